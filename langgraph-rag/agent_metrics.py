@@ -0,0 +1,267 @@
+"""
+Agent Metrics
+SQL 에이전트 실행 메트릭과 토큰 사용량/구간(span) 추적 콜백
+
+langchain_sql_agent.LangChainSQLAgent와 langgraph_rag.TextToSqlAgent가 함께 사용합니다.
+
+Span은 실행 중 각 구간의 시작/종료 시각입니다.
+- llm: LLM 호출 한 번 (토큰 수 포함)
+- tool: 도구 호출 한 번 (sql_db_query는 SQL 텍스트, DB 실행 시간, 행 수 포함)
+- stage: 에이전트 코드의 처리 단계 (캐시 조회, 결과 후처리 등)
+AGENT_TRACE_FILE을 지정하면 실행마다 JSONL 한 줄로 기록되며 summarize_traces.py로 요약할 수 있습니다.
+"""
+
+from typing import List, Dict, Any, Optional
+from uuid import UUID
+from langchain_core.callbacks import StreamingStdOutCallbackHandler
+from langchain_core.outputs import LLMResult
+from dataclasses import dataclass, field
+import json
+import os
+import threading
+import time
+
+# ========================
+# Configuration
+# ========================
+
+# 실행 trace JSONL 파일 경로 (비어 있으면 기록하지 않음)
+AGENT_TRACE_FILE = os.getenv("AGENT_TRACE_FILE", "")
+
+# span 속성에 기록할 SQL 최대 길이
+SPAN_SQL_LENGTH = 2000
+
+_trace_lock = threading.Lock()
+
+# ========================
+# Span
+# ========================
+
+@dataclass
+class Span:
+    """실행 구간 하나"""
+    name: str  # 예: "llm", "sql_db_query", "post_process"
+    kind: str  # llm / tool / stage
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        """origin(실행 시작 시각) 기준 상대 시각(ms)으로 변환"""
+        result = {
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round(self.duration_ms, 1),
+        }
+        if self.attributes:
+            result["attributes"] = self.attributes
+        if self.error:
+            result["error"] = self.error
+        return result
+
+# ========================
+# 성능 메트릭 추적
+# ========================
+
+@dataclass
+class AgentMetrics:
+    """
+    에이전트 성능 메트릭을 추적하는 데이터 클래스
+    
+    각 쿼리 실행에 대한 상세한 메트릭 정보를 수집하여
+    성능 분석과 최적화에 활용합니다.
+    """
+    query: str  # 사용자의 원본 쿼리
+    start_time: float = field(default_factory=time.time)  # 시작 시간
+    end_time: Optional[float] = None  # 종료 시간
+    total_tokens: int = 0  # 총 토큰 사용량
+    prompt_tokens: int = 0  # 프롬프트 토큰
+    completion_tokens: int = 0  # 완성 토큰
+    tool_calls: int = 0  # 도구 호출 횟수
+    error_recoveries: int = 0  # 에러 복구 시도 횟수
+    success: bool = False  # 성공 여부
+    error_message: Optional[str] = None  # 에러 메시지 (실패 시)
+    sql_generated: Optional[str] = None  # 생성된 SQL 쿼리
+    result_count: int = 0  # 반환된 결과 행 수
+    schema_tokens_full: int = 0  # 스키마 링킹 전 스키마 토큰 수 (추정)
+    schema_tokens_pruned: int = 0  # 스키마 링킹 후 프롬프트에 넣은 스키마 토큰 수 (추정)
+    schema_link_ms: float = 0.0  # 스키마 링킹 소요 시간 (밀리초)
+    cache_hit: bool = False  # 답변 캐시 적중 여부 (LLM 호출 생략)
+    fast_path: Optional[str] = None  # 단일 호출 경로 결과 ("hit" 또는 "escalated: <사유>")
+    spans: List[Span] = field(default_factory=list)  # 구간별 소요 시간
+    
+    def start_span(self, name: str, kind: str = "stage", **attributes) -> Span:
+        """구간 시작 (end_span으로 종료)"""
+        span = Span(name=name, kind=kind, attributes=attributes)
+        self.spans.append(span)
+        return span
+    
+    def end_span(self, span: Span, error: Optional[str] = None, **attributes):
+        """구간 종료"""
+        span.end = time.time()
+        span.attributes.update(attributes)
+        if error:
+            span.error = error
+    
+    def span_totals(self) -> Dict[str, float]:
+        """종류별 총 소요 시간 (ms) - 겹치는 구간은 각각 합산"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.kind] = totals.get(span.kind, 0.0) + span.duration_ms
+        return {kind: round(ms, 1) for kind, ms in totals.items()}
+    
+    def finalize(self):
+        """메트릭 수집을 완료하고 종료 시간을 기록 (열린 span도 함께 종료)"""
+        self.end_time = time.time()
+        for span in self.spans:
+            if span.end is None:
+                span.end = self.end_time
+        
+    @property
+    def duration(self) -> float:
+        """실행 시간을 초 단위로 계산"""
+        if self.end_time:
+            return self.end_time - self.start_time
+        return time.time() - self.start_time
+    
+    def to_dict(self) -> Dict:
+        """메트릭을 딕셔너리로 변환 (JSON 직렬화용)"""
+        return {
+            "query": self.query,
+            "duration": f"{self.duration:.2f}s",
+            "total_tokens": self.total_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "schema_tokens_full": self.schema_tokens_full,
+            "schema_tokens_pruned": self.schema_tokens_pruned,
+            "schema_link_ms": round(self.schema_link_ms, 1),
+            "tool_calls": self.tool_calls,
+            "error_recoveries": self.error_recoveries,
+            "success": self.success,
+            "cache_hit": self.cache_hit,
+            "fast_path": self.fast_path,
+            "result_count": self.result_count,
+            "sql": self.sql_generated,
+            "error": self.error_message,
+            "time_by_kind_ms": self.span_totals(),
+            "spans": [span.to_dict(self.start_time) for span in self.spans]
+        }
+
+
+def write_trace(metrics: AgentMetrics, trace_file: str = AGENT_TRACE_FILE):
+    """실행 trace를 JSONL 파일에 한 줄 추가 (trace_file이 비어 있으면 무시)"""
+    if not trace_file:
+        return
+    record = {
+        "timestamp": metrics.start_time,
+        "query": metrics.query,
+        "duration_ms": round(metrics.duration * 1000, 1),
+        "success": metrics.success,
+        "cache_hit": metrics.cache_hit,
+        "total_tokens": metrics.total_tokens,
+        "tool_calls": metrics.tool_calls,
+        "spans": [span.to_dict(metrics.start_time) for span in metrics.spans],
+    }
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    try:
+        with _trace_lock, open(trace_file, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"⚠️ trace 기록 실패: {e}")
+
+
+class TokenCountingCallback(StreamingStdOutCallbackHandler):
+    """
+    LLM 호출 시 토큰 사용량을 추적하는 콜백 핸들러
+    
+    Azure OpenAI의 응답에서 토큰 사용량 정보를 추출하여
+    메트릭 객체에 누적하고, LLM 호출과 도구 호출마다 span을 기록합니다.
+    도구는 스레드 풀에서 실행될 수 있으므로 열린 span은 run_id별로 락과 함께 관리합니다.
+    """
+    
+    def __init__(self, metrics: AgentMetrics):
+        super().__init__()
+        self.metrics = metrics
+        self._open: Dict[UUID, Span] = {}
+        self._lock = threading.Lock()
+    
+    def _start(self, run_id: Optional[UUID], name: str, kind: str, **attributes):
+        span = self.metrics.start_span(name, kind, **attributes)
+        if run_id is not None:
+            with self._lock:
+                self._open[run_id] = span
+    
+    def _end(self, run_id: Optional[UUID], error: Optional[str] = None, **attributes) -> Optional[Span]:
+        with self._lock:
+            span = self._open.pop(run_id, None) if run_id is not None else None
+        if span is not None:
+            self.metrics.end_span(span, error=error, **attributes)
+        return span
+    
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID = None, **kwargs: Any):
+        self._start(run_id, "llm", "llm")
+    
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID = None, **kwargs: Any):
+        self._start(run_id, "llm", "llm", messages=sum(len(m) for m in messages))
+    
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID = None, **kwargs: Any):
+        """
+        LLM 호출이 완료될 때 호출되는 콜백
+        응답에서 토큰 사용량 정보를 추출합니다.
+        """
+        usage = {}
+        if response.llm_output and 'token_usage' in response.llm_output:
+            usage = response.llm_output['token_usage'] or {}
+            self.metrics.prompt_tokens += usage.get('prompt_tokens', 0)
+            self.metrics.completion_tokens += usage.get('completion_tokens', 0)
+            self.metrics.total_tokens += usage.get('total_tokens', 0)
+        self._end(run_id, prompt_tokens=usage.get('prompt_tokens', 0),
+                  completion_tokens=usage.get('completion_tokens', 0))
+    
+    def on_llm_error(self, error: BaseException, *, run_id: UUID = None, **kwargs: Any):
+        self._end(run_id, error=str(error))
+    
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID = None, **kwargs: Any):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        attributes = {}
+        if name == "sql_db_query":
+            inputs = kwargs.get("inputs") or {}
+            attributes["sql"] = str(inputs.get("query", input_str))[:SPAN_SQL_LENGTH]
+        else:
+            attributes["input"] = str(input_str)[:200]
+        self._start(run_id, name, "tool", **attributes)
+    
+    def on_tool_end(self, output: Any, *, run_id: UUID = None, **kwargs: Any):
+        span = self._end(run_id, output_chars=len(str(output)))
+        if span is not None and span.name == "sql_db_query":
+            attach_db_timing(span)
+    
+    def on_tool_error(self, error: BaseException, *, run_id: UUID = None, **kwargs: Any):
+        self._end(run_id, error=str(error))
+
+
+def attach_db_timing(span: Span):
+    """
+    sql_db_query span에 DB 실행 시간/행 수 추가
+    
+    CapturingQuerySQLDataBaseTool이 현재 실행의 ResultCapture에 남긴 기록에서 같은 SQL을 찾습니다.
+    """
+    from sql_query_tool import current_capture  # sql_query_tool이 이 모듈을 간접 참조하지 않도록 지연 import
+    
+    capture = current_capture()
+    sql = span.attributes.get("sql")
+    if capture is None or not sql:
+        return
+    for timing in reversed(capture.timings):
+        if timing.sql[:SPAN_SQL_LENGTH] == sql:
+            span.attributes["db_ms"] = round(timing.elapsed_ms, 1)
+            span.attributes["rows"] = timing.rows
+            if timing.error:
+                span.error = timing.error
+            return
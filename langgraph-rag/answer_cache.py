@@ -0,0 +1,217 @@
+"""
+Answer Cache - 질문 → 검증된 SQL 캐시
+같은 (또는 거의 같은) 질문이 다시 들어오면 ReAct 루프와 LLM 호출을 건너뛰고
+이전에 검증된 SQL만 최신 데이터에 다시 실행합니다.
+
+- 정확 일치: 정규화된 질문 텍스트
+- 유사 일치: 문자 n-gram 코사인 유사도 (로컬 역색인으로 후보 검색)
+- 숫자나 기간/순위 표현("이번 달" vs "지난 달", "상위" vs "하위")이 다르면 유사 일치로 보지 않음
+- LRU 방식으로 최대 개수 유지
+- 스키마 fingerprint 또는 임포터 적재 시각이 바뀌면 전체 무효화
+"""
+
+from typing import Dict, Optional, Set, Tuple
+from dataclasses import dataclass, field
+from collections import Counter, OrderedDict
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+
+# ========================
+# Configuration
+# ========================
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 256))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.9))
+
+# 의미에 영향이 없는 요청 표현 (정규화 시 제거)
+FILLER_PHRASES = [
+    "보여주세요", "보여줘요", "보여줘", "알려주세요", "알려줘요", "알려줘", "조회해줘", "조회해주세요",
+    "찾아줘", "찾아주세요", "주세요", "해줘", "please", "show me", "show",
+]
+
+# 다르면 다른 질문으로 취급해야 하는 기간/순위/방향 표현
+CRITICAL_TERMS = [
+    "이번", "지난", "다음", "올해", "작년", "전년", "내년", "오늘", "어제", "내일", "최근",
+    "상위", "하위", "최대", "최소", "최고", "최저", "증가", "감소", "평균", "합계",
+    "일별", "주별", "월별", "분기", "연별", "년별",
+]
+
+NGRAM_SIZE = 3
+
+# 캐시 버전: (스키마 fingerprint, 임포터 마지막 적재 시각)
+CacheVersion = Tuple[str, float]
+
+
+def normalize_question(question: str) -> str:
+    """질문 정규화 (NFKC, 소문자, 요청 표현/구두점/공백 정리)"""
+    q = unicodedata.normalize("NFKC", question).lower()
+    for phrase in FILLER_PHRASES:
+        q = q.replace(phrase, " ")
+    q = re.sub(r"[^\w\s가-힣]", " ", q)
+    return re.sub(r"\s+", " ", q).strip()
+
+
+def question_signature(normalized: str) -> Tuple[frozenset, frozenset]:
+    """유사 일치를 허용하려면 반드시 같아야 하는 숫자/핵심 표현"""
+    numbers = frozenset(re.findall(r"\d+", normalized))
+    terms = frozenset(t for t in CRITICAL_TERMS if t in normalized)
+    return numbers, terms
+
+
+def ngram_vector(normalized: str) -> Counter:
+    """공백을 제거한 문자 n-gram 빈도 벡터"""
+    compact = normalized.replace(" ", "")
+    if len(compact) <= NGRAM_SIZE:
+        return Counter([compact]) if compact else Counter()
+    return Counter(compact[i:i + NGRAM_SIZE] for i in range(len(compact) - NGRAM_SIZE + 1))
+
+
+def cosine(a: Counter, a_norm: float, b: Counter, b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    return dot / (a_norm * b_norm)
+
+
+@dataclass
+class CacheEntry:
+    """캐시된 질문과 검증된 SQL"""
+    key: str  # 정규화된 질문
+    question: str  # 원본 질문
+    sql: str  # 검증된 SQL
+    vector: Counter
+    norm: float
+    signature: Tuple[frozenset, frozenset]
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class AnswerCache:
+    """
+    질문 → 검증된 SQL LRU 캐시 (스레드 안전)
+
+    lookup()과 store()에 현재 캐시 버전을 넘기면 버전이 바뀐 경우 자동으로 비웁니다.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.version: Optional[CacheVersion] = None
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._index: Dict[str, Set[str]] = {}  # n-gram → 질문 key (유사 일치 후보 검색용)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, version: CacheVersion):
+        if self.version != version:
+            if self._entries:
+                print("🧹 Answer cache invalidated (schema or data load changed)")
+            self._entries.clear()
+            self._index.clear()
+            self.version = version
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry:
+            for gram in entry.vector:
+                keys = self._index.get(gram)
+                if keys:
+                    keys.discard(key)
+                    if not keys:
+                        del self._index[gram]
+
+    def lookup(self, question: str, version: CacheVersion) -> Optional[Tuple[CacheEntry, float]]:
+        """
+        캐시 조회
+
+        Returns:
+            (캐시 항목, 유사도) 또는 None
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version(version)
+
+            entry = self._entries.get(key)
+            similarity = 1.0
+            if entry is None:
+                vector = ngram_vector(key)
+                norm = math.sqrt(sum(c * c for c in vector.values()))
+                signature = question_signature(key)
+
+                candidates = set()
+                for gram in vector:
+                    candidates.update(self._index.get(gram, ()))
+
+                best, similarity = None, 0.0
+                for candidate_key in candidates:
+                    candidate = self._entries[candidate_key]
+                    if candidate.signature != signature:
+                        continue
+                    score = cosine(vector, norm, candidate.vector, candidate.norm)
+                    if score > similarity:
+                        best, similarity = candidate, score
+
+                entry = best if similarity >= self.threshold else None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry.hits += 1
+            self.hits += 1
+            self._entries.move_to_end(entry.key)
+            return entry, similarity
+
+    def store(self, question: str, sql: str, version: CacheVersion):
+        """검증된 SQL 저장 (가장 오래 사용되지 않은 항목부터 제거)"""
+        key = normalize_question(question)
+        if not key or not sql:
+            return
+
+        vector = ngram_vector(key)
+        entry = CacheEntry(
+            key=key,
+            question=question,
+            sql=sql,
+            vector=vector,
+            norm=math.sqrt(sum(c * c for c in vector.values())),
+            signature=question_signature(key),
+        )
+
+        with self._lock:
+            self._check_version(version)
+            self._remove(key)
+            self._entries[key] = entry
+            for gram in vector:
+                self._index.setdefault(gram, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def evict(self, key: str):
+        """캐시 항목 제거 (캐시된 SQL 재실행이 실패한 경우, key는 CacheEntry.key)"""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,233 @@
+"""
+Async DB - SQLAlchemy 비동기 엔진 기반 SQL 실행 경로
+에이전트의 SQL 실행을 이벤트 루프를 막지 않는 비동기 드라이버로 처리
+
+동기 엔진(psycopg2)으로 async 핸들러 안에서 쿼리를 실행하면 느린 쿼리 하나가 uvicorn 이벤트 루프를
+점유하여 다른 SSE 스트림(/api/chat 등)까지 멈춥니다. 이 모듈은 별도 풀을 가진 비동기 엔진으로
+- PostgreSQL: postgresql+asyncpg
+- SQLite: sqlite+aiosqlite
+결과를 청크 단위로 가져오며 청크마다 이벤트 루프에 양보합니다.
+
+시간 예산/취소는 query_budget과 같은 규칙을 따릅니다.
+- PostgreSQL은 SET LOCAL statement_timeout, SQLite는 progress handler (클라이언트 측 타임아웃은 보조)
+- 쿼리는 CancelScope에 태스크로 등록되며, 취소되면 asyncpg가 서버에 취소 요청을 보냅니다.
+
+스키마 조회, EXPLAIN(cost_guard), 컬럼 프로파일 등 짧은 메타데이터 조회는 기존 동기 엔진을 사용합니다.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Awaitable
+from contextlib import asynccontextmanager
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from query_budget import (
+    QUERY_TIMEOUT_MS, SQLITE_PROGRESS_STEPS, BudgetExceeded, CancelScope, current_scope, translate_error
+)
+import asyncio
+import os
+import threading
+import time
+
+# ========================
+# Configuration
+# ========================
+
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", 20))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", 40))
+
+# 한 번에 가져오는 행 수 (청크마다 이벤트 루프에 양보)
+ASYNC_FETCH_CHUNK = int(os.getenv("ASYNC_FETCH_CHUNK", 500))
+
+# 헬스 체크 쿼리 제한 시간 (밀리초)
+HEALTH_CHECK_TIMEOUT_MS = 5000
+
+# 동기 드라이버 URL → 비동기 드라이버
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(db_url: str) -> str:
+    """동기 DB URL을 비동기 드라이버 URL로 변환"""
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"Unsupported database for async execution: {backend}")
+
+    query = dict(url.query)
+    # asyncpg는 libpq 옵션 sslmode 대신 ssl을 받음
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername=driver, query=query).render_as_string(hide_password=False)
+
+
+def returns_rows(sql: str) -> bool:
+    """서버 사이드 커서로 스트리밍할 수 있는 조회 문장인지"""
+    return sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+class AsyncDatabase:
+    """
+    비동기 SQL 실행기 (DB URL당 하나, get_async_db()로 공유)
+
+    비동기 엔진의 커넥션은 처음 사용한 이벤트 루프에 묶이므로 프로세스당 하나의 루프에서 사용합니다.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        pool_size: int = ASYNC_DB_POOL_SIZE,
+        max_overflow: int = ASYNC_DB_MAX_OVERFLOW,
+        timeout_ms: int = QUERY_TIMEOUT_MS
+    ):
+        self.url = to_async_url(db_url)
+        self.dialect = make_url(self.url).get_backend_name()
+        self.timeout_ms = timeout_ms
+
+        engine_args: Dict[str, Any] = {}
+        if self.dialect != "sqlite":
+            engine_args = {
+                "pool_size": pool_size,
+                "max_overflow": max_overflow,
+                "pool_pre_ping": True,
+                "pool_recycle": 3600,
+            }
+        self.engine = create_async_engine(self.url, **engine_args)
+
+    @asynccontextmanager
+    async def connect(self, timeout_ms: Optional[int] = None,
+                      scope: Optional[CancelScope] = None) -> AsyncIterator[AsyncConnection]:
+        """
+        시간 예산이 적용된 연결
+
+        - PostgreSQL: SET LOCAL statement_timeout (트랜잭션이 끝나면 설정도 사라짐)
+        - SQLite: progress handler가 제한 시간 초과 또는 scope 취소 시 실행 중인 문장을 중단
+          (aiosqlite는 전용 스레드에서 실행되므로 태스크 취소만으로는 쿼리가 멈추지 않음)
+        """
+        timeout_ms = self.timeout_ms if timeout_ms is None else timeout_ms
+        scope = scope if scope is not None else current_scope()
+        async with self.engine.connect() as conn:
+            driver = None
+            if self.dialect == "postgresql" and timeout_ms:
+                await conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+            elif self.dialect == "sqlite":
+                driver = (await conn.get_raw_connection()).driver_connection
+                deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+
+                def progress() -> int:
+                    if deadline is not None and time.monotonic() > deadline:
+                        return 1
+                    return 1 if scope is not None and scope.cancelled else 0
+
+                await driver.set_progress_handler(progress, SQLITE_PROGRESS_STEPS)
+            try:
+                yield conn
+            finally:
+                # 취소로 무효화된 연결은 풀로 돌아가지 않으므로 핸들러를 지울 필요 없음
+                if driver is not None and not conn.invalidated:
+                    await driver.set_progress_handler(None, 0)
+
+    async def guard(self, awaitable: Awaitable, sql: str = "", timeout_ms: Optional[int] = None,
+                    scope: Optional[CancelScope] = None):
+        """
+        시간 예산/취소 범위 안에서 DB 작업 실행
+
+        - 작업을 태스크로 만들어 scope에 등록 (scope.cancel() → 태스크 취소 → 서버에 취소 요청)
+        - PostgreSQL은 서버의 statement_timeout이 먼저 동작하도록 클라이언트 측 제한에 여유를 둠
+        - 시간 초과/취소는 BudgetExceeded로 변환
+        """
+        timeout_ms = self.timeout_ms if timeout_ms is None else timeout_ms
+        scope = scope if scope is not None else current_scope()
+        # DB 측 제한(statement_timeout / progress handler)이 먼저 동작하도록 여유를 둔 클라이언트 측 제한
+        client_timeout = timeout_ms / 1000 + 1.0 if timeout_ms else None
+
+        task = asyncio.ensure_future(awaitable)
+        if scope is not None:
+            try:
+                scope.register(task)
+            except BudgetExceeded:
+                task.cancel()
+                raise
+        try:
+            return await asyncio.wait_for(task, timeout=client_timeout)
+        except asyncio.TimeoutError:
+            raise BudgetExceeded("statement_timeout", sql=sql, limit_ms=timeout_ms)
+        except asyncio.CancelledError:
+            # 바깥 태스크가 취소된 경우는 그대로 전달, scope 취소로 작업만 취소된 경우는 BudgetExceeded
+            if asyncio.current_task().cancelling() or scope is None or not scope.cancelled:
+                raise
+            raise BudgetExceeded("cancelled", sql=sql, detail=scope.reason)
+        except Exception as e:
+            # SQLite progress handler 중단은 scope 취소가 아니면 시간 초과
+            timed_out = (self.dialect == "sqlite" and "interrupted" in str(e)
+                         and not (scope is not None and scope.cancelled))
+            translated = translate_error(e, timeout_ms, scope, timed_out)
+            if translated is e:
+                raise
+            raise translated from e
+        finally:
+            if scope is not None:
+                scope.unregister(task)
+
+    async def _fetch(self, sql: str, max_rows: int, timeout_ms: Optional[int],
+                     scope: Optional[CancelScope]) -> Tuple[List[str], List[Tuple]]:
+        async with self.connect(timeout_ms, scope) as conn:
+            if not returns_rows(sql):
+                result = await conn.execute(text(sql))
+                if not result.returns_rows:
+                    return [], []
+                return list(result.keys()), [tuple(row) for row in result.fetchmany(max_rows + 1)]
+
+            # 서버 사이드 커서: max_rows + 1행 이후는 DB가 만들지 않음
+            result = await conn.stream(text(sql))
+            columns = list(result.keys())
+            rows: List[Tuple] = []
+            async for chunk in result.partitions(min(ASYNC_FETCH_CHUNK, max_rows + 1)):
+                rows.extend(tuple(row) for row in chunk)
+                if len(rows) > max_rows:
+                    break
+                await asyncio.sleep(0)  # 다른 요청(SSE 스트림)에 이벤트 루프 양보
+            await result.close()
+            return columns, rows
+
+    async def fetch(
+        self,
+        sql: str,
+        max_rows: int,
+        timeout_ms: Optional[int] = None,
+        scope: Optional[CancelScope] = None
+    ) -> Tuple[List[str], List[Tuple], bool]:
+        """
+        SQL 실행 후 (컬럼, 최대 max_rows개 행, 잘렸는지 여부) 반환
+
+        행은 드라이버가 반환한 타입(Decimal, date 등) 그대로입니다.
+        """
+        scope = scope if scope is not None else current_scope()
+        columns, rows = await self.guard(self._fetch(sql, max_rows, timeout_ms, scope), sql, timeout_ms, scope)
+        return columns, rows[:max_rows], len(rows) > max_rows
+
+    async def ping(self) -> bool:
+        """헬스 체크 (SELECT 1)"""
+        try:
+            await self.fetch("SELECT 1", max_rows=1, timeout_ms=HEALTH_CHECK_TIMEOUT_MS, scope=CancelScope())
+            return True
+        except Exception as e:
+            print(f"⚠️ DB health check failed: {str(e)}")
+            return False
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+
+_databases: Dict[str, AsyncDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_async_db(db_url: str) -> AsyncDatabase:
+    """DB URL별 프로세스 전역 AsyncDatabase (에이전트들이 같은 비동기 풀을 공유)"""
+    with _databases_lock:
+        if db_url not in _databases:
+            _databases[db_url] = AsyncDatabase(db_url)
+        return _databases[db_url]
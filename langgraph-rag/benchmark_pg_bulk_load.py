@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL 적재 방식별 벤치마크
+기존 import 스크립트의 행 단위 INSERT(iterrows + execute, N행마다 commit)와
+pg_bulk_load의 COPY FROM STDIN 적재를 같은 데이터로 비교
+
+SAP 재고(ZMMR0016) 형태의 합성 데이터를 임시 테이블에 적재하여 측정합니다.
+행 단위 INSERT는 느리므로 --insert-rows행만 적재한 뒤 전체 행 수로 환산합니다.
+
+--db 옵션으로 측정할 DB를 지정합니다 (기본: DATABASE_URL).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+import pandas as pd
+import psycopg2
+from dotenv import load_dotenv
+
+from pg_bulk_load import COPY_CHUNK_ROWS, load_dataframe, sap_number, sap_strings
+
+TABLE = "benchmark_pg_bulk_load"
+
+COLUMNS = [
+    ("자재번호", "VARCHAR(18)"),
+    ("자재명", "TEXT"),
+    ("플랜트", "VARCHAR(4)"),
+    ("저장위치", "VARCHAR(4)"),
+    ("가용재고", "NUMERIC(15,3)"),
+    ("품질검사재고", "NUMERIC(15,3)"),
+    ("블록재고", "NUMERIC(15,3)"),
+    ("기본단위", "VARCHAR(3)"),
+    ("재고금액", "NUMERIC(20,2)"),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+COLUMN_SQL = ", ".join(f'"{name}"' for name in COLUMN_NAMES)
+NUMERIC_COLUMNS = {name for name, kind in COLUMNS if kind.startswith("NUMERIC")}
+
+
+def synthetic_inventory(row_count: int) -> pd.DataFrame:
+    """RFC_READ_TABLE 결과처럼 모든 값이 문자열인 재고 데이터 (빈 값, 음수 부호 뒤붙임 포함)"""
+    rng = random.Random(42)
+    rows = []
+    for _ in range(row_count):
+        rows.append((
+            f"M{rng.randint(100000, 999999):017d}",
+            f"자재 {rng.randint(1, 9999)}",
+            rng.choice(["1000", "1100", "2000"]),
+            rng.choice(["0001", "0002", ""]),
+            f"{rng.randint(0, 500000) / 1000:.3f}",
+            rng.choice(["", "0.000", f"{rng.randint(1, 999)}.000"]),
+            rng.choice(["", f"{rng.randint(1, 99)}.000-"]),
+            "EA",
+            f"{rng.randint(0, 99999999) / 100:,.2f}",
+        ))
+    return pd.DataFrame(rows, columns=COLUMN_NAMES)
+
+
+def clean(df: pd.DataFrame) -> pd.DataFrame:
+    """import 스크립트와 같은 정리 (문자열 빈 값 → NULL, 숫자 변환)"""
+    return pd.DataFrame({
+        col: sap_number(df[col]) if col in NUMERIC_COLUMNS else sap_strings(df[col])
+        for col in df.columns
+    })
+
+
+def reset_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    column_sql = ", ".join(f'"{name}" {kind}' for name, kind in COLUMNS)
+    cursor.execute(f"CREATE TABLE {TABLE} (id SERIAL PRIMARY KEY, {column_sql})")
+    conn.commit()
+
+
+def insert_rows(conn, df: pd.DataFrame, commit_every: int) -> int:
+    """기존 방식: 행마다 값 변환 후 INSERT, commit_every행마다 commit"""
+    cursor = conn.cursor()
+    query = f"INSERT INTO {TABLE} ({COLUMN_SQL}) VALUES ({', '.join(['%s'] * len(COLUMNS))})"
+    inserted = 0
+    for _, row in df.iterrows():
+        values = []
+        for name in COLUMN_NAMES:
+            value = str(row.get(name, '')).strip()
+            if name in NUMERIC_COLUMNS:
+                value = value.replace(",", "")
+                if value.endswith("-"):
+                    value = "-" + value[:-1]
+                values.append(float(value) if value else 0)
+            else:
+                values.append(value or None)
+        cursor.execute(query, values)
+        inserted += 1
+        if inserted % commit_every == 0:
+            conn.commit()
+    conn.commit()
+    return inserted
+
+
+def table_rows(conn) -> List[tuple]:
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {COLUMN_SQL} FROM {TABLE} ORDER BY id")
+    return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostgreSQL 적재 방식별 벤치마크")
+    parser.add_argument("--rows", type=int, default=200000, help="COPY로 적재할 합성 행 수")
+    parser.add_argument("--insert-rows", type=int, default=5000, help="행 단위 INSERT로 적재할 행 수 (전체 행 수로 환산)")
+    parser.add_argument("--commit-every", type=int, default=100, help="행 단위 INSERT의 commit 간격 (기존 스크립트 기본 100)")
+    parser.add_argument("--chunk-rows", type=int, default=COPY_CHUNK_ROWS, help="COPY 단위 (행)")
+    parser.add_argument("--db", default=None, help="측정할 DB URL (기본: DATABASE_URL)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db_url = args.db or os.getenv("DATABASE_URL")
+    if not db_url:
+        print("❌ --db 또는 DATABASE_URL이 필요합니다")
+        sys.exit(1)
+
+    raw = synthetic_inventory(args.rows)
+    conn = psycopg2.connect(db_url)
+
+    print("=" * 80)
+    print(f"📊 PostgreSQL 적재 벤치마크 ({args.rows:,}행, INSERT는 {args.insert_rows:,}행 측정 후 환산)")
+    print("=" * 80)
+    print(f"{'방식':<30}{'행':>12}{'초':>10}{'행/초':>12}{'전체 환산 (초)':>16}")
+
+    try:
+        sample = raw.iloc[:args.insert_rows]
+
+        reset_table(conn)
+        started = time.perf_counter()
+        insert_rows(conn, sample, args.commit_every)
+        insert_time = time.perf_counter() - started
+        insert_rate = len(sample) / insert_time
+        expected = table_rows(conn)
+        print(f"{'행 단위 INSERT (기존)':<30}{len(sample):>12,}{insert_time:>10.2f}{insert_rate:>12,.0f}{args.rows / insert_rate:>16.1f}")
+
+        reset_table(conn)
+        load_dataframe(conn, TABLE, clean(sample), chunk_rows=args.chunk_rows, progress=False)
+        if table_rows(conn) != expected:
+            print("\n❌ COPY 결과가 행 단위 INSERT와 다름")
+            sys.exit(1)
+
+        reset_table(conn)
+        started = time.perf_counter()
+        cleaned = clean(raw)
+        clean_time = time.perf_counter() - started
+        stats = load_dataframe(conn, TABLE, cleaned, chunk_rows=args.chunk_rows, progress=False)
+        copy_time = clean_time + stats["seconds"]
+        copy_rate = stats["rows"] / copy_time
+        print(f"{'정리 + COPY':<30}{stats['rows']:>12,}{copy_time:>10.2f}{copy_rate:>12,.0f}{copy_time:>16.1f}")
+        print(f"  (컬럼 정리 {clean_time:.2f}초, COPY {stats['seconds']:.2f}초)")
+
+        print(f"\n⚡ 기존 대비 {copy_rate / insert_rate:.0f}배")
+        print("✅ 두 방식의 적재 결과가 같음")
+    finally:
+        conn.rollback()
+        conn.cursor().execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
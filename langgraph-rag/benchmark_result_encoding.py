@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+결과 형식별 직렬화 벤치마크
+/api/text-to-sql 결과(행 딕셔너리 리스트)를 형식별로 인코딩하여 크기와 CPU 시간을 비교
+
+SAP 재고/판매 테이블처럼 한글 컬럼 이름이 많은 결과를 합성하여 측정합니다.
+- 기존 응답: FastAPI 기본 경로와 같이 jsonable_encoder 후 JSON 직렬화
+- rows / columnar JSON, NDJSON (무압축, gzip, zstd), Arrow IPC (pyarrow 설치 시)
+
+--db 옵션을 주면 합성 데이터 대신 해당 DB에서 --sql 결과를 가져와 측정합니다.
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List, Dict, Any, Callable, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from result_encoding import (
+    FORMAT_ARROW, FORMAT_COLUMNAR, FORMAT_NDJSON, FORMAT_ROWS,
+    available_formats, compress, dumps, encode_result, zstandard
+)
+
+BASE_COLUMNS = ["자재코드", "자재명", "플랜트", "저장위치", "재고수량", "재고금액", "단위", "기준일자", "고객명", "판매수량"]
+
+
+def synthetic_rows(row_count: int, column_count: int) -> List[Dict[str, Any]]:
+    """한글 컬럼 이름, 문자열/정수/Decimal/날짜가 섞인 결과 행"""
+    columns = [
+        BASE_COLUMNS[i] if i < len(BASE_COLUMNS) else f"{BASE_COLUMNS[i % len(BASE_COLUMNS)]}_{i // len(BASE_COLUMNS)}"
+        for i in range(column_count)
+    ]
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    rows = []
+    for i in range(row_count):
+        row = {}
+        for j, column in enumerate(columns):
+            kind = j % 4
+            if kind == 0:
+                row[column] = f"M{rng.randint(100000, 999999)}"
+            elif kind == 1:
+                row[column] = rng.randint(0, 100000)
+            elif kind == 2:
+                row[column] = Decimal(rng.randint(0, 10_000_000)) / 100
+            else:
+                row[column] = start + timedelta(days=i % 365)
+        rows.append(row)
+    return rows
+
+
+def fetch_rows(db_url: str, sql: str) -> List[Dict[str, Any]]:
+    from sqlalchemy import create_engine, text
+    with create_engine(db_url).connect() as conn:
+        result = conn.execute(text(sql))
+        columns = list(result.keys())
+        return [dict(zip(columns, row)) for row in result]
+
+
+def measure(fn: Callable[[], bytes], repeat: int) -> Tuple[float, int]:
+    """가장 빠른 실행의 CPU 시간(ms)과 결과 크기"""
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.process_time()
+        body = fn()
+        best = min(best, time.process_time() - started)
+        size = len(body)
+    return best * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="결과 형식별 직렬화 벤치마크")
+    parser.add_argument("--rows", type=int, default=10000, help="합성 행 수")
+    parser.add_argument("--columns", type=int, default=60, help="합성 컬럼 수")
+    parser.add_argument("--repeat", type=int, default=3, help="형식별 반복 횟수 (가장 빠른 값 사용)")
+    parser.add_argument("--db", help="측정할 DB URL (주면 합성 데이터 대신 사용)")
+    parser.add_argument("--sql", default="SELECT * FROM sap_zmmr0016_inventory LIMIT 10000", help="--db에서 실행할 SQL")
+    args = parser.parse_args()
+
+    rows = fetch_rows(args.db, args.sql) if args.db else synthetic_rows(args.rows, args.columns)
+    meta = {"success": True, "query": "benchmark", "row_count": len(rows), "truncated": False}
+
+    cases = [
+        ("json (기존, 행 딕셔너리)", lambda: dumps(jsonable_encoder({**meta, "results": rows})).encode()),
+        ("rows+json", lambda: encode_result(meta, rows, FORMAT_ROWS)),
+        ("columnar+json", lambda: encode_result(meta, rows, FORMAT_COLUMNAR)),
+        ("ndjson", lambda: encode_result(meta, rows, FORMAT_NDJSON)),
+        ("ndjson + gzip", lambda: compress(encode_result(meta, rows, FORMAT_NDJSON), "gzip")[0]),
+        ("json (기존) + gzip", lambda: compress(dumps(jsonable_encoder({**meta, "results": rows})).encode(), "gzip")[0]),
+    ]
+    if zstandard is not None:
+        cases.append(("ndjson + zstd", lambda: compress(encode_result(meta, rows, FORMAT_NDJSON), "zstd")[0]))
+    if FORMAT_ARROW in available_formats():
+        cases.append(("arrow", lambda: encode_result(meta, rows, FORMAT_ARROW)))
+        if zstandard is not None:
+            cases.append(("arrow + zstd", lambda: compress(encode_result(meta, rows, FORMAT_ARROW), "zstd")[0]))
+
+    column_count = len(rows[0]) if rows else 0
+    print("=" * 80)
+    print(f"📊 결과 인코딩 벤치마크 ({len(rows):,}행 x {column_count}컬럼, {args.repeat}회 중 최소)")
+    print("=" * 80)
+    print(f"{'형식':<28}{'크기':>14}{'기존 대비':>10}{'CPU (ms)':>12}")
+
+    baseline = None
+    for label, fn in cases:
+        cpu_ms, size = measure(fn, args.repeat)
+        baseline = baseline or size
+        print(f"{label:<28}{size:>14,}{size / baseline:>9.1%}{cpu_ms:>12.1f}")
+
+    if zstandard is None:
+        print("\nℹ️ zstandard 미설치: zstd 압축 생략")
+    if FORMAT_ARROW not in available_formats():
+        print("ℹ️ pyarrow 미설치: Arrow 형식 생략")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+RFC_READ_TABLE 추출 방식별 처리량 벤치마크
+기존 ROWSKIPS 순차 페이징과 키 범위 분할 병렬 추출(rfc_extract)을 파티션 수별로 비교
+
+기본 모드는 FakeRFCServer에 VBAP 형태의 합성 테이블을 올려 측정합니다.
+가짜 서버는 호출 지연, 읽은 행 수(ROWSKIPS로 건너뛴 행 포함), 전송 바이트에 비례해 sleep하므로
+SAP 서버 비용 구조(앞부분 재스캔, 커넥션당 직렬 처리)를 재현합니다.
+
+--live 옵션을 주면 실제 SAP(.env의 SAP_* 설정)에서 --table/--fields/--key로 측정합니다.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Tuple, Callable
+
+from rfc_extract import (
+    RFC_PAGE_SIZE, ExtractResult, FakeRFCServer, FakeTable, RFCConnectionPool, RFCTableExtractor
+)
+
+VBAP_FIELDS = ["VBELN", "POSNR", "MATNR", "WERKS", "LGORT", "KWMENG", "VRKME", "NETWR", "WAERK", "ARKTX"]
+
+
+def synthetic_vbap(row_count: int, items_per_doc: int = 5) -> FakeTable:
+    """판매 문서당 아이템 여러 개인 VBAP 형태의 테이블 (키: VBELN, POSNR)"""
+    rng = random.Random(42)
+    rows = []
+    doc = 10000000
+    while len(rows) < row_count:
+        doc += rng.randint(1, 3)
+        for item in range(1, rng.randint(1, items_per_doc * 2) + 1):
+            if len(rows) >= row_count:
+                break
+            rows.append((
+                f"{doc:010d}", f"{item * 10:06d}", f"M{rng.randint(100000, 999999):017d}",
+                rng.choice(["1000", "1100", "2000"]), rng.choice(["0001", "0002", "0010"]),
+                f"{rng.randint(1, 500)}.000", "EA", f"{rng.randint(1000, 9999999) / 100:.2f}", "KRW",
+                f"자재 {rng.randint(1, 9999)}",
+            ))
+    return FakeTable("VBAP", VBAP_FIELDS, rows, key_fields=["VBELN", "POSNR"])
+
+
+def measure(label: str, workers: int, run: Callable[[], ExtractResult]) -> Tuple[ExtractResult, float]:
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    stats = result.stats
+    print(
+        f"{label:<24}{workers:>8}{stats.partitions:>8}{stats.calls:>8}{stats.rows:>10,}"
+        f"{elapsed:>10.2f}{stats.rows / elapsed:>12,.0f}"
+    )
+    return result, elapsed
+
+
+def run_benchmark(pool_factory: Callable[[int], RFCConnectionPool], table: str, fields: List[str],
+                  conditions: List[str], key: str, partition_counts: List[int], max_pool: int,
+                  page_size: int) -> List[str]:
+    print(f"{'방식':<24}{'커넥션':>8}{'파티션':>8}{'호출':>8}{'행':>10}{'초':>10}{'행/초':>12}")
+
+    pool = pool_factory(1)
+    baseline, baseline_time = measure(
+        "ROWSKIPS 순차 (기존)", 1,
+        lambda: RFCTableExtractor(pool, page_size=page_size, verbose=False).read_sequential(table, fields, conditions)
+    )
+    pool.close()
+    expected = sorted(map(tuple, baseline.rows))
+
+    failures = []
+    for partitions in partition_counts:
+        workers = min(partitions, max_pool)
+        pool = pool_factory(workers)
+        extractor = RFCTableExtractor(pool, page_size=page_size, partitions=partitions, verbose=False)
+        result, elapsed = measure(
+            "키 범위 분할", workers,
+            lambda: extractor.read(table, fields, conditions, partition_key=key)
+        )
+        pool.close()
+        if sorted(map(tuple, result.rows)) != expected:
+            failures.append(f"파티션 {partitions}: 결과가 순차 추출과 다름 ({result.stats.rows:,}행)")
+        if partitions == partition_counts[-1]:
+            print(f"\n⚡ 기존 대비 {baseline_time / elapsed:.1f}배 (파티션 {result.stats.partitions}개, 커넥션 {workers}개)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RFC_READ_TABLE 추출 벤치마크")
+    parser.add_argument("--rows", type=int, default=100000, help="합성 행 수")
+    parser.add_argument("--partitions", default="1,2,4,8,16,32", help="비교할 파티션 수 (쉼표 구분, 커넥션 수 = min(파티션, --max-pool))")
+    parser.add_argument("--max-pool", type=int, default=8, help="최대 동시 커넥션 수")
+    parser.add_argument("--page-size", type=int, default=RFC_PAGE_SIZE, help="RFC_READ_TABLE ROWCOUNT")
+    parser.add_argument("--latency", type=float, default=0.05, help="가짜 서버 호출 지연 (초)")
+    parser.add_argument("--scan-cost", type=float, default=5e-6, help="가짜 서버 행당 스캔 비용 (초, ROWSKIPS로 건너뛴 행 포함)")
+    parser.add_argument("--byte-cost", type=float, default=7e-7, help="가짜 서버 바이트당 전송 비용 (초, 기본값은 70바이트 행 기준 커넥션당 약 2만 행/초)")
+    parser.add_argument("--live", action="store_true", help="실제 SAP에서 측정")
+    parser.add_argument("--table", default="VBAP", help="SAP 테이블 (--live)")
+    parser.add_argument("--fields", default=",".join(VBAP_FIELDS), help="조회 필드 (--live, 쉼표 구분)")
+    parser.add_argument("--where", default="", help="WHERE 조건 (--live)")
+    parser.add_argument("--key", default="VBELN", help="파티션 키 필드")
+    args = parser.parse_args()
+
+    partition_counts = [int(p) for p in args.partitions.split(",")]
+    fields = args.fields.split(",")
+    conditions = [args.where] if args.where else []
+
+    print("=" * 80)
+    if args.live:
+        os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
+        from dotenv import load_dotenv
+        from pyrfc import Connection
+        load_dotenv()
+        sap_config = {
+            'ashost': os.getenv('SAP_ASHOST', '192.168.32.100'),
+            'sysnr': os.getenv('SAP_SYSNR', '00'),
+            'client': os.getenv('SAP_CLIENT', '100'),
+            'user': os.getenv('SAP_USER', 'bc01'),
+            'passwd': os.getenv('SAP_PASSWORD', ''),
+            'lang': os.getenv('SAP_LANG', 'KO'),
+        }
+        print(f"📊 RFC 추출 벤치마크 (SAP {args.table}, 키 {args.key})")
+        print("=" * 80)
+        failures = run_benchmark(
+            lambda size: RFCConnectionPool(lambda: Connection(**sap_config), size),
+            args.table, fields, conditions, args.key, partition_counts, args.max_pool, args.page_size
+        )
+    else:
+        server = FakeRFCServer(
+            [synthetic_vbap(args.rows)],
+            call_latency=args.latency, scan_cost=args.scan_cost, byte_cost=args.byte_cost
+        )
+        print(f"📊 RFC 추출 벤치마크 (가짜 VBAP {args.rows:,}행, 페이지 {args.page_size:,}행, 키 {args.key})")
+        print("=" * 80)
+        failures = run_benchmark(
+            lambda size: RFCConnectionPool(server.connect, size),
+            "VBAP", VBAP_FIELDS, conditions, args.key, partition_counts, args.max_pool, args.page_size
+        )
+        print(f"ℹ️ 가짜 서버 최대 동시 호출 {server.stats.max_concurrent}개")
+
+    if failures:
+        print("\n❌ 실패:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ 모든 방식의 추출 결과가 같음")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+RFC 키 목록 조회(semi-join) 방식별 벤치마크
+기존 ZMMR0016 import의 키당 RFC_READ_TABLE 1회 조회와 rfc_semijoin의 IN 목록 배치/전체 추출 + 해시 조인을 비교
+
+FakeRFCServer에 MAKT 형태의 합성 테이블(자재 x 언어)을 올리고 그 중 --keys개 자재의 한글 자재명을 조회합니다.
+키당 조회는 느리므로 --per-key-sample개만 측정한 뒤 전체 키 수로 환산합니다.
+
+--live 옵션을 주면 실제 SAP(.env의 SAP_* 설정)의 MAKT에서 --keys개 자재로 측정합니다.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List
+
+from rfc_extract import FakeRFCServer, FakeTable, RFCConnectionPool, quote, split_rows
+from rfc_semijoin import (
+    SEMIJOIN_BATCH_KEYS, STRATEGY_FULL_SCAN, STRATEGY_IN_LIST, RFCSemiJoin
+)
+
+
+def synthetic_makt(material_count: int) -> FakeTable:
+    """자재마다 한국어(3)/영어(E) 자재명이 있는 MAKT 형태의 테이블 (키: MATNR, SPRAS)"""
+    rows = []
+    for i in range(1, material_count + 1):
+        rows.append((f"{i * 7:018d}", "3", f"자재 {i}"))
+        rows.append((f"{i * 7:018d}", "E", f"MATERIAL {i}"))
+    return FakeTable("MAKT", ["MATNR", "SPRAS", "MAKTX"], rows, key_fields=["MATNR", "SPRAS"])
+
+
+def per_key_lookup(pool: RFCConnectionPool, keys: List[str]) -> List[tuple]:
+    """기존 방식: 자재마다 RFC_READ_TABLE 1회"""
+    rows = []
+    for key in keys:
+        result = pool.call(
+            "RFC_READ_TABLE",
+            QUERY_TABLE="MAKT",
+            DELIMITER="|",
+            FIELDS=[{"FIELDNAME": "MATNR"}, {"FIELDNAME": "MAKTX"}],
+            OPTIONS=[{"TEXT": f"MATNR = {quote(key)} AND SPRAS = '3'"}],
+        )
+        rows.extend(tuple(row) for row in split_rows(result["DATA"]))
+    return rows
+
+
+def run_benchmark(pool_factory: Callable[[int], RFCConnectionPool], keys: List[str], sample: int,
+                  pool_size: int, batch_keys: int) -> List[str]:
+    print(f"{'방식':<28}{'커넥션':>8}{'호출':>8}{'행':>10}{'초':>10}{'전체 환산 (초)':>16}")
+
+    pool = pool_factory(1)
+    sample_keys = keys[:sample]
+    started = time.perf_counter()
+    expected_sample = sorted(per_key_lookup(pool, sample_keys))
+    per_key_time = time.perf_counter() - started
+    pool.close()
+    per_key_total = per_key_time / max(1, len(sample_keys)) * len(keys)
+    print(f"{'키당 1회 (기존)':<28}{1:>8}{len(sample_keys):>8}{len(expected_sample):>10,}"
+          f"{per_key_time:>10.2f}{per_key_total:>16.1f}")
+
+    failures = []
+    results = {}
+    for label, strategy in [("IN 목록 배치", STRATEGY_IN_LIST), ("전체 추출 + 해시 조인", STRATEGY_FULL_SCAN)]:
+        pool = pool_factory(pool_size)
+        semi_join = RFCSemiJoin(pool, batch_keys=batch_keys, verbose=False)
+        started = time.perf_counter()
+        result = semi_join.read("MAKT", "MATNR", keys, ["MATNR", "MAKTX"], ["SPRAS = '3'"], strategy=strategy)
+        elapsed = time.perf_counter() - started
+        pool.close()
+        print(f"{label:<28}{pool_size:>8}{result.stats.calls:>8}{result.stats.rows:>10,}"
+              f"{elapsed:>10.2f}{elapsed:>16.1f}")
+        results[strategy] = (sorted(map(tuple, result.rows)), elapsed)
+
+        sample_set = set(sample_keys)
+        if sorted(row for row in results[strategy][0] if row[0] in sample_set) != expected_sample:
+            failures.append(f"{label}: 표본 키 결과가 키당 조회와 다름")
+
+    if results[STRATEGY_IN_LIST][0] != results[STRATEGY_FULL_SCAN][0]:
+        failures.append("IN 목록 배치와 전체 추출 결과가 다름")
+
+    best = min(elapsed for _, elapsed in results.values())
+    print(f"\n⚡ 기존 대비 {per_key_total / best:.0f}배 (키 {len(keys):,}개)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RFC 키 목록 조회(semi-join) 벤치마크")
+    parser.add_argument("--materials", type=int, default=200000, help="가짜 MAKT 자재 수")
+    parser.add_argument("--keys", type=int, default=5000, help="조회할 자재 수")
+    parser.add_argument("--per-key-sample", type=int, default=200, help="키당 조회로 측정할 자재 수 (전체 키 수로 환산)")
+    parser.add_argument("--pool-size", type=int, default=4, help="동시 커넥션 수")
+    parser.add_argument("--batch-keys", type=int, default=SEMIJOIN_BATCH_KEYS, help="IN 목록 한 번의 키 수")
+    parser.add_argument("--latency", type=float, default=0.02, help="가짜 서버 호출 지연 (초)")
+    parser.add_argument("--scan-cost", type=float, default=2e-6, help="가짜 서버 행당 스캔 비용 (초)")
+    parser.add_argument("--byte-cost", type=float, default=2e-7, help="가짜 서버 바이트당 전송 비용 (초)")
+    parser.add_argument("--live", action="store_true", help="실제 SAP에서 측정")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    if args.live:
+        os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
+        from dotenv import load_dotenv
+        from pyrfc import Connection
+        load_dotenv()
+        sap_config = {
+            'ashost': os.getenv('SAP_ASHOST', '192.168.32.100'),
+            'sysnr': os.getenv('SAP_SYSNR', '00'),
+            'client': os.getenv('SAP_CLIENT', '100'),
+            'user': os.getenv('SAP_USER', 'bc01'),
+            'passwd': os.getenv('SAP_PASSWORD', ''),
+            'lang': os.getenv('SAP_LANG', 'KO'),
+        }
+        pool = RFCConnectionPool(lambda: Connection(**sap_config), 1)
+        result = pool.call(
+            "RFC_READ_TABLE", QUERY_TABLE="MARD", DELIMITER="|",
+            FIELDS=[{"FIELDNAME": "MATNR"}], ROWCOUNT=args.keys * 5
+        )
+        pool.close()
+        keys = sorted({row[0] for row in split_rows(result["DATA"])})[:args.keys]
+        print(f"📊 RFC semi-join 벤치마크 (SAP MAKT, MARD 자재 {len(keys):,}개)")
+        print("=" * 80)
+        failures = run_benchmark(
+            lambda size: RFCConnectionPool(lambda: Connection(**sap_config), size),
+            keys, args.per_key_sample, args.pool_size, args.batch_keys
+        )
+    else:
+        table = synthetic_makt(args.materials)
+        server = FakeRFCServer(
+            [table], call_latency=args.latency, scan_cost=args.scan_cost, byte_cost=args.byte_cost
+        )
+        # 자재 전체에 고르게 흩어진 키 (MARD 재고가 있는 자재처럼)
+        materials = sorted({row[0] for row in table.rows})
+        step = max(1, len(materials) // args.keys)
+        keys = materials[::step][:args.keys]
+        print(f"📊 RFC semi-join 벤치마크 (가짜 MAKT 자재 {args.materials:,}개 중 {len(keys):,}개)")
+        print("=" * 80)
+        failures = run_benchmark(
+            lambda size: RFCConnectionPool(server.connect, size),
+            keys, args.per_key_sample, args.pool_size, args.batch_keys
+        )
+        print(f"ℹ️ 가짜 서버 최대 동시 호출 {server.stats.max_concurrent}개")
+
+    if failures:
+        print("\n❌ 실패:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ 모든 방식의 조회 결과가 같음")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+넓은 테이블 추출 벤치마크
+RFC_READ_TABLE 512바이트 행 제한 때문에 앞쪽 필드만 읽던 기존 방식과
+WideTableExtractor의 필드 그룹 병렬 추출 + 키 병합을 비교
+
+기본 모드는 FakeRFCServer에 MARA처럼 필드가 많은(행 폭 약 1,700바이트) 합성 테이블을 올려 측정합니다.
+가짜 서버는 호출 지연과 전송 바이트에 비례해 sleep하므로 커넥션당 처리량이 제한된 SAP를 재현합니다.
+그룹을 커넥션 수만큼 동시에 읽으므로 커넥션을 그룹 수만큼 늘리면 한 그룹을 읽는 시간에 가까워집니다.
+
+--live 옵션을 주면 실제 SAP(.env의 SAP_* 설정)에서 --table로 측정합니다.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, List
+
+from rfc_extract import (
+    RFC_PAGE_SIZE, ExtractResult, FakeRFCServer, FakeTable, RFCConnectionPool, RFCTableExtractor, WideTableExtractor
+)
+
+
+def synthetic_wide_table(material_count: int, extra_fields: int) -> FakeTable:
+    """자재 x 플랜트 키에 길이가 제각각인 필드가 많은 테이블 (키: MANDT, MATNR, WERKS)"""
+    rng = random.Random(42)
+    names = [f"ZF{i:03d}" for i in range(extra_fields)]
+    lengths = {"MANDT": 3, "MATNR": 18, "WERKS": 4, **{name: rng.choice([1, 3, 4, 10, 18, 40]) for name in names}}
+    rows = []
+    for material in range(material_count):
+        for plant in ("1000", "2000"):
+            values = [str(rng.randint(0, 10 ** min(lengths[name], 6))).zfill(lengths[name])[:lengths[name]] for name in names]
+            rows.append(("100", f"{material * 3:018d}", plant, *values))
+    return FakeTable("ZWIDE", ["MANDT", "MATNR", "WERKS", *names], rows, lengths=lengths,
+                     key_fields=["MANDT", "MATNR", "WERKS"])
+
+
+def measure(label: str, connections: int, run: Callable[[], ExtractResult]) -> ExtractResult:
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    stats = result.stats
+    print(f"{label:<28}{connections:>8}{len(result.fields):>8}{stats.groups:>8}{stats.calls:>8}"
+          f"{stats.rows:>10,}{elapsed:>10.2f}")
+    return result
+
+
+def run_benchmark(pool_factory: Callable[[int], RFCConnectionPool], table: str, pool_size: int,
+                  page_size: int) -> List[str]:
+    print(f"{'방식':<28}{'커넥션':>8}{'필드':>8}{'그룹':>8}{'호출':>8}{'행':>10}{'초':>10}")
+
+    pool = pool_factory(pool_size)
+    wide = WideTableExtractor(pool, page_size=page_size, verbose=False)
+    key_fields, groups, _ = wide.field_groups(table)
+    first_group = measure(
+        "첫 그룹만 (기존 필드 제한)", pool_size,
+        lambda: RFCTableExtractor(pool, page_size=page_size, verbose=False).read(
+            table, groups[0], partition_key=key_fields[0]
+        )
+    )
+    full = measure("전체 필드 그룹 병렬", pool_size, lambda: wide.read(table))
+    pool.close()
+
+    connections = pool_size * len(groups)
+    pool = pool_factory(connections)
+    scaled = measure(
+        "전체 필드 (커넥션 x 그룹 수)", connections,
+        lambda: WideTableExtractor(pool, page_size=page_size, verbose=False).read(table)
+    )
+    pool.close()
+
+    failures = []
+    if full.stats.mismatched or scaled.stats.mismatched:
+        failures.append("그룹 사이 키가 맞지 않는 행이 있음")
+    if sorted(map(tuple, full.rows)) != sorted(map(tuple, scaled.rows)):
+        failures.append("커넥션 수에 따라 결과가 다름")
+    if len(full.rows) != len(first_group.rows):
+        failures.append(f"행 수가 첫 그룹과 다름 ({len(full.rows):,} != {len(first_group.rows):,})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="넓은 테이블 추출 벤치마크")
+    parser.add_argument("--materials", type=int, default=20000, help="합성 자재 수 (행 = 자재 x 플랜트 2개)")
+    parser.add_argument("--fields", type=int, default=120, help="키 외 합성 필드 수")
+    parser.add_argument("--pool-size", type=int, default=4, help="동시 커넥션 수")
+    parser.add_argument("--page-size", type=int, default=RFC_PAGE_SIZE, help="RFC_READ_TABLE ROWCOUNT")
+    parser.add_argument("--latency", type=float, default=0.05, help="가짜 서버 호출 지연 (초)")
+    parser.add_argument("--byte-cost", type=float, default=7e-7, help="가짜 서버 바이트당 전송 비용 (초)")
+    parser.add_argument("--live", action="store_true", help="실제 SAP에서 측정")
+    parser.add_argument("--table", default="MARA", help="SAP 테이블 (--live)")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    if args.live:
+        os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
+        from dotenv import load_dotenv
+        from pyrfc import Connection
+        load_dotenv()
+        sap_config = {
+            'ashost': os.getenv('SAP_ASHOST', '192.168.32.100'),
+            'sysnr': os.getenv('SAP_SYSNR', '00'),
+            'client': os.getenv('SAP_CLIENT', '100'),
+            'user': os.getenv('SAP_USER', 'bc01'),
+            'passwd': os.getenv('SAP_PASSWORD', ''),
+            'lang': os.getenv('SAP_LANG', 'KO'),
+        }
+        print(f"📊 넓은 테이블 추출 벤치마크 (SAP {args.table})")
+        print("=" * 80)
+        failures = run_benchmark(
+            lambda size: RFCConnectionPool(lambda: Connection(**sap_config), size),
+            args.table, args.pool_size, args.page_size
+        )
+    else:
+        table = synthetic_wide_table(args.materials, args.fields)
+        server = FakeRFCServer([table], call_latency=args.latency, byte_cost=args.byte_cost)
+        width = table.row_width(table.fields) + len(table.fields) - 1
+        print(f"📊 넓은 테이블 추출 벤치마크 (가짜 테이블 {len(table.rows):,}행, 필드 {len(table.fields)}개, 행 폭 {width:,}바이트)")
+        print("=" * 80)
+        failures = run_benchmark(
+            lambda size: RFCConnectionPool(server.connect, size), "ZWIDE", args.pool_size, args.page_size
+        )
+        server.call_latency = server.byte_cost = 0
+        expected = sorted(table.rows)
+        result = WideTableExtractor(RFCConnectionPool(server.connect, args.pool_size), verbose=False).read("ZWIDE")
+        if sorted(map(tuple, result.rows)) != expected:
+            failures.append("합친 행이 원본 테이블과 다름")
+
+    if failures:
+        print("\n❌ 실패:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ 모든 필드를 키로 합친 결과가 원본과 같음")
+
+
+if __name__ == "__main__":
+    main()
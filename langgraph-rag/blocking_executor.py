@@ -0,0 +1,241 @@
+"""
+Blocking Executor - 동기 DB/LLM 작업용 크기 제한 스레드 풀과 입장 제어
+async 핸들러 안의 동기 호출(스키마 추출, EXPLAIN, 에이전트 초기화 등)을 이벤트 루프 밖에서 실행
+
+asyncio 기본 실행기(to_thread)는 대기열 제한이 없어 느린 DB에 요청이 몰리면 작업이 끝없이 쌓입니다.
+이 모듈은 전용 풀(BLOCKING_POOL_WORKERS)과 대기열 제한(BLOCKING_POOL_QUEUE)으로
+- 대기열이 가득 차면 즉시 거부 → 429 Too Many Requests
+- 대기열에서 BLOCKING_QUEUE_TIMEOUT초 이상 기다린 작업은 실행하지 않고 거부 → 503 Service Unavailable
+두 경우 모두 ExecutorSaturated가 발생하며, main.py에서 Retry-After 헤더와 함께 응답합니다.
+
+- submit(): 요청 진입 시점의 작업 (입장 제어 적용)
+- run(): 이미 받아들인 요청 내부의 작업 (진행 중인 요청이 중간에 실패하지 않도록 입장 제어 없음)
+- admit(): 작업 없이 여유만 확인 (풀을 내부적으로 쓰는 비동기 엔드포인트 진입 시)
+
+사용률(실행/대기 작업 수, 대기 시간 분위수, 거부 수)은 stats()/to_prometheus()로 조회합니다.
+"""
+
+from typing import Dict, Any, Optional, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from metrics_store import PROMETHEUS_PREFIX, QUANTILES, LogHistogram
+import asyncio
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+
+# ========================
+# Configuration
+# ========================
+
+# 동기 작업 스레드 수 (DB 커넥션 풀 크기보다 작게 유지)
+BLOCKING_POOL_WORKERS = int(os.getenv("BLOCKING_POOL_WORKERS", 8))
+
+# 실행을 기다릴 수 있는 최대 작업 수 (초과 시 429)
+BLOCKING_POOL_QUEUE = int(os.getenv("BLOCKING_POOL_QUEUE", 32))
+
+# 대기열에서 기다릴 수 있는 최대 시간 (초, 초과 시 503)
+BLOCKING_QUEUE_TIMEOUT = float(os.getenv("BLOCKING_QUEUE_TIMEOUT", 10))
+
+
+class ExecutorSaturated(Exception):
+    """풀이 포화되어 작업을 받지 않음"""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int, queued: int = 0):
+        self.reason = reason  # "queue_full" | "queue_timeout"
+        self.status_code = status_code  # 429 | 503
+        self.retry_after = retry_after
+        self.queued = queued
+        super().__init__(self.message())
+
+    def message(self) -> str:
+        if self.reason == "queue_full":
+            return f"Server busy: {self.queued} tasks already queued, retry after {self.retry_after}s"
+        return f"Server overloaded: task waited longer than {BLOCKING_QUEUE_TIMEOUT:.0f}s in queue"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "executor_saturated",
+            "reason": self.reason,
+            "retry_after": self.retry_after,
+            "queued": self.queued,
+        }
+
+
+class BoundedExecutor:
+    """
+    크기와 대기열이 제한된 스레드 풀
+
+    작업은 호출한 코루틴의 contextvars(RunContext 캡처, CancelScope 등)를 복사해 실행합니다.
+    """
+
+    def __init__(
+        self,
+        workers: int = BLOCKING_POOL_WORKERS,
+        max_queue: int = BLOCKING_POOL_QUEUE,
+        queue_timeout: float = BLOCKING_QUEUE_TIMEOUT,
+        name: str = "blocking"
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        self.running = 0
+        self.queued = 0
+        self.peak_running = 0
+        self.peak_queued = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0  # 대기열 초과 (429)
+        self.expired = 0  # 대기 시간 초과 (503)
+        self.wait_time = LogHistogram()  # 대기열 대기 시간 (초)
+        self.run_time = LogHistogram()  # 실행 시간 (초)
+
+    def _retry_after(self) -> int:
+        """대기열이 비는 데 걸릴 예상 시간 (초)"""
+        backlog = (self.queued + 1) / max(self.workers, 1)
+        return max(1, math.ceil(backlog * (self.run_time.mean or 1.0)))
+
+    def admit(self):
+        """대기열이 가득 찼으면 ExecutorSaturated(429)"""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated("queue_full", 429, self._retry_after(), self.queued)
+
+    def _call(self, fn: Callable, args, kwargs, enqueued: float, deadline: Optional[float]):
+        """풀 스레드에서 실행되는 래퍼 (대기 시간 기록, 만료 작업 거부)"""
+        started = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            self.wait_time.record(started - enqueued)
+            if deadline is not None and started > deadline:
+                self.expired += 1
+                raise ExecutorSaturated("queue_timeout", 503, self._retry_after(), self.queued)
+            self.running += 1
+            self.peak_running = max(self.peak_running, self.running)
+
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.run_time.record(time.monotonic() - started)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+    def _on_done(self, future: Future):
+        # 시작 전에 취소된 작업은 _call이 실행되지 않으므로 여기서 대기 수를 줄임
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def _execute(self, fn: Callable, args, kwargs, admit: bool):
+        if admit:
+            self.admit()
+
+        enqueued = time.monotonic()
+        deadline = enqueued + self.queue_timeout if admit and self.queue_timeout else None
+        with self._lock:
+            self.queued += 1
+            self.submitted += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+
+        context = contextvars.copy_context()
+        call = functools.partial(self._call, fn, args, kwargs, enqueued, deadline)
+        future = self._pool.submit(context.run, call)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    async def submit(self, fn: Callable, *args, **kwargs):
+        """요청 진입 작업 실행 (대기열 초과/대기 시간 초과 시 ExecutorSaturated)"""
+        return await self._execute(fn, args, kwargs, admit=True)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """이미 받아들인 요청 내부의 작업 실행 (입장 제어 없음)"""
+        return await self._execute(fn, args, kwargs, admit=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.queued,
+                "utilization": round(self.running / self.workers, 3) if self.workers else 0.0,
+                "queue_utilization": round(self.queued / self.max_queue, 3) if self.max_queue else 0.0,
+                "peak_running": self.peak_running,
+                "peak_queued": self.peak_queued,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "wait_seconds": self.wait_time.snapshot(),
+                "run_seconds": self.run_time.snapshot(),
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        p = f"{PROMETHEUS_PREFIX}_executor"
+        stats = self.stats()
+        lines = [
+            f"# HELP {p}_threads Blocking executor threads by state",
+            f"# TYPE {p}_threads gauge",
+            f'{p}_threads{{state="running"}} {stats["running"]}',
+            f'{p}_threads{{state="idle"}} {stats["workers"] - stats["running"]}',
+            f"# HELP {p}_queued Tasks waiting for a blocking executor thread",
+            f"# TYPE {p}_queued gauge",
+            f"{p}_queued {stats['queued']}",
+            f"# HELP {p}_tasks_total Blocking executor tasks by outcome",
+            f"# TYPE {p}_tasks_total counter",
+            f'{p}_tasks_total{{outcome="completed"}} {stats["completed"]}',
+            f'{p}_tasks_total{{outcome="failed"}} {stats["failed"]}',
+            f'{p}_tasks_total{{outcome="rejected"}} {stats["rejected"]}',
+            f'{p}_tasks_total{{outcome="expired"}} {stats["expired"]}',
+        ]
+        with self._lock:
+            for name, help_text, hist in (
+                ("wait_seconds", "Time spent waiting in the executor queue", self.wait_time),
+                ("run_seconds", "Time spent running in the executor", self.run_time),
+            ):
+                lines.append(f"# HELP {p}_{name} {help_text}")
+                lines.append(f"# TYPE {p}_{name} summary")
+                for q in QUANTILES:
+                    lines.append(f'{p}_{name}{{quantile="{q}"}} {hist.quantile(q):.6g}')
+                lines.append(f"{p}_{name}_sum {hist.total:.6g}")
+                lines.append(f"{p}_{name}_count {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor: Optional[BoundedExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_blocking_executor() -> BoundedExecutor:
+    """프로세스 전역 BoundedExecutor"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BoundedExecutor()
+        return _executor
+
+
+async def run_blocking(fn: Callable, *args, **kwargs):
+    """요청 내부의 동기 작업을 전역 풀에서 실행 (asyncio.to_thread 대체)"""
+    return await get_blocking_executor().run(fn, *args, **kwargs)
@@ -0,0 +1,349 @@
+"""
+Column Profile Store - 사전 계산된 컬럼 프로파일 저장소
+SQL 에이전트의 sql_db_schema 도구가 매번 샘플 행(SELECT ... LIMIT 3)을 조회하는 대신
+미리 계산해 파일로 저장한 컬럼 통계를 힌트로 제공합니다.
+
+- PostgreSQL: pg_stats(ANALYZE 결과)에서 distinct 추정치, NULL 비율, 최소/최대, 최빈값 추출
+- 그 외(SQLite 등): 테이블당 1회 샘플 스캔으로 계산
+- "10~50" 같은 텍스트 범위 컬럼(예: price_per_kg) 자동 감지
+
+사용법:
+    python column_profile.py            # DATABASE_URL 기준으로 프로파일 생성
+    python column_profile.py --analyze  # PostgreSQL ANALYZE 후 생성
+"""
+
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field, asdict
+from collections import Counter
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from dotenv import load_dotenv
+from schema_cache import get_schema_cache
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+load_dotenv()
+
+# ========================
+# Configuration
+# ========================
+
+# 프로파일 저장 파일
+COLUMN_PROFILE_FILE = os.getenv(
+    "COLUMN_PROFILE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "column_profiles.json")
+)
+
+# 프로파일 최대 사용 기간 (초) - 지나면 백그라운드에서 다시 생성
+COLUMN_PROFILE_MAX_AGE = float(os.getenv("COLUMN_PROFILE_MAX_AGE", 24 * 3600))
+
+# 샘플 스캔 행 수 (pg_stats가 없는 경우)
+PROFILE_SAMPLE_ROWS = int(os.getenv("PROFILE_SAMPLE_ROWS", 10000))
+
+# 최빈값 개수
+TOP_K = 5
+
+# 텍스트 범위 값 패턴 (예: "10~50", "1.5 - 3")
+TEXT_RANGE_PATTERN = re.compile(r"^\s*-?\d+(\.\d+)?\s*[~\-]\s*-?\d+(\.\d+)?\s*$")
+
+PG_STATS_SQL = """
+SELECT s.attname,
+       s.null_frac,
+       s.n_distinct,
+       array_to_json(s.most_common_vals::text::text[]) AS most_common_vals,
+       array_to_json(s.histogram_bounds::text::text[]) AS histogram_bounds,
+       c.reltuples
+FROM pg_catalog.pg_stats s
+JOIN pg_catalog.pg_namespace n ON n.nspname = s.schemaname
+JOIN pg_catalog.pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+WHERE s.schemaname = ANY (current_schemas(false))
+  AND s.tablename = :table
+"""
+
+# ========================
+# Profile Model
+# ========================
+
+@dataclass
+class ColumnProfile:
+    """컬럼 하나의 통계 요약"""
+    column: str
+    data_type: str
+    distinct_estimate: Optional[int] = None  # distinct 값 개수 추정치
+    null_ratio: Optional[float] = None  # NULL 비율 (0~1)
+    min_value: Optional[Any] = None
+    max_value: Optional[Any] = None
+    top_values: List[Any] = field(default_factory=list)  # 최빈값
+    is_text_range: bool = False  # "10~50" 형식의 텍스트 범위 컬럼 여부
+    source: str = "sample"  # "pg_stats" 또는 "sample"
+
+    def to_hint(self) -> str:
+        """에이전트 프롬프트용 한 줄 요약"""
+        parts = []
+        if self.distinct_estimate is not None:
+            parts.append(f"~{self.distinct_estimate:,} distinct")
+        if self.null_ratio:
+            parts.append(f"null {self.null_ratio:.0%}")
+        if self.min_value is not None and self.max_value is not None:
+            parts.append(f"range [{_short(self.min_value)} .. {_short(self.max_value)}]")
+        if self.top_values:
+            parts.append("top: " + ", ".join(_short(v) for v in self.top_values))
+        if self.is_text_range:
+            parts.append('TEXT range values like "10~50" - do NOT cast to NUMERIC')
+        return f"  - {self.column}: " + ("; ".join(parts) if parts else "no statistics")
+
+
+def _short(value: Any, limit: int = 30) -> str:
+    value = str(value)
+    return value if len(value) <= limit else value[:limit - 3] + "..."
+
+
+def _json_value(value: Any) -> Any:
+    """JSON 저장용 값 변환 (날짜/Decimal 등은 문자열로)"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _is_text_type(data_type: str) -> bool:
+    data_type = data_type.upper()
+    return any(t in data_type for t in ("CHAR", "TEXT", "STRING"))
+
+
+def _detect_text_range(data_type: str, values: List[Any]) -> bool:
+    """텍스트 컬럼 값의 절반 이상이 범위 형식이면 텍스트 범위 컬럼으로 판단"""
+    if not _is_text_type(data_type):
+        return False
+    values = [v for v in values if v is not None and str(v).strip()]
+    if not values:
+        return False
+    matched = sum(1 for v in values if TEXT_RANGE_PATTERN.match(str(v)))
+    return matched / len(values) >= 0.5
+
+# ========================
+# Profile Builders
+# ========================
+
+def profile_from_sample(table: str, columns: List[Dict[str, Any]], engine: Engine,
+                        sample_rows: int = PROFILE_SAMPLE_ROWS) -> Dict[str, ColumnProfile]:
+    """테이블당 1회 샘플 스캔으로 컬럼 프로파일 계산"""
+    quoted = engine.dialect.identifier_preparer.quote
+    col_list = ", ".join(quoted(c['name']) for c in columns)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT {col_list} FROM {quoted(table)} LIMIT {int(sample_rows)}")).fetchall()
+
+    profiles = {}
+    for i, col in enumerate(columns):
+        values = [row[i] for row in rows]
+        non_null = [v for v in values if v is not None]
+        counts = Counter(non_null)
+
+        min_value = max_value = None
+        try:
+            if non_null:
+                min_value, max_value = min(non_null), max(non_null)
+        except TypeError:
+            pass  # 비교 불가능한 타입 혼재
+
+        profiles[col['name']] = ColumnProfile(
+            column=col['name'],
+            data_type=col['type'],
+            distinct_estimate=len(counts),
+            null_ratio=(1 - len(non_null) / len(values)) if values else None,
+            min_value=_json_value(min_value),
+            max_value=_json_value(max_value),
+            top_values=[_json_value(v) for v, _ in counts.most_common(TOP_K)],
+            is_text_range=_detect_text_range(col['type'], non_null),
+            source="sample",
+        )
+    return profiles
+
+
+def profile_from_pg_stats(table: str, columns: List[Dict[str, Any]], engine: Engine) -> Dict[str, ColumnProfile]:
+    """PostgreSQL pg_stats에서 컬럼 프로파일 추출 (테이블 스캔 없음)"""
+    types = {c['name']: c['type'] for c in columns}
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(PG_STATS_SQL), {"table": table}).fetchall()
+
+    profiles = {}
+    for attname, null_frac, n_distinct, mcv, histogram, reltuples in rows:
+        if attname not in types:
+            continue
+        mcv = mcv or []
+        histogram = histogram or []
+
+        # n_distinct가 음수면 전체 행 수 대비 비율
+        if n_distinct is None:
+            distinct = None
+        elif n_distinct < 0:
+            distinct = int(-n_distinct * max(reltuples or 0, 0))
+        else:
+            distinct = int(n_distinct)
+
+        bounds = histogram or sorted(mcv)
+        profiles[attname] = ColumnProfile(
+            column=attname,
+            data_type=types[attname],
+            distinct_estimate=distinct,
+            null_ratio=float(null_frac) if null_frac is not None else None,
+            min_value=bounds[0] if bounds else None,
+            max_value=bounds[-1] if bounds else None,
+            top_values=mcv[:TOP_K],
+            is_text_range=_detect_text_range(types[attname], mcv + histogram),
+            source="pg_stats",
+        )
+    return profiles
+
+
+def build_profiles(engine: Engine, tables: Optional[List[str]] = None,
+                   analyze: bool = False) -> Dict[str, Dict[str, ColumnProfile]]:
+    """
+    전체(또는 지정) 테이블의 컬럼 프로파일 생성
+
+    Args:
+        engine: 대상 데이터베이스 엔진
+        tables: 대상 테이블 (None이면 전체)
+        analyze: PostgreSQL에서 통계가 없는 테이블을 ANALYZE 할지 여부
+    """
+    snapshot = get_schema_cache().get(engine)
+    is_postgres = engine.dialect.name == "postgresql"
+    result = {}
+
+    for table in snapshot.tables:
+        name = table['name']
+        if tables and name not in tables:
+            continue
+
+        try:
+            profiles = {}
+            if is_postgres:
+                profiles = profile_from_pg_stats(name, table['columns'], engine)
+                if not profiles and analyze:
+                    with engine.begin() as conn:
+                        conn.execute(text(f"ANALYZE {engine.dialect.identifier_preparer.quote(name)}"))
+                    profiles = profile_from_pg_stats(name, table['columns'], engine)
+
+            # 통계가 없는 컬럼은 샘플 스캔으로 보완
+            missing = [c for c in table['columns'] if c['name'] not in profiles]
+            if missing:
+                profiles.update(profile_from_sample(name, missing, engine))
+
+            result[name] = profiles
+            print(f"  📈 {name}: {len(profiles)}개 컬럼 프로파일 생성")
+        except Exception as e:
+            print(f"  ⚠️ {name} 프로파일 생성 실패: {e}")
+
+    return result
+
+# ========================
+# Store
+# ========================
+
+class ColumnProfileStore:
+    """
+    컬럼 프로파일 저장소
+
+    파일에서 읽어 메모리에 보관하며, 조회는 DB 접근 없이 메모리에서만 처리합니다.
+    """
+
+    def __init__(self, path: str = COLUMN_PROFILE_FILE):
+        self.path = path
+        self.fingerprint: Optional[str] = None
+        self.built_at: float = 0
+        self.tables: Dict[str, Dict[str, ColumnProfile]] = {}
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = COLUMN_PROFILE_FILE) -> "ColumnProfileStore":
+        """파일에서 저장소 로드 (파일이 없으면 빈 저장소)"""
+        store = cls(path)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            store.fingerprint = data.get("fingerprint")
+            store.built_at = data.get("built_at", 0)
+            store.tables = {
+                table: {col: ColumnProfile(**profile) for col, profile in columns.items()}
+                for table, columns in data.get("tables", {}).items()
+            }
+        except (OSError, ValueError, TypeError):
+            pass
+        return store
+
+    def save(self):
+        """파일로 저장 (원자적 교체)"""
+        data = {
+            "fingerprint": self.fingerprint,
+            "built_at": self.built_at,
+            "tables": {
+                table: {col: asdict(profile) for col, profile in columns.items()}
+                for table, columns in self.tables.items()
+            },
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_stale(self, engine: Engine, max_age: float = COLUMN_PROFILE_MAX_AGE) -> bool:
+        """스키마가 바뀌었거나 max_age가 지났으면 True"""
+        if not self.tables or time.time() - self.built_at > max_age:
+            return True
+        return self.fingerprint != get_schema_cache().fingerprint(engine)
+
+    def refresh(self, engine: Engine, analyze: bool = False):
+        """프로파일을 다시 생성하여 메모리와 파일 모두 교체"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # 이미 갱신 중
+        try:
+            print("📈 Building column profiles...")
+            tables = build_profiles(engine, analyze=analyze)
+            self.fingerprint = get_schema_cache().fingerprint(engine)
+            self.built_at = time.time()
+            self.tables = tables
+            self.save()
+            print(f"✅ Column profiles saved: {len(tables)} tables → {self.path}")
+        except Exception as e:
+            print(f"❌ Column profile build failed: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_in_background(self, engine: Engine, analyze: bool = False) -> threading.Thread:
+        """백그라운드 스레드에서 프로파일 생성"""
+        thread = threading.Thread(
+            target=self.refresh, args=(engine, analyze), name="column-profile-refresh", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def format_hints(self, table_names: List[str]) -> str:
+        """sql_db_schema 출력에 덧붙일 컬럼 프로파일 힌트"""
+        blocks = []
+        for table in table_names:
+            profiles = self.tables.get(table)
+            if not profiles:
+                continue
+            lines = [f"Column profile for {table} (precomputed):"]
+            lines.extend(p.to_hint() for p in profiles.values())
+            blocks.append("/*\n" + "\n".join(lines) + "\n*/")
+        return "\n\n".join(blocks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Column profile store builder")
+    parser.add_argument("--analyze", action="store_true", help="PostgreSQL ANALYZE 후 프로파일 생성")
+    parser.add_argument("--output", default=COLUMN_PROFILE_FILE, help="저장 파일 경로")
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        print("❌ DATABASE_URL not set in environment")
+    else:
+        store = ColumnProfileStore(args.output)
+        store.refresh(create_engine(db_url), analyze=args.analyze)
@@ -0,0 +1,181 @@
+"""
+Cost Guard - EXPLAIN 기반 실행 전 비용 검사
+생성된 SQL을 실행하기 전에 옵티마이저 추정치를 확인하여 폭주 쿼리가 커넥션 풀을 점유하지 않도록 차단
+
+검사 항목 (PostgreSQL EXPLAIN (FORMAT JSON)):
+- 추정 총 비용 > COST_GUARD_MAX_COST
+- 추정 결과 행 수 > COST_GUARD_MAX_ROWS
+
+처리:
+1. 예산 이내 → 통과
+2. 예산 초과 → 바깥 LIMIT을 COST_GUARD_MAX_ROWS로 낮춘 뒤 다시 EXPLAIN, 예산 이내면 재작성본 사용
+3. 그래도 초과 → 거부, 사유는 SQL 생성기(또는 ReAct 에이전트)에 피드백으로 전달
+   거부 사유에는 플랜에서 찾은 원인을 함께 적습니다.
+   - 조인 조건 없는 Nested Loop (카테시안 조인)
+   - 필터 없는 대형 테이블 Seq Scan (COST_GUARD_SCAN_ROWS 이상)
+
+비용 추정이 없는 DB(SQLite 등)는 EXPLAIN으로 문법만 확인하고 통과시킵니다.
+"""
+
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from sqlalchemy.engine import Engine
+from query_plan import PlanEstimate, explain, walk_plan
+import os
+import re
+
+# ========================
+# Configuration
+# ========================
+
+COST_GUARD_ENABLED = os.getenv("COST_GUARD_ENABLED", "true").lower() == "true"
+
+# 허용하는 최대 추정 비용 (PostgreSQL cost 단위)
+COST_GUARD_MAX_COST = float(os.getenv("COST_GUARD_MAX_COST", 5_000_000))
+
+# 허용하는 최대 추정 결과 행 수
+COST_GUARD_MAX_ROWS = int(os.getenv("COST_GUARD_MAX_ROWS", 100_000))
+
+# 필터 없는 Seq Scan을 경고하는 테이블 행 수 기준
+COST_GUARD_SCAN_ROWS = float(os.getenv("COST_GUARD_SCAN_ROWS", 1_000_000))
+
+# 문장 끝의 LIMIT n (세미콜론 허용)
+TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\d+)\s*;?\s*$", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    """비용 검사에서 거부된 쿼리 (메시지는 재작성 지침 포함)"""
+
+    def __init__(self, verdict: "GuardVerdict"):
+        super().__init__(verdict.feedback())
+        self.verdict = verdict
+
+
+@dataclass
+class GuardVerdict:
+    """비용 검사 결과"""
+    action: str  # "pass" | "rewrite" | "reject"
+    sql: str  # 실행할 SQL (rewrite면 재작성본)
+    reasons: List[str] = field(default_factory=list)
+    estimate: Optional[PlanEstimate] = None
+
+    @property
+    def allowed(self) -> bool:
+        return self.action != "reject"
+
+    @property
+    def cost(self) -> Optional[float]:
+        return self.estimate.total_cost if self.estimate else None
+
+    def feedback(self) -> str:
+        """SQL 생성기에 전달할 거부/재작성 사유"""
+        reasons = "; ".join(self.reasons)
+        if self.action == "rewrite":
+            return f"Query rewritten by cost guard: {reasons}"
+        return (
+            f"Query rejected by cost guard: {reasons}. "
+            "Rewrite it to be cheaper: add selective WHERE filters (e.g. a date range), "
+            "join only on key columns, aggregate before joining, and return fewer rows."
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "action": self.action,
+            "reasons": self.reasons,
+            "cost": self.cost,
+            "plan_rows": self.estimate.plan_rows if self.estimate else None,
+        }
+
+
+def relations(plan: Dict[str, Any]) -> List[str]:
+    """Plan 노드 아래에서 읽는 테이블 이름"""
+    return [node["Relation Name"] for node in walk_plan(plan) if node.get("Relation Name")]
+
+
+def inspect_plan(plan: Dict[str, Any], scan_rows: float = COST_GUARD_SCAN_ROWS) -> List[str]:
+    """카테시안 조인, 필터 없는 대형 Seq Scan 탐지"""
+    findings: List[str] = []
+    for node in walk_plan(plan):
+        node_type = node.get("Node Type")
+        if node_type == "Nested Loop" and not node.get("Join Filter"):
+            children = node.get("Plans", []) or []
+            inner = children[1] if len(children) > 1 else {}
+            # 인덱스 조건이 있으면 바깥 행 값으로 안쪽을 조회하는 정상 조인
+            if not any(n.get("Index Cond") or n.get("Recheck Cond") for n in walk_plan(inner)):
+                tables = " x ".join(relations(node)) or "subqueries"
+                findings.append(f"cartesian join ({tables}, ~{node.get('Plan Rows', 0):,.0f} rows)")
+        elif node_type == "Seq Scan" and not node.get("Filter") and node.get("Plan Rows", 0) >= scan_rows:
+            findings.append(f"unfiltered scan of {node.get('Relation Name')} (~{node['Plan Rows']:,.0f} rows)")
+    return list(dict.fromkeys(findings))  # 같은 테이블이 여러 번 나오면 한 번만
+
+
+def cap_limit(sql: str, max_rows: int) -> str:
+    """바깥 LIMIT을 max_rows 이하로 낮춤 (없으면 추가)"""
+    match = TRAILING_LIMIT.search(sql)
+    if match:
+        if int(match.group(1)) <= max_rows:
+            return sql
+        return sql[:match.start()] + f"LIMIT {max_rows};"
+    if re.search(r"\bLIMIT\b", sql, re.IGNORECASE):
+        return sql  # LIMIT ... OFFSET 등 안전하게 바꿀 수 없는 형태
+    return sql.strip().rstrip(";") + f" LIMIT {max_rows};"
+
+
+class CostGuard:
+    """
+    실행 전 비용 검사기
+
+    check()는 DB 예외(문법/컬럼 오류)를 그대로 전달하고, enforce()는 거부 시 QueryRejected를 발생시킵니다.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_cost: float = COST_GUARD_MAX_COST,
+        max_rows: int = COST_GUARD_MAX_ROWS,
+        scan_rows: float = COST_GUARD_SCAN_ROWS,
+        enabled: bool = COST_GUARD_ENABLED
+    ):
+        self.engine = engine
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.scan_rows = scan_rows
+        self.enabled = enabled
+
+    def _violations(self, estimate: PlanEstimate) -> List[str]:
+        """예산 초과 항목 (비용 추정이 없으면 빈 리스트)"""
+        violations: List[str] = []
+        if estimate.plan_rows is not None and estimate.plan_rows > self.max_rows:
+            violations.append(f"estimated {estimate.plan_rows:,.0f} rows > {self.max_rows:,}")
+        if estimate.total_cost is not None and estimate.total_cost > self.max_cost:
+            violations.append(f"estimated cost {estimate.total_cost:,.0f} > {self.max_cost:,.0f}")
+        return violations
+
+    def check(self, sql: str) -> GuardVerdict:
+        """SQL 비용 검사 (실행하지 않음)"""
+        if not self.enabled:
+            return GuardVerdict(action="pass", sql=sql)
+
+        estimate = explain(self.engine, sql)
+        violations = self._violations(estimate)
+        if not violations:
+            return GuardVerdict(action="pass", sql=sql, estimate=estimate)
+
+        # LIMIT을 낮춰 재검사 (행 수 초과는 해소되고, 정렬/집계가 없는 플랜이면 비용도 함께 줄어듦)
+        rewritten = cap_limit(sql, self.max_rows)
+        if rewritten != sql:
+            rewritten_estimate = explain(self.engine, rewritten)
+            if not self._violations(rewritten_estimate):
+                reasons = violations + [f"outer LIMIT lowered to {self.max_rows:,}"]
+                return GuardVerdict(action="rewrite", sql=rewritten, reasons=reasons, estimate=rewritten_estimate)
+
+        # 예산 초과 원인 (카테시안 조인, 필터 없는 대형 스캔)을 사유에 포함
+        reasons = violations + inspect_plan(estimate.plan, self.scan_rows)
+        return GuardVerdict(action="reject", sql=sql, reasons=reasons, estimate=estimate)
+
+    def enforce(self, sql: str) -> GuardVerdict:
+        """check() 후 거부면 QueryRejected 발생"""
+        verdict = self.check(sql)
+        if not verdict.allowed:
+            raise QueryRejected(verdict)
+        return verdict
@@ -1,10 +1,10 @@
 import pandas as pd
 import psycopg2
-from psycopg2 import sql
 from datetime import datetime
 import os
 from urllib.parse import urlparse
 from dotenv import load_dotenv
+from pg_bulk_load import copy_dataframe
 
 # .env.local 파일 로드
 load_dotenv('/Users/jinsyu/dev/ai-chatbot-baseone/.env.local')
@@ -131,43 +131,9 @@ try:
     # 데이터 삽입
     print(f"총 {len(df)}개의 레코드를 삽입합니다...")
     
-    # NaN 값을 None으로 변환 (datetime 컬럼 특별 처리)
-    for col in df.columns:
-        if df[col].dtype == 'datetime64[ns]':
-            df[col] = df[col].where(pd.notnull(df[col]), None)
-        else:
-            df[col] = df[col].where(pd.notnull(df[col]), None)
-    
-    # 데이터 삽입 SQL 준비
-    columns = df.columns.tolist()
-    insert_sql = sql.SQL("INSERT INTO sales_analysis_report ({}) VALUES ({})").format(
-        sql.SQL(', ').join([sql.Identifier(col) for col in columns]),
-        sql.SQL(', ').join(sql.Placeholder() * len(columns))
-    )
-    
-    # 배치 삽입
-    batch_size = 100
-    for i in range(0, len(df), batch_size):
-        batch = df.iloc[i:i+batch_size]
-        
-        for _, row in batch.iterrows():
-            # NaT 및 nan 값을 None으로 변환
-            values = []
-            for val in row.values:
-                if pd.isna(val):
-                    values.append(None)
-                else:
-                    values.append(val)
-            
-            try:
-                cur.execute(insert_sql, tuple(values))
-            except Exception as e:
-                print(f"레코드 삽입 오류 (행 {i}): {e}")
-                print(f"문제가 있는 데이터: {values[:5]}...")  # 처음 5개 컬럼만 출력
-                continue
-        
-        conn.commit()
-        print(f"  {min(i+batch_size, len(df))} / {len(df)} 레코드 삽입 완료")
+    # COPY로 한 번에 삽입 (NaN/NaT는 NULL)
+    copy_dataframe(conn, 'sales_analysis_report', df)
+    conn.commit()
     
     print("모든 데이터가 성공적으로 삽입되었습니다.")
     
@@ -12,6 +12,7 @@ from sqlalchemy import create_engine, text
 from datetime import datetime
 import logging
 from typing import Dict, List, Any
+from schema_cache import mark_schema_changed
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -392,6 +393,9 @@ class SalesOrderImporter:
             # 요약 통계
             self.create_summary_stats()
             
+            # 스키마 캐시 무효화 (API 서버가 새 테이블 구조를 다시 읽도록)
+            mark_schema_changed(self.table_name)
+            
             logger.info("\n" + "=" * 60)
             logger.info("✅ Import 완료!")
             logger.info(f"데이터베이스: {self.db_path}")
@@ -11,6 +11,7 @@ from sqlalchemy import create_engine, text
 from datetime import datetime
 import logging
 from typing import Dict, List, Any
+from schema_cache import mark_schema_changed
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,6 +23,8 @@ class SalesDataImporter:
         self.db_path = db_path
         self.engine = None
         self.table_name = 'sap_zsdr0340_sales_detail'
+        # 적재는 staging 테이블에 하고 마지막에 한 트랜잭션으로 교체 (적재 중에도 기존 데이터와 뷰 조회 가능)
+        self.staging_table = f"{self.table_name}_staging"
         self.df = None
         
     def connect_database(self):
@@ -132,19 +135,19 @@ class SalesDataImporter:
             return False
     
     def create_table(self):
-        """SQLite 테이블 생성"""
+        """SQLite staging 테이블 생성 (인덱스는 데이터 적재 후 build_indexes에서)"""
         try:
-            # 기존 테이블 삭제
+            # 이전 실패로 남은 staging 테이블 삭제
             with self.engine.connect() as conn:
-                conn.execute(text(f"DROP TABLE IF EXISTS {self.table_name}"))
+                conn.execute(text(f"DROP TABLE IF EXISTS {self.staging_table}"))
                 conn.commit()
             
-            logger.info(f"📝 {self.table_name} 테이블 생성 중...")
+            logger.info(f"📝 {self.staging_table} 테이블 생성 중...")
             
             # pandas to_sql을 사용하여 테이블 자동 생성 (SQLite는 동적 타입)
             # 첫 번째 행만 사용하여 스키마 생성
             self.df.head(1).to_sql(
-                self.table_name,
+                self.staging_table,
                 self.engine,
                 if_exists='replace',
                 index=False
@@ -152,25 +155,10 @@ class SalesDataImporter:
             
             # 테이블 비우기 (스키마만 남기기)
             with self.engine.connect() as conn:
-                conn.execute(text(f"DELETE FROM {self.table_name}"))
-                conn.commit()
-                
-                # 인덱스 생성
-                # 청구일 인덱스
-                if '청구일' in self.df.columns:
-                    conn.execute(text(f"CREATE INDEX idx_{self.table_name}_billing_date ON {self.table_name} (청구일)"))
-                
-                # 판매처 인덱스
-                if '판매처' in self.df.columns:
-                    conn.execute(text(f"CREATE INDEX idx_{self.table_name}_customer ON {self.table_name} (판매처)"))
-                
-                # 자재 인덱스
-                if '자재' in self.df.columns:
-                    conn.execute(text(f"CREATE INDEX idx_{self.table_name}_material ON {self.table_name} (자재)"))
-                
+                conn.execute(text(f"DELETE FROM {self.staging_table}"))
                 conn.commit()
             
-            logger.info(f"✅ 테이블 생성 완료: {self.table_name}")
+            logger.info(f"✅ 테이블 생성 완료: {self.staging_table}")
             return True
             
         except Exception as e:
@@ -196,7 +184,7 @@ class SalesDataImporter:
                 chunk = df_to_save.iloc[i:i+chunk_size]
                 
                 chunk.to_sql(
-                    self.table_name,
+                    self.staging_table,
                     self.engine,
                     if_exists='append',
                     index=False,
@@ -210,14 +198,14 @@ class SalesDataImporter:
             # 저장 확인
             with self.engine.connect() as conn:
                 count_result = conn.execute(
-                    text(f"SELECT COUNT(*) FROM {self.table_name}")
+                    text(f"SELECT COUNT(*) FROM {self.staging_table}")
                 ).scalar()
                 
                 logger.info(f"✅ 저장 완료: 총 {count_result}개 레코드")
                 
                 # 샘플 데이터 확인
                 sample_result = conn.execute(
-                    text(f"SELECT * FROM {self.table_name} LIMIT 3")
+                    text(f"SELECT * FROM {self.staging_table} LIMIT 3")
                 ).fetchall()
                 
                 if sample_result:
@@ -233,41 +221,70 @@ class SalesDataImporter:
             traceback.print_exc()
             return False
     
-    def create_summary_view(self):
-        """분석용 뷰 생성"""
+    def build_indexes(self):
+        """staging 테이블 인덱스 생성 및 ANALYZE (교체 전에 미리)"""
+        index_columns = {'billing_date': '청구일', 'customer': '판매처', 'material': '자재'}
+        
+        with self.engine.connect() as conn:
+            existing = {
+                row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+            }
+            for suffix, column in index_columns.items():
+                if column not in self.df.columns:
+                    continue
+                # SQLite는 인덱스 이름을 바꿀 수 없으므로 현재 테이블이 쓰지 않는 이름을 번갈아 사용
+                name = f"idx_{self.table_name}_{suffix}"
+                if name in existing:
+                    name = f"{name}_2"
+                conn.execute(text(f'CREATE INDEX {name} ON {self.staging_table} ("{column}")'))
+            conn.execute(text(f"ANALYZE {self.staging_table}"))
+            conn.commit()
+        logger.info("✅ 인덱스 생성 및 ANALYZE 완료")
+    
+    def summary_view_sql(self) -> str:
+        """월별 매출 집계 뷰 (SQLite 버전)"""
+        return f"""
+        CREATE VIEW v_monthly_sales_summary AS
+        SELECT 
+            substr(청구일, 1, 7) as month,
+            COUNT(*) as transaction_count,
+            SUM(청구금액) as total_amount
+        FROM {self.table_name}
+        WHERE 청구일 IS NOT NULL
+        GROUP BY substr(청구일, 1, 7)
+        ORDER BY month DESC
+        """
+    
+    def swap_table(self):
+        """
+        staging 테이블을 본 테이블로 교체하고 분석용 뷰를 다시 생성 (한 트랜잭션)
+        
+        조회하는 쪽은 교체 전 또는 교체 후 데이터만 보며, 뷰가 없는 순간도 없습니다.
+        """
+        logger.info(f"🔁 {self.table_name} 교체 중...")
+        
+        # pysqlite는 DDL 앞에서 트랜잭션을 자동으로 시작하지 않으므로 직접 BEGIN/COMMIT
+        raw = self.engine.raw_connection()
+        isolation_level = raw.driver_connection.isolation_level
         try:
-            logger.info("📊 분석용 뷰 생성 중...")
-            
-            # SQLite는 CREATE OR REPLACE VIEW를 지원하지 않으므로 DROP 후 생성
-            with self.engine.connect() as conn:
-                try:
-                    # 기존 뷰 삭제
-                    conn.execute(text("DROP VIEW IF EXISTS v_monthly_sales_summary"))
-                    
-                    # 월별 매출 집계 뷰 (SQLite 버전)
-                    view_sql = f"""
-                    CREATE VIEW v_monthly_sales_summary AS
-                    SELECT 
-                        substr(청구일, 1, 7) as month,
-                        COUNT(*) as transaction_count,
-                        SUM(청구금액) as total_amount
-                    FROM {self.table_name}
-                    WHERE 청구일 IS NOT NULL
-                    GROUP BY substr(청구일, 1, 7)
-                    ORDER BY month DESC;
-                    """
-                    
-                    conn.execute(text(view_sql))
-                    conn.commit()
-                    logger.info("✅ 월별 매출 집계 뷰 생성 완료")
-                except Exception as e:
-                    logger.warning(f"뷰 생성 실패: {e}")
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"뷰 생성 실패: {e}")
-            return False
+            raw.driver_connection.isolation_level = None
+            cursor = raw.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # SQLite는 CREATE OR REPLACE VIEW를 지원하지 않으므로 DROP 후 생성
+                cursor.execute("DROP VIEW IF EXISTS v_monthly_sales_summary")
+                cursor.execute(f"DROP TABLE IF EXISTS {self.table_name}")
+                cursor.execute(f"ALTER TABLE {self.staging_table} RENAME TO {self.table_name}")
+                cursor.execute(self.summary_view_sql())
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        finally:
+            raw.driver_connection.isolation_level = isolation_level
+            raw.close()
+        
+        logger.info("✅ 테이블 교체 및 월별 매출 집계 뷰 생성 완료")
     
     def run(self):
         """전체 프로세스 실행"""
@@ -298,8 +315,12 @@ class SalesDataImporter:
             if not self.save_to_database():
                 return False
             
-            # 분석 뷰 생성
-            self.create_summary_view()
+            # 인덱스/ANALYZE 후 교체 (분석 뷰도 같은 트랜잭션에서 재생성)
+            self.build_indexes()
+            self.swap_table()
+            
+            # 스키마 캐시 무효화 (API 서버가 새 테이블 구조를 다시 읽도록)
+            mark_schema_changed(self.table_name)
             
             logger.info("\n" + "=" * 60)
             logger.info("✅ Import 완료!")
@@ -4,13 +4,12 @@ LangChain SQL ReAct Agent - Production Ready
 ReAct (Reasoning + Acting) 패턴을 사용하여 동적으로 문제 해결
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
 from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import create_sql_agent
 from langchain.agents.agent_types import AgentType
 from langchain_core.callbacks import StreamingStdOutCallbackHandler
-from langchain_core.outputs import LLMResult
 import os
 import time
 from datetime import datetime
@@ -18,85 +17,63 @@ import json
 from dotenv import load_dotenv
 import asyncio
 import traceback
-from dataclasses import dataclass, field
 import re
 from sqlalchemy import text
+from agent_metrics import AgentMetrics, TokenCountingCallback, write_trace
+from column_profile import ColumnProfileStore
+from answer_cache import AnswerCache
+from schema_cache import get_schema_cache, last_load_timestamp
+from sql_query_tool import CapturingQuerySQLDataBaseTool, activate, deactivate
+from run_context import RunContext, RunCancelled
+from metrics_store import MetricsStore
+from langgraph_rag import TextToSqlNode
+from cost_guard import CostGuard
+from query_budget import (
+    BudgetedConnection, BudgetExceeded, CancelScope, activate_scope, deactivate_scope, run_cancellable
+)
+from async_db import get_async_db
+from blocking_executor import run_blocking
 
 load_dotenv()
 
 # ========================
-# 성능 메트릭 추적
+# Configuration
 # ========================
 
-@dataclass
-class AgentMetrics:
-    """
-    에이전트 성능 메트릭을 추적하는 데이터 클래스
-    
-    각 쿼리 실행에 대한 상세한 메트릭 정보를 수집하여
-    성능 분석과 최적화에 활용합니다.
-    """
-    query: str  # 사용자의 원본 쿼리
-    start_time: float = field(default_factory=time.time)  # 시작 시간
-    end_time: Optional[float] = None  # 종료 시간
-    total_tokens: int = 0  # 총 토큰 사용량
-    prompt_tokens: int = 0  # 프롬프트 토큰
-    completion_tokens: int = 0  # 완성 토큰
-    tool_calls: int = 0  # 도구 호출 횟수
-    error_recoveries: int = 0  # 에러 복구 시도 횟수
-    success: bool = False  # 성공 여부
-    error_message: Optional[str] = None  # 에러 메시지 (실패 시)
-    sql_generated: Optional[str] = None  # 생성된 SQL 쿼리
-    result_count: int = 0  # 반환된 결과 행 수
-    
-    def finalize(self):
-        """메트릭 수집을 완료하고 종료 시간을 기록"""
-        self.end_time = time.time()
-        
-    @property
-    def duration(self) -> float:
-        """실행 시간을 초 단위로 계산"""
-        if self.end_time:
-            return self.end_time - self.start_time
-        return time.time() - self.start_time
-    
-    def to_dict(self) -> Dict:
-        """메트릭을 딕셔너리로 변환 (JSON 직렬화용)"""
-        return {
-            "query": self.query,
-            "duration": f"{self.duration:.2f}s",
-            "total_tokens": self.total_tokens,
-            "tool_calls": self.tool_calls,
-            "error_recoveries": self.error_recoveries,
-            "success": self.success,
-            "result_count": self.result_count,
-            "sql": self.sql_generated,
-            "error": self.error_message
-        }
+# 동시 요청이 커넥션을 기다리지 않도록 풀 크기 지정 (SQLite 제외)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 40))
+
+# 요청당 최대 반환 행 수 상한
+MAX_ROWS_LIMIT = 10000
 
+# 실행 모드
+# - fast_first: 단일 LLM 호출(SQL 생성 → 검증 → 실행)을 먼저 시도하고 실패/빈 결과면 ReAct 에이전트로 전환
+# - react: 항상 ReAct 에이전트 사용
+SQL_AGENT_MODE = os.getenv("SQL_AGENT_MODE", "fast_first")
+AGENT_MODES = ("fast_first", "react")
 
-class TokenCountingCallback(StreamingStdOutCallbackHandler):
+
+class ProfiledSQLDatabase(SQLDatabase):
     """
-    LLM 호출 시 토큰 사용량을 추적하는 콜백 핸들러
+    컬럼 프로파일 힌트를 제공하는 SQLDatabase
     
-    Azure OpenAI의 응답에서 토큰 사용량 정보를 추출하여
-    메트릭 객체에 누적합니다.
+    sql_db_schema 도구가 샘플 행을 조회하는 대신 미리 계산된
+    컬럼 프로파일(distinct/NULL 비율/범위/최빈값)을 테이블 정보에 덧붙입니다.
+    힌트는 메모리에서만 읽으므로 추가 쿼리가 발생하지 않습니다.
     """
     
-    def __init__(self, metrics: AgentMetrics):
-        super().__init__()
-        self.metrics = metrics
+    def __init__(self, *args, profile_store: Optional[ColumnProfileStore] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile_store = profile_store
     
-    def on_llm_end(self, response: LLMResult, **kwargs: Any):
-        """
-        LLM 호출이 완료될 때 호출되는 콜백
-        응답에서 토큰 사용량 정보를 추출합니다.
-        """
-        if response.llm_output and 'token_usage' in response.llm_output:
-            usage = response.llm_output['token_usage']
-            self.metrics.prompt_tokens += usage.get('prompt_tokens', 0)
-            self.metrics.completion_tokens += usage.get('completion_tokens', 0)
-            self.metrics.total_tokens += usage.get('total_tokens', 0)
+    def get_table_info(self, table_names: Optional[List[str]] = None, get_col_comments: bool = False) -> str:
+        table_info = super().get_table_info(table_names, get_col_comments)
+        if not self.profile_store:
+            return table_info
+        
+        hints = self.profile_store.format_hints(table_names or self.get_usable_table_names())
+        return f"{table_info}\n\n{hints}" if hints else table_info
 
 
 class LangChainSQLAgent:
@@ -121,7 +98,9 @@ class LangChainSQLAgent:
         db_url: str,
         max_iterations: int = 50,
         enable_streaming: bool = False,
-        verbose: bool = True
+        verbose: bool = True,
+        enable_answer_cache: bool = True,
+        mode: str = SQL_AGENT_MODE
     ):
         """
         SQL Agent 초기화
@@ -131,16 +110,25 @@ class LangChainSQLAgent:
             max_iterations: 최대 ReAct 반복 횟수 (기본값: 5)
             enable_streaming: 스트리밍 출력 활성화 여부
             verbose: 상세 로그 출력 여부
+            enable_answer_cache: 동일/유사 질문에 검증된 SQL 재사용 여부
+            mode: 실행 모드 ("fast_first" 또는 "react")
         """
         self.db_url = db_url
         self.max_iterations = max_iterations
         self.enable_streaming = enable_streaming
         self.verbose = verbose
+        self.enable_answer_cache = enable_answer_cache
+        if mode not in AGENT_MODES:
+            raise ValueError(f"알 수 없는 실행 모드: {mode!r} (가능한 값: {', '.join(AGENT_MODES)})")
+        self.mode = mode
+        
+        # 질문 → 검증된 SQL 캐시
+        self.answer_cache = AnswerCache()
         
-        # 성능 메트릭 히스토리
-        self.metrics_history: List[AgentMetrics] = []
+        # 성능 메트릭 집계 (고정 메모리, 최근 쿼리 링 버퍼 + 히스토그램)
+        self.metrics_store = MetricsStore()
         
-        # 쿼리 결과 제한 설정
+        # 쿼리 결과 제한 설정 (요청에서 max_rows를 지정하지 않은 경우의 기본값)
         self.max_rows = 10000  # 최대 반환 행 수 (1만개로 조정)
         self.default_limit = 1000  # 기본 LIMIT 값 (1000개로 조정)
         
@@ -156,14 +144,29 @@ class LangChainSQLAgent:
         """
         
         # 1. 데이터베이스 연결 설정
-        # SQLAlchemy를 통해 SQLite 데이터베이스에 연결
-        self.db = SQLDatabase.from_uri(
+        # 샘플 행 조회 대신 미리 계산된 컬럼 프로파일을 스키마 정보에 포함
+        self.profile_store = ColumnProfileStore.load()
+        engine_args = {} if self.db_url.startswith("sqlite") else {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_pre_ping": True,
+        }
+        self.db = ProfiledSQLDatabase.from_uri(
             self.db_url,
-            sample_rows_in_table_info=3,  # 스키마 정보에 샘플 데이터 3행 포함
+            engine_args=engine_args,
+            sample_rows_in_table_info=0,  # 샘플 행 조회 비활성화 (프로파일 힌트로 대체)
             include_tables=None,  # None = 모든 테이블 포함
-            view_support=True  # SQLite는 view_support를 False로 설정 (버그 회피)
+            view_support=True,  # SQLite는 view_support를 False로 설정 (버그 회피)
+            profile_store=self.profile_store
         )
         
+        # 프로파일이 없거나 오래되었으면 백그라운드에서 다시 생성
+        try:
+            if self.profile_store.is_stale(self.db._engine):
+                self.profile_store.refresh_in_background(self.db._engine)
+        except Exception as e:
+            print(f"⚠️ 컬럼 프로파일 확인 실패: {e}")
+        
         # 2. LLM 설정 - LMStudio 또는 Azure OpenAI 선택
         use_lmstudio = os.getenv("USE_LMSTUDIO", "false").lower() == "true"
         
@@ -236,6 +239,9 @@ class LangChainSQLAgent:
 
 단순히 SQL을 말로만 설명하지 말고, 반드시 sql_db_query를 사용하여 실제 데이터를 가져와야 합니다.
 
+sql_db_query는 결과 요약(앞쪽 일부 행, 전체 행 수, 숫자 컬럼의 min/max/sum, 결과 핸들)만 반환합니다.
+전체 결과는 사용자에게 자동으로 전달되므로 답변에서 모든 행을 다시 나열하지 말고 요약과 핵심 수치만 설명하세요.
+
 ## 주요 목표
 자연어 질문을 효율적이고 안전한 SQL 쿼리로 변환하여 정확한 결과를 제공합니다.
 
@@ -282,7 +288,22 @@ class LangChainSQLAgent:
         
         toolkit = SQLDatabaseToolkit(db=self.db, llm=self.llm)
         # query_checker 제외 - 이것이 문제의 원인!
-        tools = [tool for tool in toolkit.get_tools() if tool.name != 'sql_db_query_checker']
+        # sql_db_query는 결과 행을 타입 그대로 보관하고 실행 전 비용을 검사하는 도구로 교체
+        # (에이전트는 비동기로 호출하므로 쿼리는 async_db 풀에서 실행되어 이벤트 루프를 막지 않음)
+        self.cost_guard = CostGuard(self.db._engine)
+        self.async_db = get_async_db(self.db_url)
+        tools = [
+            CapturingQuerySQLDataBaseTool(db=self.db, cost_guard=self.cost_guard, async_db=self.async_db)
+            if tool.name == 'sql_db_query' else tool
+            for tool in toolkit.get_tools() if tool.name != 'sql_db_query_checker'
+        ]
+        self.tools = tools
+        self.query_tool = next(tool for tool in tools if tool.name == 'sql_db_query')
+        
+        # 5. 단일 호출 경로 (TextToSqlNode 단계를 같은 엔진/LLM으로 재사용)
+        self.fast_node = TextToSqlNode(
+            self.db_url, engine=self.db._engine, llm=self.llm, guard=self.cost_guard, async_db=self.async_db
+        )
         
         self.agent = create_sql_agent(
             llm=self.llm,
@@ -320,10 +341,203 @@ class LangChainSQLAgent:
         
         return callbacks
     
+    def _record_metrics(self, metrics: AgentMetrics):
+        """완료된 실행 메트릭을 집계에 반영하고 trace 파일에 기록"""
+        self.metrics_store.record(metrics)
+        write_trace(metrics)
+    
+    def create_context(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        max_rows: Optional[int] = None
+    ) -> RunContext:
+        """
+        요청 단위 실행 컨텍스트 생성
+        
+        공유 에이전트의 설정을 바꾸지 않고 요청마다 행 제한/콜백/메트릭/취소 토큰을 분리합니다.
+        호출자가 미리 만들어 두면 ctx.cancel()로 실행 중인 요청을 취소할 수 있습니다.
+        """
+        metrics = AgentMetrics(query=query)
+        return RunContext(
+            query=query,
+            max_rows=min(max(1, max_rows or self.max_rows), MAX_ROWS_LIMIT),
+            session_id=session_id,
+            metrics=metrics,
+            callbacks=self._create_callbacks(metrics),
+        )
+    
+    def _cache_version(self):
+        """답변 캐시 버전 (스키마 fingerprint, 임포터 마지막 적재 시각)"""
+        return get_schema_cache().fingerprint(self.db._engine), last_load_timestamp()
+    
+    async def _run_from_cache(self, ctx: RunContext,
+                              collect_results: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        답변 캐시 조회
+        
+        동일하거나 거의 같은 질문의 검증된 SQL이 있으면 LLM 없이
+        해당 SQL만 최신 데이터에 다시 실행합니다. 재실행이 실패하면 항목을 제거하고 None을 반환합니다.
+        """
+        query, metrics = ctx.query, ctx.metrics
+        try:
+            version = await run_blocking(self._cache_version)
+            hit = self.answer_cache.lookup(query, version)
+        except Exception as e:
+            if self.verbose:
+                print(f"⚠️ 답변 캐시 조회 실패: {str(e)}")
+            return None
+        
+        if not hit:
+            return None
+        
+        entry, similarity = hit
+        if self.verbose:
+            print(f"💾 답변 캐시 적중 (유사도 {similarity:.2f}): {entry.question}")
+        
+        start_time = time.time()
+        try:
+            results, truncated = (await self._afetch_rows(entry.sql, ctx.max_rows, ctx.scope)
+                                  if collect_results else ([], False))
+        except BudgetExceeded as e:
+            # 시간 초과면 캐시 제거 후 새로 생성, 취소면 캐시는 유지
+            if self.verbose:
+                print(f"⚠️ 캐시된 SQL 재실행 중단: {str(e)}")
+            if e.kind == "statement_timeout":
+                self.answer_cache.evict(entry.key)
+            return None
+        except Exception as e:
+            if self.verbose:
+                print(f"⚠️ 캐시된 SQL 재실행 실패, 캐시 제거: {str(e)}")
+            self.answer_cache.evict(entry.key)
+            return None
+        execution_time = time.time() - start_time
+        
+        metrics.cache_hit = True
+        metrics.sql_generated = entry.sql
+        metrics.result_count = len(results)
+        metrics.success = True
+        metrics.finalize()
+        self._record_metrics(metrics)
+        
+        return {
+            "success": True,
+            "query": query,
+            "response": (f"이전에 검증된 SQL로 최신 데이터를 조회했습니다. ({len(results)}개 행)"
+                         if collect_results else "이전에 검증된 SQL로 최신 데이터를 조회합니다."),
+            "sql": entry.sql,
+            "results": results or None,
+            "truncated": truncated,
+            "metrics": metrics.to_dict(),
+            "execution_time": execution_time,
+            "cache_hit": True
+        }
+    
+    async def _run_fast_path(self, ctx: RunContext, collect_results: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        단일 호출 경로: 스키마(캐시 + 링킹) → SQL 생성(LLM 1회) → 검증 → 실행
+        
+        ReAct 루프의 sql_db_list_tables → sql_db_schema → sql_db_query 왕복 없이
+        TextToSqlNode의 단계를 그대로 사용합니다. 실행은 sql_db_query 도구와 같은 경로로 하여
+        결과 캡처/행 제한/trace가 ReAct 경로와 동일하게 적용됩니다.
+        
+        Returns:
+            성공 시 run()과 같은 형식의 결과, 생성/검증/실행 실패 또는 빈 결과면 None (ReAct로 전환)
+        
+        Raises:
+            RunCancelled: 실행 중인 쿼리가 ctx.cancel()로 취소된 경우 (ReAct로 전환하지 않음)
+        """
+        metrics = ctx.metrics
+        node = self.fast_node
+        state: Dict[str, Any] = {"user_query": ctx.query, "metrics": metrics, "messages": []}
+        start_time = time.time()
+        span = metrics.start_span("fast_path")
+        
+        reason = None
+        captured = None
+        # 비용 검사에서 거부되면 사유를 포함하여 SQL 재생성 (cost_guard가 max_retries에서 에러로 종료)
+        stages = [node.analyze_schema, node.generate_sql, node.validate_sql, node.cost_guard]
+        while stages:
+            stage = stages.pop(0)
+            ctx.raise_if_cancelled()
+            state.update(await stage(state))
+            if state.get("error"):
+                reason = state["error"]
+                break
+            valid = (state.get("validation_result") or {}).get("valid")
+            if stage == node.validate_sql and not valid:
+                break
+            if stage == node.cost_guard and not valid:
+                stages = [node.generate_sql, node.validate_sql, node.cost_guard]
+        
+        if reason is None and not (state.get("validation_result") or {}).get("valid"):
+            reason = (state.get("validation_result") or {}).get("reason", "invalid SQL")
+        
+        if reason is None:
+            # 후보 SQL이 여러 개면 추정 비용 순으로 실행하여 행을 반환하는 첫 후보 사용
+            candidates = [c["sql"] for c in state.get("sql_candidates") or []] or [state["generated_sql"]]
+            for sql in candidates:
+                ctx.raise_if_cancelled()
+                try:
+                    captured = await self.query_tool.aexecute(sql, guarded=True)
+                except BudgetExceeded as e:
+                    # 취소는 ReAct로 전환하지 않고 요청 전체를 중단
+                    if e.kind == "cancelled":
+                        metrics.end_span(span, cancelled=ctx.cancel_reason)
+                        raise RunCancelled(ctx.cancel_reason or str(e))
+                    reason = str(e)
+                    continue
+                except Exception as e:
+                    reason = f"execution failed: {str(e)[:200]}"
+                    continue
+                reason = None if captured.row_count else "empty result"
+                if reason is None:
+                    state["generated_sql"] = sql
+                    break
+        
+        if reason is not None:
+            metrics.fast_path = f"escalated: {reason}"
+            metrics.end_span(span, escalated=reason)
+            if self.verbose:
+                print(f"↪️ 단일 호출 경로 실패 ({reason}), ReAct 에이전트로 전환")
+            return None
+        
+        state["query_results"] = captured.to_dicts()
+        state.update(await node.format_response(state))
+        metrics.end_span(span, rows=captured.row_count)
+        
+        metrics.fast_path = "hit"
+        metrics.sql_generated = captured.sql
+        metrics.result_count = captured.row_count
+        metrics.success = True
+        metrics.finalize()
+        self._record_metrics(metrics)
+        
+        if self.verbose:
+            print(f"⚡ 단일 호출 경로 성공: {captured.row_count}개 행, {metrics.total_tokens} 토큰")
+        
+        return {
+            "success": True,
+            "query": ctx.query,
+            "response": state.get("formatted_response"),
+            "sql": captured.sql,
+            "results": state["query_results"] if collect_results else None,
+            "result_handle": captured.handle,
+            "truncated": captured.truncated,
+            "metrics": metrics.to_dict(),
+            "execution_time": time.time() - start_time,
+            "fast_path": True
+        }
+    
     async def run(
         self,
         query: str,
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        use_cache: bool = True,
+        collect_results: bool = True,
+        max_rows: Optional[int] = None,
+        context: Optional[RunContext] = None,
+        mode: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         SQL Agent 실행 (비동기)
@@ -334,6 +548,12 @@ class LangChainSQLAgent:
         Args:
             query: 사용자의 자연어 질문
             session_id: 세션 ID (향후 대화 컨텍스트 관리용)
+            use_cache: 답변 캐시 사용 여부 (False면 항상 ReAct 루프 실행)
+            collect_results: False면 최종 SQL만 확정하고 결과 행은 수집하지 않음
+                (스트리밍 응답에서 stream_rows()로 직접 전달할 때 사용)
+            max_rows: 이 요청의 최대 반환 행 수 (기본값: self.max_rows)
+            context: create_context()로 미리 만든 실행 컨텍스트 (취소가 필요한 경우)
+            mode: 이 요청의 실행 모드 ("fast_first" / "react", 기본값: self.mode)
             
         Returns:
             실행 결과와 메트릭을 포함한 딕셔너리
@@ -346,6 +566,11 @@ class LangChainSQLAgent:
             - execution_time: 실행 시간
             - error: 에러 메시지 (실패 시)
         """
+        mode = mode or self.mode
+        if mode not in AGENT_MODES:
+            raise ValueError(f"알 수 없는 실행 모드: {mode!r} (가능한 값: {', '.join(AGENT_MODES)})")
+        ctx = context or self.create_context(query, session_id=session_id, max_rows=max_rows)
+        
         # 실행 시작 로그
         if self.verbose:
             print(f"\n{'='*80}")
@@ -354,12 +579,47 @@ class LangChainSQLAgent:
             print(f"🕐 시작 시간: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"{'='*80}\n")
         
-        # 메트릭 초기화
-        metrics = AgentMetrics(query=query)
+        # 요청 단위 메트릭
+        metrics = ctx.metrics
+        
+        # 답변 캐시: 동일/유사 질문이면 ReAct 루프 없이 검증된 SQL만 재실행
+        use_cache = use_cache and self.enable_answer_cache
+        if use_cache:
+            span = metrics.start_span("cache_lookup")
+            cached = await self._run_from_cache(ctx, collect_results)
+            metrics.end_span(span, hit=bool(cached))
+            if cached:
+                return cached
+        
+        # sql_db_query 실행 결과를 받을 side channel, 실행 중인 DB 쿼리 취소 범위
+        capture = ctx.capture
+        capture_token = activate(capture)
+        scope_token = activate_scope(ctx.scope)
         
         try:
-            # 콜백 설정
-            callbacks = self._create_callbacks(metrics)
+            ctx.raise_if_cancelled()
+            
+            # 단일 호출 경로 우선 시도 (실패/빈 결과면 아래 ReAct 루프로 전환)
+            if mode == "fast_first":
+                # 태스크로 실행하여 ctx.cancel()이 진행 중인 LLM 호출까지 중단하도록 등록
+                fast_task = asyncio.ensure_future(self._run_fast_path(ctx, collect_results))
+                ctx.attach(fast_task)
+                try:
+                    fast = await fast_task
+                except asyncio.CancelledError:
+                    if not ctx.cancelled:
+                        ctx.scope.interrupt()
+                        raise
+                    raise RunCancelled(ctx.cancel_reason)
+                if fast:
+                    if use_cache:
+                        try:
+                            version = await run_blocking(self._cache_version)
+                            self.answer_cache.store(query, fast["sql"], version)
+                        except Exception as e:
+                            if self.verbose:
+                                print(f"⚠️ 답변 캐시 저장 실패: {str(e)}")
+                    return fast
             
             # 에이전트 실행 시작
             start_time = time.time()
@@ -369,21 +629,30 @@ class LangChainSQLAgent:
             enhanced_query = f"{query}\n\n중요: 반드시 sql_db_query 도구를 사용하여 SQL을 실행하고 실제 데이터를 반환하세요."
             
             # 타임아웃 처리를 위한 asyncio.wait_for 사용
-            import asyncio
             try:
                 if self.verbose:
                     print(f"⏱️ 에이전트 호출 시작 (최대 {self.max_iterations} 반복)")
                     
-                result = await asyncio.wait_for(
+                agent_span = metrics.start_span("agent_loop")
+                agent_task = asyncio.ensure_future(
                     self.agent.ainvoke(
                         {"input": enhanced_query},
-                        config={"callbacks": callbacks}
-                    ),
-                    timeout=1200  # 20분 타임아웃
+                        config={"callbacks": ctx.callbacks}
+                    )
                 )
+                ctx.attach(agent_task)
+                result = await asyncio.wait_for(agent_task, timeout=1200)  # 20분 타임아웃
+                metrics.end_span(agent_span)
+            except asyncio.CancelledError:
+                # ctx.cancel()로 취소된 경우만 처리하고 외부 취소는 그대로 전달
+                if not ctx.cancelled:
+                    ctx.scope.interrupt()  # 스레드에서 실행 중인 도구 쿼리도 중단
+                    raise
+                raise RunCancelled(ctx.cancel_reason)
             except asyncio.TimeoutError:
                 if self.verbose:
                     print(f"⚠️ 에이전트 실행 타임아웃 (20분 초과)")
+                ctx.scope.interrupt()
                 result = {
                     "output": "시스템 실행 시간이 초과되어 데이터를 가져올 수 없습니다. 쿼리를 단순화해 주세요.",
                     "intermediate_steps": []
@@ -391,12 +660,16 @@ class LangChainSQLAgent:
             
             execution_time = time.time() - start_time
             
+            # 결과 후처리 구간 (SQL/결과 추출, 폴백 실행)
+            post_span = metrics.start_span("post_process")
+            
             # 결과에서 응답 메시지 추출
             output_message = result.get("output", "")
             
-            # 중간 단계에서 SQL 쿼리와 결과 추출
+            # 중간 단계에서 SQL 쿼리 추출
             sql_query = None
             results = None
+            sql_validated = False  # 마지막 SQL이 실제로 실행되어 결과를 반환했는지 여부
             intermediate_steps = result.get("intermediate_steps", [])
             
             if self.verbose:
@@ -422,57 +695,69 @@ class LangChainSQLAgent:
                     
                     if self.verbose:
                         print(f"🔍 SQL 쿼리 발견: {sql_query[:100] if len(sql_query) > 100 else sql_query}...")
-                    metrics.sql_generated = sql_query
-                    
-                    # observation에서 결과 파싱 시도
-                    if observation:
-                        if self.verbose:
-                            print(f"    결과 크기: {len(str(observation))} 문자")
-                            print(f"    결과 내용: {str(observation)[:200]}...")
-                        # SQLDatabase.run의 결과는 텍스트 형식이므로 파싱 필요
-                        results = self._parse_sql_observation(str(observation))
-                        if results:
-                            metrics.result_count = len(results)
-                            if self.verbose:
-                                print(f"📊 쿼리 결과: {len(results)}개 행")
-                        else:
-                            # 결과가 리스트 형태인 경우 직접 처리
-                            if isinstance(observation, list):
-                                results = observation
-                                metrics.result_count = len(results)
-                                if self.verbose:
-                                    print(f"📊 쿼리 결과: {len(results)}개 행 (직접)")
+            
+            # 도구가 보관한 마지막 성공 결과 사용 (재실행/재파싱 없음)
+            # LLM은 요약만 보았고 전체 결과는 여기서 API 응답으로 전달됨
+            captured = capture.last
+            if captured:
+                sql_query = captured.sql
+                results = captured.to_dicts() if collect_results else None
+                sql_validated = captured.row_count > 0
+                metrics.result_count = captured.row_count
+                if self.verbose:
+                    print(f"📊 쿼리 결과: {captured.row_count}개 행 ({captured.elapsed_ms:.0f}ms)")
+            if sql_query:
+                metrics.sql_generated = sql_query
+            
+            # 결과 행 수집 생략 (호출자가 최종 SQL을 직접 스트리밍)
+            if not collect_results:
+                results = None
+                sql_validated = sql_validated or bool(sql_query)
             
             # intermediate_steps에서 SQL을 찾지 못한 경우 output에서 추출
             if not sql_query:
                 sql_query = self._extract_sql_from_output(output_message)
-                if sql_query:
+                if sql_query and collect_results:
                     metrics.sql_generated = sql_query
                     # SQL을 직접 실행하여 결과 가져오기
-                    results = self._execute_sql_and_get_results(sql_query)
+                    results = await run_cancellable(
+                        self._execute_sql_and_get_results, sql_query, ctx.max_rows, scope=ctx.scope
+                    )
+                    sql_validated = bool(results)
                     if results:
                         metrics.result_count = len(results)
                         if self.verbose:
                             print(f"📊 쿼리 결과: {len(results)}개 행")
             
-            # 여전히 결과가 없으면 출력에서 추출 시도 (폴백)
-            if not results:
+            # 쿼리가 한 번도 성공하지 않았으면 출력에서 추출 시도 (폴백)
+            if not captured and not results and collect_results:
                 results = self._extract_results_from_output(output_message)
                 if results:
                     metrics.result_count = len(results)
             
             # 마지막 시도: 출력 메시지에서 테이블 형식 찾기
-            if not results and "|" in output_message:
+            if not captured and not results and collect_results and "|" in output_message:
                 results = self._parse_table_from_text(output_message)
                 if results:
                     metrics.result_count = len(results)
             
+            metrics.end_span(post_span, rows=metrics.result_count)
+            
             # 성공 처리
             metrics.success = True
             metrics.finalize()
             
-            # 메트릭 히스토리에 저장
-            self.metrics_history.append(metrics)
+            # 메트릭 집계에 반영
+            self._record_metrics(metrics)
+            
+            # 실제 실행되어 결과를 반환한 SQL만 답변 캐시에 저장
+            if use_cache and sql_query and sql_validated:
+                try:
+                    version = await run_blocking(self._cache_version)
+                    self.answer_cache.store(query, sql_query, version)
+                except Exception as e:
+                    if self.verbose:
+                        print(f"⚠️ 답변 캐시 저장 실패: {str(e)}")
             
             if self.verbose:
                 print(f"\n{'='*80}")
@@ -488,6 +773,9 @@ class LangChainSQLAgent:
                 "response": output_message,
                 "sql": sql_query,
                 "results": results,
+                "result_handle": captured.handle if captured else None,
+                "truncated": captured.truncated if captured else False,
+                "budget_exceeded": capture.budget_exceeded,
                 "metrics": metrics.to_dict(),
                 "execution_time": execution_time
             }
@@ -498,19 +786,27 @@ class LangChainSQLAgent:
             metrics.error_message = str(e)
             metrics.finalize()
             
-            # 메트릭 히스토리에 저장
-            self.metrics_history.append(metrics)
+            # 메트릭 집계에 반영
+            self._record_metrics(metrics)
             
             if self.verbose:
                 print(f"\n❌ 에러: {str(e)}")
                 traceback.print_exc()
             
+            budget_exceeded = list(capture.budget_exceeded)
+            if isinstance(e, BudgetExceeded):
+                budget_exceeded.append(e.to_dict())
+            
             return {
                 "success": False,
                 "query": query,
                 "error": str(e),
+                "budget_exceeded": budget_exceeded,
                 "metrics": metrics.to_dict()
             }
+        finally:
+            deactivate_scope(scope_token)
+            deactivate(capture_token)
     
     def run_sync(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -562,48 +858,6 @@ class LangChainSQLAgent:
         
         return None
     
-    def _parse_sql_observation(self, observation: str) -> Optional[List[Dict]]:
-        """
-        SQL 실행 결과 (observation)를 파싱하여 딕셔너리 리스트로 변환
-        
-        Args:
-            observation: sql_db_query 도구의 출력 (테이블 형식 텍스트)
-            
-        Returns:
-            결과 데이터의 딕셔너리 리스트 또는 None
-        """
-        try:
-            if not observation or observation.strip() == "":
-                return None
-            
-            # 결과를 파싱하여 딕셔너리 리스트로 변환
-            lines = observation.strip().split('\n')
-            if len(lines) < 2:  # 최소한 헤더와 데이터 1줄이 있어야 함
-                return None
-            
-            # 첫 줄을 헤더로 사용
-            headers = [h.strip() for h in lines[0].split('|') if h.strip()]
-            
-            results = []
-            for line in lines[1:]:
-                if '|' in line:  # 데이터 행인 경우
-                    values = [v.strip() for v in line.split('|')]
-                    # 빈 문자열 제거하지 않고 헤더와 같은 수만 확인
-                    if len(values) == len(headers):
-                        row_dict = {headers[i]: values[i].strip() for i in range(len(headers))}
-                        results.append(row_dict)
-            
-            # 최대 행 수 제한
-            if len(results) > self.max_rows:
-                results = results[:self.max_rows]
-            
-            return results if results else None
-            
-        except Exception as e:
-            if self.verbose:
-                print(f"Observation 파싱 에러: {str(e)}")
-            return None
-    
     def _extract_results_from_output(self, output: str) -> Optional[List[Dict]]:
         """
         에이전트 출력에서 쿼리 실행 결과 추출
@@ -671,36 +925,110 @@ class LangChainSQLAgent:
                 print(f"테이블 파싱 에러: {str(e)}")
             return None
     
-    def _execute_sql_and_get_results(self, sql: str) -> Optional[List[Dict]]:
+    def _fetch_rows(self, sql: str, max_rows: Optional[int] = None) -> List[Dict]:
+        """
+        SQL 쿼리를 직접 실행하여 최대 max_rows개의 행을 딕셔너리 리스트로 반환
+        
+        실행 에러는 호출자에게 그대로 전달합니다 (시간 초과/취소는 BudgetExceeded).
+        """
+        max_rows = max_rows or self.max_rows
+        with BudgetedConnection(self.db._engine) as conn:
+            # 서버 사이드 커서: max_rows 이후의 행은 DB에서 가져오지 않음
+            result = conn.execution_options(stream_results=True).execute(text(sql))
+            
+            # 열 이름 가져오기
+            columns = list(result.keys())
+            
+            # 결과를 딕셔너리 리스트로 변환
+            return [dict(zip(columns, row)) for row in result.fetchmany(max_rows)]
+    
+    async def _afetch_rows(self, sql: str, max_rows: Optional[int] = None,
+                           scope: Optional[CancelScope] = None) -> Tuple[List[Dict], bool]:
+        """
+        _fetch_rows의 비동기 버전 (async_db 풀 사용, 이벤트 루프를 막지 않음)
+        
+        Returns:
+            (행 딕셔너리 리스트, max_rows에서 잘렸는지 여부)
+        """
+        columns, rows, truncated = await self.async_db.fetch(sql, max_rows or self.max_rows, scope=scope)
+        return [dict(zip(columns, row)) for row in rows], truncated
+    
+    async def stream_rows(
+        self,
+        sql: str,
+        max_rows: Optional[int] = None,
+        batch_size: int = 100,
+        min_batch_size: int = 50,
+        max_batch_size: int = 5000,
+        target_interval: float = 0.1,
+        scope: Optional[CancelScope] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        서버 사이드 커서로 SQL을 실행하며 행을 배치 단위로 전달 (비동기 제너레이터)
+        
+        전체 결과를 메모리에 올리지 않고 DB 커서에서 읽는 즉시 전달합니다.
+        배치 크기는 소비자(클라이언트 전송)가 배치 하나를 처리하는 데 걸린 시간에 맞춰 조정됩니다.
+        - target_interval/2보다 빠르면 2배로 증가
+        - target_interval*2보다 느리면 절반으로 감소
+        소비자가 다음 배치를 요청할 때까지 DB에서 더 읽지 않으므로 느린 클라이언트에 자연스럽게 backpressure가 걸립니다.
+        
+        Args:
+            sql: 실행할 SQL 쿼리
+            max_rows: 최대 전달 행 수 (기본값: self.max_rows)
+            batch_size: 초기 배치 크기
+            min_batch_size: 최소 배치 크기
+            max_batch_size: 최대 배치 크기
+            target_interval: 배치 하나당 목표 처리 시간 (초)
+            scope: 취소 범위 (RunContext.scope, 클라이언트 연결이 끊기면 실행 중인 FETCH도 중단)
+        
+        FETCH마다 statement_timeout이 적용되며, 시간 초과/취소는 BudgetExceeded로 전달됩니다.
+        """
+        max_rows = max_rows or self.max_rows
+        scope = scope or CancelScope()
+        async with self.async_db.connect(scope=scope) as conn:
+            # 비동기 서버 사이드 커서: 배치마다 FETCH하며 기다리는 동안 다른 요청에 이벤트 루프 양보
+            result = await self.async_db.guard(conn.stream(text(sql)), sql, scope=scope)
+            try:
+                columns = list(result.keys())
+                
+                sent = 0
+                while sent < max_rows:
+                    rows = await self.async_db.guard(
+                        result.fetchmany(min(batch_size, max_rows - sent)), sql, scope=scope
+                    )
+                    if not rows:
+                        break
+                    sent += len(rows)
+                    
+                    yielded_at = time.perf_counter()
+                    yield [dict(zip(columns, row)) for row in rows]
+                    consumer_time = time.perf_counter() - yielded_at
+                    
+                    if consumer_time < target_interval / 2:
+                        batch_size = min(batch_size * 2, max_batch_size)
+                    elif consumer_time > target_interval * 2:
+                        batch_size = max(batch_size // 2, min_batch_size)
+            finally:
+                await result.close()
+    
+    def _execute_sql_and_get_results(self, sql: str, max_rows: Optional[int] = None) -> Optional[List[Dict]]:
         """
         SQL 쿼리를 직접 실행하고 결과를 딕셔너리 리스트로 반환
         
         Args:
             sql: 실행할 SQL 쿼리
+            max_rows: 최대 행 수 (기본값: self.max_rows)
             
         Returns:
             결과 데이터의 딕셔너리 리스트 또는 None
         """
         try:
             # 직접 DB 연결을 사용하여 쿼리 실행
-            with self.db._engine.connect() as conn:
-                result = conn.execute(text(sql))
-                
-                # 열 이름 가져오기
-                columns = list(result.keys())
-                
-                # 결과를 딕셔너리 리스트로 변환
-                results = []
-                for row in result:
-                    row_dict = {columns[i]: row[i] for i in range(len(columns))}
-                    results.append(row_dict)
-                    
-                    # 최대 행 수 확인
-                    if len(results) >= self.max_rows:
-                        break
-                
-                return results if results else None
+            results = self._fetch_rows(sql, max_rows)
+            return results if results else None
             
+        except BudgetExceeded:
+            raise  # 예산 없이 다시 실행하는 폴백을 타지 않음
         except Exception as e:
             if self.verbose:
                 print(f"SQL 실행 중 에러: {str(e)}")
@@ -730,8 +1058,9 @@ class LangChainSQLAgent:
                             results.append(row_dict)
                 
                 # 최대 행 수 제한
-                if len(results) > self.max_rows:
-                    results = results[:self.max_rows]
+                max_rows = max_rows or self.max_rows
+                if len(results) > max_rows:
+                    results = results[:max_rows]
                 
                 return results if results else None
                 
@@ -744,50 +1073,47 @@ class LangChainSQLAgent:
         """
         누적된 메트릭 요약 통계 반환
         
-        에이전트가 실행된 모든 쿼리의 통계 정보를 제공합니다.
-        성능 분석과 최적화에 활용할 수 있습니다.
+        히스토리를 훑지 않고 MetricsStore의 집계값만 읽으므로 서버 가동 시간과 무관하게 일정한 비용입니다.
         
         Returns:
             요약 통계 딕셔너리
-            - total_queries: 총 쿼리 수
-            - successful: 성공한 쿼리 수
-            - failed: 실패한 쿼리 수
-            - success_rate: 성공률
-            - avg_duration: 평균 실행 시간
-            - avg_tokens: 평균 토큰 사용량
-            - total_tokens: 총 토큰 사용량
+            - total_queries / successful / failed / success_rate
+            - duration_seconds: 실행 시간 분포 (mean, p50, p95, p99, max)
+            - tokens_per_query / tool_calls_per_query: 쿼리당 분포
+            - avg_duration / avg_tokens / total_tokens
+            - last_5m / last_1h: 최근 시간 창 통계
             - queries: 최근 5개 쿼리 상세 정보
         """
-        if not self.metrics_history:
-            return {"message": "아직 실행된 쿼리가 없습니다"}
-        
-        successful = [m for m in self.metrics_history if m.success]
-        failed = [m for m in self.metrics_history if not m.success]
-        
-        avg_duration = sum(m.duration for m in self.metrics_history) / len(self.metrics_history)
-        avg_tokens = sum(m.total_tokens for m in self.metrics_history) / len(self.metrics_history)
-        
-        return {
-            "total_queries": len(self.metrics_history),
-            "successful": len(successful),
-            "failed": len(failed),
-            "success_rate": f"{(len(successful) / len(self.metrics_history) * 100):.1f}%",
-            "avg_duration": f"{avg_duration:.2f}s",
-            "avg_tokens": int(avg_tokens),
-            "total_tokens": sum(m.total_tokens for m in self.metrics_history),
-            "queries": [m.to_dict() for m in self.metrics_history[-5:]]  # 최근 5개
-        }
+        summary = self.metrics_store.summary()
+        if not summary["total_queries"]:
+            return {"message": "아직 실행된 쿼리가 없습니다", "answer_cache": self.answer_cache.stats()}
+        summary["answer_cache"] = self.answer_cache.stats()
+        return summary
+    
+    def get_metrics_prometheus(self) -> str:
+        """Prometheus text format 메트릭"""
+        cache = self.answer_cache.stats()
+        return self.metrics_store.to_prometheus({
+            "answer_cache_entries": cache["entries"],
+            "answer_cache_hit_rate": cache["hit_rate"],
+        })
     
     def clear_metrics(self):
-        """메트릭 히스토리 초기화"""
-        self.metrics_history.clear()
+        """메트릭 집계 초기화"""
+        self.metrics_store.reset()
+    
+    def clear_answer_cache(self):
+        """답변 캐시 초기화"""
+        self.answer_cache.clear()
     
     def set_max_rows(self, max_rows: int):
         """
-        최대 반환 행 수 설정
+        기본 최대 반환 행 수 설정
+        
+        요청별 행 제한은 run(max_rows=...)으로 전달하세요. 이 값은 공유 에이전트 전체의 기본값을 바꿉니다.
         
         Args:
             max_rows: 최대 행 수 (1-10000)
         """
-        self.max_rows = min(max(1, max_rows), 10000)
+        self.max_rows = min(max(1, max_rows), MAX_ROWS_LIMIT)
         self.default_limit = min(self.max_rows, 100)
\ No newline at end of file
@@ -8,7 +8,7 @@ from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, System
 from langchain_openai import AzureChatOpenAI
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import create_engine
 import os
 import re
 from dotenv import load_dotenv
@@ -16,6 +16,14 @@ from datetime import datetime
 import json
 from decimal import Decimal
 import traceback
+import asyncio
+from schema_cache import get_schema_cache
+from schema_linker import SchemaLinker
+from agent_metrics import AgentMetrics, TokenCountingCallback
+from cost_guard import CostGuard
+from query_budget import BudgetExceeded
+from async_db import AsyncDatabase, get_async_db
+from blocking_executor import run_blocking
 
 load_dotenv()
 
@@ -23,6 +31,12 @@ load_dotenv()
 # Configuration
 # ========================
 
+# 후보 SQL 수 (1이면 기존처럼 한 개만 생성)
+SQL_CANDIDATES = int(os.getenv("SQL_CANDIDATES", 1))
+
+# 첫 유효 후보 이후 나머지 후보를 기다리는 최대 시간 (초)
+SQL_CANDIDATE_GRACE = float(os.getenv("SQL_CANDIDATE_GRACE", 2.0))
+
 # Decimal을 처리할 수 있는 JSON Encoder
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -52,12 +66,16 @@ class TextToSqlState(TypedDict):
     user_query: str
     conversation_history: Optional[List[Dict]]
     schema_info: Optional[str]
+    schema_tables: Optional[List[Dict]]
     generated_sql: Optional[str]
+    sql_candidates: Optional[List[Dict]]  # 검증/비용 검사를 통과한 후보 (추정 비용 오름차순)
+    guard_feedback: Optional[str]  # 비용 검사 거부 사유 (다음 SQL 생성 프롬프트에 포함)
     validation_result: Optional[Dict]
     query_results: Optional[List[Dict]]
     formatted_response: Optional[str]
     error: Optional[str]
     retry_count: int
+    metrics: Optional[AgentMetrics]
 
 # ========================
 # Text-to-SQL Node
@@ -69,67 +87,54 @@ class TextToSqlNode:
     사용자의 자연어 질의를 SQL로 변환하고 실행하는 핵심 노드
     """
     
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, engine=None, llm=None, candidates: int = SQL_CANDIDATES,
+                 candidate_grace: float = SQL_CANDIDATE_GRACE, guard: Optional[CostGuard] = None,
+                 async_db: Optional[AsyncDatabase] = None):
+        """
+        Args:
+            db_url: 데이터베이스 연결 URL
+            engine: 재사용할 SQLAlchemy 엔진 (LangChainSQLAgent의 fast path에서 공유)
+            llm: 재사용할 LLM 클라이언트
+            candidates: 동시에 생성할 후보 SQL 수 (테이블 힌트를 달리하여 생성)
+            candidate_grace: 첫 유효 후보 이후 나머지 후보를 기다리는 시간 (초)
+            guard: 실행 전 비용 검사기 (없으면 이 엔진으로 생성)
+            async_db: 쿼리 실행용 비동기 엔진 (없으면 db_url의 공유 인스턴스)
+        """
         self.db_url = db_url
         # 대용량 데이터 처리를 위한 설정
-        self.engine = create_engine(
+        self.engine = engine or create_engine(
             db_url,
             pool_size=20,  # 커넥션 풀 크기 증가
             max_overflow=40,  # 최대 오버플로우 증가
             pool_timeout=1200,  # 타임아웃 20분으로 증가
             pool_recycle=3600  # 1시간마다 커넥션 재활용
         )
-        self.llm = get_llm()
+        self.llm = llm or get_llm()
         self.max_retries = 3
         self.max_rows = 100000  # 최대 10,000행 반환
         self.default_limit = 500000  # 기본 LIMIT 50만건
+        self.schema_linker = SchemaLinker()  # 질문 관련 테이블/컬럼만 프롬프트에 포함
+        self.candidates = max(1, candidates)
+        self.candidate_grace = candidate_grace
+        self.guard = guard or CostGuard(self.engine)
+        self.async_db = async_db or get_async_db(db_url)
     
     def get_detailed_schema(self) -> str:
-        """데이터베이스 스키마 정보를 상세히 추출"""
-        inspector = inspect(self.engine)
-        schema_info = []
-        
-        for table_name in inspector.get_table_names():
-            schema_info.append(f"\nTable: {table_name}")
-            
-            # 컬럼 정보
-            columns = inspector.get_columns(table_name)
-            for col in columns:
-                col_type = str(col['type'])
-                nullable = " (nullable)" if col['nullable'] else " (NOT NULL)"
-                default = f" DEFAULT {col['default']}" if col.get('default') else ""
-                schema_info.append(f"  - {col['name']}: {col_type}{nullable}{default}")
-            
-            # Primary Key
-            pk = inspector.get_pk_constraint(table_name)
-            if pk and pk['constrained_columns']:
-                schema_info.append(f"  Primary Key: {', '.join(pk['constrained_columns'])}")
-            
-            # Foreign Keys
-            fks = inspector.get_foreign_keys(table_name)
-            for fk in fks:
-                schema_info.append(f"  Foreign Key: {', '.join(fk['constrained_columns'])} -> {fk['referred_table']}.{', '.join(fk['referred_columns'])}")
-            
-            # Indexes
-            indexes = inspector.get_indexes(table_name)
-            for idx in indexes:
-                if not idx.get('unique'):
-                    schema_info.append(f"  Index: {idx['name']} on ({', '.join(idx['column_names'])})")
-        
-        return "\n".join(schema_info)
+        """데이터베이스 스키마 정보를 상세히 추출 (프로세스 전역 캐시 사용, 동기 - 이벤트 루프에서는 run_blocking으로 호출)"""
+        return get_schema_cache().get(self.engine).text
     
     async def analyze_schema(self, state: TextToSqlState) -> Dict:
         """스키마 분석 단계"""
         print("\n📊 Analyzing database schema...")
         
         try:
-            schema_info = self.get_detailed_schema()
-            
-            # 스키마 요약 생성
-            table_count = schema_info.count('\nTable:')
+            # 지문 조회/재구성과 캐시 락 대기가 이벤트 루프를 막지 않도록 전역 풀에서 실행
+            snapshot = await run_blocking(get_schema_cache().get, self.engine)
+            table_count = snapshot.table_count
             
             return {
-                "schema_info": schema_info,
+                "schema_info": snapshot.text,
+                "schema_tables": snapshot.tables,
                 "messages": [AIMessage(content=f"Schema analyzed: {table_count} tables found")]
             }
         except Exception as e:
@@ -140,21 +145,16 @@ class TextToSqlNode:
                 "messages": [AIMessage(content=error_msg)]
             }
     
-    async def generate_sql(self, state: TextToSqlState) -> Dict:
-        """SQL 생성 단계"""
-        print("\n🔧 Generating SQL query...")
-        
-        if not state.get('schema_info'):
-            return {
-                "error": "No schema information available",
-                "messages": [AIMessage(content="Schema information is required")]
-            }
-        
-        # 향상된 프롬프트
-        prompt = f"""You are an expert PostgreSQL query generator. Convert the natural language query to SQL.
+    def _build_prompt(self, user_query: str, schema_info: str, hint: Optional[str] = None,
+                      feedback: Optional[str] = None) -> str:
+        """SQL 생성 프롬프트 (hint는 후보별 테이블 힌트, feedback은 이전 시도의 비용 검사 거부 사유)"""
+        hint_block = f"\nHINT: {hint}\n" if hint else ""
+        if feedback:
+            hint_block += f"\nPREVIOUS ATTEMPT: {feedback}\n"
+        return f"""You are an expert PostgreSQL query generator. Convert the natural language query to SQL.
 
 DATABASE SCHEMA:
-{state['schema_info']}
+{schema_info}
 
 STRICT RULES:
 1. Generate ONLY SELECT queries (read-only operations)
@@ -180,29 +180,156 @@ IMPORTANT SCHEMA NOTES:
 - If you see columns like 'price', 'price_per_kg', etc., they are likely TEXT fields with ranges
 - For aggregations on price fields, use COUNT instead of SUM
 - For sales/revenue calculations, look for actual numeric columns, not price range fields
-
-USER QUERY: {state['user_query']}
+{hint_block}
+USER QUERY: {user_query}
 
 Generate a single PostgreSQL query. Return ONLY the SQL query without any explanation or markdown:
 """
+    
+    async def _generate_one(self, prompt: str, metrics: Optional[AgentMetrics]) -> str:
+        """LLM 1회 호출로 SQL 하나 생성"""
+        config = {"callbacks": [TokenCountingCallback(metrics)]} if metrics else None
+        response = await self.llm.ainvoke([SystemMessage(content=prompt)], config=config)
+        sql_query = response.content.strip()
+        
+        # SQL 정리
+        sql_query = re.sub(r'```sql\s*', '', sql_query)
+        sql_query = re.sub(r'```\s*', '', sql_query)
+        sql_query = sql_query.strip()
+        
+        # 세미콜론 확인
+        if not sql_query.endswith(';'):
+            sql_query += ';'
+        
+        return sql_query
+    
+    @staticmethod
+    def _candidate_hints(link) -> List[Optional[str]]:
+        """후보별 테이블 힌트 (첫 후보는 힌트 없음)"""
+        hints: List[Optional[str]] = [None]
+        for table in link.tables:
+            hints.append(f"Answer primarily from table {table}; join other tables only if strictly required.")
+        if len(link.tables) > 1:
+            hints.append(f"The answer likely needs a JOIN between {link.tables[0]} and {link.tables[1]}.")
+        hints.append("Prefer a single aggregate query; filter as early as possible and avoid unnecessary JOINs.")
+        return hints
+    
+    async def _generate_candidates(self, state: TextToSqlState, schema_info: str, link,
+                                   metrics: Optional[AgentMetrics]) -> Dict:
+        """
+        후보 SQL K개를 동시에 생성 → 검증 → 비용 검사(EXPLAIN)
+        
+        첫 유효 후보가 나온 뒤 candidate_grace초까지만 나머지를 기다리고 남은 후보는 취소합니다.
+        유효한 후보는 추정 비용 오름차순으로 sql_candidates에 담기며 execute_query가 이 순서로
+        실행하여 행을 반환하는 첫 후보를 사용합니다.
+        """
+        hints = self._candidate_hints(link)[:self.candidates]
+        loop = asyncio.get_running_loop()
+        span = metrics.start_span("sql_candidates", "stage", requested=len(hints)) if metrics else None
+        
+        async def pipeline(hint: Optional[str]) -> Dict:
+            prompt = self._build_prompt(state['user_query'], schema_info, hint, state.get('guard_feedback'))
+            sql = await self._generate_one(prompt, metrics)
+            check = self.check_sql(sql)
+            if not check['valid']:
+                return {"sql": sql, "hint": hint, "valid": False, "reason": check['reason']}
+            try:
+                verdict = await run_blocking(self.guard.check, check['sql'])
+            except Exception as e:
+                return {"sql": sql, "hint": hint, "valid": False, "reason": f"EXPLAIN failed: {str(e)[:200]}"}
+            if not verdict.allowed:
+                return {"sql": sql, "hint": hint, "valid": False, "reason": verdict.feedback()}
+            return {"sql": verdict.sql, "hint": hint, "valid": True, "cost": verdict.cost,
+                    "plan_rows": verdict.estimate.plan_rows if verdict.estimate else None}
+        
+        tasks = {asyncio.ensure_future(pipeline(hint)) for hint in hints}
+        pending = set(tasks)
+        finished: List[Dict] = []
+        deadline = None
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break  # 유예 시간 초과
+            for task in done:
+                if task.exception():
+                    finished.append({"valid": False, "reason": str(task.exception())})
+                    continue
+                candidate = task.result()
+                finished.append(candidate)
+                if candidate['valid'] and deadline is None:
+                    deadline = loop.time() + self.candidate_grace
+        
+        # 늦은 후보 취소 (진행 중인 LLM 호출 중단)
+        for task in pending:
+            task.cancel()
+        
+        valid = [c for c in finished if c['valid']]
+        # 같은 SQL 중복 제거 후 비용 순 정렬 (비용을 모르면 뒤로)
+        unique: Dict[str, Dict] = {}
+        for c in valid:
+            unique.setdefault(c['sql'], c)
+        ranked = sorted(unique.values(), key=lambda c: (c['cost'] is None, c['cost'] or 0))
+        
+        print(f"🎯 Candidates: {len(ranked)} valid / {len(finished)} finished / {len(pending)} cancelled")
+        if span:
+            metrics.end_span(span, finished=len(finished), valid=len(ranked), cancelled=len(pending))
+        
+        if not ranked:
+            reasons = "; ".join(c.get('reason', '') for c in finished) or "no candidate finished"
+            error_msg = f"SQL generation failed: all candidates invalid ({reasons})"
+            print(f"❌ {error_msg}")
+            return {
+                "error": error_msg,
+                "messages": [AIMessage(content=error_msg)]
+            }
+        
+        for c in ranked:
+            cost = f"{c['cost']:.0f}" if c['cost'] is not None else "?"
+            print(f"  cost={cost} {c['sql'][:100]}")
+        
+        return {
+            "generated_sql": ranked[0]['sql'],
+            "sql_candidates": ranked,
+            "messages": [AIMessage(content=f"{len(ranked)} SQL candidates generated")]
+        }
+    
+    async def generate_sql(self, state: TextToSqlState) -> Dict:
+        """SQL 생성 단계 (candidates > 1이면 후보 K개를 병렬 생성)"""
+        print("\n🔧 Generating SQL query...")
+        
+        if not state.get('schema_info'):
+            return {
+                "error": "No schema information available",
+                "messages": [AIMessage(content="Schema information is required")]
+            }
+        
+        # 스키마 링킹: 질문과 관련된 테이블/컬럼만 프롬프트에 포함
+        schema_info = state['schema_info']
+        metrics = state.get('metrics')
+        link = None
+        if state.get('schema_tables'):
+            link = self.schema_linker.link(state['user_query'], state['schema_tables'])
+            schema_info = link.schema_text
+            print(f"🔗 Schema linked: {', '.join(link.tables)} "
+                  f"({link.tokens_full} → {link.tokens_pruned} tokens, {link.elapsed_ms:.1f}ms)")
+            if metrics:
+                metrics.schema_tokens_full = link.tokens_full
+                metrics.schema_tokens_pruned = link.tokens_pruned
+                metrics.schema_link_ms = link.elapsed_ms
         
         try:
-            response = await self.llm.ainvoke([SystemMessage(content=prompt)])
-            sql_query = response.content.strip()
+            if self.candidates > 1 and link is not None:
+                return await self._generate_candidates(state, schema_info, link, metrics)
             
-            # SQL 정리
-            sql_query = re.sub(r'```sql\s*', '', sql_query)
-            sql_query = re.sub(r'```\s*', '', sql_query)
-            sql_query = sql_query.strip()
-            
-            # 세미콜론 확인
-            if not sql_query.endswith(';'):
-                sql_query += ';'
+            prompt = self._build_prompt(state['user_query'], schema_info, feedback=state.get('guard_feedback'))
+            sql_query = await self._generate_one(prompt, metrics)
             
             print(f"Generated SQL: {sql_query}")
             
             return {
                 "generated_sql": sql_query,
+                "sql_candidates": None,
                 "messages": [AIMessage(content=f"SQL generated successfully")]
             }
             
@@ -214,17 +341,15 @@ Generate a single PostgreSQL query. Return ONLY the SQL query without any explan
                 "messages": [AIMessage(content=error_msg)]
             }
     
-    async def validate_sql(self, state: TextToSqlState) -> Dict:
-        """SQL 검증 단계"""
-        print("\n✅ Validating SQL query...")
-        
-        sql = state.get('generated_sql', '')
+    def check_sql(self, sql: str) -> Dict[str, Any]:
+        """
+        SQL 보안/형식 검증 (상태를 바꾸지 않는 순수 함수)
         
+        Returns:
+            {"valid": bool, "sql": LIMIT이 보장된 SQL, "reason": 실패 사유, "error": 사용자용 에러}
+        """
         if not sql:
-            return {
-                "validation_result": {"valid": False, "reason": "No SQL query to validate"},
-                "messages": [AIMessage(content="No SQL query to validate")]
-            }
+            return {"valid": False, "reason": "No SQL query to validate", "error": None}
         
         # 보안 검증
         forbidden_keywords = [
@@ -236,19 +361,13 @@ Generate a single PostgreSQL query. Return ONLY the SQL query without any explan
         
         for keyword in forbidden_keywords:
             if re.search(r'\b' + keyword + r'\b', sql_upper):
-                return {
-                    "validation_result": {"valid": False, "reason": f"Forbidden operation: {keyword}"},
-                    "error": f"Security violation: {keyword} operations not allowed",
-                    "messages": [AIMessage(content=f"Forbidden operation detected: {keyword}")]
-                }
+                return {"valid": False, "reason": f"Forbidden operation: {keyword}",
+                        "error": f"Security violation: {keyword} operations not allowed"}
         
         # SELECT 또는 WITH로 시작하는지 확인
         if not (sql_upper.startswith('SELECT') or sql_upper.startswith('WITH')):
-            return {
-                "validation_result": {"valid": False, "reason": "Must be SELECT query"},
-                "error": "Only SELECT queries are allowed",
-                "messages": [AIMessage(content="Query must start with SELECT or WITH")]
-            }
+            return {"valid": False, "reason": "Must be SELECT query",
+                    "error": "Only SELECT queries are allowed"}
         
         # SQL Injection 패턴 체크
         dangerous_patterns = [
@@ -261,26 +380,113 @@ Generate a single PostgreSQL query. Return ONLY the SQL query without any explan
         
         for pattern in dangerous_patterns:
             if re.search(pattern, sql, re.IGNORECASE):
-                return {
-                    "validation_result": {"valid": False, "reason": "Dangerous pattern detected"},
-                    "error": "Potentially dangerous SQL pattern detected",
-                    "messages": [AIMessage(content="Security risk detected in query")]
-                }
+                return {"valid": False, "reason": "Dangerous pattern detected",
+                        "error": "Potentially dangerous SQL pattern detected"}
         
         # LIMIT 체크 및 추가 (대용량 데이터 처리)
         if 'LIMIT' not in sql_upper:
             sql = sql.replace(';', f' LIMIT {self.default_limit};')
-            state['generated_sql'] = sql
             print(f"Added LIMIT {self.default_limit} to query")
         
+        return {"valid": True, "sql": sql, "reason": None, "error": None}
+    
+    async def validate_sql(self, state: TextToSqlState) -> Dict:
+        """SQL 검증 단계"""
+        print("\n✅ Validating SQL query...")
+        
+        check = self.check_sql(state.get('generated_sql', ''))
+        
+        if not check['valid']:
+            update = {
+                "validation_result": {"valid": False, "reason": check['reason']},
+                "messages": [AIMessage(content=check['reason'])]
+            }
+            if check['error']:
+                update["error"] = check['error']
+            return update
+        
         return {
-            "validation_result": {"valid": True, "sql": sql},
-            "generated_sql": sql,
+            "validation_result": {"valid": True, "sql": check['sql']},
+            "generated_sql": check['sql'],
             "messages": [AIMessage(content="SQL validation passed")]
         }
     
+    async def cost_guard(self, state: TextToSqlState) -> Dict:
+        """
+        비용 검사 단계 (EXPLAIN)
+        
+        예산 초과 쿼리는 LIMIT을 낮춰 재작성하거나 거부합니다. 거부 사유는 guard_feedback으로
+        generate_sql에 전달되며, max_retries를 넘기면 에러로 종료합니다.
+        후보 생성 경로의 SQL은 후보마다 이미 검사했으므로 다시 EXPLAIN하지 않습니다.
+        """
+        print("\n🛡️ Checking query cost...")
+        
+        validation = state.get('validation_result') or {}
+        sql = state.get('generated_sql', '')
+        if not validation.get('valid'):
+            return {}
+        if any(c['sql'] == sql for c in state.get('sql_candidates') or []):
+            return {"messages": [AIMessage(content="Cost check passed (candidate)")]}
+        
+        try:
+            verdict = await run_blocking(self.guard.check, sql)
+        except Exception as e:
+            reason = f"EXPLAIN failed: {str(e)[:200]}"
+            feedback = f"The previous query failed to plan: {str(e)[:200]}. Fix table/column names."
+        else:
+            cost = f"{verdict.cost:,.0f}" if verdict.cost is not None else "?"
+            print(f"  {verdict.action} (cost={cost}) {'; '.join(verdict.reasons)}")
+            if verdict.allowed:
+                return {
+                    "generated_sql": verdict.sql,
+                    "validation_result": {"valid": True, "sql": verdict.sql, "guard": verdict.to_dict()},
+                    "guard_feedback": None,
+                    "messages": [AIMessage(content=f"Cost check {verdict.action}")]
+                }
+            reason = "; ".join(verdict.reasons)
+            feedback = verdict.feedback()
+        
+        retry_count = state.get('retry_count', 0) + 1
+        print(f"❌ Cost check rejected (attempt {retry_count}/{self.max_retries}): {reason}")
+        update = {
+            "validation_result": {"valid": False, "reason": reason},
+            "guard_feedback": feedback,
+            "retry_count": retry_count,
+            "messages": [AIMessage(content=feedback)]
+        }
+        if retry_count >= self.max_retries:
+            update["error"] = f"Query rejected by cost guard: {reason}"
+        return update
+    
+    async def _execute(self, sql: str) -> List[Dict]:
+        """SQL 실행 후 JSON 직렬화 가능한 딕셔너리 리스트로 변환 (최대 max_rows, 비동기 엔진, 시간 예산 적용)"""
+        columns, rows, truncated = await self.async_db.fetch(sql, self.max_rows)
+        
+        # 결과를 딕셔너리 리스트로 변환 (대용량 데이터 처리)
+        results = []
+        for row in rows:
+            row_dict = {}
+            for i, col in enumerate(columns):
+                value = row[i]
+                # Decimal, datetime 등 처리
+                if isinstance(value, Decimal):
+                    value = float(value)
+                elif isinstance(value, datetime):
+                    value = value.isoformat()
+                row_dict[col] = value
+            results.append(row_dict)
+        
+        if truncated:
+            print(f"⚠️ Results truncated: showing first {self.max_rows} rows")
+        
+        return results
+    
     async def execute_query(self, state: TextToSqlState) -> Dict:
-        """쿼리 실행 단계"""
+        """
+        쿼리 실행 단계
+        
+        후보 SQL이 여러 개면 추정 비용이 낮은 순서로 실행하여 행을 반환하는 첫 후보를 사용합니다.
+        """
         print("\n🚀 Executing SQL query...")
         
         validation = state.get('validation_result', {})
@@ -291,52 +497,43 @@ Generate a single PostgreSQL query. Return ONLY the SQL query without any explan
             }
         
         sql = state.get('generated_sql', '')
-        
-        try:
-            with self.engine.connect() as conn:
-                result = conn.execute(text(sql))
-                rows = result.fetchall()
-                
-                # 결과를 딕셔너리 리스트로 변환 (대용량 데이터 처리)
-                if rows:
-                    columns = result.keys()
-                    results = []
-                    # 최대 max_rows까지 처리
-                    for row in rows[:self.max_rows]:
-                        row_dict = {}
-                        for i, col in enumerate(columns):
-                            value = row[i]
-                            # Decimal, datetime 등 처리
-                            if isinstance(value, Decimal):
-                                value = float(value)
-                            elif isinstance(value, datetime):
-                                value = value.isoformat()
-                            row_dict[col] = value
-                        results.append(row_dict)
-                    
-                    # 전체 행 수 정보 추가
-                    total_rows = len(rows)
-                    if total_rows > self.max_rows:
-                        print(f"⚠️ Results truncated: showing {self.max_rows} of {total_rows} rows")
-                else:
-                    results = []
-                
-                print(f"✅ Query executed: {len(results)} rows returned")
-                
-                return {
-                    "query_results": results,
-                    "messages": [AIMessage(content=f"Query executed: {len(results)} rows returned")]
-                }
-                
-        except Exception as e:
-            error_msg = f"Query execution failed: {str(e)}"
-            print(f"❌ {error_msg}")
-            traceback.print_exc()
+        candidates = [c['sql'] for c in state.get('sql_candidates') or []] or [sql]
+        if sql not in candidates:
+            candidates[0] = sql
+        
+        last_error = None
+        results: List[Dict] = []
+        for candidate in candidates:
+            try:
+                results = await self._execute(candidate)
+            except BudgetExceeded as e:
+                last_error = str(e)
+                print(f"❌ {last_error}")
+                if e.kind == "cancelled":
+                    break
+                continue
+            except Exception as e:
+                last_error = f"Query execution failed: {str(e)}"
+                print(f"❌ {last_error}")
+                continue
             
+            sql, last_error = candidate, None
+            if results:
+                break
+        
+        if last_error and not results:
             return {
-                "error": error_msg,
-                "messages": [AIMessage(content=error_msg)]
+                "error": last_error,
+                "messages": [AIMessage(content=last_error)]
             }
+        
+        print(f"✅ Query executed: {len(results)} rows returned")
+        
+        return {
+            "query_results": results,
+            "generated_sql": sql,
+            "messages": [AIMessage(content=f"Query executed: {len(results)} rows returned")]
+        }
     
     async def format_response(self, state: TextToSqlState) -> Dict:
         """응답 포맷팅 단계"""
@@ -404,16 +601,39 @@ class TextToSqlAgent:
         self.node = TextToSqlNode(db_url)
         self.graph = self._build_graph()
     
+    @staticmethod
+    def _traced(name: str, node_fn):
+        """노드 실행을 stage span으로 감싸기 (execute_query는 SQL과 행 수 포함)"""
+        async def wrapper(state: TextToSqlState) -> Dict:
+            metrics = state.get('metrics')
+            if not metrics:
+                return await node_fn(state)
+            
+            attributes = {"sql": state.get('generated_sql', '')} if name == "execute_query" else {}
+            span = metrics.start_span(name, "stage", **attributes)
+            try:
+                update = await node_fn(state)
+            except Exception as e:
+                metrics.end_span(span, error=str(e))
+                raise
+            
+            if 'query_results' in update:
+                span.attributes["rows"] = len(update['query_results'] or [])
+            metrics.end_span(span, error=update.get('error'))
+            return update
+        return wrapper
+    
     def _build_graph(self) -> StateGraph:
         """LangGraph 워크플로우 구성"""
         workflow = StateGraph(TextToSqlState)
         
-        # 노드 추가
-        workflow.add_node("analyze_schema", self.node.analyze_schema)
-        workflow.add_node("generate_sql", self.node.generate_sql)
-        workflow.add_node("validate_sql", self.node.validate_sql)
-        workflow.add_node("execute_query", self.node.execute_query)
-        workflow.add_node("format_response", self.node.format_response)
+        # 노드 추가 (노드별 소요 시간은 metrics span으로 기록)
+        workflow.add_node("analyze_schema", self._traced("analyze_schema", self.node.analyze_schema))
+        workflow.add_node("generate_sql", self._traced("generate_sql", self.node.generate_sql))
+        workflow.add_node("validate_sql", self._traced("validate_sql", self.node.validate_sql))
+        workflow.add_node("cost_guard", self._traced("cost_guard", self.node.cost_guard))
+        workflow.add_node("execute_query", self._traced("execute_query", self.node.execute_query))
+        workflow.add_node("format_response", self._traced("format_response", self.node.format_response))
         
         # 엣지 설정
         workflow.set_entry_point("analyze_schema")
@@ -427,11 +647,24 @@ class TextToSqlAgent:
             "validate_sql",
             lambda x: "execute" if x.get('validation_result', {}).get('valid') else "retry",
             {
-                "execute": "execute_query",
+                "execute": "cost_guard",
                 "retry": END  # 재시도 로직은 외부에서 처리
             }
         )
         
+        # 비용 검사: 통과/재작성 → 실행, 거부 → 사유를 포함하여 SQL 재생성 (max_retries 초과 시 종료)
+        workflow.add_conditional_edges(
+            "cost_guard",
+            lambda x: "end" if x.get('error') else (
+                "execute" if x.get('validation_result', {}).get('valid') else "regenerate"
+            ),
+            {
+                "execute": "execute_query",
+                "regenerate": "generate_sql",
+                "end": END
+            }
+        )
+        
         workflow.add_edge("execute_query", "format_response")
         workflow.add_edge("format_response", END)
         
@@ -444,22 +677,34 @@ class TextToSqlAgent:
         print(f"📝 Query: {query}")
         print(f"{'='*60}")
         
+        metrics = AgentMetrics(query=query)
+        
         initial_state = {
             "messages": [HumanMessage(content=query)],
             "user_query": query,
             "conversation_history": conversation_history or [],
             "schema_info": None,
+            "schema_tables": None,
             "generated_sql": None,
+            "sql_candidates": None,
+            "guard_feedback": None,
             "validation_result": None,
             "query_results": None,
             "formatted_response": None,
             "error": None,
-            "retry_count": 0
+            "retry_count": 0,
+            "metrics": metrics
         }
         
         try:
             result = await self.graph.ainvoke(initial_state)
             
+            metrics.sql_generated = result.get("generated_sql")
+            metrics.result_count = len(result.get("query_results") or [])
+            metrics.error_message = result.get("error")
+            metrics.success = not result.get("error")
+            metrics.finalize()
+            
             print(f"\n{'='*60}")
             print(f"✅ Agent Completed Successfully")
             print(f"{'='*60}\n")
@@ -470,18 +715,23 @@ class TextToSqlAgent:
                 "sql": result.get("generated_sql"),
                 "response": result.get("formatted_response"),
                 "results": result.get("query_results"),
-                "error": result.get("error")
+                "error": result.get("error"),
+                "metrics": metrics.to_dict()
             }
             
         except Exception as e:
             print(f"\n❌ Agent failed: {str(e)}")
             traceback.print_exc()
             
+            metrics.error_message = str(e)
+            metrics.finalize()
+            
             return {
                 "success": False,
                 "query": query,
                 "error": str(e),
-                "response": f"An error occurred: {str(e)}"
+                "response": f"An error occurred: {str(e)}",
+                "metrics": metrics.to_dict()
             }
 
 # ========================
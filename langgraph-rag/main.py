@@ -1,13 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse, Response
 from pydantic import BaseModel
-from typing import List, AsyncGenerator, Optional, Dict, Any
+from typing import List, AsyncGenerator, Optional, Dict, Any, Literal
 import json
 import asyncio
 import os
+import threading
 from dotenv import load_dotenv
 from langchain_sql_agent import LangChainSQLAgent
+from run_context import RunContext
+from query_budget import BudgetExceeded, CancelScope
+from blocking_executor import ExecutorSaturated, get_blocking_executor
+from result_encoding import (
+    FORMAT_JSON, compress, encode_batch, encode_result, json_default, negotiate_encoding, negotiate_format,
+    result_columns
+)
+from result_store import (
+    RESULT_PAGE_SIZE, ResultNotReady, SpooledResult, get_result_store, iter_batches
+)
+from schema_cache import get_schema_cache, invalidate_schema_cache
 import uvicorn
 
 load_dotenv()
@@ -29,33 +41,76 @@ app.add_middleware(
 
 # 전역 SQL 에이전트 인스턴스
 sql_agent: Optional[LangChainSQLAgent] = None
+sql_agent_lock = threading.Lock()
+
+# 동기 DB/LLM 작업용 크기 제한 스레드 풀 (포화 시 429/503)
+executor = get_blocking_executor()
+
+# 큰 결과의 서버 측 보관소 (result_handle로 페이지 조회/CSV 내보내기)
+result_store = get_result_store()
 
 def get_sql_agent() -> LangChainSQLAgent:
-    """LangChain SQL Agent 인스턴스 가져오기 (싱글톤)"""
+    """LangChain SQL Agent 인스턴스 가져오기 (싱글톤, 초기화는 동기 작업이므로 스레드에서 호출)"""
     global sql_agent
-    if sql_agent is None:
-        db_url = os.getenv("DATABASE_URL")
-        if not db_url:
-            raise ValueError("DATABASE_URL environment variable not set")
-        # LangChain SQL Agent 초기화
-        sql_agent = LangChainSQLAgent(
-            db_url=db_url,
-            max_iterations=5,  # 최대 5번 재시도
-            enable_streaming=False,  # API에서는 스트리밍 비활성화
-            verbose=True  # 상세 로그 활성화
-        )
-        print("✅ LangChain SQL Agent initialized")
-    return sql_agent
+    with sql_agent_lock:
+        if sql_agent is None:
+            db_url = os.getenv("DATABASE_URL")
+            if not db_url:
+                raise ValueError("DATABASE_URL environment variable not set")
+            # LangChain SQL Agent 초기화
+            sql_agent = LangChainSQLAgent(
+                db_url=db_url,
+                max_iterations=5,  # 최대 5번 재시도
+                enable_streaming=False,  # API에서는 스트리밍 비활성화
+                verbose=True  # 상세 로그 활성화
+            )
+            print("✅ LangChain SQL Agent initialized")
+        return sql_agent
+
+async def aget_sql_agent() -> LangChainSQLAgent:
+    """
+    엔드포인트용 에이전트 조회
+    
+    보통은 시작 시 워밍업에서 만들어진 인스턴스를 바로 반환하고,
+    워밍업이 실패한 경우에만 초기화를 스레드 풀에서 실행합니다 (이벤트 루프를 막지 않음).
+    """
+    if sql_agent is not None:
+        return sql_agent
+    return await executor.submit(get_sql_agent)
+
+def warm_up_sql_agent():
+    """에이전트 생성 + 스키마 캐시 적재 (첫 요청이 초기화 비용을 떠안지 않도록)"""
+    agent = get_sql_agent()
+    get_schema_cache().get(agent.db._engine)
+    return agent
 
 @app.on_event("startup")
 async def startup_event():
-    """서버 시작 시 에이전트 초기화"""
+    """서버 시작 시 에이전트 워밍업 (에이전트, 스키마 캐시, 비동기 DB 풀)"""
     try:
-        get_sql_agent()  # LangChain SQL Agent 초기화
+        agent = await executor.run(warm_up_sql_agent)
+        await agent.async_db.ping()
         print("✅ All agents initialized successfully")
     except Exception as e:
         print(f"❌ Failed to initialize agents: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """비동기 DB 풀, 결과 보관소, 스레드 풀 정리"""
+    await result_store.close()
+    if sql_agent is not None:
+        await sql_agent.async_db.dispose()
+    executor.shutdown()
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    """스레드 풀 포화 → 429 (대기열 초과) / 503 (대기 시간 초과), Retry-After 포함"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), **exc.to_dict()},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 class Message(BaseModel):
     role: str
     content: str
@@ -68,6 +123,8 @@ class TextToSqlRequest(BaseModel):
     query: str
     conversation_history: Optional[List[Dict]] = None
     max_rows: Optional[int] = 1000
+    use_cache: Optional[bool] = True  # 답변 캐시 사용 여부
+    mode: Optional[Literal["fast_first", "react"]] = None  # 실행 모드 ("fast_first" / "react", 기본값: SQL_AGENT_MODE)
 
 class TextToSqlResponse(BaseModel):
     success: bool
@@ -78,6 +135,9 @@ class TextToSqlResponse(BaseModel):
     error: Optional[str]
     row_count: Optional[int]
     truncated: Optional[bool]
+    budget_exceeded: Optional[List[Dict[str, Any]]] = None  # 시간 예산 초과/취소된 쿼리
+    result_handle: Optional[str] = None  # 전체 결과 핸들 (results는 첫 페이지, /api/results/{handle})
+    result_status: Optional[str] = None  # 핸들 상태 (pending: 처음 조회할 때 보관 시작, spooling, ready)
     metrics: Optional[Dict[str, Any]]  # 성능 메트릭 추가
 
 async def stream_langgraph_response(messages: List[Message], files_content: Optional[List[str]] = None, file_names: Optional[List[str]] = None) -> AsyncGenerator[str, None]:
@@ -225,7 +285,7 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/text-to-sql", response_model=TextToSqlResponse)
-async def text_to_sql(request: TextToSqlRequest):
+async def text_to_sql(request: TextToSqlRequest, http_request: Request):
     """
     Text-to-SQL API 엔드포인트 (LangChain SQL Agent 사용)
     자연어 쿼리를 SQL로 변환하고 실행
@@ -237,104 +297,239 @@ async def text_to_sql(request: TextToSqlRequest):
     - query: 자연어 질문
     - conversation_history: 이전 대화 내역 (선택, 현재 미사용)
     - max_rows: 반환할 최대 행 수 (선택, 기본 1000, 최대 10000)
+    
+    Accept 헤더로 결과 형식을 고를 수 있습니다 (result_encoding 참고).
+    - application/json: 기존 응답 (results: 행 딕셔너리 리스트)
+    - application/vnd.text-to-sql.rows+json / columnar+json, application/x-ndjson,
+      application/vnd.apache.arrow.stream: 컬럼 이름을 한 번만 전송 (Accept-Encoding: gzip/zstd 압축)
     """
+    # 스레드 풀이 포화면 요청을 쌓지 않고 바로 429
+    executor.admit()
     try:
-        # LangChain SQL Agent 가져오기
-        agent = get_sql_agent()
-        
-        # 최대 행 수 설정
-        if request.max_rows:
-            agent.set_max_rows(request.max_rows)
+        # LangChain SQL Agent 가져오기 (공유 인스턴스, 요청별 상태는 run()의 RunContext에 분리)
+        agent = await aget_sql_agent()
         
         # 에이전트 실행 (ReAct 루프)
         result = await agent.run(
             query=request.query,
-            session_id=None  # 세션 관리는 향후 구현
+            session_id=None,  # 세션 관리는 향후 구현
+            use_cache=request.use_cache is not False,
+            max_rows=request.max_rows or 1000,
+            mode=request.mode
         )
         
         # 결과 처리
         row_count = result.get("metrics", {}).get("result_count", 0)
-        truncated = row_count >= agent.max_rows
+        truncated = result.get("truncated", False)
+        media_type = negotiate_format(http_request.headers.get("accept"))
         
-        return TextToSqlResponse(
+        # 큰 결과는 첫 페이지만 응답하고 전체는 결과 보관소에 (잘린 결과는 핸들을 처음 조회할 때 최종 SQL만 다시 실행)
+        rows = result.get("results") or []
+        spooled = None
+        if result.get("success"):
+            spooled = spool_result(agent, request.query, result.get("sql"), rows, truncated)
+        if spooled:
+            rows = rows[:RESULT_PAGE_SIZE]
+            truncated = True
+        
+        response = TextToSqlResponse(
             success=result.get("success", False),
             query=request.query,
             sql=result.get("sql"),
             response=result.get("response"),
-            results=result.get("results"),
+            results=(rows if spooled else result.get("results")) if media_type == FORMAT_JSON else None,
             error=result.get("error"),
             row_count=row_count,
             truncated=truncated,
+            budget_exceeded=result.get("budget_exceeded") or None,
+            result_handle=spooled.handle if spooled else None,
+            result_status=spooled.status if spooled else None,
             metrics=result.get("metrics")
         )
+        if media_type == FORMAT_JSON:
+            return response
+        
+        # 컬럼 이름을 한 번만 보내는 형식 (인코딩/압축은 CPU 작업이므로 스레드 풀에서)
+        meta = response.model_dump(exclude={"results"})
+        encoding = negotiate_encoding(http_request.headers.get("accept-encoding"))
+        body = await executor.run(encode_result, meta, rows, media_type)
+        body, content_encoding = await executor.run(compress, body, encoding)
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if content_encoding:
+            headers["Content-Encoding"] = content_encoding
+        return Response(content=body, media_type=media_type, headers=headers)
         
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def stream_text_to_sql_response(query: str, max_rows: int = 1000) -> AsyncGenerator[str, None]:
-    """Text-to-SQL 스트리밍 응답 (LangChain SQL Agent)"""
+def spool_result(
+    agent: LangChainSQLAgent,
+    query: str,
+    sql: Optional[str],
+    rows: List[Dict[str, Any]],
+    truncated: bool
+) -> Optional[SpooledResult]:
+    """
+    큰 결과를 결과 보관소에 보관 (응답을 막지 않음)
+    
+    - RESULT_PAGE_SIZE 이하이고 잘리지 않은 결과는 보관하지 않음
+    - 수집한 행이 전체 결과면 메모리에서 바로 기록 (백그라운드)
+    - max_rows에서 잘린 결과는 pending 핸들만 반환하고, 핸들을 처음 조회할 때 최종 SQL을 서버 사이드 커서로
+      다시 실행하여 기록 (LLM은 호출하지 않음, 페이지를 조회하지 않으면 DB를 다시 읽지 않음)
+    """
+    if not sql or not (truncated or len(rows) > RESULT_PAGE_SIZE):
+        return None
+    if truncated:
+        def source():
+            # 요청의 CancelScope와 분리 (응답이 끝난 뒤 실행), +1행으로 보관 한도 초과 여부 판단
+            scope = CancelScope()
+            return agent.stream_rows(sql, max_rows=result_store.max_rows + 1, scope=scope), scope
+        return result_store.defer(query, sql, source)
+    return result_store.spool(query, sql, iter_batches(rows))
+
+def sse_event(payload: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False, default=json_default)}\n\n"
+
+async def cancel_on_disconnect(request: Request, ctx: RunContext, interval: float = 0.5):
+    """클라이언트 연결이 끊기면 실행 중인 에이전트 요청을 취소"""
+    while not ctx.cancelled:
+        if await request.is_disconnected():
+            print("🔌 Client disconnected, cancelling agent run")
+            ctx.cancel("client disconnected")
+            return
+        await asyncio.sleep(interval)
+
+async def stream_text_to_sql_response(
+    query: str,
+    max_rows: int = 1000,
+    use_cache: bool = True,
+    request: Optional[Request] = None,
+    mode: Optional[str] = None,
+    media_type: str = FORMAT_JSON
+) -> AsyncGenerator[str, None]:
+    """
+    Text-to-SQL 스트리밍 응답 (LangChain SQL Agent)
+    
+    최종 SQL이 확정되면 결과를 메모리에 모으지 않고 서버 사이드 커서에서 읽는 대로
+    results_batch 이벤트로 전달합니다. 배치 크기는 클라이언트 수신 속도에 맞춰 조정되며
+    클라이언트 연결이 끊기면 즉시 커서를 닫고, 실행 중인 쿼리는 DB에서도 취소합니다.
+    
+    media_type이 rows/columnar 형식이면 results_batch는 행 배열(또는 컬럼별 배열)이며
+    컬럼 이름은 첫 배치의 columns 필드로 한 번만 전송됩니다.
+    """
     try:
-        agent = get_sql_agent()
-        
-        # 최대 행 수 설정
-        agent.set_max_rows(max_rows)
+        agent = await aget_sql_agent()
+        ctx = agent.create_context(query, max_rows=max_rows)
         
         # 단계별 진행 상황 전송
-        yield f"data: {json.dumps({'step': 'Analyzing database schema...'})}\n\n"
-        await asyncio.sleep(0.1)
-        
-        # 에이전트 실행
-        result = await agent.run(query=query)
+        yield sse_event({'step': 'Analyzing database schema...'})
         
-        if result.get("success"):
-            # SQL 쿼리 전송
-            if result.get("sql"):
-                yield f"data: {json.dumps({'sql': result.get('sql')})}\n\n"
-                await asyncio.sleep(0.1)
-            
-            # 결과 개수 전송
-            row_count = len(result.get("results", [])) if result.get("results") else 0
-            yield f"data: {json.dumps({'row_count': row_count})}\n\n"
+        # 에이전트 실행 (결과 행은 아래에서 커서로 직접 스트리밍하므로 수집하지 않음)
+        # 연결 감시는 결과 스트리밍이 끝날 때까지 유지 (끊기면 실행 중인 DB 쿼리까지 취소)
+        watcher = asyncio.create_task(cancel_on_disconnect(request, ctx)) if request is not None else None
+        try:
+            result = await agent.run(query=query, use_cache=use_cache, collect_results=False, context=ctx, mode=mode)
             
-            # 응답 전송 (청크 단위로)
-            response = result.get("response", "")
-            for i in range(0, len(response), 100):
-                chunk = response[i:i+100]
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
-                await asyncio.sleep(0.01)
+            if ctx.cancelled:
+                return
             
-            # 결과 데이터 전송 (대용량 처리)
-            if result.get("results"):
-                yield f"data: {json.dumps({'results_start': True})}\n\n"
+            if result.get("success"):
+                sql = result.get("sql")
                 
-                # 결과를 배치로 전송 (100개씩)
-                results = result.get("results")
-                batch_size = 100
-                for i in range(0, len(results), batch_size):
-                    batch = results[i:i+batch_size]
-                    yield f"data: {json.dumps({'results_batch': batch, 'batch_index': i // batch_size})}\n\n"
-                    await asyncio.sleep(0.05)
+                # SQL 쿼리 전송
+                if sql:
+                    yield sse_event({'sql': sql})
                 
-                yield f"data: {json.dumps({'results_end': True})}\n\n"
-        else:
-            # 에러 전송
-            error_msg = result.get("error", "Unknown error occurred")
-            yield f"data: {json.dumps({'error': error_msg})}\n\n"
-        
-        yield f"data: [DONE]\n\n"
+                # 응답 전송 (청크 단위로)
+                response = result.get("response", "")
+                for i in range(0, len(response), 100):
+                    yield sse_event({'content': response[i:i+100]})
+                
+                # 결과 데이터 스트리밍 (서버 사이드 커서 → SSE)
+                if sql:
+                    start_event = {'results_start': True}
+                    if media_type != FORMAT_JSON:
+                        start_event['format'] = media_type
+                    yield sse_event(start_event)
+                    
+                    row_count = 0
+                    batch_index = 0
+                    truncated = False
+                    columns: List[str] = []
+                    # +1행을 읽어 max_rows를 넘는 행이 실제로 있을 때만 잘린 것으로 판단 (그 행은 보내지 않음)
+                    rows = agent.stream_rows(sql, max_rows=ctx.max_rows + 1, scope=ctx.scope)
+                    try:
+                        async for batch in rows:
+                            if ctx.cancelled or (request is not None and await request.is_disconnected()):
+                                ctx.cancel("client disconnected")
+                                print(f"🔌 Client disconnected after {row_count} rows, cancelling query")
+                                break
+                            if row_count + len(batch) > ctx.max_rows:
+                                truncated = True
+                                batch = batch[:ctx.max_rows - row_count]
+                                if not batch:
+                                    break
+                            row_count += len(batch)
+                            if batch_index == 0:
+                                columns = result_columns(batch)
+                            batch_event = {'results_batch': encode_batch(batch, media_type, columns), 'batch_index': batch_index}
+                            if media_type != FORMAT_JSON and batch_index == 0:
+                                batch_event['columns'] = columns
+                            yield sse_event(batch_event)
+                            batch_index += 1
+                    except BudgetExceeded as e:
+                        if ctx.cancelled:
+                            return
+                        yield sse_event({'error': str(e), 'budget_exceeded': e.to_dict()})
+                        yield f"data: [DONE]\n\n"
+                        return
+                    finally:
+                        await rows.aclose()
+                    
+                    if ctx.cancelled:
+                        return
+                    
+                    # 결과 개수 전송 (스트리밍이 끝나야 확정됨)
+                    yield sse_event({'row_count': row_count, 'truncated': truncated})
+                    
+                    # max_rows에서 잘렸으면 전체 결과를 보관하고 핸들 전송
+                    spooled = spool_result(agent, query, sql, [], truncated)
+                    if spooled:
+                        yield sse_event({'result_handle': spooled.handle, 'result_status': spooled.status})
+                    yield sse_event({'results_end': True})
+            else:
+                # 에러 전송 (시간 예산 초과는 구조화된 정보 포함)
+                error_msg = result.get("error", "Unknown error occurred")
+                error_event = {'error': error_msg}
+                if result.get("budget_exceeded"):
+                    error_event['budget_exceeded'] = result["budget_exceeded"][-1]
+                yield sse_event(error_event)
+            
+            yield f"data: [DONE]\n\n"
+        finally:
+            if watcher:
+                watcher.cancel()
         
     except Exception as e:
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        yield sse_event({'error': str(e)})
         yield f"data: [DONE]\n\n"
 
 @app.post("/api/text-to-sql/stream")
-async def text_to_sql_stream(request: TextToSqlRequest):
+async def text_to_sql_stream(request: TextToSqlRequest, http_request: Request):
     """Text-to-SQL 스트리밍 API"""
+    # 스트림을 연 뒤에는 상태 코드를 바꿀 수 없으므로 입장 제어는 응답 시작 전에
+    executor.admit()
     try:
         return StreamingResponse(
             stream_text_to_sql_response(
                 query=request.query,
-                max_rows=request.max_rows or 1000
+                max_rows=request.max_rows or 1000,
+                use_cache=request.use_cache is not False,
+                request=http_request,
+                mode=request.mode,
+                media_type=negotiate_format(http_request.headers.get("accept"), streaming=True)
             ),
             media_type="text/event-stream",
             headers={
@@ -346,48 +541,115 @@ async def text_to_sql_stream(request: TextToSqlRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def get_spooled(handle: str) -> SpooledResult:
+    try:
+        return result_store.get(handle)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Result {handle} not found or expired")
+
+async def ready_spooled(handle: str, wait: float) -> SpooledResult:
+    """보관이 끝난 항목 (기록 중이면 최대 wait초 대기)"""
+    entry = get_spooled(handle)
+    try:
+        return await result_store.wait_ready(entry, wait)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.exception_handler(ResultNotReady)
+async def result_not_ready_handler(request: Request, exc: ResultNotReady):
+    """아직 기록 중인 결과 → 202 (status: spooling)"""
+    return JSONResponse(status_code=202, content=exc.entry.to_dict(result_store.ttl),
+                        headers={"Retry-After": "1"})
+
+@app.get("/api/results/{handle}")
+async def get_result_info(handle: str):
+    """보관된 결과 정보 (상태, 컬럼, 행 수, 만료 시간), pending이면 보관 시작"""
+    return result_store.start(get_spooled(handle)).to_dict(result_store.ttl)
+
+@app.get("/api/results/{handle}/rows")
+async def get_result_rows(
+    handle: str,
+    http_request: Request,
+    offset: int = 0,
+    limit: int = RESULT_PAGE_SIZE,
+    sort: Optional[str] = None,
+    order: str = "asc",
+    filter: List[str] = Query(default=[]),
+    wait: float = 10.0
+):
+    """
+    보관된 결과의 페이지 조회 (LLM/원래 쿼리를 다시 실행하지 않음)
+    
+    Parameters:
+    - offset, limit: 페이지 범위 (limit 최대 10000)
+    - sort, order: 정렬 컬럼과 방향 (asc/desc)
+    - filter: "컬럼:연산자:값" (eq, ne, lt, le, gt, ge, contains), 여러 개면 AND
+    - wait: 보관 중이면 기다릴 최대 시간 (초, 끝나지 않으면 202)
+    
+    Accept 헤더로 /api/text-to-sql과 같은 결과 형식을 고를 수 있습니다.
+    """
+    entry = await ready_spooled(handle, wait)
+    try:
+        total, rows = await executor.submit(
+            result_store.read_page, entry, offset, limit, sort, order.lower() == "desc", filter
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    meta = {
+        "result_handle": handle,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "row_count": len(rows),
+        "truncated": entry.truncated,
+    }
+    media_type = negotiate_format(http_request.headers.get("accept"))
+    body = await executor.run(encode_result, meta, rows, media_type, entry.columns)
+    body, content_encoding = await executor.run(
+        compress, body, negotiate_encoding(http_request.headers.get("accept-encoding"))
+    )
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+@app.get("/api/results/{handle}/csv")
+async def export_result_csv(
+    handle: str,
+    sort: Optional[str] = None,
+    order: str = "asc",
+    filter: List[str] = Query(default=[]),
+    wait: float = 10.0
+):
+    """보관된 결과를 CSV로 내보내기 (정렬/필터 적용, UTF-8 BOM)"""
+    entry = await ready_spooled(handle, wait)
+    try:
+        # 잘못된 정렬/필터는 스트림을 열기 전에 400으로
+        result_store.check_query(entry, sort, filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        result_store.iter_csv(entry, sort, order.lower() == "desc", filter),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="result_{handle[:8]}.csv"'}
+    )
+
+@app.delete("/api/results/{handle}")
+async def delete_result(handle: str):
+    """보관된 결과 삭제"""
+    if not result_store.delete(handle):
+        raise HTTPException(status_code=404, detail=f"Result {handle} not found or expired")
+    return {"message": "결과가 삭제되었습니다"}
+
 @app.get("/api/schema")
 async def get_schema():
     """데이터베이스 스키마 정보 반환"""
     try:
-        agent = get_sql_agent()
-        # LangChain SQL Agent는 SQLDatabase 객체를 사용
-        # 스키마 정보를 직접 가져옴
-        schema_info = agent.db.get_table_info()
-        
-        # 스키마를 구조화된 형태로 파싱
-        tables = []
-        current_table = None
-        
-        for line in schema_info.split('\n'):
-            if line.startswith('Table:'):
-                if current_table:
-                    tables.append(current_table)
-                current_table = {
-                    "name": line.replace('Table:', '').strip(),
-                    "columns": [],
-                    "primary_key": None,
-                    "foreign_keys": [],
-                    "indexes": []
-                }
-            elif current_table and line.strip().startswith('-'):
-                # 컬럼 정보
-                col_info = line.strip()[2:]  # "- " 제거
-                if ':' in col_info:
-                    name, rest = col_info.split(':', 1)
-                    current_table["columns"].append({
-                        "name": name.strip(),
-                        "type": rest.strip()
-                    })
-            elif current_table and 'Primary Key:' in line:
-                current_table["primary_key"] = line.split(':', 1)[1].strip()
-            elif current_table and 'Foreign Key:' in line:
-                current_table["foreign_keys"].append(line.split(':', 1)[1].strip())
-            elif current_table and 'Index:' in line:
-                current_table["indexes"].append(line.split(':', 1)[1].strip())
-        
-        if current_table:
-            tables.append(current_table)
+        agent = await aget_sql_agent()
+        # TextToSqlNode와 같은 프로세스 전역 스키마 캐시를 사용 (캐시 미스 시 리플렉션은 스레드 풀에서)
+        snapshot = await executor.submit(get_schema_cache().get, agent.db._engine)
+        tables = snapshot.to_api_tables()
         
         return {
             "success": True,
@@ -395,9 +657,21 @@ async def get_schema():
             "table_count": len(tables)
         }
         
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/schema/invalidate")
+async def invalidate_schema():
+    """
+    스키마 캐시 무효화
+    
+    테이블을 다시 적재한 뒤 다음 요청에서 스키마를 새로 추출하도록 합니다.
+    """
+    invalidate_schema_cache()
+    return {"message": "스키마 캐시가 초기화되었습니다"}
+
 @app.get("/api/text-to-sql/metrics")
 async def get_sql_metrics():
     """
@@ -406,17 +680,41 @@ async def get_sql_metrics():
     누적된 쿼리 실행 통계를 반환합니다.
     - 총 쿼리 수
     - 성공률
-    - 평균 실행 시간
-    - 평균 토큰 사용량
+    - 실행 시간/토큰/도구 호출 분위수 (p50/p95/p99)
+    - 최근 5분/1시간 통계
     - 최근 쿼리 정보
     """
     try:
-        agent = get_sql_agent()
+        agent = await aget_sql_agent()
         metrics = agent.get_metrics_summary()
         return metrics
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/text-to-sql/metrics/prometheus", response_class=PlainTextResponse)
+async def get_sql_metrics_prometheus():
+    """
+    SQL Agent 메트릭 (Prometheus text format)
+    
+    쿼리 수, 토큰, 도구 호출 카운터와 실행 시간/토큰/도구 호출 분위수(p50/p95/p99)를 노출합니다.
+    """
+    agent = await aget_sql_agent()
+    return PlainTextResponse(
+        agent.get_metrics_prometheus() + executor.to_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/api/executor/metrics")
+async def get_executor_metrics():
+    """
+    동기 작업 스레드 풀 사용률 조회
+    
+    - 실행/대기 중인 작업 수와 사용률
+    - 대기열 대기 시간, 실행 시간 분위수
+    - 거부(429)/만료(503) 작업 수
+    """
+    return executor.stats()
+
 @app.post("/api/text-to-sql/clear-metrics")
 async def clear_sql_metrics():
     """
@@ -425,33 +723,43 @@ async def clear_sql_metrics():
     누적된 성능 메트릭을 모두 초기화합니다.
     """
     try:
-        agent = get_sql_agent()
+        agent = await aget_sql_agent()
         agent.clear_metrics()
         return {"message": "메트릭이 초기화되었습니다"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/text-to-sql/clear-cache")
+async def clear_sql_answer_cache():
+    """
+    SQL Agent 답변 캐시 초기화
+    
+    캐시된 질문 → SQL 매핑을 모두 제거합니다.
+    """
+    try:
+        agent = await aget_sql_agent()
+        agent.clear_answer_cache()
+        return {"message": "답변 캐시가 초기화되었습니다"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/health")
 async def health_check():
     """헬스 체크"""
     try:
-        agent = get_sql_agent()
-        # 데이터베이스 연결 테스트
-        db_connected = False
-        try:
-            # 간단한 쿼리로 연결 확인
-            agent.db.run("SELECT 1")
-            db_connected = True
-        except:
-            pass
-            
+        agent = await aget_sql_agent()
+        # 데이터베이스 연결 테스트 (비동기 풀, 이벤트 루프를 막지 않음)
+        db_connected = await agent.async_db.ping()
+        stats = executor.stats()
+        
         return {
             "status": "healthy",
             "service": "Text-to-SQL & RAG API (LangChain SQL Agent)",
             "database": "connected" if db_connected else "disconnected",
             "max_rows": agent.max_rows,
             "default_limit": agent.default_limit,
-            "agent_type": "LangChain ReAct SQL Agent"
+            "agent_type": "LangChain ReAct SQL Agent",
+            "executor": {key: stats[key] for key in ("running", "queued", "utilization")}
         }
     except:
         return {
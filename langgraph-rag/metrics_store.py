@@ -0,0 +1,260 @@
+"""
+Metrics Store - 고정 메모리 스트리밍 메트릭 집계
+AgentMetrics를 쿼리마다 리스트에 쌓는 대신 도착 즉시 집계하여 보관
+
+- 최근 쿼리: 링 버퍼 (RECENT_QUERIES_SIZE개)
+- 분포: 로그 버킷 히스토그램 (HDR 방식, 상대 오차 약 HISTOGRAM_PRECISION)
+  - 실행 시간, 쿼리당 토큰 수, 쿼리당 도구 호출 수
+- 시간 창: 1분 단위 창을 METRICS_WINDOW_COUNT개 유지하여 최근 5분/1시간 통계 제공
+- 누적 카운터: 쿼리 수, 성공/실패, 캐시 적중, 토큰, 도구 호출
+
+p50/p95/p99 조회는 히스토리를 훑지 않고 히스토그램 버킷(수백 개 이하)만 순회합니다.
+"""
+
+from typing import List, Dict, Any, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from agent_metrics import AgentMetrics
+import math
+import os
+import threading
+import time
+
+# ========================
+# Configuration
+# ========================
+
+RECENT_QUERIES_SIZE = int(os.getenv("RECENT_QUERIES_SIZE", 20))
+METRICS_WINDOW_SECONDS = int(os.getenv("METRICS_WINDOW_SECONDS", 60))
+METRICS_WINDOW_COUNT = int(os.getenv("METRICS_WINDOW_COUNT", 60))
+
+# 히스토그램 상대 오차 (버킷 경계 비율 = 1 + 2 * precision)
+HISTOGRAM_PRECISION = 0.02
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Prometheus 메트릭 이름 접두사
+PROMETHEUS_PREFIX = "text_to_sql"
+
+
+class LogHistogram:
+    """
+    로그 버킷 히스토그램
+
+    값 v는 floor(log(v) / log(gamma)) 버킷에 들어가며, 분위수는 버킷 대표값(기하 중앙)으로 근사합니다.
+    버킷 수는 값의 범위(최대/최소 비율)의 로그에 비례하므로 관측 수와 무관하게 메모리가 고정됩니다.
+    """
+
+    def __init__(self, precision: float = HISTOGRAM_PRECISION):
+        self.gamma = (1 + precision) / (1 - precision)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0  # 0 이하 값 (로그 불가)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.floor(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: "LogHistogram"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # 버킷 [gamma^i, gamma^(i+1)) 의 대표값, 실제 min/max 범위로 제한
+                estimate = 2 * self.gamma ** (index + 1) / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def snapshot(self, digits: int = 3) -> Dict[str, float]:
+        result = {"count": self.count, "mean": round(self.mean, digits)}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = round(self.quantile(q), digits)
+        result["max"] = round(self.max or 0.0, digits)
+        return result
+
+
+@dataclass
+class MetricsWindow:
+    """시간 창 하나의 집계"""
+    start: float
+    queries: int = 0
+    failures: int = 0
+    cache_hits: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    tool_calls: int = 0
+    duration: LogHistogram = field(default_factory=LogHistogram)
+    tokens: LogHistogram = field(default_factory=LogHistogram)
+    tools: LogHistogram = field(default_factory=LogHistogram)
+
+    def record(self, metrics: AgentMetrics):
+        self.queries += 1
+        self.failures += 0 if metrics.success else 1
+        self.cache_hits += 1 if metrics.cache_hit else 0
+        self.prompt_tokens += metrics.prompt_tokens
+        self.completion_tokens += metrics.completion_tokens
+        self.total_tokens += metrics.total_tokens
+        self.tool_calls += metrics.tool_calls
+        self.duration.record(metrics.duration)
+        self.tokens.record(metrics.total_tokens)
+        self.tools.record(metrics.tool_calls)
+
+    def merge(self, other: "MetricsWindow"):
+        self.queries += other.queries
+        self.failures += other.failures
+        self.cache_hits += other.cache_hits
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.total_tokens += other.total_tokens
+        self.tool_calls += other.tool_calls
+        self.duration.merge(other.duration)
+        self.tokens.merge(other.tokens)
+        self.tools.merge(other.tools)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total_queries": self.queries,
+            "successful": self.queries - self.failures,
+            "failed": self.failures,
+            "success_rate": f"{((self.queries - self.failures) / self.queries * 100):.1f}%" if self.queries else "0.0%",
+            "cache_hits": self.cache_hits,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "tool_calls": self.tool_calls,
+            "duration_seconds": self.duration.snapshot(),
+            "tokens_per_query": self.tokens.snapshot(digits=1),
+            "tool_calls_per_query": self.tools.snapshot(digits=2),
+        }
+
+
+class MetricsStore:
+    """
+    에이전트 메트릭 집계기 (스레드 안전, 고정 메모리)
+
+    record()는 O(1), summary()/to_prometheus()는 창 수와 버킷 수에만 비례합니다.
+    """
+
+    def __init__(
+        self,
+        recent_size: int = RECENT_QUERIES_SIZE,
+        window_seconds: int = METRICS_WINDOW_SECONDS,
+        window_count: int = METRICS_WINDOW_COUNT
+    ):
+        self.window_seconds = window_seconds
+        self.recent: deque = deque(maxlen=recent_size)
+        self.windows: deque = deque(maxlen=window_count)
+        self.totals = MetricsWindow(start=time.time())
+        self._lock = threading.Lock()
+
+    def _current_window(self, now: float) -> MetricsWindow:
+        start = now - now % self.window_seconds
+        if not self.windows or self.windows[-1].start != start:
+            self.windows.append(MetricsWindow(start=start))
+        return self.windows[-1]
+
+    def record(self, metrics: AgentMetrics):
+        """완료된 실행 메트릭 하나를 집계에 반영"""
+        now = time.time()
+        with self._lock:
+            self.totals.record(metrics)
+            self._current_window(now).record(metrics)
+            self.recent.append(metrics.to_dict())
+
+    def window_summary(self, seconds: int) -> Dict[str, Any]:
+        """최근 seconds초 동안의 집계 (창 단위로 근사)"""
+        cutoff = time.time() - seconds
+        merged = MetricsWindow(start=cutoff)
+        with self._lock:
+            for window in self.windows:
+                if window.start + self.window_seconds > cutoff:
+                    merged.merge(window)
+        return merged.summary()
+
+    def summary(self, recent: int = 5) -> Dict[str, Any]:
+        """/api/text-to-sql/metrics 응답"""
+        with self._lock:
+            result = self.totals.summary()
+            result["since"] = self.totals.start
+            result["queries"] = list(self.recent)[-recent:]
+        result["avg_duration"] = f"{result['duration_seconds']['mean']:.2f}s"
+        result["avg_tokens"] = int(result["tokens_per_query"]["mean"])
+        result["last_5m"] = self.window_summary(300)
+        result["last_1h"] = self.window_summary(3600)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.recent.clear()
+            self.windows.clear()
+            self.totals = MetricsWindow(start=time.time())
+
+    def to_prometheus(self, extra_gauges: Optional[Dict[str, float]] = None) -> str:
+        """Prometheus text exposition format (누적 카운터 + 분위수 summary)"""
+        p = PROMETHEUS_PREFIX
+        with self._lock:
+            t = self.totals
+            lines: List[str] = [
+                f"# HELP {p}_queries_total Text-to-SQL queries by status",
+                f"# TYPE {p}_queries_total counter",
+                f'{p}_queries_total{{status="success"}} {t.queries - t.failures}',
+                f'{p}_queries_total{{status="failure"}} {t.failures}',
+                f"# HELP {p}_cache_hits_total Queries answered from the answer cache",
+                f"# TYPE {p}_cache_hits_total counter",
+                f"{p}_cache_hits_total {t.cache_hits}",
+                f"# HELP {p}_tokens_total LLM tokens used",
+                f"# TYPE {p}_tokens_total counter",
+                f'{p}_tokens_total{{type="prompt"}} {t.prompt_tokens}',
+                f'{p}_tokens_total{{type="completion"}} {t.completion_tokens}',
+                f"# HELP {p}_tool_calls_total Agent tool calls",
+                f"# TYPE {p}_tool_calls_total counter",
+                f"{p}_tool_calls_total {t.tool_calls}",
+            ]
+            for name, help_text, hist in (
+                ("query_duration_seconds", "Query duration", t.duration),
+                ("tokens_per_query", "LLM tokens per query", t.tokens),
+                ("tool_calls_per_query", "Agent tool calls per query", t.tools),
+            ):
+                lines.append(f"# HELP {p}_{name} {help_text}")
+                lines.append(f"# TYPE {p}_{name} summary")
+                for q in QUANTILES:
+                    lines.append(f'{p}_{name}{{quantile="{q}"}} {hist.quantile(q):.6g}')
+                lines.append(f"{p}_{name}_sum {hist.total:.6g}")
+                lines.append(f"{p}_{name}_count {hist.count}")
+
+        for name, value in (extra_gauges or {}).items():
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
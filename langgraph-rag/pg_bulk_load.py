@@ -0,0 +1,461 @@
+"""
+PG Bulk Load - DataFrame을 COPY FROM STDIN으로 PostgreSQL에 적재
+SAP/Excel import 스크립트 공통 적재 모듈
+
+기존 스크립트는 iterrows()로 행마다 INSERT를 실행(행마다 SQL 구성, 서버 왕복, 100~1000행마다 commit)하여
+100만 행 적재에 몇 시간이 걸렸습니다. 이 모듈은
+- SAP 빈 값('', '00000000' 등) → NULL, 숫자/날짜/시간 변환을 행 루프 대신 컬럼 단위로 처리하고
+- COPY ... FROM STDIN (FORMAT csv)에 COPY_CHUNK_ROWS행씩 CSV로 만들어 흘려 넣습니다
+  (전체 CSV를 메모리에 만들지 않음)
+
+COPY는 한 문장이므로 중간에 실패하면 전체가 롤백됩니다 (호출한 쪽이 commit).
+증분 적재는 upsert_dataframe으로 임시 테이블에 COPY한 뒤 자연 키로 INSERT ... ON CONFLICT 합니다.
+전체 적재는 staging 테이블에 적재하고 인덱스/ANALYZE까지 마친 뒤 swap_table로 한 번에 교체합니다
+(DROP TABLE ... CASCADE 후 다시 채우는 동안 조회가 빈 테이블을 보거나 의존 뷰가 사라지지 않도록).
+형식별 적재 시간은 `python benchmark_pg_bulk_load.py`로 비교합니다.
+"""
+
+from typing import List, Dict, Any, Optional, Iterator, Sequence, Callable
+from psycopg2 import errors, sql
+import io
+import os
+import time
+import pandas as pd
+
+# ========================
+# Configuration
+# ========================
+
+# CSV로 만들어 COPY에 넘기는 단위 (행)
+COPY_CHUNK_ROWS = int(os.getenv("COPY_CHUNK_ROWS", 50000))
+
+# COPY가 한 번에 읽는 크기 (바이트)
+COPY_READ_SIZE = 1 << 20
+
+# CSV의 NULL 표기 (빈 문자열과 구분)
+NULL_MARKER = "\\N"
+
+# SAP RFC_READ_TABLE이 빈 값으로 돌려주는 값
+SAP_EMPTY_VALUES = ("", "00000000")
+
+# 빈 날짜/시간 (DATS/TIMS 초기값)
+SAP_EMPTY_DATES = ("", "0", "00000000")
+SAP_EMPTY_TIMES = ("", "0", "000000")
+
+
+# ========================
+# 컬럼 정리 (벡터화)
+# ========================
+
+def sap_strings(series: pd.Series, empty_values: Sequence[str] = SAP_EMPTY_VALUES) -> pd.Series:
+    """문자열 앞뒤 공백 제거 후 빈 값을 NULL로 (문자열이 아닌 값은 str로 변환)"""
+    values = series.astype("string").str.strip()
+    values = values.mask(values.isin(list(empty_values)))
+    return values.astype(object).where(values.notna(), None)
+
+
+def sap_number(series: pd.Series, default: Optional[float] = 0.0) -> pd.Series:
+    """
+    SAP 숫자 문자열을 float으로 ('1,234.50' 천 단위 쉼표, '12.50-' 뒤에 붙는 음수 부호 처리)
+
+    비어 있거나 숫자가 아닌 값은 default (None이면 NULL)
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        numbers = series.astype(float)
+    else:
+        text = series.astype("string").str.strip().str.replace(",", "", regex=False)
+        negative = text.str.endswith("-", na=False)
+        text = text.where(~negative, "-" + text.str[:-1])
+        numbers = pd.to_numeric(text, errors="coerce").astype(float)
+    if default is not None:
+        numbers = numbers.fillna(default)
+    return numbers
+
+
+def sap_date(series: pd.Series) -> pd.Series:
+    """DATS(YYYYMMDD) → 'YYYY-MM-DD', 초기값이나 형식이 틀린 값은 NULL"""
+    text = series.astype("string").str.strip()
+    valid = text.str.fullmatch(r"\d{8}", na=False) & ~text.isin(list(SAP_EMPTY_DATES))
+    dates = pd.to_datetime(text.where(valid), format="%Y%m%d", errors="coerce")
+    return dates.dt.strftime("%Y-%m-%d").astype(object).where(dates.notna(), None)
+
+
+def sap_time(series: pd.Series) -> pd.Series:
+    """TIMS(HHMMSS) → 'HH:MM:SS', 초기값이나 형식이 틀린 값은 NULL"""
+    text = series.astype("string").str.strip()
+    valid = text.str.fullmatch(r"\d{6}", na=False) & ~text.isin(list(SAP_EMPTY_TIMES))
+    times = text.str[:2] + ":" + text.str[2:4] + ":" + text.str[4:6]
+    return times.astype(object).where(valid, None)
+
+
+def row_json(df: pd.DataFrame) -> pd.Series:
+    """행마다 전체 필드를 JSON 문자열로 ("원본데이터" JSONB 컬럼용)"""
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    lines = df.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n").split("\n")
+    return pd.Series(lines, index=df.index, dtype=object)
+
+
+def column_or(df: pd.DataFrame, column: str, default: Any = None) -> pd.Series:
+    """컬럼이 있으면 그 값, 없으면 default로 채운 컬럼 (row.get(column, default) 대응)"""
+    if column in df.columns:
+        return df[column]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+# ========================
+# COPY
+# ========================
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """정수 값만 있는 float 컬럼(NaN 때문에 float이 된 정수 등)은 Int64로 ('123.0'은 BIGINT에 들어가지 않음)"""
+    converted = {}
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_float_dtype(values):
+            present = values.dropna()
+            if len(present) and (present % 1 == 0).all() and present.abs().max() < 2 ** 63:
+                converted[column] = values.astype("Int64")
+    return df.assign(**converted) if converted else df
+
+
+class _CSVStream:
+    """DataFrame을 chunk_rows행씩 CSV로 만들어 돌려주는 읽기 전용 파일 (copy_expert용)"""
+
+    def __init__(self, df: pd.DataFrame, chunk_rows: int, progress: bool):
+        self._chunks = self._generate(df, chunk_rows)
+        self._buffer = ""
+        self._pos = 0
+        self.progress = progress
+        self.total = len(df)
+        self.rows = 0
+
+    def _generate(self, df: pd.DataFrame, chunk_rows: int) -> Iterator[str]:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, header=False, index=False, na_rep=NULL_MARKER, lineterminator="\n")
+            self.rows += len(chunk)
+            if self.progress and self.rows < self.total:
+                print(f"  📝 {self.rows:,}/{self.total:,}개 저장 중...")
+            yield buffer.getvalue()
+
+    def read(self, size: int = -1) -> str:
+        if self._pos >= len(self._buffer):
+            self._buffer = next(self._chunks, "")
+            self._pos = 0
+        if size < 0:
+            size = len(self._buffer) - self._pos
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        return self.read(size)
+
+
+def copy_dataframe(
+    conn,
+    table: str,
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+    chunk_rows: int = COPY_CHUNK_ROWS,
+    progress: bool = True
+) -> int:
+    """
+    DataFrame을 COPY FROM STDIN으로 적재 (commit은 호출한 쪽에서)
+
+    Args:
+        conn: psycopg2 커넥션
+        table: 대상 테이블 ("schema.table" 가능)
+        df: 적재할 데이터 (None/NaN/NaT는 NULL)
+        columns: df 컬럼 순서대로의 대상 컬럼 이름 (없으면 df 컬럼 이름)
+        chunk_rows: CSV로 만들어 보내는 단위
+        progress: 단위마다 진행 상황 출력
+
+    Returns:
+        적재한 행 수
+    """
+    if df.empty:
+        return 0
+    columns = list(columns or df.columns)
+    if len(columns) != len(df.columns):
+        raise ValueError(f"columns({len(columns)})와 DataFrame 컬럼({len(df.columns)}) 수가 다릅니다")
+
+    statement = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL {})").format(
+        sql.Identifier(*table.split(".")),
+        sql.SQL(", ").join(map(sql.Identifier, columns)),
+        sql.Literal(NULL_MARKER)
+    )
+    stream = _CSVStream(_prepare(df), chunk_rows, progress)
+    with conn.cursor() as cursor:
+        cursor.copy_expert(statement, stream, size=COPY_READ_SIZE)
+    return stream.rows
+
+
+def ensure_unique_key(conn, table: str, key_columns: List[str]):
+    """자연 키 유니크 인덱스 (ON CONFLICT 대상, 이미 있으면 그대로)"""
+    name = f"uq_{table.split('.')[-1]}_natural_key"
+    statement = sql.SQL("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})").format(
+        sql.Identifier(name),
+        sql.Identifier(*table.split(".")),
+        sql.SQL(", ").join(map(sql.Identifier, key_columns))
+    )
+    with conn.cursor() as cursor:
+        cursor.execute(statement)
+
+
+def upsert_dataframe(
+    conn,
+    table: str,
+    df: pd.DataFrame,
+    key_columns: List[str],
+    columns: Optional[List[str]] = None,
+    touch_column: Optional[str] = None,
+    delete_missing: bool = False,
+    chunk_rows: int = COPY_CHUNK_ROWS,
+    progress: bool = True
+) -> Dict[str, int]:
+    """
+    DataFrame을 임시 테이블에 COPY한 뒤 자연 키로 INSERT ... ON CONFLICT DO UPDATE (commit은 호출한 쪽에서)
+
+    대상 테이블에 key_columns 유니크 인덱스가 있어야 합니다 (ensure_unique_key).
+    키 값이 NULL인 행은 기존 행과 같은 키로 인식되지 않으므로 키 컬럼은 NULL 대신 ''로 채워서 넘깁니다.
+    같은 키가 여러 번 있으면 그중 한 행만 반영합니다.
+
+    Args:
+        conn: psycopg2 커넥션
+        table: 대상 테이블
+        df: 적재할 데이터
+        key_columns: 자연 키 컬럼 (대상 컬럼 이름)
+        columns: df 컬럼 순서대로의 대상 컬럼 이름 (없으면 df 컬럼 이름)
+        touch_column: 갱신된 행에서 CURRENT_TIMESTAMP로 바꿀 컬럼 (예: "조회일시")
+        delete_missing: df에 없는 키의 행 삭제 (전체 스냅샷을 upsert할 때)
+
+    Returns:
+        {"inserted": 새 행 수, "updated": 갱신된 행 수, "deleted": 삭제된 행 수}
+    """
+    columns = list(columns or df.columns)
+    staging = f"_upsert_{table.split('.')[-1]}"
+    column_list = sql.SQL(", ").join(map(sql.Identifier, columns))
+    key_list = sql.SQL(", ").join(map(sql.Identifier, key_columns))
+    target = sql.Identifier(*table.split("."))
+
+    assignments = [
+        sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column))
+        for column in columns if column not in key_columns
+    ]
+    if touch_column:
+        assignments.append(sql.SQL("{} = CURRENT_TIMESTAMP").format(sql.Identifier(touch_column)))
+    on_conflict = (
+        sql.SQL("DO UPDATE SET {}").format(sql.SQL(", ").join(assignments))
+        if assignments else sql.SQL("DO NOTHING")
+    )
+
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(staging)))
+        cursor.execute(sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA").format(
+            sql.Identifier(staging), column_list, target
+        ))
+        copy_dataframe(conn, staging, df, columns, chunk_rows, progress)
+
+        deleted = 0
+        if delete_missing:
+            matches = sql.SQL(" AND ").join(
+                sql.SQL("s.{0} = t.{0}").format(sql.Identifier(column)) for column in key_columns
+            )
+            cursor.execute(sql.SQL("DELETE FROM {} t WHERE NOT EXISTS (SELECT 1 FROM {} s WHERE {})").format(
+                target, sql.Identifier(staging), matches
+            ))
+            deleted = cursor.rowcount
+
+        cursor.execute(sql.SQL("""
+            WITH upserted AS (
+                INSERT INTO {target} ({columns})
+                SELECT DISTINCT ON ({keys}) {columns} FROM {staging} ORDER BY {keys}
+                ON CONFLICT ({keys}) {on_conflict}
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+        """).format(
+            target=target, columns=column_list, keys=key_list, staging=sql.Identifier(staging), on_conflict=on_conflict
+        ))
+        inserted, updated = cursor.fetchone()
+    return {"inserted": inserted, "updated": updated, "deleted": deleted}
+
+
+def to_sql_copy(pd_table, conn, keys: List[str], data_iter) -> int:
+    """DataFrame.to_sql(method=to_sql_copy)용 COPY 적재 (SQLAlchemy 커넥션의 psycopg2 커넥션 사용)"""
+    df = pd.DataFrame(list(data_iter), columns=keys)
+    table = f"{pd_table.schema}.{pd_table.name}" if pd_table.schema else pd_table.name
+    return copy_dataframe(conn.connection.dbapi_connection, table, df, progress=False)
+
+
+def load_dataframe(
+    conn,
+    table: str,
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+    chunk_rows: int = COPY_CHUNK_ROWS,
+    progress: bool = True
+) -> Dict[str, Any]:
+    """copy_dataframe 후 commit하고 적재 통계 반환 (행 수, 초, 행/초)"""
+    started = time.time()
+    rows = copy_dataframe(conn, table, df, columns, chunk_rows, progress)
+    conn.commit()
+    seconds = time.time() - started
+    return {"rows": rows, "seconds": round(seconds, 3), "rows_per_second": round(rows / seconds) if seconds else rows}
+
+
+# ========================
+# 테이블 교체 (staging → rename)
+# ========================
+
+# 교체 시 테이블 잠금 대기 한도 (조회가 길게 잡고 있으면 포기하고 재시도, 대기 중에 새 조회가 막히지 않도록)
+SWAP_LOCK_TIMEOUT = os.getenv("SWAP_LOCK_TIMEOUT", "3s")
+SWAP_RETRIES = int(os.getenv("SWAP_RETRIES", 5))
+
+DEPENDENT_VIEWS_SQL = """
+WITH RECURSIVE deps(oid, depth) AS (
+    SELECT r.ev_class, 1
+    FROM pg_depend d
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = %s::regclass AND r.ev_class <> d.refobjid
+    UNION
+    SELECT r.ev_class, deps.depth + 1
+    FROM deps
+    JOIN pg_depend d ON d.refobjid = deps.oid
+    JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE d.classid = 'pg_rewrite'::regclass AND r.ev_class <> d.refobjid
+)
+SELECT n.nspname, c.relname, c.relkind, pg_get_viewdef(c.oid), max(deps.depth) AS depth
+FROM deps
+JOIN pg_class c ON c.oid = deps.oid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+GROUP BY c.oid, n.nspname, c.relname, c.relkind
+ORDER BY depth, c.relname
+"""
+
+OWNED_RELATIONS_SQL = """
+SELECT c.relname, c.relkind
+FROM pg_class c
+WHERE c.oid IN (
+    SELECT indexrelid FROM pg_index WHERE indrelid = %(table)s::regclass
+    UNION
+    SELECT objid FROM pg_depend
+    WHERE refobjid = %(table)s::regclass AND classid = 'pg_class'::regclass AND deptype IN ('a', 'i')
+)
+AND c.relkind IN ('i', 'S')
+"""
+
+
+def staging_table(table: str) -> str:
+    return f"{table}_staging"
+
+
+def prepare_staging(conn, table: str) -> str:
+    """
+    staging 테이블 이름 반환 (이전 실패로 남은 staging 테이블은 삭제)
+
+    staging 테이블에 만드는 인덱스 이름에는 staging 테이블 이름을 넣습니다
+    (예: idx_{staging}_matnr → 교체 후 idx_{table}_matnr로 바뀜).
+    """
+    staging = staging_table(table)
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(staging)))
+    return staging
+
+
+def dependent_views(conn, table: str) -> List[Dict[str, Any]]:
+    """table에 의존하는 뷰 (뷰에 의존하는 뷰 포함, 다시 만들 순서대로)"""
+    with conn.cursor() as cursor:
+        cursor.execute(DEPENDENT_VIEWS_SQL, (table,))
+        return [
+            {"schema": schema, "name": name, "materialized": kind == "m", "definition": definition}
+            for schema, name, kind, definition, _ in cursor.fetchall()
+        ]
+
+
+def swap_table(
+    conn,
+    table: str,
+    staging: Optional[str] = None,
+    analyze: bool = True,
+    in_transaction: Optional[Callable[[Any], None]] = None
+):
+    """
+    staging 테이블을 table로 교체 (commit까지 수행)
+
+    한 트랜잭션에서 의존 뷰 삭제 → 기존 테이블 이름 변경 → staging 이름 변경 → 기존 테이블 삭제
+    → 인덱스/시퀀스 이름 정리 → 의존 뷰 재생성을 하므로 조회하는 쪽은 이전 또는 새 데이터만 봅니다.
+    잠금은 SWAP_LOCK_TIMEOUT까지만 기다리고, 넘으면 롤백 후 SWAP_RETRIES번까지 재시도합니다.
+    뷰의 권한(GRANT)과 주석은 다시 만들지 않습니다.
+
+    Args:
+        conn: psycopg2 커넥션 (미완료 트랜잭션이 없어야 함)
+        table: 교체할 테이블 (없으면 staging 이름만 변경)
+        staging: 새 데이터가 적재된 테이블 (기본 staging_table(table))
+        analyze: 교체 전에 staging 테이블 ANALYZE
+        in_transaction: 교체와 같은 트랜잭션에서 실행할 함수 (conn을 인자로, 적재 상태 기록 등)
+    """
+    staging = staging or staging_table(table)
+    target = sql.Identifier(table)
+    old_name = f"{table}_old"
+
+    if analyze:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(staging)))
+        conn.commit()
+
+    for attempt in range(1, SWAP_RETRIES + 1):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = %s", (SWAP_LOCK_TIMEOUT,))
+                cursor.execute("SELECT to_regclass(%s)", (table,))
+                exists = cursor.fetchone()[0] is not None
+
+                views = []
+                if exists:
+                    cursor.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(target))
+                    views = dependent_views(conn, table)
+                    for view in reversed(views):
+                        cursor.execute(sql.SQL("DROP {} {}").format(
+                            sql.SQL("MATERIALIZED VIEW" if view["materialized"] else "VIEW"),
+                            sql.Identifier(view["schema"], view["name"])
+                        ))
+                    cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(old_name)))
+                    cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(target, sql.Identifier(old_name)))
+
+                cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(staging), target))
+                if exists:
+                    cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(old_name)))
+
+                # staging 이름이 들어간 인덱스/시퀀스 이름을 원래 이름으로
+                cursor.execute(OWNED_RELATIONS_SQL, {"table": table})
+                for name, kind in cursor.fetchall():
+                    if staging in name:
+                        cursor.execute(sql.SQL("ALTER {} {} RENAME TO {}").format(
+                            sql.SQL("INDEX" if kind == "i" else "SEQUENCE"),
+                            sql.Identifier(name),
+                            sql.Identifier(name.replace(staging, table))
+                        ))
+
+                for view in views:
+                    cursor.execute(sql.SQL("CREATE {} {} AS {}").format(
+                        sql.SQL("MATERIALIZED VIEW" if view["materialized"] else "VIEW"),
+                        sql.Identifier(view["schema"], view["name"]),
+                        sql.SQL(view["definition"].rstrip().rstrip(";"))
+                    ))
+
+                if in_transaction:
+                    in_transaction(conn)
+            conn.commit()
+            if views:
+                print(f"  🔁 의존 뷰 {len(views)}개 재생성: {', '.join(view['name'] for view in views)}")
+            return
+        except errors.LockNotAvailable:
+            conn.rollback()
+            if attempt == SWAP_RETRIES:
+                raise
+            print(f"  ⏳ {table} 잠금 대기 시간 초과, 재시도 {attempt}/{SWAP_RETRIES - 1}")
+            time.sleep(attempt)
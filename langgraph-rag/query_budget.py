@@ -0,0 +1,251 @@
+"""
+Query Budget - 쿼리 단위 DB 시간 예산과 취소
+SQL 실행마다 서버 측 시간 제한을 걸고, 요청이 취소되면 실행 중인 DB 쿼리까지 중단
+
+- 시간 예산: PostgreSQL은 트랜잭션마다 SET LOCAL statement_timeout (서버가 직접 중단)
+            SQLite는 progress handler로 같은 제한을 적용
+- 취소: CancelScope에 등록된 연결에 취소 요청 (psycopg2 connection.cancel() = PQcancel,
+        sqlite3 connection.interrupt()). asyncio 태스크가 취소되어도 스레드에서 실행 중인
+        쿼리는 계속 돌기 때문에 DB 쪽에서 멈춰야 CPU/커넥션이 반환됩니다.
+- 예산 초과/취소는 BudgetExceeded로 변환되어 에이전트에는 "Error: budget_exceeded: ..."로,
+  API 응답에는 구조화된 딕셔너리로 전달됩니다.
+
+행 예산은 호출 측의 fetchmany(max_rows + 1)와 서버 사이드 커서(stream_results)로 적용합니다.
+"""
+
+from typing import List, Dict, Any, Optional, Callable
+from contextvars import ContextVar
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from blocking_executor import run_blocking
+import asyncio
+import contextvars
+import os
+import threading
+import time
+
+# ========================
+# Configuration
+# ========================
+
+# 쿼리 하나의 최대 실행 시간 (밀리초, 0이면 제한 없음)
+QUERY_TIMEOUT_MS = int(os.getenv("QUERY_TIMEOUT_MS", 60000))
+
+# SQLite progress handler 호출 간격 (VM 명령 수)
+SQLITE_PROGRESS_STEPS = 10000
+
+# PostgreSQL query_canceled SQLSTATE (statement_timeout, 취소 요청 모두)
+PG_QUERY_CANCELED = "57014"
+
+
+class BudgetExceeded(Exception):
+    """쿼리 시간 예산 초과 또는 취소"""
+
+    def __init__(self, kind: str, sql: str = "", limit_ms: Optional[float] = None, detail: str = ""):
+        self.kind = kind  # "statement_timeout" | "cancelled"
+        self.sql = sql
+        self.limit_ms = limit_ms
+        self.detail = detail
+        super().__init__(self.message())
+
+    def message(self) -> str:
+        if self.kind == "statement_timeout":
+            return (
+                f"budget_exceeded: statement_timeout {self.limit_ms:.0f}ms exceeded. "
+                "Narrow the query (selective WHERE filters, aggregation, fewer joins) and try again."
+            )
+        return f"budget_exceeded: query cancelled ({self.detail or 'cancelled'})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "budget_exceeded",
+            "kind": self.kind,
+            "limit_ms": self.limit_ms,
+            "detail": self.detail,
+            "sql": self.sql[:2000],
+        }
+
+
+def cancel_connection(dbapi_connection) -> bool:
+    """실행 중인 쿼리 중단 요청 (다른 스레드에서 호출 가능)"""
+    try:
+        if isinstance(dbapi_connection, asyncio.Future):  # async_db 쿼리 태스크 (asyncpg가 서버에 취소 전송)
+            dbapi_connection.get_loop().call_soon_threadsafe(dbapi_connection.cancel)
+            return True
+        if hasattr(dbapi_connection, "cancel"):  # psycopg2
+            dbapi_connection.cancel()
+            return True
+        if hasattr(dbapi_connection, "interrupt"):  # sqlite3
+            dbapi_connection.interrupt()
+            return True
+    except Exception as e:
+        print(f"⚠️ 쿼리 취소 요청 실패: {str(e)}")
+    return False
+
+
+class CancelScope:
+    """
+    요청 단위 취소 범위 (스레드 안전)
+
+    실행 중인 DB 연결(또는 async_db 쿼리 태스크)을 추적하다가 cancel()/interrupt() 시 모두 취소 요청을 보냅니다.
+    cancel()은 이후 시작하는 쿼리도 막고, interrupt()는 지금 실행 중인 쿼리만 중단합니다.
+    """
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self._connections: List[Any] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def register(self, dbapi_connection):
+        with self._lock:
+            if self.cancelled:
+                raise BudgetExceeded("cancelled", detail=self.reason)
+            self._connections.append(dbapi_connection)
+
+    def unregister(self, dbapi_connection):
+        with self._lock:
+            if dbapi_connection in self._connections:
+                self._connections.remove(dbapi_connection)
+
+    def interrupt(self) -> int:
+        """실행 중인 쿼리 취소 요청 (요청한 연결 수 반환)"""
+        with self._lock:
+            connections = list(self._connections)
+        return sum(1 for conn in connections if cancel_connection(conn))
+
+    def cancel(self, reason: str = "cancelled") -> int:
+        if self.reason is None:
+            self.reason = reason
+        return self.interrupt()
+
+
+_current_scope: ContextVar[Optional[CancelScope]] = ContextVar("query_cancel_scope", default=None)
+
+
+def activate_scope(scope: CancelScope):
+    """현재 컨텍스트에 CancelScope 연결 (반환된 토큰으로 deactivate_scope)"""
+    return _current_scope.set(scope)
+
+
+def deactivate_scope(token):
+    _current_scope.reset(token)
+
+
+def current_scope() -> Optional[CancelScope]:
+    return _current_scope.get()
+
+
+def translate_error(error: Exception, timeout_ms: Optional[float], scope: Optional[CancelScope] = None,
+                    timed_out: bool = False) -> Exception:
+    """시간 초과/취소 DB 에러를 BudgetExceeded로 변환 (그 외는 그대로)"""
+    if not isinstance(error, DBAPIError):
+        return error
+    sql = str(error.statement or "")
+    message = str(error.orig)
+    canceled = (
+        getattr(error.orig, "pgcode", None) == PG_QUERY_CANCELED
+        or getattr(error.orig, "sqlstate", None) == PG_QUERY_CANCELED
+        or "interrupted" in message
+    )
+    if timed_out or "statement timeout" in message:
+        return BudgetExceeded("statement_timeout", sql=sql, limit_ms=timeout_ms)
+    if canceled or (scope is not None and scope.cancelled):
+        reason = scope.reason if scope is not None and scope.cancelled else "interrupted"
+        return BudgetExceeded("cancelled", sql=sql, detail=reason)
+    return error
+
+
+class BudgetedConnection:
+    """
+    시간 예산이 적용되고 취소 가능한 연결
+
+    사용법:
+        with BudgetedConnection(engine) as conn:
+            conn.execute(text(sql))
+
+    with 블록 안에서 발생한 시간 초과/취소 DB 에러는 BudgetExceeded로 바뀝니다.
+    스트리밍처럼 await 사이에 연결을 유지해야 하면 open()/translate()/close()를 직접 사용합니다.
+    """
+
+    def __init__(self, engine: Engine, timeout_ms: Optional[int] = None, scope: Optional[CancelScope] = None):
+        self.engine = engine
+        self.timeout_ms = QUERY_TIMEOUT_MS if timeout_ms is None else timeout_ms
+        self.scope = scope if scope is not None else current_scope()
+        self.conn: Optional[Connection] = None
+        self._dbapi = None
+        self._timed_out = False
+
+    def open(self) -> Connection:
+        self.conn = self.engine.connect()
+        try:
+            self._dbapi = self.conn.connection.dbapi_connection
+            self._apply_timeout()
+            if self.scope is not None:
+                self.scope.register(self._dbapi)
+        except Exception:
+            self.close()
+            raise
+        return self.conn
+
+    def _apply_timeout(self):
+        dialect = self.engine.dialect.name
+        if dialect == "sqlite":
+            deadline = time.monotonic() + self.timeout_ms / 1000 if self.timeout_ms else None
+
+            def progress() -> int:
+                # 0이 아닌 값을 반환하면 SQLite가 실행 중인 문장을 중단 (OperationalError: interrupted)
+                if deadline is not None and time.monotonic() > deadline:
+                    self._timed_out = True
+                    return 1
+                return 1 if self.scope is not None and self.scope.cancelled else 0
+
+            self._dbapi.set_progress_handler(progress, SQLITE_PROGRESS_STEPS)
+        elif dialect == "postgresql" and self.timeout_ms:
+            # 트랜잭션이 끝나면(연결 반환 시 rollback) 원래 설정으로 돌아감
+            self.conn.execute(text(f"SET LOCAL statement_timeout = {int(self.timeout_ms)}"))
+
+    def translate(self, error: Exception) -> Exception:
+        return translate_error(error, self.timeout_ms, self.scope, self._timed_out)
+
+    def close(self):
+        if self.scope is not None and self._dbapi is not None:
+            self.scope.unregister(self._dbapi)
+        if self.engine.dialect.name == "sqlite" and self._dbapi is not None:
+            self._dbapi.set_progress_handler(None, 0)  # 풀로 돌아간 연결에 남지 않도록
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self) -> Connection:
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        try:
+            if exc_value is not None:
+                translated = self.translate(exc_value)
+                if translated is not exc_value:
+                    raise translated from exc_value
+        finally:
+            self.close()
+        return False
+
+
+async def run_cancellable(fn: Callable, *args, scope: Optional[CancelScope] = None):
+    """
+    DB 작업을 blocking_executor 풀에서 실행하고, await가 취소되면 실행 중인 쿼리도 중단
+
+    scope가 없으면 현재 컨텍스트의 scope(없으면 새 scope)를 스레드에 연결합니다.
+    """
+    scope = scope or current_scope() or CancelScope()
+    context = contextvars.copy_context()
+    context.run(_current_scope.set, scope)
+    try:
+        return await run_blocking(context.run, fn, *args)
+    except asyncio.CancelledError:
+        scope.interrupt()
+        raise
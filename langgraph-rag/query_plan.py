@@ -0,0 +1,66 @@
+"""
+Query Plan - EXPLAIN 기반 실행 계획 추정
+생성된 SQL을 실제로 실행하지 않고 옵티마이저 추정 비용/행 수를 조회
+
+- PostgreSQL: EXPLAIN (FORMAT JSON)의 Total Cost / Plan Rows
+- SQLite: EXPLAIN QUERY PLAN (문법/컬럼 검증만, 비용 추정 없음)
+"""
+
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+import json
+
+
+@dataclass
+class PlanEstimate:
+    """EXPLAIN 결과 요약"""
+    total_cost: Optional[float] = None  # 옵티마이저 추정 비용 (PostgreSQL만)
+    plan_rows: Optional[float] = None  # 추정 결과 행 수 (PostgreSQL만)
+    plan: Dict[str, Any] = field(default_factory=dict)  # 최상위 Plan 노드 (PostgreSQL만)
+
+    @property
+    def has_cost(self) -> bool:
+        return self.total_cost is not None
+
+
+def strip_statement(sql: str) -> str:
+    """EXPLAIN 앞에 붙일 수 있도록 끝의 세미콜론/공백 제거"""
+    return sql.strip().rstrip(";").strip()
+
+
+def explain(engine: Engine, sql: str) -> PlanEstimate:
+    """
+    SQL 실행 계획 추정 (쿼리를 실행하지 않음)
+
+    문법/컬럼 오류가 있으면 DB 예외를 그대로 전달하므로 검증 용도로도 사용할 수 있습니다.
+    """
+    statement = strip_statement(sql)
+    dialect = engine.dialect.name
+
+    with engine.connect() as conn:
+        if dialect == "postgresql":
+            raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+            data = json.loads(raw) if isinstance(raw, str) else raw
+            plan = data[0]["Plan"]
+            return PlanEstimate(
+                total_cost=float(plan.get("Total Cost", 0)),
+                plan_rows=float(plan.get("Plan Rows", 0)),
+                plan=plan,
+            )
+
+        if dialect == "sqlite":
+            conn.execute(text(f"EXPLAIN QUERY PLAN {statement}")).fetchall()
+            return PlanEstimate()
+
+        conn.execute(text(f"EXPLAIN {statement}")).fetchall()
+        return PlanEstimate()
+
+
+def walk_plan(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Plan 트리의 모든 노드 (전위 순회)"""
+    nodes = [plan]
+    for child in plan.get("Plans", []) or []:
+        nodes.extend(walk_plan(child))
+    return nodes
@@ -0,0 +1,209 @@
+"""
+Result Encoding - Text-to-SQL 결과 행의 응답 형식 협상과 인코딩
+기본 JSON 응답(results: List[Dict])은 행마다 모든 컬럼 이름을 반복하므로 컬럼이 많고 행이 많으면
+전송량과 직렬화 시간이 크게 늘어납니다. Accept 헤더로 컬럼 이름을 한 번만 보내는 형식을 선택할 수 있습니다.
+
+형식 (Accept):
+- application/json                             기존 응답 (기본값)
+- application/vnd.text-to-sql.rows+json        {"columns": [...], "rows": [[...], ...]}
+- application/vnd.text-to-sql.columnar+json    {"columns": [...], "data": {컬럼: [...]}}
+- application/x-ndjson                         첫 줄 메타데이터+columns, 이후 한 줄에 행 배열 하나
+- application/vnd.apache.arrow.stream          Arrow IPC 스트림 (pyarrow 설치 시, 메타데이터는 스키마 메타데이터)
+
+압축 (Accept-Encoding): 기본 JSON 이외 형식은 zstd(zstandard 설치 시) 또는 gzip으로 압축합니다.
+스트리밍 SSE는 텍스트이므로 rows/columnar 레이아웃만 적용되고 나머지 형식은 rows로 대체됩니다.
+
+형식별 크기와 직렬화 시간은 `python benchmark_result_encoding.py`로 비교합니다.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import date, datetime, time
+from decimal import Decimal
+import gzip
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ========================
+# Configuration
+# ========================
+
+FORMAT_JSON = "application/json"
+FORMAT_ROWS = "application/vnd.text-to-sql.rows+json"
+FORMAT_COLUMNAR = "application/vnd.text-to-sql.columnar+json"
+FORMAT_NDJSON = "application/x-ndjson"
+FORMAT_ARROW = "application/vnd.apache.arrow.stream"
+
+# SSE 배치에 적용할 수 있는 형식 (텍스트 JSON)
+STREAM_FORMATS = (FORMAT_JSON, FORMAT_ROWS, FORMAT_COLUMNAR)
+
+# 이보다 작은 응답은 압축하지 않음 (바이트)
+RESULT_COMPRESS_MIN_BYTES = int(os.getenv("RESULT_COMPRESS_MIN_BYTES", 1024))
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def available_formats() -> List[str]:
+    """이 프로세스에서 인코딩할 수 있는 형식"""
+    formats = [FORMAT_JSON, FORMAT_ROWS, FORMAT_COLUMNAR, FORMAT_NDJSON]
+    if pa is not None:
+        formats.append(FORMAT_ARROW)
+    return formats
+
+
+def parse_accept(header: Optional[str]) -> List[str]:
+    """Accept 계열 헤더를 q 값 내림차순의 값 목록으로 (q=0은 제외)"""
+    items: List[Tuple[float, int, str]] = []
+    for index, part in enumerate((header or "").split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        value = fields[0].lower()
+        if not value:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            items.append((-q, index, value))
+    return [value for _, _, value in sorted(items)]
+
+
+def negotiate_format(accept: Optional[str], streaming: bool = False) -> str:
+    """
+    Accept 헤더로 결과 형식 결정
+
+    명시적으로 요청한 형식 중 지원하는 첫 번째를 고르고, 없으면 기존 JSON.
+    streaming이면 SSE에 실을 수 없는 형식(NDJSON, Arrow)은 rows 레이아웃으로 대체합니다.
+    """
+    supported = available_formats()
+    for media_type in parse_accept(accept):
+        if media_type in supported:
+            if streaming and media_type not in STREAM_FORMATS:
+                return FORMAT_ROWS
+            return media_type
+    return FORMAT_JSON
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Accept-Encoding으로 압축 방식 결정 (zstd 우선, 없으면 gzip)"""
+    accepted = parse_accept(accept_encoding)
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def json_default(value: Any):
+    """DB 드라이버 타입(Decimal, date 등)을 JSON 직렬화 가능한 값으로 변환"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def dumps(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, default=json_default, separators=(",", ":"))
+
+
+def result_columns(rows: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> List[str]:
+    """결과 컬럼 순서 (명시되지 않으면 첫 행의 키 순서)"""
+    if columns:
+        return list(columns)
+    return list(rows[0].keys()) if rows else []
+
+
+def to_row_arrays(rows: List[Dict[str, Any]], columns: List[str]) -> List[List[Any]]:
+    return [[row.get(column) for column in columns] for row in rows]
+
+
+def to_columnar(rows: List[Dict[str, Any]], columns: List[str]) -> Dict[str, List[Any]]:
+    return {column: [row.get(column) for row in rows] for column in columns}
+
+
+def _arrow_column(values: List[Any]):
+    """타입 추론이 실패하는 컬럼(타입이 섞인 경우)은 문자열로"""
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if v is None else str(json_default(v)) for v in values], type=pa.string())
+
+
+def encode_arrow(meta: Dict[str, Any], rows: List[Dict[str, Any]], columns: List[str]) -> bytes:
+    """Arrow IPC 스트림 (메타데이터는 스키마 메타데이터 'text_to_sql'에 JSON으로)"""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    data = to_columnar(rows, columns)
+    table = pa.table({column: _arrow_column(data[column]) for column in columns})
+    table = table.replace_schema_metadata({"text_to_sql": dumps(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_result(
+    meta: Dict[str, Any],
+    rows: List[Dict[str, Any]],
+    media_type: str,
+    columns: Optional[List[str]] = None
+) -> bytes:
+    """
+    결과 본문 인코딩
+
+    Args:
+        meta: 결과 행 이외의 응답 필드 (success, sql, row_count, metrics 등)
+        rows: 결과 행 (딕셔너리 리스트)
+        media_type: negotiate_format()으로 고른 형식
+        columns: 컬럼 순서 (없으면 첫 행 기준)
+    """
+    columns = result_columns(rows, columns)
+
+    if media_type == FORMAT_ROWS:
+        return dumps({**meta, "columns": columns, "rows": to_row_arrays(rows, columns)}).encode()
+    if media_type == FORMAT_COLUMNAR:
+        return dumps({**meta, "columns": columns, "data": to_columnar(rows, columns)}).encode()
+    if media_type == FORMAT_NDJSON:
+        lines = [dumps({**meta, "columns": columns})]
+        lines.extend(dumps(row) for row in to_row_arrays(rows, columns))
+        return ("\n".join(lines) + "\n").encode()
+    if media_type == FORMAT_ARROW:
+        return encode_arrow(meta, rows, columns)
+    return dumps({**meta, "results": rows}).encode()
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """본문 압축 (작은 본문이나 압축 방식이 없으면 그대로), (본문, Content-Encoding) 반환"""
+    if encoding is None or len(body) < RESULT_COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def encode_batch(batch: List[Dict[str, Any]], media_type: str, columns: List[str]) -> Any:
+    """SSE results_batch 값 (기본 JSON이면 딕셔너리 리스트 그대로)"""
+    if media_type == FORMAT_ROWS:
+        return to_row_arrays(batch, columns)
+    if media_type == FORMAT_COLUMNAR:
+        return to_columnar(batch, columns)
+    return batch
@@ -0,0 +1,472 @@
+"""
+Result Store - 큰 SQL 결과의 서버 측 보관 (결과 핸들)
+응답에는 첫 페이지와 result_handle만 담고, 전체 결과는 로컬 임시 저장소에 보관하여
+LLM이나 원래 쿼리를 다시 실행하지 않고 페이지 조회/정렬/필터/CSV 내보내기를 제공
+
+- 저장소: 결과마다 임시 디렉터리의 SQLite 파일 하나 (표준 라이브러리만 사용, 정렬/필터를 SQL로 처리)
+  컬럼은 위치 기반 이름(c0, c1, ...)으로 저장하고 원래 컬럼 이름은 메모리의 항목에 보관합니다
+  (SELECT a.id, b.id처럼 이름이 겹치는 결과도 보관 가능).
+- 적재: 행 배치를 비동기 제너레이터로 받아 백그라운드 태스크에서 기록 (응답을 막지 않음)
+  - 에이전트가 수집한 행 전체가 있으면 메모리에서 바로 기록
+  - max_rows에서 잘린 결과는 핸들만 만들어 두고(pending) 처음 조회될 때 최종 SQL을 서버 사이드 커서로
+    다시 실행하여 RESULT_STORE_MAX_ROWS까지 기록 (클라이언트가 페이지를 조회하지 않으면 DB를 다시 읽지 않음)
+- 만료: 마지막 조회 후 RESULT_STORE_TTL초가 지나면 삭제, 항목이 RESULT_STORE_MAX_ENTRIES개를 넘으면
+  가장 오래 조회되지 않은 항목부터 삭제
+
+값 변환: Decimal → float, 날짜/시간 → ISO 문자열 (문자열 정렬이 시간 순서와 같음)
+"""
+
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Callable
+from dataclasses import dataclass, field
+from contextlib import closing
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from blocking_executor import run_blocking
+from query_budget import CancelScope
+import asyncio
+import csv
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+# ========================
+# Configuration
+# ========================
+
+# 결과 파일을 만들 상위 디렉터리 (기본: 시스템 임시 디렉터리, 프로세스마다 하위 디렉터리 생성)
+RESULT_STORE_DIR = os.getenv("RESULT_STORE_DIR") or None
+
+# 마지막 조회 후 보관 시간 (초)
+RESULT_STORE_TTL = int(os.getenv("RESULT_STORE_TTL", 1800))
+
+# 동시에 보관하는 최대 결과 수
+RESULT_STORE_MAX_ENTRIES = int(os.getenv("RESULT_STORE_MAX_ENTRIES", 100))
+
+# 결과 하나에 보관하는 최대 행 수
+RESULT_STORE_MAX_ROWS = int(os.getenv("RESULT_STORE_MAX_ROWS", 1_000_000))
+
+# 응답에 담는 첫 페이지 행 수 (이보다 많거나 잘린 결과는 핸들로 보관)
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", 1000))
+
+# 페이지 조회 최대 행 수
+RESULT_PAGE_MAX = 10000
+
+# CSV 내보내기 시 한 번에 읽는 행 수
+CSV_CHUNK_ROWS = 5000
+
+# 필터 연산자 (쿼리 파라미터 "컬럼:연산자:값")
+FILTER_OPS = {
+    "eq": "=",
+    "ne": "!=",
+    "lt": "<",
+    "le": "<=",
+    "gt": ">",
+    "ge": ">=",
+    "contains": "LIKE",
+}
+
+
+def to_storable(value: Any) -> Any:
+    """SQLite에 저장할 수 있는 값으로 변환"""
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    return str(value)
+
+
+def parse_value(raw: str) -> Any:
+    """필터 값: 숫자로 해석되면 숫자 (저장된 숫자 컬럼과 비교되도록)"""
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            pass
+    return raw
+
+
+def parse_filter(expression: str) -> Tuple[str, str, str]:
+    """'컬럼:연산자:값' → (컬럼, 연산자, 값), 값에는 ':'가 들어갈 수 있음"""
+    parts = expression.split(":", 2)
+    if len(parts) != 3 or parts[1] not in FILTER_OPS:
+        raise ValueError(f"Invalid filter '{expression}', expected column:op:value with op in {sorted(FILTER_OPS)}")
+    return parts[0], parts[1], parts[2]
+
+
+# defer()에 넘기는 행 배치 원천: 호출하면 (배치 비동기 제너레이터, 그 쿼리의 취소 범위)를 반환
+BatchSource = Callable[[], Tuple[AsyncIterator[List[Dict[str, Any]]], Optional[CancelScope]]]
+
+
+class ResultNotReady(Exception):
+    """결과를 아직 기록 중"""
+
+    def __init__(self, entry: "SpooledResult"):
+        super().__init__(f"Result {entry.handle} is still spooling ({entry.row_count} rows so far)")
+        self.entry = entry
+
+
+@dataclass
+class SpooledResult:
+    """보관된 결과 하나"""
+    handle: str
+    query: str
+    sql: str
+    path: str
+    columns: List[str] = field(default_factory=list)
+    row_count: int = 0
+    status: str = "spooling"  # "pending" | "spooling" | "ready" | "failed"
+    error: Optional[str] = None
+    truncated: bool = False  # RESULT_STORE_MAX_ROWS에서 잘렸는지 여부
+    created_at: float = field(default_factory=time.time)
+    last_access: float = field(default_factory=time.time)
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _scope: Optional[CancelScope] = field(default=None, repr=False)
+    _source: Optional[BatchSource] = field(default=None, repr=False)  # pending 항목의 행 원천
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def column_ref(self, name: str) -> str:
+        """원래 컬럼 이름 → 저장 컬럼 이름 (없으면 ValueError)"""
+        if name not in self.columns:
+            raise ValueError(f"Unknown column '{name}'")
+        return f"c{self.columns.index(name)}"
+
+    def to_dict(self, ttl: int = RESULT_STORE_TTL) -> Dict[str, Any]:
+        return {
+            "result_handle": self.handle,
+            "status": self.status,
+            "query": self.query,
+            "sql": self.sql,
+            "columns": self.columns,
+            "row_count": self.row_count,
+            "truncated": self.truncated,
+            "error": self.error,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "expires_at": datetime.fromtimestamp(self.last_access + ttl).isoformat(),
+        }
+
+
+class ResultStore:
+    """
+    결과 핸들 저장소 (프로세스 전역, get_result_store()로 공유)
+
+    파일 I/O는 blocking_executor 풀에서 실행합니다.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = RESULT_STORE_DIR,
+        ttl: int = RESULT_STORE_TTL,
+        max_entries: int = RESULT_STORE_MAX_ENTRIES,
+        max_rows: int = RESULT_STORE_MAX_ROWS
+    ):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="text_to_sql_results_", dir=directory)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries: Dict[str, SpooledResult] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------
+    # 적재
+    # ------------------------
+
+    def spool(self, query: str, sql: str, batches: AsyncIterator[List[Dict[str, Any]]],
+              scope: Optional[CancelScope] = None) -> SpooledResult:
+        """
+        결과 보관 시작 (백그라운드 태스크로 batches를 끝까지 기록)
+
+        batches가 DB 커서를 읽는 경우 그 쿼리의 scope를 넘기면 삭제/종료 시 실행 중인 쿼리도 취소합니다.
+        실행 중인 이벤트 루프 안에서 호출해야 합니다.
+        """
+        entry = self._register(query, sql, "spooling")
+        entry._scope = scope
+        entry._task = asyncio.create_task(self._consume(entry, batches))
+        return entry
+
+    def defer(self, query: str, sql: str, source: BatchSource) -> SpooledResult:
+        """
+        핸들만 만들고 기록은 처음 조회될 때 시작 (status: pending)
+
+        source는 start()에서 한 번 호출되어 (batches, scope)를 반환합니다.
+        잘린 결과처럼 DB를 다시 읽어야 하는 경우, 클라이언트가 페이지를 조회하지 않으면 쿼리를 실행하지 않습니다.
+        """
+        entry = self._register(query, sql, "pending")
+        entry._source = source
+        return entry
+
+    def start(self, entry: SpooledResult) -> SpooledResult:
+        """pending 항목의 기록 시작 (이미 시작했으면 그대로, 실행 중인 이벤트 루프 안에서 호출)"""
+        with entry._lock:
+            if entry.status != "pending":
+                return entry
+            entry.status = "spooling"
+            source, entry._source = entry._source, None
+        try:
+            batches, entry._scope = source()
+        except Exception as e:
+            entry.status = "failed"
+            entry.error = str(e)
+            entry._done.set()
+            return entry
+        entry._task = asyncio.create_task(self._consume(entry, batches))
+        return entry
+
+    def _register(self, query: str, sql: str, status: str) -> SpooledResult:
+        self.evict_expired()
+        handle = uuid.uuid4().hex
+        entry = SpooledResult(handle=handle, query=query, sql=sql, status=status,
+                              path=os.path.join(self.directory, f"{handle}.sqlite"))
+        with self._lock:
+            self._entries[handle] = entry
+        self._evict_overflow()
+        return entry
+
+    async def _consume(self, entry: SpooledResult, batches: AsyncIterator[List[Dict[str, Any]]]):
+        conn = None
+        try:
+            conn = await run_blocking(sqlite3.connect, entry.path, check_same_thread=False)
+            async for batch in batches:
+                remaining = self.max_rows - entry.row_count
+                if len(batch) > remaining:
+                    entry.truncated = True
+                    batch = batch[:remaining]
+                if batch:
+                    await run_blocking(self._write, conn, entry, batch)
+                if entry.truncated:
+                    break
+            if not entry.columns:
+                await run_blocking(self._create_table, conn, entry, [])
+            entry.status = "ready"
+            print(f"📦 결과 보관 완료 {entry.handle[:8]}: {entry.row_count}개 행")
+        except asyncio.CancelledError:
+            entry.status = "failed"
+            entry.error = "cancelled"
+            if entry._scope is not None:
+                entry._scope.cancel("result deleted")
+            raise
+        except Exception as e:
+            entry.status = "failed"
+            entry.error = str(e)
+            print(f"⚠️ 결과 보관 실패 {entry.handle[:8]}: {str(e)}")
+        finally:
+            aclose = getattr(batches, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            if conn is not None:
+                await run_blocking(conn.close)
+            entry._done.set()
+
+    def _create_table(self, conn: sqlite3.Connection, entry: SpooledResult, columns: List[str]):
+        entry.columns = list(columns)
+        definitions = ", ".join(f"c{i}" for i in range(len(columns))) or "c0"
+        conn.execute(f"CREATE TABLE result (rid INTEGER PRIMARY KEY, {definitions})")
+
+    def _write(self, conn: sqlite3.Connection, entry: SpooledResult, batch: List[Dict[str, Any]]):
+        with entry._lock:
+            if not entry.columns:
+                self._create_table(conn, entry, list(batch[0].keys()))
+            placeholders = ", ".join("?" for _ in entry.columns)
+            conn.executemany(
+                f"INSERT INTO result ({', '.join(f'c{i}' for i in range(len(entry.columns)))}) VALUES ({placeholders})",
+                ([to_storable(row.get(column)) for column in entry.columns] for row in batch)
+            )
+            conn.commit()
+            entry.row_count += len(batch)
+
+    # ------------------------
+    # 조회
+    # ------------------------
+
+    def get(self, handle: str) -> SpooledResult:
+        """핸들로 항목 조회 (조회하면 만료 시간 연장, 없으면 KeyError)"""
+        self.evict_expired()
+        with self._lock:
+            entry = self._entries.get(handle)
+        if entry is None:
+            raise KeyError(handle)
+        entry.last_access = time.time()
+        return entry
+
+    async def wait_ready(self, entry: SpooledResult, timeout: float) -> SpooledResult:
+        """
+        기록이 끝날 때까지 최대 timeout초 대기 (끝나지 않으면 ResultNotReady, 실패면 RuntimeError)
+
+        pending 항목이면 여기서 기록을 시작합니다.
+        """
+        self.start(entry)
+        if entry.status == "spooling":
+            try:
+                await asyncio.wait_for(entry._done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise ResultNotReady(entry)
+        if entry.status == "failed":
+            raise RuntimeError(f"Result {entry.handle} could not be stored: {entry.error}")
+        return entry
+
+    def _where(self, entry: SpooledResult, filters: List[str]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for expression in filters:
+            column, op, raw = parse_filter(expression)
+            ref = entry.column_ref(column)
+            if op == "contains":
+                clauses.append(f"CAST({ref} AS TEXT) LIKE ? ESCAPE '\\'")
+                escaped = raw.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.append(f"%{escaped}%")
+            else:
+                clauses.append(f"{ref} {FILTER_OPS[op]} ?")
+                params.append(parse_value(raw))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select(self, entry: SpooledResult, sort: Optional[str], descending: bool,
+                filters: List[str]) -> Tuple[str, str, List[Any]]:
+        """(SELECT 문, COUNT 문, 파라미터)"""
+        where, params = self._where(entry, filters)
+        order = " ORDER BY rid"
+        if sort:
+            order = f" ORDER BY {entry.column_ref(sort)} {'DESC' if descending else 'ASC'}, rid"
+        columns = ", ".join(f"c{i}" for i in range(len(entry.columns))) or "NULL"
+        return (f"SELECT {columns} FROM result{where}{order}",
+                f"SELECT COUNT(*) FROM result{where}", params)
+
+    def check_query(self, entry: SpooledResult, sort: Optional[str], filters: Optional[List[str]]):
+        """정렬/필터 검증 (잘못된 컬럼/연산자면 ValueError)"""
+        self._select(entry, sort, False, filters or [])
+
+    def read_page(
+        self,
+        entry: SpooledResult,
+        offset: int = 0,
+        limit: int = RESULT_PAGE_SIZE,
+        sort: Optional[str] = None,
+        descending: bool = False,
+        filters: Optional[List[str]] = None
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """정렬/필터를 적용한 페이지 (필터에 맞는 전체 행 수, 페이지 행), 동기 함수"""
+        select, count, params = self._select(entry, sort, descending, filters or [])
+        limit = min(max(limit, 0), RESULT_PAGE_MAX)
+        with closing(sqlite3.connect(f"file:{entry.path}?mode=ro", uri=True)) as conn:
+            total = conn.execute(count, params).fetchone()[0]
+            rows = conn.execute(f"{select} LIMIT ? OFFSET ?", params + [limit, max(offset, 0)]).fetchall()
+        return total, [dict(zip(entry.columns, row)) for row in rows]
+
+    async def iter_csv(
+        self,
+        entry: SpooledResult,
+        sort: Optional[str] = None,
+        descending: bool = False,
+        filters: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """정렬/필터를 적용한 CSV (UTF-8 BOM 포함, 엑셀에서 한글이 깨지지 않도록)"""
+        select, _, params = self._select(entry, sort, descending, filters or [])
+        conn = await run_blocking(sqlite3.connect, f"file:{entry.path}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            cursor = await run_blocking(conn.execute, select, params)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            buffer.write("\ufeff")
+            writer.writerow(entry.columns)
+            while True:
+                rows = await run_blocking(cursor.fetchmany, CSV_CHUNK_ROWS)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            await run_blocking(conn.close)
+
+    # ------------------------
+    # 삭제/만료
+    # ------------------------
+
+    def delete(self, handle: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(handle, None)
+        if entry is None:
+            return False
+        if entry._task is not None and not entry._task.done():
+            entry._task.cancel()
+            entry._task.add_done_callback(lambda _: self._remove_file(entry))
+        else:
+            self._remove_file(entry)
+        return True
+
+    def _remove_file(self, entry: SpooledResult):
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ 결과 파일 삭제 실패 {entry.path}: {str(e)}")
+
+    def evict_expired(self) -> int:
+        """TTL이 지난 항목 삭제"""
+        deadline = time.time() - self.ttl
+        with self._lock:
+            expired = [h for h, e in self._entries.items() if e.last_access < deadline]
+        for handle in expired:
+            self.delete(handle)
+        return len(expired)
+
+    def _evict_overflow(self):
+        """항목 수 제한을 넘으면 가장 오래 조회되지 않은 항목부터 삭제"""
+        with self._lock:
+            overflow = len(self._entries) - self.max_entries
+            oldest = sorted(self._entries.values(), key=lambda e: e.last_access)[:max(overflow, 0)]
+        for entry in oldest:
+            self.delete(entry.handle)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "entries": len(entries),
+            "pending": sum(1 for e in entries if e.status == "pending"),
+            "spooling": sum(1 for e in entries if e.status == "spooling"),
+            "rows": sum(e.row_count for e in entries),
+            "ttl_seconds": self.ttl,
+        }
+
+    async def close(self):
+        """모든 항목과 디렉터리 삭제 (서버 종료 시, 기록 중인 태스크가 끝난 뒤 삭제)"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        tasks = [e._task for e in entries if e._task is not None and not e._task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+async def iter_batches(rows: List[Dict[str, Any]], size: int = CSV_CHUNK_ROWS) -> AsyncIterator[List[Dict[str, Any]]]:
+    """메모리의 결과 행을 spool()에 넘길 배치로"""
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """프로세스 전역 ResultStore"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store
@@ -0,0 +1,1086 @@
+"""
+RFC Extract - RFC_READ_TABLE 키 범위 분할 병렬 추출
+SAP 테이블을 키 범위 파티션으로 나누어 pyrfc 커넥션 풀에서 동시에 읽음
+
+기존 방식(ROWSKIPS=offset, ROWCOUNT=10000 순차 루프)은 페이지마다 SAP가 앞부분을 다시 읽고 건너뛰므로
+전체 비용이 행 수의 제곱에 비례하고, 커넥션 하나만 쓰므로 페이지 사이에 대기합니다.
+
+추출 순서:
+1. 키 필드(MATNR, VBELN, FKDAT 등) 하나만 읽는 첫 패스로 행 수와 키 분포를 구함 (좁은 행이므로 큰 페이지)
+2. 한 페이지(RFC_PAGE_SIZE)에 들어가면 파티션 없이 1회 호출로 읽음 (작은 테이블은 총 2회 호출)
+3. 아니면 키 값을 정렬하여 파티션당 행 수가 비슷하고 한 페이지에 들어가도록 경계를 정함
+   (-∞, b1], (b1, b2], ..., (bk, +∞) → 범위 조건은 SAP가 평가하므로 파티션은 겹치지 않고 전체를 덮음
+4. 파티션을 RFC_POOL_SIZE개 커넥션으로 동시에 읽고 파티션 순서대로 합침
+   (RFC_READ_TABLE에는 ORDER BY가 없으므로 파티션 안에서 페이지가 넘치면 그 범위 안에서만 ROWSKIPS 페이징)
+
+결과 행이 512바이트를 넘는 넓은 테이블(MARA, VBAP, CE1xxxx 등)은 WideTableExtractor가
+DDIF_FIELDINFO_GET 필드 길이로 필드를 키 필드 + 512바이트 이하 그룹으로 나눠 동시에 읽고 키로 다시 합칩니다.
+
+SAP 없이 확인할 수 있도록 RFC_READ_TABLE을 흉내 내는 FakeRFCServer/FakeRFCConnection을 포함합니다.
+파티션 수별 처리량은 `python benchmark_rfc_extract.py`로 비교합니다.
+"""
+
+from typing import List, Dict, Any, Optional, Callable, Tuple, Iterator
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import bisect
+import math
+import operator
+import os
+import re
+import threading
+import time
+
+# ========================
+# Configuration
+# ========================
+
+# 동시에 사용할 RFC 커넥션 수 (SAP 대화 세션 수 제한을 고려)
+RFC_POOL_SIZE = int(os.getenv("RFC_POOL_SIZE", 4))
+
+# RFC_READ_TABLE 1회 호출로 가져올 행 수
+RFC_PAGE_SIZE = int(os.getenv("RFC_PAGE_SIZE", 10000))
+
+# 최소 파티션 수 (행 수가 많으면 페이지에 들어가도록 더 늘림)
+RFC_PARTITIONS = int(os.getenv("RFC_PARTITIONS", 8))
+
+# 키 필드만 읽는 첫 패스의 페이지 크기 (행이 좁으므로 크게)
+RFC_KEY_PAGE_SIZE = int(os.getenv("RFC_KEY_PAGE_SIZE", 100000))
+
+# 파티션 호출 실패 시 재시도 횟수 (실패한 커넥션은 버리고 새로 연결)
+RFC_RETRIES = int(os.getenv("RFC_RETRIES", 1))
+
+# 파티션을 페이지 크기의 이 비율까지만 채움 (첫 패스 이후 늘어난 행 여유)
+PARTITION_FILL = 0.8
+
+# RFC_READ_TABLE OPTIONS 한 줄 최대 길이
+OPTIONS_LINE_WIDTH = 72
+
+# RFC_READ_TABLE 결과 행 최대 폭 (구분자 포함, 바이트)
+RFC_ROW_WIDTH = 512
+
+DELIMITER = "|"
+
+
+# ========================
+# OPTIONS 조건
+# ========================
+
+def quote(value: Any) -> str:
+    """ABAP WHERE 문자열 리터럴"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def wrap_option(text: str, width: int = OPTIONS_LINE_WIDTH) -> List[str]:
+    """
+    조건 문자열을 OPTIONS 줄 길이 이하로 나눔
+
+    따옴표 리터럴 안에서는 자르지 않고 공백이나 쉼표 뒤에서 자릅니다.
+    (줄 경계는 토큰 구분으로 처리되므로 "IN ('A','B')"를 쉼표 뒤에서 나눠도 같은 조건)
+    """
+    text = text.strip()
+    lines = []
+    while len(text) > width:
+        cut = None
+        in_quote = False
+        for i, ch in enumerate(text[:width + 1]):
+            if ch == "'":
+                in_quote = not in_quote
+            elif not in_quote and ch == " ":
+                cut = i
+            elif not in_quote and ch == "," and i < width:
+                cut = i + 1
+        if not cut:
+            raise ValueError(f"OPTIONS 줄을 {width}자 이하로 나눌 수 없습니다: {text[:80]}")
+        lines.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        lines.append(text)
+    return lines
+
+
+def build_options(conditions: List[str], extra: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    OPTIONS 테이블 생성
+
+    conditions는 기존 read_table의 OPTIONS 줄(연결하면 하나의 WHERE 절)이고,
+    extra(파티션 범위 등)는 기존 조건 전체를 괄호로 감싼 뒤 AND로 붙입니다.
+    (기존 조건에 OR가 있어도 우선순위가 바뀌지 않도록)
+    """
+    texts = [c for c in conditions if c and c.strip()]
+    if extra:
+        texts = ["(", *texts, ") AND (", extra, ")"] if texts else [extra]
+    lines = []
+    for text in texts:
+        lines.extend(wrap_option(text))
+    return [{"TEXT": line} for line in lines]
+
+
+def range_condition(key: str, lower: Optional[str], upper: Optional[str]) -> Optional[str]:
+    """(lower, upper] 키 범위 조건 (None이면 열린 경계)"""
+    parts = []
+    if lower is not None:
+        parts.append(f"{key} > {quote(lower)}")
+    if upper is not None:
+        parts.append(f"{key} <= {quote(upper)}")
+    return " AND ".join(parts) or None
+
+
+def split_rows(data: List[Dict[str, str]]) -> List[List[str]]:
+    return [[v.strip() for v in row["WA"].split(DELIMITER)] for row in data]
+
+
+# ========================
+# Connection Pool
+# ========================
+
+class RFCConnectionPool:
+    """
+    pyrfc 커넥션 풀 (필요할 때 size개까지 연결)
+
+    호출 중 오류가 난 커넥션은 상태를 알 수 없으므로 닫고 버리며, 다음 대여 때 새로 연결합니다.
+    커넥션을 버리면 기다리던 스레드를 깨워 새로 연결하게 하므로 커넥션이 모두 깨져도 대기가 멈추지 않습니다.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = RFC_POOL_SIZE):
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle: List[Any] = []  # 마지막에 반납된 커넥션부터 재사용
+        self._cond = threading.Condition()
+        self._created = 0
+        self._closed = False
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("RFC connection pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                # 반납(release) 또는 폐기(_discard)될 때까지 대기
+                self._cond.wait()
+        try:
+            return self.factory()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, broken: bool = False):
+        with self._cond:
+            if not (broken or self._closed):
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def call(self, function: str, **params) -> Dict[str, Any]:
+        """커넥션을 빌려 RFC 호출 후 반납"""
+        conn = self.acquire()
+        try:
+            result = conn.call(function, **params)
+        except Exception:
+            self.release(conn, broken=True)
+            raise
+        self.release(conn)
+        return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+
+# ========================
+# Extractor
+# ========================
+
+@dataclass
+class ExtractStats:
+    table: str
+    rows: int = 0
+    calls: int = 0
+    partitions: int = 1
+    key_rows: int = 0  # 첫 패스에서 읽은 키 수
+    overflowed: int = 0  # 한 페이지를 넘어 ROWSKIPS로 이어 읽은 파티션 수
+    groups: int = 1  # 필드 그룹 수 (넓은 테이블)
+    mismatched: int = 0  # 그룹 사이에 키가 맞지 않아 버린 행 수 (읽는 중 변경된 행)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "rows": self.rows,
+            "calls": self.calls,
+            "partitions": self.partitions,
+            "key_rows": self.key_rows,
+            "overflowed": self.overflowed,
+            "groups": self.groups,
+            "mismatched": self.mismatched,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+@dataclass
+class ExtractResult:
+    fields: List[str]
+    rows: List[List[str]]
+    stats: ExtractStats
+
+    def records(self) -> List[Dict[str, str]]:
+        return [dict(zip(self.fields, row)) for row in self.rows]
+
+
+@dataclass
+class _Partition:
+    index: int
+    lower: Optional[str]
+    upper: Optional[str]
+    rows: List[List[str]] = field(default_factory=list)
+    calls: int = 0
+    overflowed: bool = False
+
+
+class RFCTableExtractor:
+    """
+    RFC_READ_TABLE 키 범위 분할 병렬 추출기
+
+    사용 예:
+        pool = RFCConnectionPool(lambda: Connection(**SAP_CONFIG))
+        result = RFCTableExtractor(pool).read('VBAK', fields, options, partition_key='VBELN')
+    """
+
+    def __init__(
+        self,
+        pool: RFCConnectionPool,
+        page_size: int = RFC_PAGE_SIZE,
+        partitions: int = RFC_PARTITIONS,
+        key_page_size: int = RFC_KEY_PAGE_SIZE,
+        verbose: bool = True
+    ):
+        self.pool = pool
+        self.page_size = page_size
+        self.partitions = max(1, partitions)
+        self.key_page_size = key_page_size
+        self.verbose = verbose
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def _read_page(self, conn, table: str, fields: List[str], options: List[Dict[str, str]],
+                   skip: int, count: int) -> Tuple[List[str], List[List[str]]]:
+        result = conn.call(
+            "RFC_READ_TABLE",
+            QUERY_TABLE=table,
+            DELIMITER=DELIMITER,
+            FIELDS=[{"FIELDNAME": f} for f in fields],
+            OPTIONS=options,
+            ROWSKIPS=skip,
+            ROWCOUNT=count
+        )
+        names = [f["FIELDNAME"] for f in result.get("FIELDS", [])]
+        return names, split_rows(result.get("DATA", []))
+
+    def _read_range(self, table: str, fields: List[str], options: List[Dict[str, str]],
+                    page_size: int, skip: int = 0, on_page: Optional[Callable[[int], None]] = None):
+        """조건에 맞는 행을 page_size씩 끝까지 읽음 (필드 이름, 행, 호출 수)"""
+        names: List[str] = []
+        rows: List[List[str]] = []
+        calls = 0
+        for attempt in range(RFC_RETRIES + 1):
+            conn = self.pool.acquire()
+            try:
+                while True:
+                    names, page = self._read_page(conn, table, fields, options, skip + len(rows), page_size)
+                    calls += 1
+                    rows.extend(page)
+                    if on_page:
+                        on_page(len(rows))
+                    if len(page) < page_size:
+                        break
+            except Exception as e:
+                self.pool.release(conn, broken=True)
+                if attempt >= RFC_RETRIES:
+                    raise
+                self._log(f"   ⚠️ {table} 호출 실패, 재시도: {str(e)[:80]}")
+                continue
+            self.pool.release(conn)
+            return names, rows, calls
+        return names, rows, calls
+
+    def _key_boundaries(self, keys: List[str], partitions: int) -> List[str]:
+        """정렬된 키 목록을 행 수가 비슷한 partitions개 구간으로 나누는 상한 경계 (마지막 구간 제외)"""
+        if not keys or partitions <= 1:
+            return []
+        per_partition = math.ceil(len(keys) / partitions)
+        boundaries = []
+        for i in range(per_partition - 1, len(keys) - 1, per_partition):
+            # 같은 키 값은 한 파티션에 모임 (중복 경계 제거)
+            if not boundaries or keys[i] > boundaries[-1]:
+                if keys[i] < keys[-1]:
+                    boundaries.append(keys[i])
+        return boundaries
+
+    def _partitions_for(self, keys: List[str]) -> List[_Partition]:
+        """정렬된 키 목록으로 파티션 범위 결정 (한 페이지에 들어가면 파티션 1개)"""
+        if len(keys) < self.page_size * PARTITION_FILL:
+            target = 1
+        else:
+            target = max(self.partitions, math.ceil(len(keys) / max(1, int(self.page_size * PARTITION_FILL))))
+        bounds = [None, *self._key_boundaries(keys, target), None]
+        return [_Partition(i, bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+    def _read_keys(self, table: str, conditions: List[str], partition_key: str) -> Tuple[List[str], int]:
+        """키 필드만 읽어 정렬된 키 값 목록 (키 값, 호출 수)"""
+        _, key_rows, calls = self._read_range(
+            table, [partition_key], build_options(conditions), self.key_page_size
+        )
+        return sorted(row[0] for row in key_rows), calls
+
+    def plan(self, table: str, conditions: List[str], partition_key: str,
+             stats: Optional[ExtractStats] = None) -> List[_Partition]:
+        """키 필드만 읽어 파티션 범위 결정"""
+        started = time.time()
+        keys, calls = self._read_keys(table, conditions, partition_key)
+        partitions = self._partitions_for(keys)
+        if stats is not None:
+            stats.calls += calls
+            stats.key_rows = len(keys)
+        self._log(
+            f"   🔑 {partition_key} 키 {len(keys):,}개 → 파티션 {len(partitions)}개 "
+            f"({time.time() - started:.1f}초, 호출 {calls}회)"
+        )
+        return partitions
+
+    def _read_partition(self, table: str, fields: List[str], conditions: List[str],
+                        partition_key: str, partition: _Partition) -> _Partition:
+        options = build_options(conditions, range_condition(partition_key, partition.lower, partition.upper))
+        _, partition.rows, partition.calls = self._read_range(table, fields, options, self.page_size)
+        partition.overflowed = partition.calls > 1
+        return partition
+
+    def read(
+        self,
+        table: str,
+        fields: List[str],
+        conditions: Optional[List[str]] = None,
+        partition_key: Optional[str] = None
+    ) -> ExtractResult:
+        """
+        테이블 추출
+
+        Args:
+            table: SAP 테이블 이름
+            fields: 읽을 필드 이름 목록
+            conditions: WHERE 조건 줄 (기존 OPTIONS의 TEXT 값, 연결하면 하나의 조건)
+            partition_key: 범위 분할에 쓸 필드 (없으면 fields의 첫 필드)
+        """
+        conditions = list(conditions or [])
+        partition_key = partition_key or fields[0]
+        stats = ExtractStats(table=table)
+        started = time.time()
+
+        # 1. 키 분포로 파티션 결정
+        partitions = self.plan(table, conditions, partition_key, stats)
+        stats.partitions = len(partitions)
+
+        # 2. 한 페이지에 들어가면 그대로 읽음
+        if len(partitions) == 1:
+            names, rows, calls = self._read_range(table, fields, build_options(conditions), self.page_size)
+            stats.calls += calls
+            stats.rows = len(rows)
+            stats.seconds = time.time() - started
+            return ExtractResult(names, rows, stats)
+
+        # 3. 파티션 병렬 추출 (동시 실행 수 = 풀 크기)
+        done = 0
+        progress_lock = threading.Lock()
+
+        def run(partition: _Partition) -> _Partition:
+            nonlocal done
+            self._read_partition(table, fields, conditions, partition_key, partition)
+            with progress_lock:
+                done += 1
+                if done == len(partitions) or done % max(1, len(partitions) // 10) == 0:
+                    self._log(f"   파티션 {done}/{len(partitions)} 완료")
+            return partition
+
+        workers = min(self.pool.size, len(partitions))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"rfc-{table}") as pool:
+            results = list(pool.map(run, partitions))
+
+        names = [*fields]
+        rows = []
+        for partition in results:
+            rows.extend(partition.rows)
+            stats.calls += partition.calls
+            stats.overflowed += int(partition.overflowed)
+
+        stats.rows = len(rows)
+        stats.seconds = time.time() - started
+        if stats.overflowed:
+            self._log(f"   ⚠️ 파티션 {stats.overflowed}개가 한 페이지를 넘어 ROWSKIPS로 이어 읽음")
+        return ExtractResult(names, rows, stats)
+
+    def read_where(self, table: str, fields: List[str], conditions: Optional[List[str]] = None,
+                   extra: Optional[str] = None) -> ExtractResult:
+        """분할 없이 조건에 맞는 행을 커넥션 하나로 끝까지 읽음 (IN 목록 조회처럼 결과가 작은 조건용)"""
+        stats = ExtractStats(table=table)
+        started = time.time()
+        names, rows, stats.calls = self._read_range(
+            table, fields, build_options(list(conditions or []), extra), self.page_size
+        )
+        stats.rows = len(rows)
+        stats.seconds = time.time() - started
+        return ExtractResult(names, rows, stats)
+
+    def read_sequential(self, table: str, fields: List[str], conditions: Optional[List[str]] = None) -> ExtractResult:
+        """기존 방식 (ROWSKIPS 순차 페이징, 비교용)"""
+        stats = ExtractStats(table=table)
+        started = time.time()
+        names, rows, stats.calls = self._read_range(
+            table, fields, build_options(list(conditions or [])), self.page_size,
+            on_page=lambda n: self._log(f"   {n}개 조회 중...")
+        )
+        stats.rows = len(rows)
+        stats.seconds = time.time() - started
+        return ExtractResult(names, rows, stats)
+
+
+# ========================
+# 넓은 테이블 (필드 그룹)
+# ========================
+
+# RFC_READ_TABLE로 읽을 수 없는 타입 (STRING, RAWSTRING 등 가변 길이)
+UNREADABLE_INTTYPES = {"g", "y", "h", "r", "v"}
+
+
+def rfc_field_width(info: Dict[str, Any]) -> int:
+    """
+    DDIF_FIELDINFO_GET 필드 정보로 RFC_READ_TABLE 결과에서 차지하는 폭 (바이트)
+
+    packed 숫자(P)는 자릿수 외에 부호와 소수점, 부동소수점(F)은 지수 표기 출력 길이를 씀
+    """
+    length = int(info.get("LENG") or 0)
+    inttype = info.get("INTTYPE", "C")
+    if inttype == "P":
+        return length + 2
+    if inttype == "F":
+        return max(length, int(info.get("OUTPUTLEN") or 0))
+    return length
+
+
+def pack_field_groups(fields: List[str], widths: Dict[str, int], key_fields: List[str],
+                      row_width: int = RFC_ROW_WIDTH) -> List[List[str]]:
+    """
+    키 필드를 모든 그룹에 넣고 나머지 필드를 행 폭 제한 안에 first-fit decreasing으로 채움
+
+    그룹 안의 필드는 원래 순서를 유지합니다. (키 필드, 그룹 필드...) 순서의 필드 목록을 반환
+    """
+    separator = len(DELIMITER)
+    key_width = sum(widths[k] for k in key_fields) + separator * (len(key_fields) - 1)
+    position = {name: i for i, name in enumerate(fields)}
+    bins: List[List[Any]] = []  # [사용 폭, 필드 목록]
+    for name in sorted((f for f in fields if f not in key_fields), key=lambda f: (-widths[f], position[f])):
+        cost = widths[name] + separator
+        if key_width + cost > row_width:
+            raise ValueError(f"{name} 필드({widths[name]}바이트)는 키 필드와 함께 {row_width}바이트에 들어가지 않습니다")
+        target = next((b for b in bins if b[0] + cost <= row_width), None)
+        if target is None:
+            target = [key_width, []]
+            bins.append(target)
+        target[0] += cost
+        target[1].append(name)
+    groups = [[*key_fields, *sorted(names, key=position.get)] for _, names in bins]
+    return groups or [list(key_fields)]
+
+
+class WideTableExtractor(RFCTableExtractor):
+    """
+    넓은 테이블 추출 (RFC_READ_TABLE 결과 행 512바이트 제한)
+
+    DDIF_FIELDINFO_GET의 필드 길이로 필드를 512바이트 이하 그룹으로 나누고 (모든 그룹에 키 필드 포함),
+    키 범위 파티션마다 그룹들을 커넥션 풀에서 동시에 읽어 기본 키로 다시 합칩니다.
+    파티션 순서대로 합친 행을 내보내고 동시에 읽는 파티션은 몇 개로 제한하므로
+    그룹 전체를 메모리에 올리지 않습니다 (iter_chunks). 그룹이 커넥션 수 이하면 한 그룹을 읽는 시간과 비슷합니다.
+
+    사용 예:
+        extractor = WideTableExtractor(RFCConnectionPool(lambda: Connection(**SAP_CONFIG)))
+        for names, rows in extractor.iter_chunks('MARA'):  # 모든 필드
+            copy_dataframe(conn, staging, pd.DataFrame(rows, columns=names))
+    """
+
+    def __init__(self, pool: RFCConnectionPool, row_width: int = RFC_ROW_WIDTH, **kwargs):
+        super().__init__(pool, **kwargs)
+        self.row_width = row_width
+
+    def field_info(self, table: str) -> List[Dict[str, Any]]:
+        """DDIF_FIELDINFO_GET 필드 목록 (FIELDNAME, LENG, INTTYPE, KEYFLAG 등)"""
+        result = self.pool.call("DDIF_FIELDINFO_GET", TABNAME=table)
+        return list(result.get("DFIES_TAB", []))
+
+    def field_groups(self, table: str, fields: Optional[List[str]] = None,
+                     field_info: Optional[List[Dict[str, Any]]] = None) -> Tuple[List[str], List[List[str]], List[str]]:
+        """
+        필드 그룹 결정
+
+        Returns:
+            (키 필드, 그룹별 필드 목록, 읽을 수 없어 제외한 필드)
+            MANDT는 로그온 클라이언트 값뿐이므로 키 필드에서 빼고 일반 필드로 읽음
+        """
+        info = field_info or self.field_info(table)
+        by_name = {f["FIELDNAME"]: f for f in info}
+        fields = list(fields) if fields else [f["FIELDNAME"] for f in info]
+        unknown = [f for f in fields if f not in by_name]
+        if unknown:
+            raise ValueError(f"{table}에 없는 필드: {', '.join(unknown)}")
+
+        key_fields = [f["FIELDNAME"] for f in info if f.get("KEYFLAG") == "X" and f["FIELDNAME"] != "MANDT"]
+        if not key_fields:
+            raise ValueError(f"{table}: 키 필드가 없어 필드 그룹을 다시 합칠 수 없습니다")
+
+        skipped = [f for f in fields if by_name[f].get("INTTYPE") in UNREADABLE_INTTYPES]
+        readable = [f for f in fields if f not in skipped]
+        widths = {name: rfc_field_width(by_name[name]) for name in {*readable, *key_fields}}
+        groups = pack_field_groups(readable, widths, key_fields, self.row_width)
+        return key_fields, groups, skipped
+
+    def _read_group(self, table: str, fields: List[str], conditions: List[str],
+                    partition_key: str, partition: _Partition) -> Tuple[List[List[str]], int]:
+        options = build_options(conditions, range_condition(partition_key, partition.lower, partition.upper))
+        _, rows, calls = self._read_range(table, fields, options, self.page_size)
+        return rows, calls
+
+    @staticmethod
+    def _merge(key_count: int, group_rows: List[List[List[str]]]) -> Tuple[List[List[str]], int]:
+        """그룹별 행을 키로 합침 (합친 행, 일부 그룹에만 있는 행 수)"""
+        first, rest = group_rows[0], group_rows[1:]
+        lookups = [{tuple(row[:key_count]): row[key_count:] for row in rows} for rows in rest]
+        merged = []
+        for row in first:
+            key = tuple(row[:key_count])
+            combined = row
+            for lookup in lookups:
+                part = lookup.get(key)
+                if part is None:
+                    break
+                combined = combined + part
+            else:
+                merged.append(combined)
+        return merged, max(len(rows) for rows in group_rows) - len(merged)
+
+    def iter_chunks(
+        self,
+        table: str,
+        fields: Optional[List[str]] = None,
+        conditions: Optional[List[str]] = None,
+        partition_key: Optional[str] = None,
+        max_rows: Optional[int] = None,
+        field_info: Optional[List[Dict[str, Any]]] = None,
+        stats: Optional[ExtractStats] = None
+    ) -> Iterator[Tuple[List[str], List[List[str]]]]:
+        """
+        파티션 순서대로 합친 행 묶음을 내보냄 ((필드 이름, 행) 반복)
+
+        Args:
+            fields: 읽을 필드 (None이면 모든 필드, 키 필드는 빠져 있어도 앞에 추가)
+            conditions: WHERE 조건 줄
+            partition_key: 범위 분할 필드 (기본: 첫 키 필드)
+            max_rows: 최대 행 수 (정렬된 분할 키 앞쪽 행, RFC_READ_TABLE에는 ORDER BY가 없으므로
+                      모든 그룹이 같은 행을 읽도록 키 범위로 제한)
+            field_info: DDIF_FIELDINFO_GET 결과 (이미 조회했으면 재사용)
+        """
+        conditions = list(conditions or [])
+        stats = stats if stats is not None else ExtractStats(table=table)
+        field_info = field_info or self.field_info(table)
+        fields = list(dict.fromkeys(fields or [f["FIELDNAME"] for f in field_info]))
+        key_fields, groups, skipped = self.field_groups(table, fields, field_info)
+        partition_key = partition_key or key_fields[0]
+        if skipped:
+            self._log(f"   ⚠️ RFC_READ_TABLE로 읽을 수 없는 필드 {len(skipped)}개 제외: {', '.join(skipped[:10])}")
+
+        # 출력 순서: 요청 필드 순서 (빠진 키 필드는 앞에)
+        output = [k for k in key_fields if k not in fields] + [f for f in fields if f not in skipped]
+        concatenated = [*key_fields, *(f for group in groups for f in group[len(key_fields):])]
+        positions = [concatenated.index(name) for name in output]
+        pick = operator.itemgetter(*positions) if len(positions) > 1 else (lambda row: (row[positions[0]],))
+
+        keys, calls = self._read_keys(table, conditions, partition_key)
+        stats.calls += calls
+        stats.key_rows = len(keys)
+        if max_rows and len(keys) > max_rows:
+            keys = keys[:max_rows]
+        partitions = self._partitions_for(keys)
+        if max_rows and keys:
+            partitions[-1].upper = keys[-1]
+        stats.partitions = len(partitions)
+        stats.groups = len(groups)
+        self._log(
+            f"   🧩 {table} 필드 {len(output)}개 → 그룹 {len(groups)}개 (키 {'+'.join(key_fields)}), "
+            f"{partition_key} 키 {len(keys):,}개 → 파티션 {len(partitions)}개"
+        )
+
+        # 파티션별로 그룹을 동시에 읽음 (커넥션을 채울 만큼의 파티션만 미리 요청)
+        window = max(2, math.ceil(self.pool.size / len(groups)) + 1)
+        emitted = 0
+        with ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix=f"rfc-wide-{table}") as executor:
+            def submit(partition: _Partition):
+                return partition, [
+                    executor.submit(self._read_group, table, group, conditions, partition_key, partition)
+                    for group in groups
+                ]
+
+            upcoming = iter(partitions)
+            pending = deque(submit(p) for _, p in zip(range(window), upcoming))
+            while pending:
+                partition, futures = pending.popleft()
+                results = [f.result() for f in futures]
+                next_partition = next(upcoming, None)
+                if next_partition is not None:
+                    pending.append(submit(next_partition))
+
+                stats.calls += sum(calls for _, calls in results)
+                merged, mismatched = self._merge(len(key_fields), [rows for rows, _ in results])
+                if mismatched:
+                    # 그룹을 읽는 사이에 행이 바뀜 → 파티션을 한 번 다시 읽음
+                    # (풀 크기만큼의 워커 안에서 읽어 진행 중인 파티션과 커넥션을 더 다투지 않도록 executor로)
+                    results = [f.result() for f in submit(partition)[1]]
+                    stats.calls += sum(calls for _, calls in results)
+                    merged, mismatched = self._merge(len(key_fields), [rows for rows, _ in results])
+                    stats.mismatched += mismatched
+                    if mismatched:
+                        self._log(f"   ⚠️ 파티션 {partition.index + 1}: 그룹 사이 키가 맞지 않는 행 {mismatched}개 제외")
+
+                rows = merged if positions == list(range(len(concatenated))) else [list(pick(row)) for row in merged]
+                if max_rows:
+                    rows = rows[:max_rows - emitted]
+                emitted += len(rows)
+                stats.rows += len(rows)
+                yield output, rows
+
+    def read(
+        self,
+        table: str,
+        fields: Optional[List[str]] = None,
+        conditions: Optional[List[str]] = None,
+        partition_key: Optional[str] = None,
+        max_rows: Optional[int] = None,
+        field_info: Optional[List[Dict[str, Any]]] = None
+    ) -> ExtractResult:
+        """모든 필드 그룹을 읽어 한 번에 반환 (큰 테이블은 iter_chunks로 나눠 적재)"""
+        stats = ExtractStats(table=table)
+        started = time.time()
+        names: List[str] = []
+        rows: List[List[str]] = []
+        for names, chunk in self.iter_chunks(table, fields, conditions, partition_key, max_rows, field_info, stats):
+            rows.extend(chunk)
+        stats.seconds = time.time() - started
+        return ExtractResult(names, rows, stats)
+
+
+# ========================
+# Fake RFC (테스트/벤치마크용)
+# ========================
+
+class RFCError(Exception):
+    """FakeRFCConnection 호출 오류 (pyrfc ABAPApplicationError 대응, key는 ABAP 예외 이름)"""
+
+    def __init__(self, key: str, message: str = ""):
+        self.key = key
+        super().__init__(f"{key}: {message}" if message else key)
+
+
+@dataclass
+class FakeTable:
+    """
+    FakeRFCServer 테이블 (필드 순서대로의 값 튜플 목록)
+
+    행은 키 필드 순서(없으면 첫 필드)로 정렬해 두고, 첫 키 필드의 범위 조건은 이진 탐색으로 찾습니다.
+    """
+    name: str
+    fields: List[str]
+    rows: List[Tuple[str, ...]]
+    lengths: Dict[str, int] = field(default_factory=dict)
+    key_fields: List[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        for i, name in enumerate(self.fields):
+            if name not in self.lengths:
+                self.lengths[name] = max([len(row[i]) for row in self.rows] + [1])
+        if not self.key_fields:
+            self.key_fields = self.fields[:1]
+        positions = [self.fields.index(k) for k in self.key_fields]
+        self.rows = sorted(self.rows, key=lambda row: tuple(row[p] for p in positions))
+        self.index = [row[positions[0]] for row in self.rows]
+        # RFC_READ_TABLE 결과처럼 필드 길이만큼 공백을 채운 값 (호출마다 다시 만들지 않도록)
+        widths = [self.lengths[name] for name in self.fields]
+        self.padded = {id(row): tuple(v.ljust(w) for v, w in zip(row, widths)) for row in self.rows}
+
+    def row_width(self, names: List[str]) -> int:
+        return sum(self.lengths[name] for name in names)
+
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<str>'(?:[^']|'')*')|(?P<op><>|>=|<=|=|<|>)|(?P<punct>[(),])"
+    r"|(?P<num>-?\d+(?:\.\d+)?)(?![A-Za-z_])|(?P<word>[A-Za-z_/][A-Za-z0-9_/]*))"
+)
+_WORD_OPS = {"EQ": "=", "NE": "<>", "GT": ">", "GE": ">=", "LT": "<", "LE": "<="}
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match or match.end() == pos:
+            raise RFCError("OPTION_NOT_VALID", text[pos:pos + 20])
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "str":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "word" and value.upper() in _WORD_OPS:
+            kind, value = "op", _WORD_OPS[value.upper()]
+        elif kind == "word":
+            value = value.upper()
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+def _compare(left: str, op: str, right: Any) -> bool:
+    if isinstance(right, float):
+        try:
+            left = float(left or 0)
+        except ValueError:
+            return False
+    else:
+        left = left.rstrip()
+        right = right.rstrip()
+    if op == "=":
+        return left == right
+    if op == "<>":
+        return left != right
+    if op == ">":
+        return left > right
+    if op == ">=":
+        return left >= right
+    if op == "<":
+        return left < right
+    return left <= right
+
+
+class _WhereParser:
+    """
+    RFC_READ_TABLE OPTIONS의 간단한 ABAP WHERE 절 해석기
+
+    비교(=, <>, >, >=, <, <=, EQ/NE/GT/GE/LT/LE), IN (...), LIKE, NOT, AND, OR, 괄호를 지원하며
+    (행 → bool 함수, AND로 묶인 문자열 비교에서 얻은 필드별 범위)로 변환합니다.
+    범위는 FakeRFCServer가 정렬된 키 필드를 이진 탐색하는 데 씁니다 (SAP 인덱스 접근 흉내).
+    """
+
+    def __init__(self, text: str, columns: Dict[str, int]):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.columns = columns
+
+    def _peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ("end", "")
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _expect(self, value: str):
+        if self._next()[1] != value:
+            raise RFCError("OPTION_NOT_VALID", f"expected {value}")
+
+    def _literal(self) -> Any:
+        kind, value = self._next()
+        if kind == "str":
+            return value
+        if kind == "num":
+            return float(value)
+        raise RFCError("OPTION_NOT_VALID", f"literal expected, got {value}")
+
+    def parse(self) -> Tuple[Callable[[Tuple[str, ...]], bool], Dict[str, List[Any]]]:
+        if not self.tokens:
+            return (lambda row: True), {}
+        predicate, bounds = self._or()
+        if self.pos != len(self.tokens):
+            raise RFCError("OPTION_NOT_VALID", f"unexpected {self._peek()[1]}")
+        return predicate, bounds
+
+    def _or(self):
+        terms = [self._and()]
+        while self._peek() == ("word", "OR"):
+            self._next()
+            terms.append(self._and())
+        if len(terms) == 1:
+            return terms[0]
+        predicates = [t[0] for t in terms]
+        return (lambda row: any(p(row) for p in predicates)), {}
+
+    def _and(self):
+        factors = [self._factor()]
+        while self._peek() == ("word", "AND"):
+            self._next()
+            factors.append(self._factor())
+        if len(factors) == 1:
+            return factors[0]
+        predicates = [f[0] for f in factors]
+        bounds: Dict[str, List[Any]] = {}
+        for _, factor_bounds in factors:
+            for name, (lower, upper) in factor_bounds.items():
+                current = bounds.setdefault(name, [None, None])
+                if lower is not None and (current[0] is None or lower > current[0]):
+                    current[0] = lower
+                if upper is not None and (current[1] is None or upper < current[1]):
+                    current[1] = upper
+        if len(predicates) == 2:
+            first, second = predicates
+            return (lambda row: first(row) and second(row)), bounds
+        return (lambda row: all(p(row) for p in predicates)), bounds
+
+    def _factor(self):
+        if self._peek() == ("word", "NOT"):
+            self._next()
+            inner = self._factor()[0]
+            return (lambda row: not inner(row)), {}
+        if self._peek() == ("punct", "("):
+            self._next()
+            inner = self._or()
+            self._expect(")")
+            return inner
+
+        kind, name = self._next()
+        if kind != "word" or name not in self.columns:
+            raise RFCError("FIELD_NOT_VALID", name)
+        index = self.columns[name]
+
+        negate = False
+        if self._peek() == ("word", "NOT"):
+            self._next()
+            negate = True
+
+        bounds: Dict[str, List[Any]] = {}
+        kind, op = self._next()
+        if (kind, op) == ("word", "IN"):
+            self._expect("(")
+            values = [self._literal()]
+            while self._peek() == ("punct", ","):
+                self._next()
+                values.append(self._literal())
+            self._expect(")")
+            strings = {v.rstrip() for v in values if isinstance(v, str)}
+            if any(isinstance(v, float) for v in values):
+                predicate = lambda row: any(_compare(row[index], "=", v) for v in values)
+            else:
+                predicate = lambda row: row[index].rstrip() in strings
+                bounds[name] = [min(strings), max(strings)]
+        elif (kind, op) == ("word", "LIKE"):
+            pattern = str(self._literal())
+            regex = re.compile(
+                "^" + "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern) + "$"
+            )
+            predicate = lambda row: bool(regex.match(row[index].rstrip()))
+        elif kind == "op":
+            value = self._literal()
+            predicate = lambda row: _compare(row[index], op, value)
+            if isinstance(value, str):
+                # 범위는 포함 여부와 관계없이 닫힌 구간으로 근사 (정확한 판정은 predicate가 함)
+                if op in ("=", ">", ">="):
+                    bounds.setdefault(name, [None, None])[0] = value.rstrip()
+                if op in ("=", "<", "<="):
+                    bounds.setdefault(name, [None, None])[1] = value.rstrip()
+        else:
+            raise RFCError("OPTION_NOT_VALID", f"operator expected after {name}")
+
+        if negate:
+            return (lambda row: not predicate(row)), {}
+        return predicate, bounds
+
+
+@dataclass
+class FakeRFCStats:
+    calls: int = 0
+    rows_returned: int = 0
+    rows_scanned: int = 0  # 건너뛴 행(ROWSKIPS) 포함
+    connections: int = 0
+    max_concurrent: int = 0
+
+
+class FakeRFCServer:
+    """
+    RFC_READ_TABLE을 흉내 내는 가짜 SAP 서버
+
+    호출마다 (call_latency + 읽은 행 수 x scan_cost + 반환 바이트 x byte_cost)초를 sleep하여
+    ROWSKIPS가 앞부분을 다시 읽는 비용과 네트워크 전송 비용을 재현합니다.
+    (첫 키 필드 범위 조건은 SAP에서 인덱스로 처리되므로 조건에 맞는 행만 읽은 것으로 계산)
+    """
+
+    def __init__(
+        self,
+        tables: Optional[List[FakeTable]] = None,
+        call_latency: float = 0.0,
+        scan_cost: float = 0.0,
+        byte_cost: float = 0.0
+    ):
+        self.tables: Dict[str, FakeTable] = {t.name: t for t in tables or []}
+        self.call_latency = call_latency
+        self.scan_cost = scan_cost
+        self.byte_cost = byte_cost
+        self.stats = FakeRFCStats()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._filtered: Dict[Tuple[str, str], List[Tuple[str, ...]]] = {}
+
+    def add_table(self, table: FakeTable):
+        self.tables[table.name] = table
+        self._filtered = {k: v for k, v in self._filtered.items() if k[0] != table.name}
+
+    def connect(self) -> "FakeRFCConnection":
+        with self._lock:
+            self.stats.connections += 1
+        return FakeRFCConnection(self)
+
+    def _filter(self, table: FakeTable, where: str) -> List[Tuple[str, ...]]:
+        # 같은 조건의 ROWSKIPS 페이징이 매번 다시 해석하지 않도록 결과를 보관
+        cache_key = (table.name, where)
+        with self._lock:
+            cached = self._filtered.get(cache_key)
+        if cached is not None:
+            return cached
+        columns = {name: i for i, name in enumerate(table.fields)}
+        predicate, bounds = _WhereParser(where, columns).parse()
+        rows = table.rows
+        lower, upper = bounds.get(table.key_fields[0], (None, None))
+        if lower is not None or upper is not None:
+            start = bisect.bisect_left(table.index, lower) if lower is not None else 0
+            end = bisect.bisect_right(table.index, upper) if upper is not None else len(rows)
+            rows = rows[start:end]
+        matched = [row for row in rows if predicate(row)]
+        with self._lock:
+            if len(self._filtered) > 256:
+                self._filtered.clear()
+            self._filtered[cache_key] = matched
+        return matched
+
+    def field_info(self, TABNAME: str, **_) -> Dict[str, Any]:
+        """DDIF_FIELDINFO_GET (모든 필드를 문자 타입으로, 키 필드는 KEYFLAG='X')"""
+        table = self.tables.get(TABNAME)
+        if table is None:
+            raise RFCError("NOT_FOUND", TABNAME)
+        with self._lock:
+            self.stats.calls += 1
+        time.sleep(self.call_latency)
+        dfies = []
+        offset = 0
+        for position, name in enumerate(table.fields, 1):
+            length = table.lengths[name]
+            dfies.append({
+                "TABNAME": TABNAME, "FIELDNAME": name, "POSITION": position, "OFFSET": offset,
+                "LENG": length, "OUTPUTLEN": length, "INTTYPE": "C", "DATATYPE": "CHAR", "DECIMALS": 0,
+                "KEYFLAG": "X" if name in table.key_fields else "", "FIELDTEXT": "",
+            })
+            offset += length
+        return {"DFIES_TAB": dfies}
+
+    def read_table(self, QUERY_TABLE: str, DELIMITER: str = "", NO_DATA: str = "",
+                   FIELDS: Optional[List[Dict[str, str]]] = None, OPTIONS: Optional[List[Dict[str, str]]] = None,
+                   ROWSKIPS: int = 0, ROWCOUNT: int = 0, **_) -> Dict[str, Any]:
+        table = self.tables.get(QUERY_TABLE)
+        if table is None:
+            raise RFCError("TABLE_NOT_AVAILABLE", QUERY_TABLE)
+
+        names = [f["FIELDNAME"] for f in FIELDS or []] or list(table.fields)
+        unknown = [n for n in names if n not in table.lengths]
+        if unknown:
+            raise RFCError("FIELD_NOT_VALID", ", ".join(unknown))
+
+        field_info = []
+        offset = 0
+        for name in names:
+            length = table.lengths[name]
+            field_info.append({"FIELDNAME": name, "OFFSET": offset, "LENGTH": length, "TYPE": "C", "FIELDTEXT": ""})
+            offset += length + len(DELIMITER)
+        if offset - len(DELIMITER) > RFC_ROW_WIDTH:
+            raise RFCError("DATA_BUFFER_EXCEEDED", f"{offset - len(DELIMITER)} > {RFC_ROW_WIDTH}")
+
+        for line in OPTIONS or []:
+            if len(line["TEXT"]) > OPTIONS_LINE_WIDTH:
+                raise RFCError("OPTION_NOT_VALID", f"line longer than {OPTIONS_LINE_WIDTH}: {line['TEXT'][:40]}")
+
+        if NO_DATA:
+            return {"FIELDS": field_info, "DATA": []}
+
+        where = " ".join(line["TEXT"] for line in OPTIONS or [])
+        matched = self._filter(table, where)
+        end = ROWSKIPS + ROWCOUNT if ROWCOUNT else len(matched)
+        page = matched[ROWSKIPS:end]
+
+        pick = operator.itemgetter(*[table.fields.index(name) for name in names])
+        if len(names) == 1:
+            data = [{"WA": pick(table.padded[id(row)])} for row in page]
+        else:
+            data = [{"WA": DELIMITER.join(pick(table.padded[id(row)]))} for row in page]
+
+        scanned = min(end, len(matched))
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.rows_returned += len(page)
+            self.stats.rows_scanned += scanned
+        time.sleep(self.call_latency + scanned * self.scan_cost + len(page) * table.row_width(names) * self.byte_cost)
+        return {"FIELDS": field_info, "DATA": data}
+
+
+class FakeRFCConnection:
+    """pyrfc.Connection 대용 (call/close만 구현, RFC_READ_TABLE과 DDIF_FIELDINFO_GET만 지원)"""
+
+    def __init__(self, server: FakeRFCServer):
+        self.server = server
+        self.alive = True
+
+    def call(self, function: str, **params) -> Dict[str, Any]:
+        if not self.alive:
+            raise RFCError("RFC_INVALID_HANDLE", "connection closed")
+        if function not in ("RFC_READ_TABLE", "DDIF_FIELDINFO_GET"):
+            raise RFCError("FU_NOT_FOUND", function)
+        server = self.server
+        with server._lock:
+            server._active += 1
+            server.stats.max_concurrent = max(server.stats.max_concurrent, server._active)
+        try:
+            if function == "DDIF_FIELDINFO_GET":
+                return server.field_info(**params)
+            return server.read_table(**params)
+        finally:
+            with server._lock:
+                server._active -= 1
+
+    def close(self):
+        self.alive = False
@@ -0,0 +1,197 @@
+"""
+RFC Semi-Join - 키 목록에 해당하는 SAP 차원 테이블 행 조회
+MARD 재고 행의 자재번호로 MARA/MAKT/MBEW를 읽는 것처럼, 이미 가진 키 집합에 대한 행만 가져옴
+
+기존 방식(키마다 RFC_READ_TABLE 1회)은 키 수만큼 왕복하므로 느려서 앞의 100개/50개 자재만 조회했습니다.
+키 수에 따라 두 가지 방식 중 하나를 고릅니다.
+
+1. IN 목록 배치 (키 SEMIJOIN_FULL_SCAN_KEYS개 이하)
+   키를 정렬하여 SEMIJOIN_BATCH_KEYS개씩 "KEY IN ('A','B',...)" 조건으로 묶고 (OPTIONS 72자 줄로 나눔)
+   배치를 RFC 커넥션 풀에서 동시에 읽음 → 호출 수 = 키 수 / 배치 크기
+   (정렬된 배치는 키 범위가 좁아 SAP가 기본 키 인덱스의 좁은 구간만 읽음)
+2. 필터 전체 추출 + 메모리 해시 조인 (키가 더 많을 때)
+   추가 조건(SPRAS 등)만 걸어 테이블을 rfc_extract의 키 범위 분할 병렬 추출로 한 번 읽고
+   키 집합(set)에 있는 행만 남김 → 배치가 수십 개를 넘으면 IN 목록을 해석하는 비용보다 유리
+
+반환 행은 어느 방식이든 같으므로 호출하는 쪽은 pandas merge 등으로 그대로 조인합니다.
+방식별 호출 수/시간은 `python benchmark_rfc_semijoin.py`로 비교합니다.
+"""
+
+from typing import List, Dict, Any, Optional, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
+import threading
+import time
+
+from rfc_extract import RFC_PAGE_SIZE, RFCConnectionPool, RFCTableExtractor, quote
+
+# ========================
+# Configuration
+# ========================
+
+# IN 목록 한 번에 넣을 키 수 (OPTIONS 줄 수와 SAP 동적 WHERE 길이 제한을 고려)
+SEMIJOIN_BATCH_KEYS = int(os.getenv("SEMIJOIN_BATCH_KEYS", 500))
+
+# 키가 이 수를 넘으면 IN 목록 대신 필터 전체 추출 + 해시 조인
+SEMIJOIN_FULL_SCAN_KEYS = int(os.getenv("SEMIJOIN_FULL_SCAN_KEYS", 20000))
+
+STRATEGY_AUTO = "auto"
+STRATEGY_IN_LIST = "in_list"
+STRATEGY_FULL_SCAN = "full_scan"
+
+
+def in_condition(key: str, values: Iterable[str]) -> str:
+    """KEY IN ('A','B',...) 조건 (build_options가 72자 줄로 나눔)"""
+    return f"{key} IN ({','.join(quote(v) for v in values)})"
+
+
+@dataclass
+class SemiJoinStats:
+    table: str
+    keys: int = 0
+    strategy: str = ""
+    batches: int = 0
+    calls: int = 0
+    rows: int = 0
+    scanned_rows: int = 0  # 전체 추출에서 해시 조인 전 읽은 행 수
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "keys": self.keys,
+            "strategy": self.strategy,
+            "batches": self.batches,
+            "calls": self.calls,
+            "rows": self.rows,
+            "scanned_rows": self.scanned_rows,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+@dataclass
+class SemiJoinResult:
+    fields: List[str]
+    rows: List[List[str]]
+    stats: SemiJoinStats
+
+    def records(self) -> List[Dict[str, str]]:
+        return [dict(zip(self.fields, row)) for row in self.rows]
+
+
+class RFCSemiJoin:
+    """
+    키 목록 기준 SAP 테이블 조회 (semi-join)
+
+    사용 예:
+        pool = RFCConnectionPool(lambda: Connection(**SAP_CONFIG))
+        result = RFCSemiJoin(pool).read('MAKT', 'MATNR', materials, ['MATNR', 'MAKTX'], ["SPRAS = '3'"])
+        df_makt = pd.DataFrame(result.rows, columns=result.fields)
+    """
+
+    def __init__(
+        self,
+        pool: RFCConnectionPool,
+        batch_keys: int = SEMIJOIN_BATCH_KEYS,
+        full_scan_keys: int = SEMIJOIN_FULL_SCAN_KEYS,
+        page_size: int = RFC_PAGE_SIZE,
+        verbose: bool = True
+    ):
+        self.pool = pool
+        self.batch_keys = max(1, batch_keys)
+        self.full_scan_keys = full_scan_keys
+        self.extractor = RFCTableExtractor(pool, page_size=page_size, verbose=False)
+        self.verbose = verbose
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def choose_strategy(self, key_count: int) -> str:
+        return STRATEGY_FULL_SCAN if key_count > self.full_scan_keys else STRATEGY_IN_LIST
+
+    def read(
+        self,
+        table: str,
+        key: str,
+        keys: Iterable[str],
+        fields: List[str],
+        conditions: Optional[List[str]] = None,
+        strategy: str = STRATEGY_AUTO
+    ) -> SemiJoinResult:
+        """
+        key 값이 keys에 있는 table 행 조회
+
+        Args:
+            table: SAP 테이블 이름
+            key: 조인 키 필드 (fields에 없으면 앞에 추가)
+            keys: 키 값 목록 (중복/빈 값은 제외, SAP 내부 형식 그대로 예: 선행 0 포함 자재번호)
+            fields: 읽을 필드 이름 목록
+            conditions: 추가 WHERE 조건 줄 (예: ["SPRAS = '3'"])
+            strategy: auto(키 수로 선택) / in_list / full_scan
+        """
+        fields = fields if key in fields else [key, *fields]
+        conditions = list(conditions or [])
+        key_set = {str(k).strip() for k in keys if k is not None and str(k).strip()}
+        stats = SemiJoinStats(table=table, keys=len(key_set))
+        started = time.time()
+
+        if not key_set:
+            stats.strategy = STRATEGY_IN_LIST
+            return SemiJoinResult(fields, [], stats)
+
+        stats.strategy = self.choose_strategy(len(key_set)) if strategy == STRATEGY_AUTO else strategy
+        if stats.strategy == STRATEGY_FULL_SCAN:
+            names, rows = self._read_full_scan(table, key, key_set, fields, conditions, stats)
+        else:
+            names, rows = self._read_in_list(table, key, sorted(key_set), fields, conditions, stats)
+
+        stats.rows = len(rows)
+        stats.seconds = time.time() - started
+        detail = f"배치 {stats.batches}개" if stats.strategy == STRATEGY_IN_LIST else f"{stats.scanned_rows:,}행 중"
+        self._log(
+            f"   🔗 {table} {key} {stats.keys:,}개 → {stats.strategy} ({detail}, "
+            f"{stats.rows:,}행, 호출 {stats.calls}회, {stats.seconds:.1f}초)"
+        )
+        return SemiJoinResult(names, rows, stats)
+
+    def _read_in_list(self, table: str, key: str, keys: List[str], fields: List[str],
+                      conditions: List[str], stats: SemiJoinStats):
+        """정렬된 키를 batch_keys개씩 IN 조건으로 묶어 풀 크기만큼 동시 조회"""
+        batches = [keys[i:i + self.batch_keys] for i in range(0, len(keys), self.batch_keys)]
+        stats.batches = len(batches)
+        done = 0
+        progress_lock = threading.Lock()
+
+        def run(batch: List[str]):
+            nonlocal done
+            result = self.extractor.read_where(table, fields, conditions, in_condition(key, batch))
+            with progress_lock:
+                done += 1
+                if len(batches) >= 10 and (done == len(batches) or done % max(1, len(batches) // 10) == 0):
+                    self._log(f"   {table} 배치 {done}/{len(batches)} 완료")
+            return result
+
+        workers = min(self.pool.size, len(batches))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"semijoin-{table}") as executor:
+            results = list(executor.map(run, batches))
+
+        names = results[0].fields or fields
+        rows = []
+        for result in results:
+            rows.extend(result.rows)
+            stats.calls += result.stats.calls
+        return names, rows
+
+    def _read_full_scan(self, table: str, key: str, key_set: set, fields: List[str],
+                        conditions: List[str], stats: SemiJoinStats):
+        """추가 조건만으로 테이블을 분할 병렬 추출한 뒤 키 집합에 있는 행만 남김"""
+        result = self.extractor.read(table, fields, conditions, partition_key=key)
+        stats.calls = result.stats.calls
+        stats.batches = result.stats.partitions
+        stats.scanned_rows = len(result.rows)
+        position = result.fields.index(key)
+        rows = [row for row in result.rows if row[position] in key_set]
+        return result.fields, rows
+
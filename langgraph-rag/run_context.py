@@ -0,0 +1,66 @@
+"""
+Run Context - 요청 단위 에이전트 실행 상태
+LangChainSQLAgent.run() 한 번에 필요한 가변 상태를 모아 요청마다 새로 생성
+
+LLM 클라이언트, DB 엔진, 컴파일된 AgentExecutor는 프로세스 전역으로 공유하고
+행 제한, 콜백, 메트릭, 결과 캡처, 취소 토큰(DB 쿼리 취소 범위 포함)은 요청마다 분리하여
+동시 요청이 서로의 설정을 덮어쓰지 않도록 합니다.
+"""
+
+from typing import List, Any, Optional
+from dataclasses import dataclass, field
+from agent_metrics import AgentMetrics
+from sql_query_tool import ResultCapture
+from query_budget import CancelScope
+import asyncio
+
+
+class RunCancelled(Exception):
+    """RunContext.cancel()로 실행이 취소됨"""
+
+
+@dataclass
+class RunContext:
+    """요청 하나의 실행 컨텍스트"""
+    query: str
+    max_rows: int
+    session_id: Optional[str] = None
+    metrics: Optional[AgentMetrics] = None
+    callbacks: List[Any] = field(default_factory=list)
+    capture: Optional[ResultCapture] = None
+    cancel_reason: Optional[str] = None
+    scope: CancelScope = field(default_factory=CancelScope)  # 실행 중인 DB 쿼리 취소 범위
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.metrics is None:
+            self.metrics = AgentMetrics(query=self.query)
+        if self.capture is None:
+            self.capture = ResultCapture(max_rows=self.max_rows)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    def attach(self, task: asyncio.Task):
+        """취소 대상 태스크 등록 (에이전트 실행 태스크)"""
+        self._task = task
+        if self.cancelled:
+            task.cancel()
+
+    def cancel(self, reason: str = "cancelled"):
+        """
+        실행 취소 (클라이언트 연결 끊김 등)
+
+        진행 중인 LLM 호출은 즉시 중단되고, 실행 중인 DB 쿼리에는 취소 요청을 보내
+        (PostgreSQL PQcancel) 서버에서도 실행이 멈춥니다.
+        """
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+        self.scope.cancel(self.cancel_reason)
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise RunCancelled(self.cancel_reason)
@@ -0,0 +1,275 @@
+"""
+SAP 필드 한글 매핑
+SAP 테이블 필드명(영문 약어)과 한글 컬럼명의 대응표
+
+임포터는 적재 시 컬럼명 변환에, Text-to-SQL 에이전트는 스키마 링킹의 동의어 사전으로 사용합니다.
+(pyrfc 없이도 import 할 수 있도록 별도 모듈로 분리)
+"""
+
+# SAP 필드 한글 매핑
+FIELD_MAPPING = {
+    # 공통
+    'MANDT': '클라이언트',
+    'BUKRS': '회사코드',
+    'WERKS': '플랜트',
+    'LGORT': '저장위치',
+    'MATNR': '자재번호',
+    'MAKTX': '자재명',
+    'MTART': '자재유형',
+    'MATKL': '자재그룹',
+    'MEINS': '기본단위',
+    'BSTME': '주문단위',
+    
+    # 재고 관련
+    'LABST': '가용재고',
+    'UMLME': '이동중재고',
+    'INSME': '품질검사재고',
+    'EINME': '제한재고',
+    'SPEME': '블록재고',
+    'RETME': '반품재고',
+    'KLABS': '미제한재고_누계',
+    'KINSM': '품질재고_누계',
+    'KSPEM': '블록재고_누계',
+    
+    # 중량/크기
+    'BRGEW': '총중량',
+    'NTGEW': '순중량',
+    'GEWEI': '중량단위',
+    'VOLUM': '부피',
+    'VOLEH': '부피단위',
+    
+    # 날짜
+    'ERSDA': '생성일',
+    'ERDAT': '생성일',
+    'ERZET': '생성시간',
+    'ERNAM': '생성자',
+    'LAEDA': '최종변경일',
+    'AENAM': '변경자',
+    
+    # 회계
+    'GJAHR': '회계연도',
+    'MONAT': '회계기간',
+    'PERDE': '기간',
+    'VERSN': '버전',
+    'OBJNR': '오브젝트번호',
+    'KSTAR': '원가요소',
+    'KOSTL': '원가센터',
+    'AUFNR': '내부오더',
+    
+    # 판매
+    'KUNNR': '고객번호',
+    'KNDNR': '고객번호',
+    'NAME1': '고객명',
+    'NAME2': '고객명2',
+    'VKORG': '판매조직',
+    'VTWEG': '유통채널',
+    'SPART': '제품군',
+    'VBELN': '판매문서',
+    'POSNR': '품목번호',
+    'KAUFN': '판매오더',
+    'KDPOS': '판매오더항목',
+    'ARTNR': '제품번호',
+    'VBTYP': '판매문서범주',
+    'AUART': '판매문서유형',
+    'AUDAT': '증빙일',
+    'VDATU': '납품요청일',
+    'BUKRS_VF': '청구회사코드',
+    'BZIRK': '판매지역',
+    'BZIRK_AUFT': '판매지역_오더',
+    'PRSDT': '가격결정일',
+    'ABGRU': '취소사유',
+    'FKART': '청구유형',
+    'FKDAT': '청구일',
+    'FKSTO': '청구취소',
+    'SFAKN': '취소청구',
+    'KUNAG': '판매처',
+    'KUNRG': '지급인',
+    'ZUONR': '할당번호',
+    'FKIMG': '청구수량',
+    'SHKZG': '차대지시자',
+    'KZWI1': '조건금액1',
+    'KZWI2': '조건금액2', 
+    'KZWI3': '조건금액3',
+    'KZWI4': '조건금액4',
+    'AUGRU': '오더사유',
+    'GWLDT': 'PO일자',
+    'PSPNR': '프로젝트번호',
+    'VBTYP': '판매문서범주',
+    'KURRF_DAT': '환율일자',
+    'RFBSK': '전기상태',
+    'AUBEL': '판매문서',
+    'AUPOS': '판매품목',
+    'PALEDGER': '원장',
+    'VRGAR': '레코드유형',
+    'VERSI': '버전',
+    'PERBL': '전기기간',
+    'VV005001': '월목표금액',
+    'VKGRP': '영업그룹',
+    'VKBUR': '영업사무소',
+    'BSTNK': '고객PO번호',
+    'BSTDK': '고객PO일자',
+    'ARKTX': '품목텍스트',
+    'VSTEL': '출하지점',
+    'ROUTE': '경로',
+    'KPEIN': '가격단위수량',
+    
+    # 구매
+    'LIFNR': '공급업체',
+    'EBELN': '구매문서',
+    'EBELP': '구매품목',
+    'EKGRP': '구매그룹',
+    'EKORG': '구매조직',
+    
+    # 금액 필드
+    'NETWR': '정가',
+    'WAERK': '통화',
+    'KWMENG': '주문수량',
+    'VRKME': '판매단위',
+    'NETPR': '단가',
+    'MENGE': '수량',
+    'DMBTR': '금액_현지통화',
+    'WRBTR': '금액_문서통화',
+    
+    # CO-PA 값 필드
+    'VV010': '매출액',
+    'VV020': '매출원가',
+    'VV030': '매출총이익',
+    
+    # 월별 금액 (WKG)
+    'WKG001': '1월',
+    'WKG002': '2월',
+    'WKG003': '3월',
+    'WKG004': '4월',
+    'WKG005': '5월',
+    'WKG006': '6월',
+    'WKG007': '7월',
+    'WKG008': '8월',
+    'WKG009': '9월',
+    'WKG010': '10월',
+    'WKG011': '11월',
+    'WKG012': '12월',
+    
+    # 기타
+    'BUTXT': '회사명',
+    'LAND1': '국가',
+    'REGIO': '지역',
+    'ORT01': '도시',
+    'STRAS': '주소',
+    'PSTLZ': '우편번호',
+    'TELF1': '전화번호',
+    'TELFX': '팩스번호',
+    'SPERR': '블록',
+    'LOEVM': '삭제표시',
+    'XBLNR': '참조문서',
+    'BELNR': '전표번호',
+    'BUZEI': '항목',
+    'BLART': '전표유형',
+    'BLDAT': '전표일자',
+    'BUDAT': '전기일자',
+    'CPUDT': '입력일자',
+    'USNAM': '사용자명',
+    'TCODE': '트랜잭션코드',
+    'BSCHL': '전기키',
+    'SHKZG': '차변/대변',
+    'MWSKZ': '세금코드',
+    'GSBER': '사업영역',
+    'PRCTR': '손익센터',
+    'SEGMENT': '세그먼트',
+    'ZUONR': '지정',
+    'SGTXT': '적요',
+    'AUFNR': '오더',
+    'ANLN1': '자산번호',
+    'ANLN2': '자산보조번호',
+    'SAKNR': 'G/L계정',
+    'HKONT': '총계정원장계정',
+    'UMSKZ': '특별G/L',
+    'ZFBDT': '기준일',
+    'ZTERM': '지급조건',
+    'ZBD1T': '현금할인일수1',
+    'ZBD2T': '현금할인일수2',
+    'ZBD3T': '순지급일수',
+    'REBZG': '참조전표',
+    'REBZJ': '참조연도',
+    'REBZZ': '참조항목',
+    'LZBKZ': '지급보류',
+    'DISKP': '할인율',
+    'WVERW': '사용목적',
+    'SQIKZ': '품질검사',
+    'PSTYP': '품목범주',
+    'KNUMV': '조건문서',
+    'KPOSN': '조건품목',
+    'KSCHL': '조건유형',
+    'KBETR': '조건금액',
+    'KONWA': '조건통화',
+    'KPEIN': '가격단위',
+    'KMEIN': '조건단위',
+    'KUMZA': '분자',
+    'KUMNE': '분모',
+    'AWTYP': '참조거래',
+    'AWKEY': '참조키',
+    'FIKRS': '재무영역',
+    'XWBZK': '원천세',
+    'QSSHB': '원천세액',
+    'QBSHB': '과세표준액',
+    'QSZDT': '원천세전기일',
+    'QSSEC': '원천세코드',
+    'EMPFB': '대체수취인',
+    'XREF1': '참조키1',
+    'XREF2': '참조키2',
+    'XREF3': '참조키3',
+    'DTWS1': '계획일1',
+    'DTWS2': '계획일2',
+    'DTWS3': '계획일3',
+    'DTWS4': '계획일4',
+    'XNEGP': '음수전기',
+    'RFZEI': '지급기준',
+    'CCINS': '카드회사',
+    'CCNUM': '카드번호',
+    'SSBLK': '지급보류사유',
+    'MANSP': '수동보류',
+    'MSCHL': '던닝키',
+    'MANST': '던닝레벨',
+    'MADAT': '독촉일',
+    'VBUND': '회사',
+    'XEGDR': '단일지급',
+    'RECID': 'RecoveryID',
+    'PPDIFF': '지급차액',
+    'PPDIF2': '지급차액2',
+    'PPDIF3': '지급차액3',
+    'PYCUR': '지급통화',
+    'PYAMT': '지급금액',
+    'BVTYP': '파트너은행유형',
+    'KTOSL': '거래유형',
+    'AGZEI': '정산기간',
+    'PERNR': '사원번호',
+    'DMBE2': '그룹통화금액',
+    'DMBE3': '하드통화금액',
+    'DMBE4': '인덱스기준금액',
+    'RDIFF': '반올림차액',
+    'RDIF2': '반올림차액2',
+    'RDIF3': '반올림차액3',
+    'BDIFF': '평가차액',
+    'BDIF2': '평가차액2',
+    'BDIF3': '평가차액3',
+    'XSTAT': '상태',
+    'XRUEB': '이월',
+    'XPANZ': '부분표시',
+    'XSTOV': '역분개',
+    'XSNET': '순지급',
+    'XSERG': '보충',
+    'XUMAN': '재분류',
+    'XANET': '순자산',
+    'XSKST': '원가차이',
+    'XINVE': '투자',
+    'XZAHL': '지급',
+    'XMANU': '수동생성',
+    'XBILK': '대차대조표계정',
+    'GVTYP': '손익유형',
+    'HKTID': '계정ID',
+    'XNEGP': '음수전기가능',
+    'VORGN': '거래유형',
+    'FDLEV': '계획레벨',
+    'FDGRP': '계획그룹',
+    'FDWBT': '계획금액',
+    'FDTAG': '계획일',
+}
@@ -12,6 +12,8 @@ from psycopg2 import sql
 from dotenv import load_dotenv
 from datetime import datetime
 import json
+from pg_bulk_load import copy_dataframe, prepare_staging, sap_date, sap_number, sap_time, swap_table
+from rfc_extract import RFCConnectionPool, WideTableExtractor
 
 # 환경변수 설정
 os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
@@ -58,6 +60,8 @@ def get_table_full_info(conn, table_name):
                     'FIELDNAME': field.get('FIELDNAME'),      # 필드명
                     'DATATYPE': field.get('DATATYPE'),        # 데이터 타입
                     'LENG': field.get('LENG'),                # 길이
+                    'INTTYPE': field.get('INTTYPE'),          # ABAP 내부 타입 (RFC_READ_TABLE 출력 폭 계산)
+                    'OUTPUTLEN': field.get('OUTPUTLEN'),      # 출력 길이
                     'DECIMALS': field.get('DECIMALS'),        # 소수점
                     'FIELDTEXT': field.get('FIELDTEXT'),      # 필드 설명 (한글)
                     'SCRTEXT_L': field.get('SCRTEXT_L'),      # 긴 설명
@@ -105,33 +109,24 @@ def read_table_with_all_fields(conn, table_name, max_rows=None):
         if not fields_info:
             return None, None
         
-        # 2. RFC_READ_TABLE은 최대 512바이트 제한이 있음
-        # 필드를 선택적으로 가져오거나 배치로 처리
-        
-        # 작은 테이블은 전체 필드 가져오기
+        # 2. RFC_READ_TABLE은 결과 행이 512바이트를 넘을 수 없으므로
+        # 필드를 키 필드 + 512바이트 이하 그룹으로 나눠 동시에 읽고 키로 합침 (rfc_extract.WideTableExtractor)
         print(f"\n📖 {table_name} 테이블 데이터 읽기 중...")
         
-        # 필드 리스트 생성 (필드명만)
-        field_list = [{'FIELDNAME': f['FIELDNAME']} for f in fields_info[:50]]  # 처음 50개 필드만
-        
-        result = conn.call('RFC_READ_TABLE',
-                          QUERY_TABLE=table_name,
-                          DELIMITER='|',
-                          FIELDS=field_list,
-                          ROWCOUNT=max_rows if max_rows else 1000)
+        pool = RFCConnectionPool(lambda: Connection(**SAP_CONFIG))
+        try:
+            result = WideTableExtractor(pool).read(
+                table_name, field_info=fields_info, max_rows=max_rows if max_rows else 1000
+            )
+        finally:
+            pool.close()
         
-        if result['DATA']:
-            print(f"✅ {len(result['DATA'])}개 행 읽기 완료")
+        if result.rows:
+            stats = result.stats
+            print(f"✅ {stats.rows}개 행 읽기 완료 (필드 {len(result.fields)}개, 그룹 {stats.groups}개, "
+                  f"호출 {stats.calls}회, {stats.seconds:.1f}초)")
             
-            # 데이터 파싱
-            field_names = [f['FIELDNAME'] for f in result['FIELDS']]
-            data = []
-            for row in result['DATA']:
-                values = row['WA'].split('|')
-                values = [v.strip() for v in values]
-                data.append(dict(zip(field_names, values)))
-            
-            df = pd.DataFrame(data)
+            df = pd.DataFrame(result.rows, columns=result.fields)
             return df, fields_info
         
         return None, fields_info
@@ -152,14 +147,16 @@ def create_postgres_table_auto(table_name, fields_info, df=None):
         # 테이블명 변환 (SAP_ 접두어 추가)
         pg_table_name = f"sap_{table_name.lower()}"
         
-        # 기존 테이블 삭제
-        cursor.execute(f"DROP TABLE IF EXISTS {pg_table_name} CASCADE")
+        # staging 테이블에 만든 뒤 기존 테이블과 교체 (적재 중에도 기존 데이터 조회 가능, 의존 뷰 유지)
+        staging = prepare_staging(conn, pg_table_name)
         
         # CREATE TABLE 문 생성
         columns = ["id SERIAL PRIMARY KEY"]
         comments = []
         
-        for field in fields_info[:50]:  # 처음 50개 필드만
+        # 읽은 필드만 (STRING 등 RFC_READ_TABLE로 읽을 수 없는 필드 제외)
+        table_fields = [f for f in fields_info if df is None or f.get('FIELDNAME') in df.columns]
+        for field in table_fields:
             field_name = field.get('FIELDNAME', '')
             data_type = field.get('DATATYPE', field.get('TYPE', 'CHAR'))
             length = field.get('LENG', field.get('LENGTH', 50))
@@ -185,16 +182,16 @@ def create_postgres_table_auto(table_name, fields_info, df=None):
             
             # 한글 설명이 있으면 코멘트 추가
             if field_text:
-                comments.append(f"COMMENT ON COLUMN {pg_table_name}.\"{field_name}\" IS '{field_text}';")
+                comments.append(f"COMMENT ON COLUMN {staging}.\"{field_name}\" IS '{field_text}';")
         
         # 메타데이터 컬럼 추가
         columns.append("created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
         columns.append("sap_sync_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
         
         # 테이블 생성
-        create_sql = f"CREATE TABLE {pg_table_name} (\n    " + ",\n    ".join(columns) + "\n)"
+        create_sql = f"CREATE TABLE {staging} (\n    " + ",\n    ".join(columns) + "\n)"
         cursor.execute(create_sql)
-        print(f"✅ {pg_table_name} 테이블 생성 완료")
+        print(f"✅ {staging} 테이블 생성 완료")
         
         # 코멘트 추가
         for comment in comments:
@@ -211,64 +208,37 @@ def create_postgres_table_auto(table_name, fields_info, df=None):
             # 필드 타입 정보 매핑
             field_types = {f['FIELDNAME']: f.get('DATATYPE', f.get('TYPE', '')) for f in fields_info}
             
-            inserted_count = 0
-            for _, row in df.iterrows():
-                insert_columns = []
-                insert_values = []
-                for col in df_columns:
-                    value = row[col]
-                    if pd.notna(value):
-                        # 날짜 필드 처리 (DATS 타입)
-                        if field_types.get(col) == 'DATS':
-                            if value == '00000000' or value == '' or value == '0':
-                                continue  # NULL로 처리
-                            else:
-                                # YYYYMMDD를 YYYY-MM-DD로 변환
-                                try:
-                                    if len(str(value)) == 8:
-                                        value = f"{value[:4]}-{value[4:6]}-{value[6:8]}"
-                                except:
-                                    continue
-                        
-                        # 시간 필드 처리 (TIMS 타입)
-                        elif field_types.get(col) == 'TIMS':
-                            if value == '000000' or value == '' or value == '0':
-                                continue  # NULL로 처리
-                            else:
-                                # HHMMSS를 HH:MM:SS로 변환
-                                try:
-                                    if len(str(value)) == 6:
-                                        value = f"{value[:2]}:{value[2:4]}:{value[4:6]}"
-                                except:
-                                    continue
-                        
-                        # 숫자 필드 처리
-                        elif field_types.get(col) in ['NUMC', 'DEC', 'CURR', 'QUAN', 'FLTP']:
-                            try:
-                                value = float(value) if value else 0
-                            except:
-                                value = 0
-                        
-                        insert_columns.append(f'"{col}"')
-                        insert_values.append(value)
-                
-                if insert_columns:
-                    try:
-                        insert_sql = f"INSERT INTO {pg_table_name} ({', '.join(insert_columns)}) VALUES ({', '.join(['%s'] * len(insert_values))})"
-                        cursor.execute(insert_sql, insert_values)
-                        inserted_count += 1
-                        if inserted_count % 100 == 0:
-                            conn.commit()
-                            print(f"  📝 {inserted_count}개 저장 중...")
-                    except Exception as e:
-                        if inserted_count == 0:
-                            print(f"  ⚠️ 첫 번째 행 삽입 오류: {str(e)[:100]}")
-                        continue
+            # 타입별 변환 (DATS → 날짜, TIMS → 시간, 숫자 타입 → float, 빈 값은 NULL)
+            # (전체 필드는 컬럼이 수백 개이므로 한 번에 DataFrame 생성)
+            load_columns = {}
+            for col in df_columns:
+                field_type = field_types.get(col)
+                if field_type == 'DATS':
+                    load_columns[col] = sap_date(df[col])
+                elif field_type == 'TIMS':
+                    load_columns[col] = sap_time(df[col])
+                elif field_type in ['NUMC', 'DEC', 'CURR', 'QUAN', 'FLTP']:
+                    load_columns[col] = sap_number(df[col])
+                else:
+                    load_columns[col] = df[col].astype(object).where(df[col].notna(), None)
+            load_df = pd.DataFrame(load_columns, index=df.index)
+            
+            try:
+                inserted_count = copy_dataframe(conn, staging, load_df)
+            except Exception as e:
+                print(f"  ⚠️ 데이터 적재 오류 (기존 테이블 유지): {str(e)[:100]}")
+                conn.rollback()
+                conn.close()
+                return
             
             print(f"✅ {inserted_count}개 데이터 삽입 완료 (전체: {len(df)}개)")
         
         conn.commit()
+        
+        # ANALYZE 후 기존 테이블과 교체
+        swap_table(conn, pg_table_name, staging)
         conn.close()
+        print(f"✅ {pg_table_name} 교체 완료")
         
         # 필드 정보를 별도 테이블에 저장
         save_field_info(table_name, fields_info)
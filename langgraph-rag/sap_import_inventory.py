@@ -10,6 +10,7 @@ import psycopg2
 from psycopg2 import sql
 from dotenv import load_dotenv
 from datetime import datetime
+from pg_bulk_load import column_or, copy_dataframe, prepare_staging, row_json, swap_table
 
 # 환경변수 설정
 os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
@@ -152,12 +153,12 @@ def import_zmmr0016():
             pg_conn = psycopg2.connect(DATABASE_URL)
             cursor = pg_conn.cursor()
             
-            # 기존 테이블 삭제
-            cursor.execute("DROP TABLE IF EXISTS sap_inventory_status CASCADE")
+            # staging 테이블에 적재한 뒤 기존 테이블과 교체 (적재 중에도 기존 데이터 조회 가능)
+            staging = prepare_staging(pg_conn, 'sap_inventory_status')
             
             # 테이블 생성 (한글 컬럼명)
-            create_table_query = """
-            CREATE TABLE sap_inventory_status (
+            create_table_query = f"""
+            CREATE TABLE {staging} (
                 id SERIAL PRIMARY KEY,
                 "자재" TEXT,
                 "자재명" TEXT,
@@ -176,37 +177,16 @@ def import_zmmr0016():
             """
             cursor.execute(create_table_query)
             
-            # 데이터 삽입
-            inserted_count = 0
-            for _, row in df.iterrows():
-                try:
-                    # 주요 필드 추출 (SAP 필드명은 실제 확인 필요)
-                    insert_query = """
-                    INSERT INTO sap_inventory_status (
-                        "자재", "자재명", "원본데이터"
-                    ) VALUES (%s, %s, %s::jsonb)
-                    """
-                    
-                    values = (
-                        row.get('MATNR'),  # 자재번호
-                        row.get('MAKTX'),  # 자재명
-                        pd.Series(row).to_json()  # 전체 데이터를 JSON으로 저장
-                    )
-                    
-                    cursor.execute(insert_query, values)
-                    inserted_count += 1
-                    
-                    if inserted_count % 1000 == 0:
-                        print(f"  📝 {inserted_count}개 저장 중...")
-                        pg_conn.commit()
-                
-                except Exception as e:
-                    if inserted_count == 0:  # 첫 번째 오류만 출력
-                        print(f"⚠️ 행 삽입 오류: {e}")
-                    pg_conn.rollback()
-                    continue
+            # 데이터 삽입 (COPY, 주요 필드 + 전체 데이터 JSON)
+            load_df = pd.DataFrame({
+                "자재": column_or(df, 'MATNR'),  # 자재번호
+                "자재명": column_or(df, 'MAKTX'),  # 자재명
+                "원본데이터": row_json(df),  # 전체 데이터를 JSON으로 저장
+            })
+            inserted_count = copy_dataframe(pg_conn, staging, load_df)
             
             pg_conn.commit()
+            swap_table(pg_conn, 'sap_inventory_status', staging)
             print(f"\n✅ {inserted_count}개 데이터 PostgreSQL 저장 완료")
             
             # 결과 확인
@@ -10,6 +10,7 @@ import pandas as pd
 import psycopg2
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from pg_bulk_load import column_or, copy_dataframe, prepare_staging, row_json, sap_number, swap_table
 
 # 환경변수 설정
 os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
@@ -248,11 +249,11 @@ def save_copa_to_postgres(df, table_name, params):
         conn = psycopg2.connect(DATABASE_URL)
         cursor = conn.cursor()
         
-        # 테이블 생성
-        cursor.execute("DROP TABLE IF EXISTS sap_ke33_copa CASCADE")
+        # staging 테이블에 적재한 뒤 기존 테이블과 교체 (적재 중에도 기존 데이터 조회 가능)
+        staging = prepare_staging(conn, 'sap_ke33_copa')
         
-        create_table = """
-        CREATE TABLE sap_ke33_copa (
+        create_table = f"""
+        CREATE TABLE {staging} (
             id SERIAL PRIMARY KEY,
             "회사코드" VARCHAR(4),
             "회계연도" VARCHAR(4),
@@ -270,50 +271,38 @@ def save_copa_to_postgres(df, table_name, params):
         """
         cursor.execute(create_table)
         
-        # 데이터 삽입
-        inserted = 0
-        for _, row in df.iterrows():
-            # 금액 필드 처리
-            revenue = 0
-            cost = 0
-            
-            # VV 필드에서 금액 추출
-            for col in df.columns:
-                if col.startswith('VV'):
-                    try:
-                        value = float(row[col]) if row[col] else 0
-                        if '010' in col:  # 매출
-                            revenue = value
-                        elif '020' in col:  # 원가
-                            cost = value
-                    except:
-                        pass
-            
-            cursor.execute("""
-                INSERT INTO sap_ke33_copa 
-                ("회사코드", "회계연도", "기간", "고객번호", "제품번호", "판매오더",
-                 "매출액", "매출원가", "매출총이익", "원본테이블", "원본데이터")
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb)
-            """, (
-                row.get('BUKRS', params.get('BUKRS')),
-                row.get('GJAHR', params.get('GJAHR')),
-                row.get('PERDE', ''),
-                row.get('KNDNR', ''),
-                row.get('ARTNR', ''),
-                row.get('KAUFN', ''),
-                revenue,
-                cost,
-                revenue - cost,
-                table_name,
-                pd.Series(row).to_json()
-            ))
-            inserted += 1
-            
-            if inserted % 100 == 0:
-                conn.commit()
-                print(f"  📝 {inserted}개 저장 중...")
+        # 금액 필드 처리 (VV 필드 중 010 = 매출, 020 = 원가, 여러 개면 뒤의 필드)
+        revenue = pd.Series(0.0, index=df.index)
+        cost = pd.Series(0.0, index=df.index)
+        for col in df.columns:
+            if col.startswith('VV'):
+                value = sap_number(df[col], default=None)
+                if '010' in col:
+                    revenue = value.fillna(revenue)
+                elif '020' in col:
+                    cost = value.fillna(cost)
+        
+        load_df = pd.DataFrame({
+            "회사코드": column_or(df, 'BUKRS', params.get('BUKRS')),
+            "회계연도": column_or(df, 'GJAHR', params.get('GJAHR')),
+            "기간": column_or(df, 'PERDE', ''),
+            "고객번호": column_or(df, 'KNDNR', ''),
+            "제품번호": column_or(df, 'ARTNR', ''),
+            "판매오더": column_or(df, 'KAUFN', ''),
+            "매출액": revenue,
+            "매출원가": cost,
+            "매출총이익": revenue - cost,
+            "원본테이블": table_name,
+            "원본데이터": row_json(df),
+        })
+        
+        # 데이터 삽입 (COPY)
+        inserted = copy_dataframe(conn, staging, load_df)
         
         conn.commit()
+        
+        # ANALYZE 후 기존 테이블과 교체
+        swap_table(conn, 'sap_ke33_copa', staging)
         conn.close()
         
         print(f"\n✅ sap_ke33_copa 테이블에 {inserted}개 데이터 저장 완료")
@@ -327,11 +316,11 @@ def save_cosp_to_postgres(df, params):
         conn = psycopg2.connect(DATABASE_URL)
         cursor = conn.cursor()
         
-        # 테이블 생성
-        cursor.execute("DROP TABLE IF EXISTS sap_ke33_cosp CASCADE")
+        # staging 테이블에 적재한 뒤 기존 테이블과 교체 (적재 중에도 기존 데이터 조회 가능)
+        staging = prepare_staging(conn, 'sap_ke33_cosp')
         
-        create_table = """
-        CREATE TABLE sap_ke33_cosp (
+        create_table = f"""
+        CREATE TABLE {staging} (
             id SERIAL PRIMARY KEY,
             "오브젝트번호" VARCHAR(22),
             "회계연도" VARCHAR(4),
@@ -348,33 +337,23 @@ def save_cosp_to_postgres(df, params):
         """
         cursor.execute(create_table)
         
-        # 데이터 삽입
-        inserted = 0
-        for _, row in df.iterrows():
-            # 월별 금액 합계
-            total = 0
-            amounts = []
-            for i in range(1, 7):
-                col = f'WKG{i:03d}'
-                amount = float(row.get(col, 0)) if row.get(col) else 0
-                amounts.append(amount)
-                total += amount
-            
-            cursor.execute("""
-                INSERT INTO sap_ke33_cosp 
-                ("오브젝트번호", "회계연도", "원가요소", "1월", "2월", "3월", "4월", "5월", "6월", "합계")
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                row.get('OBJNR'),
-                row.get('GJAHR'),
-                row.get('KSTAR'),
-                amounts[0], amounts[1], amounts[2],
-                amounts[3], amounts[4], amounts[5],
-                total
-            ))
-            inserted += 1
+        # 월별 금액과 합계
+        amounts = [sap_number(column_or(df, f'WKG{i:03d}', 0)) for i in range(1, 7)]
+        load_df = pd.DataFrame({
+            "오브젝트번호": column_or(df, 'OBJNR'),
+            "회계연도": column_or(df, 'GJAHR'),
+            "원가요소": column_or(df, 'KSTAR'),
+            **{f"{i}월": amount for i, amount in enumerate(amounts, 1)},
+            "합계": sum(amounts),
+        })
+        
+        # 데이터 삽입 (COPY)
+        inserted = copy_dataframe(conn, staging, load_df)
         
         conn.commit()
+        
+        # ANALYZE 후 기존 테이블과 교체
+        swap_table(conn, 'sap_ke33_cosp', staging)
         conn.close()
         
         print(f"\n✅ sap_ke33_cosp 테이블에 {inserted}개 데이터 저장 완료")
@@ -0,0 +1,132 @@
+"""
+SAP Load State - SAP 증분 적재 상태(워터마크) 관리
+T-Code 적재 대상 테이블마다 마지막 적재 시점을 sap_load_state 테이블에 기록
+
+SAP 임포터는 매번 DROP TABLE 후 조회 기간 전체를 다시 추출하여
+매일 같은 행을 다시 옮겼습니다. 증분 모드(--delta)에서는
+- 변경일 필드(ERDAT/AEDAT/FKDAT/LAEDA 등)가 워터마크 이후인 문서만 추출하고
+- 자연 키(VBELN+POSNR, MATNR+WERKS+LGORT 등)로 upsert하여
+적재 비용이 테이블 크기가 아니라 변경량에 비례합니다.
+
+SAP 날짜 필드는 일 단위이므로 워터마크는 추출 시작일에서 DELTA_OVERLAP_DAYS일을 뺀 날짜로 저장합니다
+(같은 날 이후에 바뀐 문서와 SAP/로컬 시계 차이를 다음 적재에서 다시 읽음, upsert이므로 중복 없음).
+상태 기록은 데이터 적재와 같은 트랜잭션에서 commit됩니다.
+"""
+
+from typing import List, Optional
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import os
+
+# ========================
+# Configuration
+# ========================
+
+SAP_LOAD_STATE_TABLE = "sap_load_state"
+
+# 워터마크를 추출 시작일보다 며칠 앞으로 잡을지 (일 단위 날짜 필드 보정)
+DELTA_OVERLAP_DAYS = int(os.getenv("DELTA_OVERLAP_DAYS", 1))
+
+CREATE_LOAD_STATE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {SAP_LOAD_STATE_TABLE} (
+    target_table VARCHAR(100) PRIMARY KEY,
+    tcode VARCHAR(30),
+    watermark_table VARCHAR(30),
+    watermark_fields VARCHAR(100),
+    watermark VARCHAR(8),
+    mode VARCHAR(10),
+    rows_loaded BIGINT,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+@dataclass
+class LoadState:
+    """대상 테이블의 마지막 적재 상태"""
+    target_table: str
+    tcode: Optional[str]
+    watermark_table: Optional[str]
+    watermark_fields: List[str]
+    watermark: Optional[str]    # YYYYMMDD, 다음 증분 추출의 시작일
+    mode: str                   # full / delta
+    rows_loaded: int
+    loaded_at: Optional[datetime] = None
+
+
+# ========================
+# 상태 테이블
+# ========================
+
+def ensure_load_state_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(CREATE_LOAD_STATE_SQL)
+
+
+def get_load_state(conn, target_table: str) -> Optional[LoadState]:
+    """마지막 적재 상태 (기록이 없거나 대상 테이블이 없으면 None → 전체 적재)"""
+    ensure_load_state_table(conn)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", (target_table,))
+        if cursor.fetchone()[0] is None:
+            return None
+        cursor.execute(
+            f"""
+            SELECT target_table, tcode, watermark_table, watermark_fields, watermark, mode, rows_loaded, loaded_at
+            FROM {SAP_LOAD_STATE_TABLE} WHERE target_table = %s
+            """,
+            (target_table,)
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return LoadState(
+        target_table=row[0],
+        tcode=row[1],
+        watermark_table=row[2],
+        watermark_fields=row[3].split(",") if row[3] else [],
+        watermark=row[4],
+        mode=row[5],
+        rows_loaded=row[6] or 0,
+        loaded_at=row[7],
+    )
+
+
+def save_load_state(conn, state: LoadState):
+    """적재 상태 기록 (commit은 데이터 적재와 함께 호출한 쪽에서)"""
+    ensure_load_state_table(conn)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {SAP_LOAD_STATE_TABLE}
+                (target_table, tcode, watermark_table, watermark_fields, watermark, mode, rows_loaded, loaded_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (target_table) DO UPDATE SET
+                tcode = EXCLUDED.tcode,
+                watermark_table = EXCLUDED.watermark_table,
+                watermark_fields = EXCLUDED.watermark_fields,
+                watermark = EXCLUDED.watermark,
+                mode = EXCLUDED.mode,
+                rows_loaded = EXCLUDED.rows_loaded,
+                loaded_at = EXCLUDED.loaded_at
+            """,
+            (
+                state.target_table, state.tcode, state.watermark_table,
+                ",".join(state.watermark_fields) or None, state.watermark, state.mode, state.rows_loaded
+            )
+        )
+
+
+# ========================
+# 워터마크
+# ========================
+
+def next_watermark(extract_started: datetime) -> str:
+    """추출 시작 시각 기준 다음 증분 추출 시작일 (YYYYMMDD)"""
+    return (extract_started - timedelta(days=DELTA_OVERLAP_DAYS)).strftime("%Y%m%d")
+
+
+def watermark_condition(fields: List[str], since: str) -> str:
+    """변경일 필드 중 하나라도 since 이후인 문서 (예: "(ERDAT >= '20240101' OR AEDAT >= '20240101')")"""
+    parts = [f"{field} >= '{since}'" for field in fields]
+    return parts[0] if len(parts) == 1 else f"({' OR '.join(parts)})"
@@ -10,6 +10,7 @@ import psycopg2
 from psycopg2 import sql
 from dotenv import load_dotenv
 from datetime import datetime
+from pg_bulk_load import column_or, copy_dataframe, prepare_staging, sap_date, swap_table, to_sql_copy
 
 # 환경변수 설정
 os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
@@ -94,15 +95,15 @@ def read_sap_table(conn, table_name, fields=None, where_clause=None, max_rows=0)
         return None
 
 def create_sales_table(conn):
-    """판매 데이터 테이블 생성"""
+    """판매 데이터 staging 테이블 생성 (적재 후 swap_table로 sap_sales_data와 교체), staging 테이블 이름 반환"""
     cursor = conn.cursor()
     
-    # 기존 테이블 삭제
-    cursor.execute("DROP TABLE IF EXISTS sap_sales_data CASCADE")
+    # 이전 실패로 남은 staging 테이블 삭제
+    staging = prepare_staging(conn, 'sap_sales_data')
     
     # 테이블 생성
-    create_table_query = """
-    CREATE TABLE sap_sales_data (
+    create_table_query = f"""
+    CREATE TABLE {staging} (
         id SERIAL PRIMARY KEY,
         "판매문서번호" VARCHAR(10),
         "판매문서유형" VARCHAR(4),
@@ -129,13 +130,14 @@ def create_sales_table(conn):
     cursor.execute(create_table_query)
     
     # 인덱스 생성
-    cursor.execute('CREATE INDEX idx_sap_sales_doc ON sap_sales_data("판매문서번호")')
-    cursor.execute('CREATE INDEX idx_sap_sales_customer ON sap_sales_data("고객번호")')
-    cursor.execute('CREATE INDEX idx_sap_sales_material ON sap_sales_data("자재번호")')
-    cursor.execute('CREATE INDEX idx_sap_sales_date ON sap_sales_data("생성일자")')
+    cursor.execute(f'CREATE INDEX idx_{staging}_doc ON {staging}("판매문서번호")')
+    cursor.execute(f'CREATE INDEX idx_{staging}_customer ON {staging}("고객번호")')
+    cursor.execute(f'CREATE INDEX idx_{staging}_material ON {staging}("자재번호")')
+    cursor.execute(f'CREATE INDEX idx_{staging}_date ON {staging}("생성일자")')
     
     conn.commit()
-    print("✅ sap_sales_data 테이블 생성 완료")
+    print(f"✅ {staging} 테이블 생성 완료")
+    return staging
 
 def import_sales_from_sap():
     """SAP에서 판매 데이터 가져와서 PostgreSQL에 저장"""
@@ -183,51 +185,24 @@ def import_sales_from_sap():
         if df_header is not None and not df_header.empty:
             print(f"✅ {len(df_header)}개 판매 문서 조회 완료")
             
-            # 2. PostgreSQL 테이블 생성
-            create_sales_table(pg_conn)
+            # 2. PostgreSQL 테이블 생성 (staging)
+            staging = create_sales_table(pg_conn)
             
             # 3. 데이터 변환 및 저장
             cursor = pg_conn.cursor()
-            inserted_count = 0
-            
-            for _, row in df_header.iterrows():
-                try:
-                    # 데이터 변환
-                    insert_query = """
-                    INSERT INTO sap_sales_data (
-                        "판매문서번호", "판매문서유형", "판매조직", "유통채널", 
-                        "제품군", "고객번호", "생성일자"
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """
-                    
-                    # 날짜 변환 (YYYYMMDD -> DATE)
-                    create_date = None
-                    if row.get('ERDAT') and len(row['ERDAT']) == 8:
-                        create_date = datetime.strptime(row['ERDAT'], '%Y%m%d').date()
-                    
-                    values = (
-                        row.get('VBELN'),
-                        row.get('AUART'),
-                        row.get('VKORG'),
-                        row.get('VTWEG'),
-                        row.get('SPART'),
-                        row.get('KUNNR'),
-                        create_date
-                    )
-                    
-                    cursor.execute(insert_query, values)
-                    inserted_count += 1
-                    
-                    if inserted_count % 100 == 0:
-                        print(f"  📝 {inserted_count}개 처리 중...")
-                        pg_conn.commit()
-                
-                except Exception as e:
-                    print(f"⚠️ 행 삽입 오류: {e}")
-                    pg_conn.rollback()
-                    continue
+            load_df = pd.DataFrame({
+                "판매문서번호": column_or(df_header, 'VBELN'),
+                "판매문서유형": column_or(df_header, 'AUART'),
+                "판매조직": column_or(df_header, 'VKORG'),
+                "유통채널": column_or(df_header, 'VTWEG'),
+                "제품군": column_or(df_header, 'SPART'),
+                "고객번호": column_or(df_header, 'KUNNR'),
+                "생성일자": sap_date(column_or(df_header, 'ERDAT', '')),  # YYYYMMDD -> DATE
+            })
+            inserted_count = copy_dataframe(pg_conn, staging, load_df)
             
             pg_conn.commit()
+            swap_table(pg_conn, 'sap_sales_data', staging)
             print(f"\n✅ {inserted_count}개 판매 데이터 저장 완료")
             
             # 4. 결과 확인
@@ -278,7 +253,7 @@ def import_custom_table(table_name, fields=None, pg_table_name=None):
             from sqlalchemy import create_engine
             engine = create_engine(DATABASE_URL.replace('postgresql://', 'postgresql+psycopg2://'))
             
-            df.to_sql(pg_table_name, engine, if_exists='replace', index=False)
+            df.to_sql(pg_table_name, engine, if_exists='replace', index=False, method=to_sql_copy)
             print(f"✅ PostgreSQL 테이블 {pg_table_name}에 저장 완료")
             
             pg_conn.close()
@@ -13,6 +13,14 @@ from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import json
 import argparse
+from schema_cache import mark_schema_changed
+from sap_field_mapping import FIELD_MAPPING
+from rfc_extract import RFC_POOL_SIZE, RFCConnectionPool, RFCTableExtractor, WideTableExtractor
+from rfc_semijoin import SEMIJOIN_BATCH_KEYS, STRATEGY_IN_LIST, RFCSemiJoin
+from pg_bulk_load import (
+    SAP_EMPTY_VALUES, copy_dataframe, ensure_unique_key, prepare_staging, sap_strings, swap_table, upsert_dataframe
+)
+from sap_load_state import LoadState, get_load_state, next_watermark, save_load_state, watermark_condition
 
 # 환경변수 설정
 os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
@@ -41,275 +49,13 @@ SAP_CONFIG = {
     'lang': 'KO',
 }
 
-# SAP 필드 한글 매핑
-FIELD_MAPPING = {
-    # 공통
-    'MANDT': '클라이언트',
-    'BUKRS': '회사코드',
-    'WERKS': '플랜트',
-    'LGORT': '저장위치',
-    'MATNR': '자재번호',
-    'MAKTX': '자재명',
-    'MTART': '자재유형',
-    'MATKL': '자재그룹',
-    'MEINS': '기본단위',
-    'BSTME': '주문단위',
-    
-    # 재고 관련
-    'LABST': '가용재고',
-    'UMLME': '이동중재고',
-    'INSME': '품질검사재고',
-    'EINME': '제한재고',
-    'SPEME': '블록재고',
-    'RETME': '반품재고',
-    'KLABS': '미제한재고_누계',
-    'KINSM': '품질재고_누계',
-    'KSPEM': '블록재고_누계',
-    
-    # 중량/크기
-    'BRGEW': '총중량',
-    'NTGEW': '순중량',
-    'GEWEI': '중량단위',
-    'VOLUM': '부피',
-    'VOLEH': '부피단위',
-    
-    # 날짜
-    'ERSDA': '생성일',
-    'ERDAT': '생성일',
-    'ERZET': '생성시간',
-    'ERNAM': '생성자',
-    'LAEDA': '최종변경일',
-    'AENAM': '변경자',
-    
-    # 회계
-    'GJAHR': '회계연도',
-    'MONAT': '회계기간',
-    'PERDE': '기간',
-    'VERSN': '버전',
-    'OBJNR': '오브젝트번호',
-    'KSTAR': '원가요소',
-    'KOSTL': '원가센터',
-    'AUFNR': '내부오더',
-    
-    # 판매
-    'KUNNR': '고객번호',
-    'KNDNR': '고객번호',
-    'NAME1': '고객명',
-    'NAME2': '고객명2',
-    'VKORG': '판매조직',
-    'VTWEG': '유통채널',
-    'SPART': '제품군',
-    'VBELN': '판매문서',
-    'POSNR': '품목번호',
-    'KAUFN': '판매오더',
-    'KDPOS': '판매오더항목',
-    'ARTNR': '제품번호',
-    'VBTYP': '판매문서범주',
-    'AUART': '판매문서유형',
-    'AUDAT': '증빙일',
-    'VDATU': '납품요청일',
-    'BUKRS_VF': '청구회사코드',
-    'BZIRK': '판매지역',
-    'BZIRK_AUFT': '판매지역_오더',
-    'PRSDT': '가격결정일',
-    'ABGRU': '취소사유',
-    'FKART': '청구유형',
-    'FKDAT': '청구일',
-    'FKSTO': '청구취소',
-    'SFAKN': '취소청구',
-    'KUNAG': '판매처',
-    'KUNRG': '지급인',
-    'ZUONR': '할당번호',
-    'FKIMG': '청구수량',
-    'SHKZG': '차대지시자',
-    'KZWI1': '조건금액1',
-    'KZWI2': '조건금액2', 
-    'KZWI3': '조건금액3',
-    'KZWI4': '조건금액4',
-    'AUGRU': '오더사유',
-    'GWLDT': 'PO일자',
-    'PSPNR': '프로젝트번호',
-    'VBTYP': '판매문서범주',
-    'KURRF_DAT': '환율일자',
-    'RFBSK': '전기상태',
-    'AUBEL': '판매문서',
-    'AUPOS': '판매품목',
-    'PALEDGER': '원장',
-    'VRGAR': '레코드유형',
-    'VERSI': '버전',
-    'PERBL': '전기기간',
-    'VV005001': '월목표금액',
-    'VKGRP': '영업그룹',
-    'VKBUR': '영업사무소',
-    'BSTNK': '고객PO번호',
-    'BSTDK': '고객PO일자',
-    'ARKTX': '품목텍스트',
-    'VSTEL': '출하지점',
-    'ROUTE': '경로',
-    'KPEIN': '가격단위수량',
-    
-    # 구매
-    'LIFNR': '공급업체',
-    'EBELN': '구매문서',
-    'EBELP': '구매품목',
-    'EKGRP': '구매그룹',
-    'EKORG': '구매조직',
-    
-    # 금액 필드
-    'NETWR': '정가',
-    'WAERK': '통화',
-    'KWMENG': '주문수량',
-    'VRKME': '판매단위',
-    'NETPR': '단가',
-    'MENGE': '수량',
-    'DMBTR': '금액_현지통화',
-    'WRBTR': '금액_문서통화',
-    
-    # CO-PA 값 필드
-    'VV010': '매출액',
-    'VV020': '매출원가',
-    'VV030': '매출총이익',
-    
-    # 월별 금액 (WKG)
-    'WKG001': '1월',
-    'WKG002': '2월',
-    'WKG003': '3월',
-    'WKG004': '4월',
-    'WKG005': '5월',
-    'WKG006': '6월',
-    'WKG007': '7월',
-    'WKG008': '8월',
-    'WKG009': '9월',
-    'WKG010': '10월',
-    'WKG011': '11월',
-    'WKG012': '12월',
-    
-    # 기타
-    'BUTXT': '회사명',
-    'LAND1': '국가',
-    'REGIO': '지역',
-    'ORT01': '도시',
-    'STRAS': '주소',
-    'PSTLZ': '우편번호',
-    'TELF1': '전화번호',
-    'TELFX': '팩스번호',
-    'SPERR': '블록',
-    'LOEVM': '삭제표시',
-    'XBLNR': '참조문서',
-    'BELNR': '전표번호',
-    'BUZEI': '항목',
-    'BLART': '전표유형',
-    'BLDAT': '전표일자',
-    'BUDAT': '전기일자',
-    'CPUDT': '입력일자',
-    'USNAM': '사용자명',
-    'TCODE': '트랜잭션코드',
-    'BSCHL': '전기키',
-    'SHKZG': '차변/대변',
-    'MWSKZ': '세금코드',
-    'GSBER': '사업영역',
-    'PRCTR': '손익센터',
-    'SEGMENT': '세그먼트',
-    'ZUONR': '지정',
-    'SGTXT': '적요',
-    'AUFNR': '오더',
-    'ANLN1': '자산번호',
-    'ANLN2': '자산보조번호',
-    'SAKNR': 'G/L계정',
-    'HKONT': '총계정원장계정',
-    'UMSKZ': '특별G/L',
-    'ZFBDT': '기준일',
-    'ZTERM': '지급조건',
-    'ZBD1T': '현금할인일수1',
-    'ZBD2T': '현금할인일수2',
-    'ZBD3T': '순지급일수',
-    'REBZG': '참조전표',
-    'REBZJ': '참조연도',
-    'REBZZ': '참조항목',
-    'LZBKZ': '지급보류',
-    'DISKP': '할인율',
-    'WVERW': '사용목적',
-    'SQIKZ': '품질검사',
-    'PSTYP': '품목범주',
-    'KNUMV': '조건문서',
-    'KPOSN': '조건품목',
-    'KSCHL': '조건유형',
-    'KBETR': '조건금액',
-    'KONWA': '조건통화',
-    'KPEIN': '가격단위',
-    'KMEIN': '조건단위',
-    'KUMZA': '분자',
-    'KUMNE': '분모',
-    'AWTYP': '참조거래',
-    'AWKEY': '참조키',
-    'FIKRS': '재무영역',
-    'XWBZK': '원천세',
-    'QSSHB': '원천세액',
-    'QBSHB': '과세표준액',
-    'QSZDT': '원천세전기일',
-    'QSSEC': '원천세코드',
-    'EMPFB': '대체수취인',
-    'XREF1': '참조키1',
-    'XREF2': '참조키2',
-    'XREF3': '참조키3',
-    'DTWS1': '계획일1',
-    'DTWS2': '계획일2',
-    'DTWS3': '계획일3',
-    'DTWS4': '계획일4',
-    'XNEGP': '음수전기',
-    'RFZEI': '지급기준',
-    'CCINS': '카드회사',
-    'CCNUM': '카드번호',
-    'SSBLK': '지급보류사유',
-    'MANSP': '수동보류',
-    'MSCHL': '던닝키',
-    'MANST': '던닝레벨',
-    'MADAT': '독촉일',
-    'VBUND': '회사',
-    'XEGDR': '단일지급',
-    'RECID': 'RecoveryID',
-    'PPDIFF': '지급차액',
-    'PPDIF2': '지급차액2',
-    'PPDIF3': '지급차액3',
-    'PYCUR': '지급통화',
-    'PYAMT': '지급금액',
-    'BVTYP': '파트너은행유형',
-    'KTOSL': '거래유형',
-    'AGZEI': '정산기간',
-    'PERNR': '사원번호',
-    'DMBE2': '그룹통화금액',
-    'DMBE3': '하드통화금액',
-    'DMBE4': '인덱스기준금액',
-    'RDIFF': '반올림차액',
-    'RDIF2': '반올림차액2',
-    'RDIF3': '반올림차액3',
-    'BDIFF': '평가차액',
-    'BDIF2': '평가차액2',
-    'BDIF3': '평가차액3',
-    'XSTAT': '상태',
-    'XRUEB': '이월',
-    'XPANZ': '부분표시',
-    'XSTOV': '역분개',
-    'XSNET': '순지급',
-    'XSERG': '보충',
-    'XUMAN': '재분류',
-    'XANET': '순자산',
-    'XSKST': '원가차이',
-    'XINVE': '투자',
-    'XZAHL': '지급',
-    'XMANU': '수동생성',
-    'XBILK': '대차대조표계정',
-    'GVTYP': '손익유형',
-    'HKTID': '계정ID',
-    'XNEGP': '음수전기가능',
-    'VORGN': '거래유형',
-    'FDLEV': '계획레벨',
-    'FDGRP': '계획그룹',
-    'FDWBT': '계획금액',
-    'FDTAG': '계획일',
-}
-
 # T-Code별 설정
+# batch_join: 앞에서 읽은 테이블(header, 기본 첫 테이블)의 join_key 값으로만 이 테이블을 조회 (헤더 → 아이템)
+#   - strategy: in_list(기본, 키 IN 목록 배치) / auto(키가 많으면 전체 추출 후 해시 조인, 작은 마스터 테이블용)
+#   - item_key: 아이템 키 (중복 아이템 확인), batch_keys: 호출당 키 수 (기본 SEMIJOIN_BATCH_KEYS)
+# delta: 증분 적재 설정 (--delta)
+#   - key: 자연 키 (SAP 필드, upsert 기준)
+#   - watermark: 변경일 필드로 추출 범위를 줄일 테이블과 필드 (없으면 전체 추출 후 upsert, 추출에 없는 행은 삭제)
 TCODE_CONFIGS = {
     'ZMMR0016': {
         'name': '재고현황',
@@ -324,6 +70,7 @@ TCODE_CONFIGS = {
                 'table': 'MARA',
                 'fields': ['MATNR', 'MTART', 'MATKL', 'MEINS', 'BRGEW', 'NTGEW'],
                 'join_key': 'MATNR',
+                'batch_join': {'header': 'MARD', 'strategy': 'auto'},
                 'description': '자재 마스터'
             },
             {
@@ -331,10 +78,12 @@ TCODE_CONFIGS = {
                 'fields': ['MATNR', 'MAKTX'],
                 'options': ["SPRAS = '3'"],
                 'join_key': 'MATNR',
+                'batch_join': {'header': 'MARD', 'strategy': 'auto'},
                 'description': '자재 설명'
             }
         ],
-        'target_table': 'sap_zmmr0016_inventory'
+        'target_table': 'sap_zmmr0016_inventory',
+        'delta': {'key': ['MATNR', 'WERKS', 'LGORT']}  # MARD에는 변경일 필드가 없음
     },
     'KE33': {
         'name': 'CO-PA 수익성 분석',
@@ -373,7 +122,11 @@ TCODE_CONFIGS = {
                 'description': '자재 마스터'
             }
         ],
-        'target_table': 'sap_mm03_material'
+        'target_table': 'sap_mm03_material',
+        'delta': {
+            'key': ['MATNR'],
+            'watermark': {'table': 'MARA', 'fields': ['ERSDA', 'LAEDA']}  # 생성일, 최종 변경일
+        }
     },
     'MB52': {
         'name': '창고별 재고 리스트',
@@ -384,7 +137,8 @@ TCODE_CONFIGS = {
                 'description': '창고별 재고'
             }
         ],
-        'target_table': 'sap_mb52_stock'
+        'target_table': 'sap_mb52_stock',
+        'delta': {'key': ['MATNR', 'WERKS', 'LGORT']}
     },
     'ZSDR0164': {
         'name': '일일 영업 실적 현황_마스터기준',
@@ -406,6 +160,7 @@ TCODE_CONFIGS = {
                 'fields': ['VBELN', 'POSNR', 'BZIRK', 'PRSDT'],
                 'options': ["POSNR = '000000'"],
                 'join_key': 'VBELN',
+                'batch_join': {'header': 'VBAK', 'item_key': ['VBELN', 'POSNR']},
                 'description': '수주 영업 데이터'
             },
             {
@@ -413,6 +168,7 @@ TCODE_CONFIGS = {
                 'fields': ['VBELN', 'POSNR', 'MATNR', 'MATKL', 'ARKTX', 'KWMENG', 'VRKME', 'NETWR', 'SPART', 'WERKS', 'LGORT', 'ABGRU'],
                 'options': ["ABGRU = ' '"],  # 취소사유 없는 것만
                 'join_key': 'VBELN',
+                'batch_join': {'header': 'VBAK', 'item_key': ['VBELN', 'POSNR']},
                 'description': '수주 아이템'
             }
         ],
@@ -437,10 +193,15 @@ TCODE_CONFIGS = {
                 'table': 'VBRP',  # 청구 문서 아이템
                 'fields': ['VBELN', 'POSNR', 'MATNR', 'NETWR', 'VKGRP', 'VKBUR', 'BZIRK_AUFT', 'SPART', 'AUBEL', 'AUPOS'],
                 'join_key': 'VBELN',
+                'batch_join': {'header': 'VBRK', 'item_key': ['VBELN', 'POSNR']},
                 'description': '매출/반품 아이템'
             }
         ],
-        'target_table': 'sap_zsdr0164_billing'
+        'target_table': 'sap_zsdr0164_billing',
+        'delta': {
+            'key': ['VBELN', 'POSNR'],
+            'watermark': {'table': 'VBRK', 'fields': ['ERDAT', 'AEDAT', 'FKDAT']}
+        }
     },
     'ZSDR0340': {
         'name': '국영/해영 기간별 매출 세부내역 레포트_마스터기준',
@@ -465,10 +226,14 @@ TCODE_CONFIGS = {
                 'fields': ['VBELN', 'POSNR', 'MATNR', 'FKIMG', 'NETWR', 'SHKZG', 'AUBEL', 'AUPOS', 'VKBUR', 'KZWI1', 'KZWI2', 'KZWI3', 'KZWI4'],
                 'join_key': 'VBELN',
                 'description': '청구문서 아이템',
-                'batch_join': True  # 배치 조인 방식 사용
+                'batch_join': {'header': 'VBRK', 'item_key': ['VBELN', 'POSNR']}
             }
         ],
-        'target_table': 'sap_zsdr0340_sales_detail'
+        'target_table': 'sap_zsdr0340_sales_detail',
+        'delta': {
+            'key': ['VBELN', 'POSNR'],
+            'watermark': {'table': 'VBRK', 'fields': ['ERDAT', 'AEDAT', 'FKDAT']}
+        }
     },
     'ZSDR0164_TARGET': {
         'name': '월목표 (CO-PA)',
@@ -478,6 +243,7 @@ TCODE_CONFIGS = {
                 'table': 'CE21000',
                 'fields': ['PALEDGER', 'VRGAR', 'VERSI', 'PERBL', 'VKBUR', 'BUKRS', 'VKORG', 'VKGRP', 'BZIRK', 'KNDNR', 'ARTNR', 'VV005001'],  # VV005001이 목표금액
                 'options': ["PALEDGER = '01'", "VRGAR = 'F'"],
+                'partition_key': 'ARTNR',  # PALEDGER/VRGAR는 값이 하나뿐이라 분할 키로 부적합
                 'params': {
                     'VERSI': '014',  # 버전 (분기별로 다름)
                     'PERBL': str(datetime.now().year) + '001'  # 연도+기간
@@ -490,13 +256,14 @@ TCODE_CONFIGS = {
 }
 
 class SAPTCodeImporter:
-    def __init__(self, tcode=None, config=None):
+    def __init__(self, tcode=None, config=None, delta=False):
         """
         범용 T-Code Importer
         
         Parameters:
         - tcode: T-Code 이름 (TCODE_CONFIGS에 정의된 것)
         - config: 사용자 정의 config (기존 T-Code 없을 때)
+        - delta: 증분 적재 (config의 'delta' 설정과 이전 적재 상태가 있을 때만, 없으면 전체 적재)
         """
         self.tcode = tcode
         if tcode and tcode in TCODE_CONFIGS:
@@ -506,23 +273,69 @@ class SAPTCodeImporter:
         else:
             raise ValueError(f"T-Code '{tcode}'가 정의되지 않았습니다. config 파라미터를 제공하세요.")
         
+        self.delta = delta
+        self.load_state = None  # 증분 적재 기준 (이전 적재 상태)
+        self.extract_started = None
         self.sap_conn = None
+        self.rfc_pool = None
         self.data_frames = {}
+        self.read_errors = []  # 조회 실패 테이블 (증분 적재 시 워터마크를 넘기지 않음)
         
     def connect(self):
-        """SAP 연결"""
+        """SAP 연결 (테이블 추출용 커넥션 풀은 필요할 때 RFC_POOL_SIZE개까지 연결)"""
         try:
             self.sap_conn = Connection(**SAP_CONFIG)
+            self.rfc_pool = RFCConnectionPool(lambda: Connection(**SAP_CONFIG), RFC_POOL_SIZE)
             print(f"✅ SAP 연결 성공 (T-Code: {self.tcode or 'Custom'})")
             return True
         except Exception as e:
             print(f"❌ SAP 연결 실패: {e}")
             return False
     
-    def read_table(self, table_config):
-        """SAP 테이블 읽기 (무제한 행)"""
+    def close(self):
+        """SAP 연결 종료"""
+        if self.rfc_pool:
+            self.rfc_pool.close()
+        if self.sap_conn:
+            self.sap_conn.close()
+    
+    @property
+    def target_table(self):
+        return self.config.get('target_table', f"sap_{self.tcode.lower() if self.tcode else 'custom'}")
+    
+    def prepare_delta(self):
+        """증분 적재 준비: 이전 적재 상태 조회 (설정이나 상태가 없으면 전체 적재)"""
+        self.load_state = None
+        if not self.delta:
+            return
+        if 'delta' not in self.config:
+            print("ℹ️ 증분 적재 설정이 없는 T-Code: 전체 적재")
+            return
+        
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            self.load_state = get_load_state(conn, self.target_table)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️ 적재 상태 조회 실패: {e}")
+            return
+        
+        watermark = self.config['delta'].get('watermark')
+        if self.load_state is None:
+            print(f"ℹ️ {self.target_table} 이전 적재 기록 없음: 전체 적재")
+        elif watermark and self.load_state.watermark:
+            print(f"🔄 증분 적재: {watermark['table']} {'/'.join(watermark['fields'])} >= {self.load_state.watermark}")
+        else:
+            print("🔄 증분 적재: 전체 추출 후 자연 키로 upsert")
+    
+    def table_conditions(self, table_config):
+        """
+        테이블 WHERE 조건 줄 (T-Code params, 테이블 options/params, 증분 워터마크)
+        
+        줄을 이어 붙이면 하나의 조건이 되도록 AND/OR로 시작하지 않는 줄 앞에 AND를 붙임
+        """
         table_name = table_config['table']
-        fields = table_config.get('fields')
         options = []
         
         # 전역 params 처리 (T-Code 레벨)
@@ -533,105 +346,90 @@ class SAPTCodeImporter:
             if self.tcode == 'ZSDR0164':
                 if table_name == 'VBAK':
                     # 수주 데이터 조건
-                    options.append({'TEXT': f"VKBUR = '{params.get('VKBUR', 'E100')}'"})
-                    options.append({'TEXT': f"AND AUDAT >= '{params.get('AUDAT_FROM', '20240101')}'"})
-                    options.append({'TEXT': f"AND AUDAT <= '{params.get('AUDAT_TO', datetime.now().strftime('%Y%m%d'))}'"})
-                    options.append({'TEXT': "AND AUART IN ('ZDR','ZOR1','ZOR3','ZEOR','ZELC','ZETP','ZES1','ZETS','ZCR','ZEIP','ZDKB','ZPS1')"})
+                    options.append(f"VKBUR = '{params.get('VKBUR', 'E100')}'")
+                    options.append(f"AND AUDAT >= '{params.get('AUDAT_FROM', '20240101')}'")
+                    options.append(f"AND AUDAT <= '{params.get('AUDAT_TO', datetime.now().strftime('%Y%m%d'))}'")
+                    options.append("AND AUART IN ('ZDR','ZOR1','ZOR3','ZEOR','ZELC','ZETP','ZES1','ZETS','ZCR','ZEIP','ZDKB','ZPS1')")
             elif self.tcode == 'ZSDR0164_BILLING':
                 if table_name == 'VBRK':
                     # 청구 데이터 조건
-                    options.append({'TEXT': f"FKDAT >= '{params.get('FKDAT_FROM', '20240101')}'"})
-                    options.append({'TEXT': f"AND FKDAT <= '{params.get('FKDAT_TO', datetime.now().strftime('%Y%m%d'))}'"})
+                    options.append(f"FKDAT >= '{params.get('FKDAT_FROM', '20240101')}'")
+                    options.append(f"AND FKDAT <= '{params.get('FKDAT_TO', datetime.now().strftime('%Y%m%d'))}'")
                 if table_name == 'VBRP':
-                    options.append({'TEXT': f"VKBUR = '{params.get('VKBUR', 'E100')}'"})
+                    options.append(f"VKBUR = '{params.get('VKBUR', 'E100')}'")
             elif self.tcode == 'ZSDR0340':
                 if table_name == 'VBRK':
                     # ZSDR0340 조건 (소스코드 참조)
-                    options.append({'TEXT': f"FKDAT >= '{params.get('FKDAT_FROM', '20240101')}'"})
-                    options.append({'TEXT': f"AND FKDAT <= '{params.get('FKDAT_TO', datetime.now().strftime('%Y%m%d'))}'"})
-                    options.append({'TEXT': "AND FKSTO = ' '"})  # 청구취소 아닌 것
-                    options.append({'TEXT': "AND SFAKN = ' '"})  # 취소청구 번호 없는 것
-                    options.append({'TEXT': f"AND VKORG = '{params.get('VKORG', '1000')}'"})
-                    options.append({'TEXT': f"AND BUKRS = '{params.get('BUKRS', '1000')}'"})
-                    # VBRK 테이블의 VBELN 저장 (VBRP 조인용)
-                    self.vbrk_vbelns = set()
+                    options.append(f"FKDAT >= '{params.get('FKDAT_FROM', '20240101')}'")
+                    options.append(f"AND FKDAT <= '{params.get('FKDAT_TO', datetime.now().strftime('%Y%m%d'))}'")
+                    options.append("AND FKSTO = ' '")  # 청구취소 아닌 것
+                    options.append("AND SFAKN = ' '")  # 취소청구 번호 없는 것
+                    options.append(f"AND VKORG = '{params.get('VKORG', '1000')}'")
+                    options.append(f"AND BUKRS = '{params.get('BUKRS', '1000')}'")
                 if table_name == 'VBRP':
-                    # VBRP는 VBELN으로 필터링해야 함
-                    options.append({'TEXT': f"VKBUR = '{params.get('VKBUR', 'D100')}'"})
-                    # 날짜 조건 추가 (VBRP는 ERDAT 필드가 있으면 사용)
-                    # 또는 VBRK에서 조회한 VBELN으로 필터링이 더 정확함
+                    # VBRP는 VBRK에서 조회한 VBELN으로 배치 조인 (batch_join), 영업사무소 조건만 추가
+                    options.append(f"VKBUR = '{params.get('VKBUR', 'D100')}'")
         
         # OPTIONS 생성
         if 'options' in table_config:
             for opt in table_config['options']:
-                if opt not in [o['TEXT'] for o in options]:  # 중복 방지
-                    options.append({'TEXT': opt})
+                if opt not in options:  # 중복 방지
+                    options.append(opt)
         
         # 테이블별 params 처리
         if 'params' in table_config:
             for key, value in table_config['params'].items():
-                options.append({'TEXT': f"{key} = '{value}'"})
+                options.append(f"{key} = '{value}'")
+        
+        # 증분 적재: 워터마크 이후 생성/변경된 문서만
+        watermark = self.config.get('delta', {}).get('watermark')
+        if self.load_state and self.load_state.watermark and watermark and watermark['table'] == table_name:
+            options.append(watermark_condition(watermark['fields'], self.load_state.watermark))
+        
+        conditions = []
+        for text in options:
+            if conditions and not text.upper().startswith(('AND ', 'OR ')):
+                text = f"AND ({text})" if ' OR ' in text.upper() else f"AND {text}"
+            conditions.append(text)
+        return conditions
+    
+    def read_table(self, table_config):
+        """
+        SAP 테이블 읽기 (무제한 행)
+        
+        키 범위 파티션으로 나누어 커넥션 풀에서 병렬로 읽음 (rfc_extract 참고)
+        분할 키는 table_config['partition_key'], 없으면 첫 필드 (MANDT 제외)
+        fields가 None이면 모든 필드를 512바이트 이하 필드 그룹으로 나눠 읽고 기본 키로 합침 (WideTableExtractor)
+        """
+        table_name = table_config['table']
+        fields = table_config.get('fields')
+        conditions = self.table_conditions(table_config)
         
         print(f"\n📖 {table_name} 테이블 조회 중...")
         print(f"   설명: {table_config.get('description', 'N/A')}")
         
         try:
-            # 먼저 필드 정보 가져오기
             if fields is None:
-                # 모든 필드 가져오기
-                result = self.sap_conn.call('RFC_READ_TABLE',
-                                           QUERY_TABLE=table_name,
-                                           DELIMITER='|',
-                                           NO_DATA='X')
-                
-                all_fields = result.get('FIELDS', [])
-                # 너무 많은 필드는 제한 (RFC 제한 때문)
-                fields = [{'FIELDNAME': f['FIELDNAME']} for f in all_fields[:50]]
-                print(f"   전체 {len(all_fields)}개 필드 중 {len(fields)}개 선택")
+                # 모든 필드: 512바이트 행 제한에 맞춰 필드 그룹으로 나눠 읽고 키로 합침
+                result = WideTableExtractor(self.rfc_pool).read(
+                    table_name, None, conditions, partition_key=table_config.get('partition_key')
+                )
             else:
-                fields = [{'FIELDNAME': f} for f in fields]
-            
-            # 데이터 조회 - 무제한 (ROWCOUNT 파라미터 제거)
-            all_data = []
-            offset = 0
-            batch_size = 10000  # 한 번에 가져올 데이터 수
-            
-            while True:
-                # ROWSKIPS와 ROWCOUNT를 사용한 페이징
-                result = self.sap_conn.call('RFC_READ_TABLE',
-                                           QUERY_TABLE=table_name,
-                                           DELIMITER='|',
-                                           FIELDS=fields,
-                                           OPTIONS=options if options else [],
-                                           ROWSKIPS=offset,
-                                           ROWCOUNT=batch_size)
-                
-                data = result.get('DATA', [])
-                if not data:
-                    break
-                
-                all_data.extend(data)
-                offset += len(data)
-                
-                print(f"   {offset}개 조회 중...")
-                
-                # 배치가 가득 차지 않았으면 마지막
-                if len(data) < batch_size:
-                    break
+                # 데이터 조회 - 무제한 (키 범위 분할 병렬 추출)
+                partition_key = table_config.get('partition_key') or next(
+                    (f for f in fields if f != 'MANDT'), fields[0]
+                )
+                result = RFCTableExtractor(self.rfc_pool).read(
+                    table_name, fields, conditions, partition_key=partition_key
+                )
             
-            if all_data:
-                print(f"✅ {table_name}: 총 {len(all_data)}개 데이터 조회 완료")
+            if result.rows:
+                stats = result.stats
+                print(f"✅ {table_name}: 총 {stats.rows}개 데이터 조회 완료 "
+                      f"({stats.seconds:.1f}초, 호출 {stats.calls}회, 파티션 {stats.partitions}개, 필드 그룹 {stats.groups}개)")
                 
                 # DataFrame 생성
-                field_names = [f['FIELDNAME'] for f in result.get('FIELDS', [])]
-                data_list = []
-                
-                for row in all_data:
-                    values = row['WA'].split('|')
-                    values = [v.strip() for v in values]
-                    data_list.append(dict(zip(field_names, values)))
-                
-                df = pd.DataFrame(data_list)
+                df = pd.DataFrame(result.rows, columns=result.fields)
                 return df
             else:
                 print(f"⚠️ {table_name}: 데이터 없음")
@@ -639,6 +437,71 @@ class SAPTCodeImporter:
                 
         except Exception as e:
             print(f"❌ {table_name} 조회 실패: {str(e)[:100]}")
+            self.read_errors.append(table_name)
+            return pd.DataFrame()
+    
+    def read_batch_join(self, table_config):
+        """
+        헤더 → 아이템 배치 조인 (table_config['batch_join'])
+        
+        아이템 테이블 전체를 읽지 않고 앞에서 읽은 헤더 테이블의 join_key 값으로만 조회
+        키를 72자 OPTIONS 줄에 빽빽하게 채운 IN 목록으로 batch_keys개씩 묶어 커넥션 풀에서 동시에 읽고,
+        헤더별 아이템 수를 세어 완전성을 확인 (요청하지 않은 키/중복 아이템은 오류,
+        아이템이 없는 헤더는 키 필드만 다시 조회해 빠진 아이템이 있으면 다시 읽음)
+        """
+        table_name = table_config['table']
+        join = table_config['batch_join'] if isinstance(table_config['batch_join'], dict) else {}
+        header = join.get('header', self.config['tables'][0]['table'])
+        key = table_config['join_key']
+        item_key = join.get('item_key')
+        fields = table_config.get('fields')
+        conditions = self.table_conditions(table_config)
+        
+        header_df = self.data_frames.get(header)
+        if header_df is None or header_df.empty or key not in header_df.columns:
+            print(f"\n⚠️ {table_name}: {header} 헤더가 없어 배치 조인 생략")
+            return pd.DataFrame()
+        keys = [k for k in header_df[key].unique().tolist() if k]
+        
+        print(f"\n📖 {table_name} 테이블 조회 중 ({header} {key} {len(keys):,}개 기준 배치 조인)...")
+        print(f"   설명: {table_config.get('description', 'N/A')}")
+        
+        try:
+            semi_join = RFCSemiJoin(self.rfc_pool, batch_keys=join.get('batch_keys', SEMIJOIN_BATCH_KEYS))
+            result = semi_join.read(table_name, key, keys, fields, conditions,
+                                    strategy=join.get('strategy', STRATEGY_IN_LIST))
+            df = pd.DataFrame(result.rows, columns=result.fields)
+            calls = result.stats.calls
+            
+            # 완전성 확인: 헤더별 아이템 수
+            counts = df[key].value_counts()
+            unexpected = set(counts.index) - set(keys)
+            if unexpected:
+                raise ValueError(f"요청하지 않은 {key} {len(unexpected)}개가 조회됨")
+            missing = [k for k in keys if k not in counts.index]
+            if missing:
+                recheck = semi_join.read(table_name, key, missing, [key], conditions, strategy=STRATEGY_IN_LIST)
+                calls += recheck.stats.calls
+                found = {row[0] for row in recheck.rows}
+                if found:
+                    print(f"   ⚠️ 아이템이 빠진 헤더 {len(found)}개 다시 조회")
+                    extra = semi_join.read(table_name, key, found, fields, conditions, strategy=STRATEGY_IN_LIST)
+                    calls += extra.stats.calls
+                    df = pd.concat([df, pd.DataFrame(extra.rows, columns=extra.fields)], ignore_index=True)
+                    missing = [k for k in missing if k not in found]
+            if item_key and df.duplicated(subset=item_key).any():
+                raise ValueError(f"중복 아이템 {int(df.duplicated(subset=item_key).sum())}개 ({'+'.join(item_key)})")
+            
+            matched = len(keys) - len(missing)
+            print(f"✅ {table_name}: 헤더 {matched:,}/{len(keys):,}개에 {len(df):,}개 조회 완료 "
+                  f"(헤더당 평균 {len(df) / max(1, matched):.1f}개, 호출 {calls}회)")
+            if missing:
+                print(f"   ℹ️ 조건에 맞는 {table_name} 행이 없는 헤더 {len(missing):,}개")
+            return df
+        
+        except Exception as e:
+            print(f"❌ {table_name} 배치 조인 실패: {str(e)[:100]}")
+            self.read_errors.append(table_name)
             return pd.DataFrame()
     
     def import_data(self, save_to_db=True):
@@ -650,72 +513,20 @@ class SAPTCodeImporter:
         print(f"T-Code: {self.config.get('name', self.tcode)}")
         print(f"{'='*60}")
         
-        # 각 테이블 읽기
+        self.extract_started = datetime.now()
+        self.prepare_delta()
+        
+        # 각 테이블 읽기 (batch_join 테이블은 앞에서 읽은 헤더의 키로만 조회)
         for table_config in self.config['tables']:
-            df = self.read_table(table_config)
+            if table_config.get('batch_join'):
+                df = self.read_batch_join(table_config)
+            else:
+                df = self.read_table(table_config)
             
             if not df.empty:
                 table_name = table_config['table']
                 self.data_frames[table_name] = df
                 
-                # ZSDR0340 특별 처리: VBRK의 VBELN만 사용
-                if self.tcode == 'ZSDR0340' and table_name == 'VBRK':
-                    # VBRK의 VBELN 저장
-                    self.vbrk_vbelns = df['VBELN'].unique().tolist()
-                    print(f"   VBRK VBELN 개수: {len(self.vbrk_vbelns)}개")
-                
-                # 배치 조인 처리 (ZSDR0340)
-                if table_config.get('batch_join') and self.tcode == 'ZSDR0340' and table_name == 'VBRP':
-                    if hasattr(self, 'vbrk_vbelns') and self.vbrk_vbelns:
-                        print(f"   VBRP 배치 조회 시작 (VBELN {len(self.vbrk_vbelns)}개)...")
-                        
-                        # VBRK의 VBELN으로 VBRP 배치 조회
-                        vbrp_data = []
-                        batch_size = 50  # 한 번에 조회할 VBELN 수
-                        
-                        for i in range(0, len(self.vbrk_vbelns), batch_size):
-                            batch_vbelns = self.vbrk_vbelns[i:i+batch_size]
-                            
-                            # IN 조건 생성
-                            vbeln_conditions = []
-                            for vbeln in batch_vbelns:
-                                vbeln_conditions.append(f"VBELN = '{vbeln}'")
-                            
-                            # OPTIONS 생성 (OR 조건)
-                            options = []
-                            options.append({'TEXT': f"VKBUR = '{self.config['params'].get('VKBUR', 'D100')}'"})
-                            if vbeln_conditions:
-                                options.append({'TEXT': f"AND ({' OR '.join(vbeln_conditions[:10])})"})  # SAP 제한으로 10개씩만
-                            
-                            # VBRP 조회
-                            try:
-                                result = self.sap_conn.call('RFC_READ_TABLE',
-                                                           QUERY_TABLE='VBRP',
-                                                           DELIMITER='|',
-                                                           FIELDS=[{'FIELDNAME': f} for f in table_config['fields']],
-                                                           OPTIONS=options,
-                                                           ROWCOUNT=10000)
-                                
-                                if result.get('DATA'):
-                                    field_names = [f['FIELDNAME'] for f in result.get('FIELDS', [])]
-                                    for row in result['DATA']:
-                                        values = row['WA'].split('|')
-                                        values = [v.strip() for v in values]
-                                        vbrp_data.append(dict(zip(field_names, values)))
-                                    
-                                    print(f"      배치 {i//batch_size + 1}: {len(result['DATA'])}개")
-                                
-                            except Exception as e:
-                                print(f"      배치 조회 실패: {str(e)[:50]}")
-                        
-                        if vbrp_data:
-                            df = pd.DataFrame(vbrp_data)
-                            print(f"   VBRP 총 {len(df)}개 조회 완료")
-                            self.data_frames[table_name] = df
-                        else:
-                            print("   VBRP 데이터 없음")
-                            return True
-                
                 # 일반 Join 처리
                 if 'join_key' in table_config and len(self.data_frames) > 1:
                     # 첫 번째 테이블과 조인
@@ -730,29 +541,59 @@ class SAPTCodeImporter:
                     # 조인된 테이블은 제거
                     del self.data_frames[table_name]
         
-        # PostgreSQL 저장
-        if save_to_db and self.data_frames:
+        # PostgreSQL 저장 (증분 적재는 변경분이 없어도 적재 상태 기록)
+        if save_to_db and (self.data_frames or self.load_state):
             self.save_to_postgres()
         
-        self.sap_conn.close()
+        self.close()
         return True
     
+    def record_load_state(self, conn, mode, rows):
+        """적재 상태 기록 (다음 증분 적재 기준, 데이터와 같은 트랜잭션)"""
+        delta_config = self.config.get('delta')
+        if not delta_config:
+            return
+        watermark = delta_config.get('watermark') or {}
+        save_load_state(conn, LoadState(
+            target_table=self.target_table,
+            tcode=self.tcode,
+            watermark_table=watermark.get('table'),
+            watermark_fields=watermark.get('fields', []),
+            watermark=next_watermark(self.extract_started) if watermark else None,
+            mode=mode,
+            rows_loaded=rows
+        ))
+    
     def save_to_postgres(self):
-        """PostgreSQL에 저장"""
-        target_table = self.config.get('target_table', f"sap_{self.tcode.lower() if self.tcode else 'custom'}")
+        """
+        PostgreSQL에 저장
+        
+        증분 적재(이전 적재 상태가 있고 테이블 컬럼이 같을 때)는 자연 키로 upsert하고,
+        그 외에는 staging 테이블에 전체 적재한 뒤 기존 테이블과 교체
+        """
+        target_table = self.target_table
+        delta_config = self.config.get('delta')
+        
+        if self.read_errors:
+            print(f"⚠️ 조회에 실패한 테이블이 있어 저장하지 않습니다: {', '.join(self.read_errors)}")
+            return
         
         try:
             conn = psycopg2.connect(DATABASE_URL)
             cursor = conn.cursor()
             
-            # 기존 테이블 삭제
-            cursor.execute(f"DROP TABLE IF EXISTS {target_table} CASCADE")
-            
             # 메인 DataFrame 가져오기
             main_df = list(self.data_frames.values())[0] if self.data_frames else pd.DataFrame()
             
             if main_df.empty:
-                print("⚠️ 저장할 데이터가 없습니다.")
+                if self.load_state:
+                    # 변경분 없음: 워터마크만 갱신
+                    self.record_load_state(conn, 'delta', 0)
+                    conn.commit()
+                    print("\nℹ️ 변경된 데이터가 없습니다.")
+                else:
+                    print("⚠️ 저장할 데이터가 없습니다.")
+                conn.close()
                 return
             
             # 동적 테이블 생성
@@ -793,9 +634,63 @@ class SAPTCodeImporter:
                 safe_col = korean_col.replace(' ', '_').replace('-', '_')
                 columns.append(f'"{safe_col}" {pg_type}')
             
+            safe_cols = [column_mapping[col].replace(" ", "_").replace("-", "_") for col in main_df.columns]
+            
+            # 적재할 값 (SAP 빈 값은 NULL)
+            load_df = pd.DataFrame({
+                col: sap_strings(main_df[col], SAP_EMPTY_VALUES + ('0',)) for col in main_df.columns
+            })
+            load_df['원본_tcode'] = self.tcode or 'CUSTOM'
+            
+            # 자연 키 (키 값은 NULL 대신 ''로 두어야 ON CONFLICT에서 같은 행으로 인식)
+            key_columns = None
+            if delta_config and all(key in main_df.columns for key in delta_config['key']):
+                key_columns = [safe_cols[list(main_df.columns).index(key)] for key in delta_config['key']]
+                for key in delta_config['key']:
+                    load_df[key] = load_df[key].fillna('')
+                duplicated = load_df.duplicated(subset=delta_config['key'], keep='last')
+                if duplicated.any():
+                    print(f"⚠️ 자연 키 중복 {duplicated.sum()}개 행 제외 ({'+'.join(delta_config['key'])})")
+                    load_df = load_df[~duplicated]
+            elif delta_config:
+                print(f"⚠️ 자연 키 필드 없음 ({'+'.join(delta_config['key'])}): 전체 적재")
+            
+            # 증분 적재 가능 여부 (이전 적재 상태 + 같은 컬럼 구성)
+            upsert = False
+            if self.load_state and key_columns:
+                cursor.execute(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = %s",
+                    (target_table,)
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                missing = [col for col in safe_cols if col not in existing]
+                if missing:
+                    print(f"⚠️ 기존 테이블에 없는 컬럼 {missing[:5]}: 전체 적재")
+                else:
+                    upsert = True
+            
+            if upsert:
+                # 증분 적재: 자연 키로 upsert (워터마크가 없으면 전체 추출이므로 추출에 없는 행은 삭제)
+                ensure_unique_key(conn, target_table, key_columns)
+                counts = upsert_dataframe(
+                    conn, target_table, load_df, key_columns, safe_cols + ['원본_tcode'],
+                    touch_column='조회일시',
+                    delete_missing=not delta_config.get('watermark')
+                )
+                self.record_load_state(conn, 'delta', len(load_df))
+                conn.commit()
+                conn.close()
+                
+                print(f"\n✅ {target_table} 증분 적재 완료: "
+                      f"추가 {counts['inserted']}개, 갱신 {counts['updated']}개, 삭제 {counts['deleted']}개")
+                return
+            
+            # 전체 적재: staging 테이블에 적재한 뒤 기존 테이블과 교체 (적재 중에도 기존 데이터 조회 가능)
+            staging = prepare_staging(conn, target_table)
+            
             # 테이블 생성
             create_sql = f"""
-            CREATE TABLE {target_table} (
+            CREATE TABLE {staging} (
                 id SERIAL PRIMARY KEY,
                 {', '.join(columns)},
                 "원본_tcode" VARCHAR(20),
@@ -803,42 +698,12 @@ class SAPTCodeImporter:
             )
             """
             cursor.execute(create_sql)
-            print(f"\n✅ 테이블 {target_table} 생성 완료")
-            
-            # 데이터 삽입
-            inserted = 0
-            for _, row in main_df.iterrows():
-                # NULL 처리 및 데이터 정리
-                values = []
-                for col in main_df.columns:
-                    val = row[col]
-                    
-                    # SAP 빈 값 처리
-                    if pd.isna(val) or val == '' or val == '00000000' or val == '0':
-                        values.append(None)
-                    else:
-                        values.append(str(val).strip())
-                
-                # 추가 컬럼
-                values.append(self.tcode or 'CUSTOM')
-                
-                # INSERT 문 생성
-                placeholders = ', '.join(['%s'] * len(values))
-                safe_cols = [f'"{column_mapping[col].replace(" ", "_").replace("-", "_")}"' for col in main_df.columns]
-                insert_sql = f"""
-                INSERT INTO {target_table} 
-                ({', '.join(safe_cols)}, "원본_tcode")
-                VALUES ({placeholders})
-                """
-                
-                cursor.execute(insert_sql, values)
-                inserted += 1
-                
-                # 배치 커밋
-                if inserted % 1000 == 0:
-                    conn.commit()
-                    print(f"  📝 {inserted}개 저장 중...")
+            print(f"\n✅ 테이블 {staging} 생성 완료")
             
+            # 데이터 삽입 (COPY)
+            inserted = copy_dataframe(conn, staging, load_df, safe_cols + ['원본_tcode'])
+            if key_columns:
+                ensure_unique_key(conn, staging, key_columns)
             conn.commit()
             
             # 인덱스 생성 (주요 컬럼이 있으면)
@@ -847,12 +712,20 @@ class SAPTCodeImporter:
                     korean_col = column_mapping[col]
                     safe_col = korean_col.replace(' ', '_').replace('-', '_')
                     try:
-                        cursor.execute(f'CREATE INDEX idx_{target_table}_{col.lower()} ON {target_table}("{safe_col}")')
+                        cursor.execute(f'CREATE INDEX idx_{staging}_{col.lower()} ON {staging}("{safe_col}")')
                     except:
                         pass
             
             conn.commit()
+            
+            # ANALYZE 후 기존 테이블과 교체 (의존 뷰 재생성, 적재 상태도 같은 트랜잭션에서 기록)
+            swap_table(conn, target_table, staging,
+                       in_transaction=lambda c: self.record_load_state(c, 'full', inserted))
             conn.close()
+            print(f"✅ {target_table} 교체 완료")
+            
+            # 스키마 캐시 무효화 (API 서버가 새 테이블 구조를 다시 읽도록)
+            mark_schema_changed(target_table)
             
             print(f"\n✅ 총 {inserted}개 데이터를 {target_table}에 저장 완료!")
             
@@ -864,6 +737,8 @@ class SAPTCodeImporter:
             
         except Exception as e:
             print(f"❌ PostgreSQL 저장 실패: {e}")
+            if self.load_state:
+                print("   전체 적재로 다시 실행하세요 (--delta 없이)")
 
 def add_custom_tcode(tcode_name, table_configs, target_table=None):
     """새로운 T-Code 설정 추가"""
@@ -888,6 +763,7 @@ if __name__ == "__main__":
     parser.add_argument('--table', help='커스텀 테이블 이름 (T-Code가 정의되지 않은 경우)')
     parser.add_argument('--fields', help='조회할 필드 (쉼표로 구분)')
     parser.add_argument('--target', help='저장할 PostgreSQL 테이블 이름')
+    parser.add_argument('--delta', action='store_true', help='증분 적재 (이전 적재 이후 변경분만 추출하여 upsert)')
     
     args = parser.parse_args()
     
@@ -895,7 +771,7 @@ if __name__ == "__main__":
         list_available_tcodes()
     elif args.tcode:
         # 기존 T-Code 실행
-        importer = SAPTCodeImporter(args.tcode)
+        importer = SAPTCodeImporter(args.tcode, delta=args.delta)
         importer.import_data()
     elif args.table:
         # 커스텀 테이블 import
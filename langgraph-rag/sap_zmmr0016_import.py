@@ -10,6 +10,9 @@ import pandas as pd
 import psycopg2
 from dotenv import load_dotenv
 from datetime import datetime
+from pg_bulk_load import column_or, ensure_unique_key, sap_number, upsert_dataframe
+from rfc_extract import RFCConnectionPool
+from rfc_semijoin import RFCSemiJoin
 
 # 환경변수 설정
 os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
@@ -46,13 +49,13 @@ def import_zmmr0016_data(max_rows=10000):
     print("="*60)
     
     try:
-        # SAP 연결
-        sap_conn = Connection(**SAP_CONFIG)
+        # SAP 연결 (자재 마스터 조회는 여러 커넥션으로 동시에)
+        sap_pool = RFCConnectionPool(lambda: Connection(**SAP_CONFIG))
         print("✅ SAP 연결 성공")
         
         # 1. MARD - 재고 데이터 조회
         print(f"\n📖 재고 데이터 조회 중 (최대 {max_rows}개)...")
-        result_mard = sap_conn.call('RFC_READ_TABLE',
+        result_mard = sap_pool.call('RFC_READ_TABLE',
                                     QUERY_TABLE='MARD',
                                     DELIMITER='|',
                                     FIELDS=[
@@ -90,76 +93,42 @@ def import_zmmr0016_data(max_rows=10000):
         
         df_mard = pd.DataFrame(data)
         
-        # 2. 자재별 추가 정보 조회
+        # 2. 자재별 추가 정보 조회 (전체 자재, 자재번호 IN 목록 배치 또는 전체 추출 후 해시 조인)
         print("\n📖 자재 마스터 및 가격 정보 조회 중...")
         
         # 고유 자재 목록
-        unique_materials = df_mard['MATNR'].unique()[:100]  # 처음 100개만
+        unique_materials = df_mard['MATNR'].unique()
+        semi_join = RFCSemiJoin(sap_pool)
         
         # MARA 정보
-        mara_data = []
-        for i, matnr in enumerate(unique_materials):
-            if i % 20 == 0:
-                print(f"  처리중... {i}/{len(unique_materials)}")
-            
-            try:
-                result = sap_conn.call('RFC_READ_TABLE',
-                                      QUERY_TABLE='MARA',
-                                      DELIMITER='|',
-                                      FIELDS=[
-                                          {'FIELDNAME': 'MATNR'},
-                                          {'FIELDNAME': 'MTART'},  # 자재유형
-                                          {'FIELDNAME': 'MATKL'},  # 자재그룹
-                                          {'FIELDNAME': 'MEINS'},  # 기본단위
-                                          {'FIELDNAME': 'BRGEW'},  # 총중량
-                                          {'FIELDNAME': 'NTGEW'},  # 순중량
-                                      ],
-                                      OPTIONS=[
-                                          {'TEXT': f"MATNR = '{matnr}'"},
-                                      ])
-                
-                if result['DATA']:
-                    values = result['DATA'][0]['WA'].split('|')
-                    mara_data.append({
-                        'MATNR': values[0].strip(),
-                        'MTART': values[1].strip(),
-                        'MATKL': values[2].strip(),
-                        'MEINS': values[3].strip(),
-                        'BRGEW': values[4].strip(),
-                        'NTGEW': values[5].strip(),
-                    })
-            except:
-                continue
-        
-        df_mara = pd.DataFrame(mara_data) if mara_data else pd.DataFrame()
+        result = semi_join.read('MARA', 'MATNR', unique_materials, [
+            'MATNR',
+            'MTART',  # 자재유형
+            'MATKL',  # 자재그룹
+            'MEINS',  # 기본단위
+            'BRGEW',  # 총중량
+            'NTGEW',  # 순중량
+        ])
+        df_mara = pd.DataFrame(result.rows, columns=result.fields).drop_duplicates(subset=['MATNR'])
         
         # MAKT 정보 (한글 자재명)
-        makt_data = []
-        for matnr in unique_materials[:50]:  # 처음 50개만
-            try:
-                result = sap_conn.call('RFC_READ_TABLE',
-                                      QUERY_TABLE='MAKT',
-                                      DELIMITER='|',
-                                      FIELDS=[
-                                          {'FIELDNAME': 'MATNR'},
-                                          {'FIELDNAME': 'MAKTX'},
-                                      ],
-                                      OPTIONS=[
-                                          {'TEXT': f"MATNR = '{matnr}' AND SPRAS = '3'"},
-                                      ])
-                
-                if result['DATA']:
-                    values = result['DATA'][0]['WA'].split('|')
-                    makt_data.append({
-                        'MATNR': values[0].strip(),
-                        'MAKTX': values[1].strip(),
-                    })
-            except:
-                continue
-        
-        df_makt = pd.DataFrame(makt_data) if makt_data else pd.DataFrame()
-        
-        print(f"✅ {len(df_mara)}개 자재 마스터, {len(df_makt)}개 자재명 조회 완료")
+        result = semi_join.read('MAKT', 'MATNR', unique_materials, ['MATNR', 'MAKTX'], ["SPRAS = '3'"])
+        df_makt = pd.DataFrame(result.rows, columns=result.fields).drop_duplicates(subset=['MATNR'])
+        
+        # MBEW 정보 (플랜트별 단가, 분할 평가 없는 행만)
+        result = semi_join.read('MBEW', 'MATNR', unique_materials, [
+            'MATNR',
+            'BWKEY',  # 평가영역 (플랜트)
+            'VPRSV',  # 가격관리 (S: 표준가, V: 이동평균가)
+            'VERPR',  # 이동평균가
+            'STPRS',  # 표준가
+            'PEINH',  # 가격단위
+        ], ["BWTAR = ' '"])
+        df_mbew = pd.DataFrame(result.rows, columns=result.fields)
+        df_mbew = df_mbew.rename(columns={'BWKEY': 'WERKS'}).drop_duplicates(subset=['MATNR', 'WERKS'])
+        
+        print(f"✅ {len(df_mara)}개 자재 마스터, {len(df_makt)}개 자재명, {len(df_mbew)}개 자재 단가 조회 완료 "
+              f"(자재 {len(unique_materials)}개)")
         
         # 3. 데이터 병합
         print("\n🔗 데이터 병합 중...")
@@ -174,16 +143,18 @@ def import_zmmr0016_data(max_rows=10000):
         if not df_makt.empty:
             df_result = pd.merge(df_result, df_makt, on='MATNR', how='left')
         
+        # + MBEW 조인 (자재 + 플랜트)
+        if not df_mbew.empty:
+            df_result = pd.merge(df_result, df_mbew, on=['MATNR', 'WERKS'], how='left')
+        
         # 4. PostgreSQL 저장
         print("\n💾 PostgreSQL 저장 중...")
         conn = psycopg2.connect(DATABASE_URL)
         cursor = conn.cursor()
         
-        # 테이블 생성
-        cursor.execute("DROP TABLE IF EXISTS sap_zmmr0016_inventory CASCADE")
-        
+        # 테이블 생성 (처음 한 번, 이후에는 자연 키로 upsert)
         create_table = """
-        CREATE TABLE sap_zmmr0016_inventory (
+        CREATE TABLE IF NOT EXISTS sap_zmmr0016_inventory (
             id SERIAL PRIMARY KEY,
             "자재번호" VARCHAR(18),
             "자재명" TEXT,
@@ -200,59 +171,68 @@ def import_zmmr0016_data(max_rows=10000):
             "기본단위" VARCHAR(3),
             "총중량" NUMERIC(15,3),
             "순중량" NUMERIC(15,3),
+            "단가" NUMERIC(15,2),
+            "가격단위" NUMERIC(5),
+            "재고금액" NUMERIC(20,2),
             "생성일시" TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         """
         cursor.execute(create_table)
+        for column, data_type in [("단가", "NUMERIC(15,2)"), ("가격단위", "NUMERIC(5)"), ("재고금액", "NUMERIC(20,2)")]:
+            cursor.execute(f'ALTER TABLE sap_zmmr0016_inventory ADD COLUMN IF NOT EXISTS "{column}" {data_type}')
         
-        # 데이터 삽입
-        inserted = 0
-        for _, row in df_result.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT INTO sap_zmmr0016_inventory 
-                    ("자재번호", "자재명", "자재유형", "자재그룹", "플랜트", "저장위치",
-                     "가용재고", "이동중재고", "품질검사재고", "제한재고", "블록재고", "반품재고",
-                     "기본단위", "총중량", "순중량")
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    row.get('MATNR'),
-                    row.get('MAKTX'),
-                    row.get('MTART'),
-                    row.get('MATKL'),
-                    row.get('WERKS'),
-                    row.get('LGORT'),
-                    float(row.get('LABST', 0)) if row.get('LABST') else 0,
-                    float(row.get('UMLME', 0)) if row.get('UMLME') else 0,
-                    float(row.get('INSME', 0)) if row.get('INSME') else 0,
-                    float(row.get('EINME', 0)) if row.get('EINME') else 0,
-                    float(row.get('SPEME', 0)) if row.get('SPEME') else 0,
-                    float(row.get('RETME', 0)) if row.get('RETME') else 0,
-                    row.get('MEINS'),
-                    float(row.get('BRGEW', 0)) if row.get('BRGEW') else 0,
-                    float(row.get('NTGEW', 0)) if row.get('NTGEW') else 0,
-                ))
-                inserted += 1
-                
-                if inserted % 100 == 0:
-                    conn.commit()
-                    print(f"  📝 {inserted}개 저장 중...")
-            except Exception as e:
-                if inserted == 0:
-                    print(f"  ⚠️ 삽입 오류: {e}")
-                continue
-        
-        conn.commit()
+        # 단가는 가격관리 기준 (S: 표준가, 그 외 이동평균가), 재고금액 = 가용재고 x 단가 / 가격단위
+        # (MBEW가 없는 자재는 NULL)
+        price = sap_number(column_or(df_result, 'VERPR'), default=None).where(
+            column_or(df_result, 'VPRSV') != 'S', sap_number(column_or(df_result, 'STPRS'), default=None)
+        )
+        price_unit = sap_number(column_or(df_result, 'PEINH'), default=None)
+        
+        # 수량/중량 필드는 숫자로 (빈 값은 0)
+        load_df = pd.DataFrame({
+            "자재번호": column_or(df_result, 'MATNR'),
+            "자재명": column_or(df_result, 'MAKTX'),
+            "자재유형": column_or(df_result, 'MTART'),
+            "자재그룹": column_or(df_result, 'MATKL'),
+            "플랜트": column_or(df_result, 'WERKS'),
+            "저장위치": column_or(df_result, 'LGORT'),
+            "가용재고": sap_number(column_or(df_result, 'LABST', 0)),
+            "이동중재고": sap_number(column_or(df_result, 'UMLME', 0)),
+            "품질검사재고": sap_number(column_or(df_result, 'INSME', 0)),
+            "제한재고": sap_number(column_or(df_result, 'EINME', 0)),
+            "블록재고": sap_number(column_or(df_result, 'SPEME', 0)),
+            "반품재고": sap_number(column_or(df_result, 'RETME', 0)),
+            "기본단위": column_or(df_result, 'MEINS'),
+            "총중량": sap_number(column_or(df_result, 'BRGEW', 0)),
+            "순중량": sap_number(column_or(df_result, 'NTGEW', 0)),
+            "단가": price,
+            "가격단위": price_unit,
+            "재고금액": (sap_number(column_or(df_result, 'LABST', 0)) * price / price_unit.where(price_unit > 0, 1)).round(2),
+        })
+        
+        # 자연 키 (MARD: 자재+플랜트+저장위치), 키 값은 NULL 대신 ''
+        key_columns = ["자재번호", "플랜트", "저장위치"]
+        load_df[key_columns] = load_df[key_columns].fillna('')
+        load_df = load_df.drop_duplicates(subset=key_columns, keep='last')
+        
+        # 데이터 upsert (MARD에는 변경일 필드가 없어 전체 추출, 이번 추출에 없는 재고는 삭제)
+        ensure_unique_key(conn, 'sap_zmmr0016_inventory', key_columns)
+        counts = upsert_dataframe(
+            conn, 'sap_zmmr0016_inventory', load_df, key_columns,
+            touch_column="생성일시", delete_missing=True
+        )
+        inserted = len(load_df)
         
         # 인덱스 생성
-        cursor.execute('CREATE INDEX idx_zmmr0016_matnr ON sap_zmmr0016_inventory("자재번호")')
-        cursor.execute('CREATE INDEX idx_zmmr0016_werks ON sap_zmmr0016_inventory("플랜트")')
-        cursor.execute('CREATE INDEX idx_zmmr0016_lgort ON sap_zmmr0016_inventory("저장위치")')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_zmmr0016_matnr ON sap_zmmr0016_inventory("자재번호")')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_zmmr0016_werks ON sap_zmmr0016_inventory("플랜트")')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_zmmr0016_lgort ON sap_zmmr0016_inventory("저장위치")')
         
         conn.commit()
         conn.close()
         
-        print(f"\n✅ 총 {inserted}개 재고 데이터 저장 완료!")
+        print(f"\n✅ 총 {inserted}개 재고 데이터 저장 완료! "
+              f"(추가 {counts['inserted']}개, 갱신 {counts['updated']}개, 삭제 {counts['deleted']}개)")
         
         # 결과 요약
         print("\n📊 저장된 데이터 요약:")
@@ -260,7 +240,7 @@ def import_zmmr0016_data(max_rows=10000):
         print(f"  - 고유 자재: {df_result['MATNR'].nunique()}")
         print(f"  - 플랜트: {df_result['WERKS'].unique()[:5].tolist()}")
         
-        sap_conn.close()
+        sap_pool.close()
         
     except Exception as e:
         print(f"❌ 오류 발생: {e}")
@@ -12,7 +12,7 @@ import pandas as pd
 import psycopg2
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-import json
+from pg_bulk_load import column_or, copy_dataframe, prepare_staging, row_json, sap_number, swap_table
 
 # 환경변수 설정
 os.environ['SAPNWRFC_HOME'] = os.path.expanduser('~/sap/nwrfcsdk')
@@ -267,11 +267,11 @@ def save_to_postgres(df, table_name, params):
         conn = psycopg2.connect(DATABASE_URL)
         cursor = conn.cursor()
         
-        # 테이블 생성
-        cursor.execute("DROP TABLE IF EXISTS sap_zpacheck0 CASCADE")
+        # staging 테이블에 적재한 뒤 기존 테이블과 교체 (적재 중에도 기존 데이터 조회 가능)
+        staging = prepare_staging(conn, 'sap_zpacheck0')
         
-        create_table = """
-        CREATE TABLE sap_zpacheck0 (
+        create_table = f"""
+        CREATE TABLE {staging} (
             id SERIAL PRIMARY KEY,
             "회사코드" VARCHAR(4),
             "회계연도" VARCHAR(4),
@@ -289,57 +289,35 @@ def save_to_postgres(df, table_name, params):
         # 값 필드를 위한 추가 컬럼 생성
         vv_columns = [col for col in df.columns if col.startswith('VV')]
         for vv_col in vv_columns[:20]:  # 최대 20개 값 필드
-            cursor.execute(f'ALTER TABLE sap_zpacheck0 ADD COLUMN "{vv_col}" NUMERIC(20,2)')
+            cursor.execute(f'ALTER TABLE {staging} ADD COLUMN "{vv_col}" NUMERIC(20,2)')
         
-        # 데이터 삽입
-        inserted = 0
-        for _, row in df.iterrows():
-            # 기본 필드
-            values = [
-                row.get('BUKRS', params['BUKRS']),
-                row.get('GJAHR', params['GJAHR']),
-                row.get('PERDE', ''),
-                row.get('VERSN', params['VERSN']),
-                row.get('ERKRS', params['ERKRS']),
-                row.get('PAOBJNR', ''),
-                table_name,
-                json.dumps(dict(row))
-            ]
-            
-            # VV 필드 값 추가
-            vv_values = []
-            for vv_col in vv_columns[:20]:
-                try:
-                    vv_values.append(float(row[vv_col]) if row[vv_col] else 0)
-                except:
-                    vv_values.append(0)
-            
-            # SQL 생성
-            placeholders = ['%s'] * (8 + len(vv_values))
-            vv_cols_str = ''.join([f', "{col}"' for col in vv_columns[:20]])
-            
-            insert_sql = f"""
-                INSERT INTO sap_zpacheck0 
-                ("회사코드", "회계연도", "기간", "버전", "경영단위", "오브젝트번호", 
-                 "원본테이블", "원본데이터"{vv_cols_str})
-                VALUES ({', '.join(placeholders)})
-            """
-            
-            cursor.execute(insert_sql, values + vv_values)
-            inserted += 1
-            
-            if inserted % 500 == 0:
-                conn.commit()
-                print(f"  📝 {inserted}개 저장 중...")
+        # 기본 필드 + VV 필드 값
+        load_df = pd.DataFrame({
+            "회사코드": column_or(df, 'BUKRS', params['BUKRS']),
+            "회계연도": column_or(df, 'GJAHR', params['GJAHR']),
+            "기간": column_or(df, 'PERDE', ''),
+            "버전": column_or(df, 'VERSN', params['VERSN']),
+            "경영단위": column_or(df, 'ERKRS', params['ERKRS']),
+            "오브젝트번호": column_or(df, 'PAOBJNR', ''),
+            "원본테이블": table_name,
+            "원본데이터": row_json(df),
+            **{vv_col: sap_number(df[vv_col]) for vv_col in vv_columns[:20]},
+        })
+        
+        # 데이터 삽입 (COPY)
+        inserted = copy_dataframe(conn, staging, load_df)
         
         conn.commit()
         
         # 인덱스 생성
-        cursor.execute('CREATE INDEX idx_zpacheck0_bukrs ON sap_zpacheck0("회사코드")')
-        cursor.execute('CREATE INDEX idx_zpacheck0_versn ON sap_zpacheck0("버전")')
-        cursor.execute('CREATE INDEX idx_zpacheck0_gjahr ON sap_zpacheck0("회계연도")')
+        cursor.execute(f'CREATE INDEX idx_{staging}_bukrs ON {staging}("회사코드")')
+        cursor.execute(f'CREATE INDEX idx_{staging}_versn ON {staging}("버전")')
+        cursor.execute(f'CREATE INDEX idx_{staging}_gjahr ON {staging}("회계연도")')
         
         conn.commit()
+        
+        # ANALYZE 후 기존 테이블과 교체
+        swap_table(conn, 'sap_zpacheck0', staging)
         conn.close()
         
         print(f"\n✅ sap_zpacheck0 테이블에 {inserted}개 데이터 저장 완료")
@@ -356,11 +334,11 @@ def save_cosp_to_postgres(df, params):
         conn = psycopg2.connect(DATABASE_URL)
         cursor = conn.cursor()
         
-        # 테이블 생성
-        cursor.execute("DROP TABLE IF EXISTS sap_zpacheck0_cosp CASCADE")
+        # staging 테이블에 적재한 뒤 기존 테이블과 교체 (적재 중에도 기존 데이터 조회 가능)
+        staging = prepare_staging(conn, 'sap_zpacheck0_cosp')
         
-        create_table = """
-        CREATE TABLE sap_zpacheck0_cosp (
+        create_table = f"""
+        CREATE TABLE {staging} (
             id SERIAL PRIMARY KEY,
             "오브젝트번호" VARCHAR(22),
             "회계연도" VARCHAR(4),
@@ -384,39 +362,24 @@ def save_cosp_to_postgres(df, params):
         """
         cursor.execute(create_table)
         
-        # 데이터 삽입
-        inserted = 0
-        for _, row in df.iterrows():
-            # 월별 금액
-            monthly = []
-            total = 0
-            for i in range(1, 13):
-                col = f'WKG{i:03d}'
-                amount = float(row.get(col, 0)) if row.get(col) else 0
-                monthly.append(amount)
-                total += amount
-            
-            cursor.execute("""
-                INSERT INTO sap_zpacheck0_cosp 
-                ("오브젝트번호", "회계연도", "버전", "원가요소",
-                 "1월", "2월", "3월", "4월", "5월", "6월",
-                 "7월", "8월", "9월", "10월", "11월", "12월", "연간합계")
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                row.get('OBJNR'),
-                row.get('GJAHR'),
-                row.get('VERSN'),
-                row.get('KSTAR'),
-                *monthly,
-                total
-            ))
-            inserted += 1
-            
-            if inserted % 500 == 0:
-                conn.commit()
-                print(f"  📝 {inserted}개 저장 중...")
+        # 월별 금액과 연간합계
+        monthly = [sap_number(column_or(df, f'WKG{i:03d}', 0)) for i in range(1, 13)]
+        load_df = pd.DataFrame({
+            "오브젝트번호": column_or(df, 'OBJNR'),
+            "회계연도": column_or(df, 'GJAHR'),
+            "버전": column_or(df, 'VERSN'),
+            "원가요소": column_or(df, 'KSTAR'),
+            **{f"{i}월": amount for i, amount in enumerate(monthly, 1)},
+            "연간합계": sum(monthly),
+        })
+        
+        # 데이터 삽입 (COPY)
+        inserted = copy_dataframe(conn, staging, load_df)
         
         conn.commit()
+        
+        # ANALYZE 후 기존 테이블과 교체
+        swap_table(conn, 'sap_zpacheck0_cosp', staging)
         conn.close()
         
         print(f"\n✅ sap_zpacheck0_cosp 테이블에 {inserted}개 데이터 저장 완료")
@@ -0,0 +1,328 @@
+"""
+Schema Cache - 프로세스 전역 스키마 캐시
+SQLAlchemy inspector로 추출한 스키마 정보를 저렴한 fingerprint로 변경 감지하며 재사용
+
+get_detailed_schema()는 테이블마다 get_columns/get_pk_constraint/get_foreign_keys/get_indexes를
+호출하므로 질문 하나에 수십 번의 카탈로그 조회가 발생합니다.
+이 모듈은 추출 결과를 DB URL별로 캐싱하고 다음 경우에만 다시 추출합니다.
+- fingerprint 변경 (PostgreSQL: pg_class OID/relfilenode/xmin, SQLite: PRAGMA schema_version)
+- TTL 만료
+- 임포터가 mark_schema_changed()로 명시적으로 무효화한 경우
+"""
+
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+import hashlib
+import json
+import os
+import threading
+import time
+
+# ========================
+# Configuration
+# ========================
+
+# 캐시 최대 수명 (초) - fingerprint가 같더라도 TTL이 지나면 다시 추출
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", 600))
+
+# fingerprint 재확인 최소 간격 (초) - 이 간격 안에서는 DB 조회 없이 캐시 반환
+SCHEMA_CHECK_INTERVAL = float(os.getenv("SCHEMA_CHECK_INTERVAL", 5))
+
+# 임포터가 적재 완료를 알리는 마커 파일 (임포터는 별도 프로세스로 실행되므로 파일로 공유)
+SCHEMA_MARKER_FILE = os.getenv(
+    "SCHEMA_MARKER_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".schema_marker.json")
+)
+
+# PostgreSQL 카탈로그 fingerprint
+# DROP/CREATE 시 OID, TRUNCATE 시 relfilenode, ALTER 시 pg_class 행의 xmin이 바뀝니다.
+PG_FINGERPRINT_SQL = """
+SELECT md5(COALESCE(string_agg(
+    c.oid::text || ':' || c.relfilenode::text || ':' || c.xmin::text,
+    ',' ORDER BY c.oid
+), ''))
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = ANY (current_schemas(false))
+  AND c.relkind IN ('r', 'p', 'v', 'm', 'i')
+"""
+
+# ========================
+# Importer Hooks
+# ========================
+
+def read_schema_marker() -> Dict[str, Any]:
+    """마커 파일 내용 반환 (없으면 빈 딕셔너리)"""
+    try:
+        with open(SCHEMA_MARKER_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def last_load_timestamp() -> float:
+    """임포터가 마지막으로 테이블을 적재한 시각 (epoch 초, 기록 없으면 0)"""
+    return float(read_schema_marker().get("updated_at", 0))
+
+
+def mark_schema_changed(*tables: str):
+    """
+    임포터용 무효화 훅
+
+    DROP TABLE ... CREATE TABLE 등으로 테이블을 다시 적재한 뒤 호출합니다.
+    마커 파일을 갱신하여 다른 프로세스(API 서버)의 캐시 fingerprint를 바꾸고,
+    같은 프로세스의 캐시는 즉시 비웁니다.
+
+    Args:
+        tables: 다시 적재된 테이블 이름들
+    """
+    marker = read_schema_marker()
+    now = time.time()
+    marker["updated_at"] = now
+    loaded = marker.setdefault("tables", {})
+    for table in tables:
+        loaded[table] = now
+
+    # 원자적 교체로 읽는 쪽이 반쯤 쓰인 파일을 보지 않도록 함
+    tmp_path = f"{SCHEMA_MARKER_FILE}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(marker, f, ensure_ascii=False)
+        os.replace(tmp_path, SCHEMA_MARKER_FILE)
+    except OSError as e:
+        print(f"⚠️ 스키마 마커 갱신 실패: {e}")
+
+    invalidate_schema_cache()
+
+# ========================
+# Schema Extraction
+# ========================
+
+def extract_schema(engine: Engine) -> List[Dict[str, Any]]:
+    """inspector로 테이블별 컬럼/PK/FK/인덱스 정보를 구조화하여 추출"""
+    inspector = inspect(engine)
+    tables = []
+
+    for table_name in inspector.get_table_names():
+        columns = [
+            {
+                "name": col['name'],
+                "type": str(col['type']),
+                "nullable": bool(col['nullable']),
+                "default": col.get('default'),
+            }
+            for col in inspector.get_columns(table_name)
+        ]
+
+        pk = inspector.get_pk_constraint(table_name)
+        primary_key = pk['constrained_columns'] if pk and pk['constrained_columns'] else []
+
+        foreign_keys = [
+            {
+                "columns": fk['constrained_columns'],
+                "referred_table": fk['referred_table'],
+                "referred_columns": fk['referred_columns'],
+            }
+            for fk in inspector.get_foreign_keys(table_name)
+        ]
+
+        indexes = [
+            {
+                "name": idx['name'],
+                "columns": [c for c in idx['column_names'] if c],
+                "unique": bool(idx.get('unique')),
+            }
+            for idx in inspector.get_indexes(table_name)
+        ]
+
+        tables.append({
+            "name": table_name,
+            "columns": columns,
+            "primary_key": primary_key,
+            "foreign_keys": foreign_keys,
+            "indexes": indexes,
+        })
+
+    return tables
+
+
+def format_column(col: Dict[str, Any]) -> str:
+    """컬럼 타입 문자열 (예: 'VARCHAR(50) (nullable) DEFAULT 0')"""
+    nullable = " (nullable)" if col['nullable'] else " (NOT NULL)"
+    default = f" DEFAULT {col['default']}" if col.get('default') else ""
+    return f"{col['type']}{nullable}{default}"
+
+
+def render_table(table: Dict[str, Any], columns: Optional[List[Dict[str, Any]]] = None) -> str:
+    """테이블 하나를 프롬프트용 텍스트로 변환 (columns를 주면 해당 컬럼만 출력)"""
+    lines = [f"\nTable: {table['name']}"]
+
+    for col in (columns if columns is not None else table['columns']):
+        lines.append(f"  - {col['name']}: {format_column(col)}")
+
+    if table['primary_key']:
+        lines.append(f"  Primary Key: {', '.join(table['primary_key'])}")
+
+    for fk in table['foreign_keys']:
+        lines.append(f"  Foreign Key: {', '.join(fk['columns'])} -> {fk['referred_table']}.{', '.join(fk['referred_columns'])}")
+
+    for idx in table['indexes']:
+        if not idx['unique']:
+            lines.append(f"  Index: {idx['name']} on ({', '.join(idx['columns'])})")
+
+    return "\n".join(lines)
+
+
+def render_schema(tables: List[Dict[str, Any]]) -> str:
+    """전체 스키마를 get_detailed_schema() 형식의 텍스트로 변환"""
+    return "\n".join(render_table(table) for table in tables)
+
+
+def compute_fingerprint(engine: Engine) -> str:
+    """
+    스키마 변경 감지용 fingerprint 계산
+
+    카탈로그 한 번 조회로 끝나는 저렴한 값만 사용하며
+    임포터 마커 파일의 갱신 시각도 함께 반영합니다.
+    """
+    dialect = engine.dialect.name
+
+    with engine.connect() as conn:
+        if dialect == "postgresql":
+            catalog = conn.execute(text(PG_FINGERPRINT_SQL)).scalar()
+        elif dialect == "sqlite":
+            catalog = conn.execute(text("PRAGMA schema_version")).scalar()
+        else:
+            # 전용 fingerprint가 없는 DB는 테이블 목록으로 대체 (TTL에 의존)
+            catalog = ",".join(sorted(inspect(conn).get_table_names()))
+
+    raw = f"{dialect}|{catalog}|{last_load_timestamp()}"
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+# ========================
+# Cache
+# ========================
+
+@dataclass
+class SchemaSnapshot:
+    """특정 시점의 스키마 추출 결과"""
+    fingerprint: str
+    tables: List[Dict[str, Any]]
+    text: str
+    built_at: float = field(default_factory=time.time)
+    checked_at: float = field(default_factory=time.time)
+
+    @property
+    def table_count(self) -> int:
+        return len(self.tables)
+
+    def to_api_tables(self) -> List[Dict[str, Any]]:
+        """/api/schema 응답 형식으로 변환"""
+        return [
+            {
+                "name": table['name'],
+                "columns": [
+                    {"name": col['name'], "type": format_column(col)}
+                    for col in table['columns']
+                ],
+                "primary_key": ", ".join(table['primary_key']) or None,
+                "foreign_keys": [
+                    f"{', '.join(fk['columns'])} -> {fk['referred_table']}.{', '.join(fk['referred_columns'])}"
+                    for fk in table['foreign_keys']
+                ],
+                "indexes": [
+                    f"{idx['name']} on ({', '.join(idx['columns'])})"
+                    for idx in table['indexes'] if not idx['unique']
+                ],
+            }
+            for table in self.tables
+        ]
+
+
+class SchemaCache:
+    """
+    DB URL별 스키마 스냅샷 캐시 (스레드 안전)
+
+    - check_interval 이내의 재요청은 DB 조회 없이 반환
+    - 그 이후에는 fingerprint 1회 조회로 변경 여부 확인
+    - fingerprint가 바뀌었거나 TTL이 지나면 inspector로 다시 추출
+    """
+
+    def __init__(self, ttl: float = SCHEMA_CACHE_TTL, check_interval: float = SCHEMA_CHECK_INTERVAL):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._snapshots: Dict[str, SchemaSnapshot] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def _key(engine: Engine) -> str:
+        return engine.url.render_as_string(hide_password=True)
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, engine: Engine, force: bool = False) -> SchemaSnapshot:
+        """
+        스키마 스냅샷 반환
+
+        Args:
+            engine: 대상 데이터베이스 엔진
+            force: True면 캐시를 무시하고 다시 추출
+        """
+        key = self._key(engine)
+
+        # 같은 DB에 대한 동시 재추출을 막기 위해 URL별 락 사용
+        with self._lock_for(key):
+            now = time.time()
+            snapshot = self._snapshots.get(key)
+
+            if snapshot and not force:
+                if now - snapshot.checked_at < self.check_interval:
+                    return snapshot
+
+                fingerprint = compute_fingerprint(engine)
+                if fingerprint == snapshot.fingerprint and now - snapshot.built_at < self.ttl:
+                    snapshot.checked_at = now
+                    return snapshot
+            else:
+                fingerprint = compute_fingerprint(engine)
+
+            tables = extract_schema(engine)
+            snapshot = SchemaSnapshot(
+                fingerprint=fingerprint,
+                tables=tables,
+                text=render_schema(tables),
+            )
+            self._snapshots[key] = snapshot
+            print(f"📊 Schema cache rebuilt: {snapshot.table_count} tables ({fingerprint[:8]})")
+            return snapshot
+
+    def fingerprint(self, engine: Engine) -> str:
+        """현재 스키마 fingerprint (캐시된 스냅샷 기준)"""
+        return self.get(engine).fingerprint
+
+    def invalidate(self, engine: Optional[Engine] = None):
+        """캐시 무효화 (engine을 생략하면 전체)"""
+        with self._guard:
+            if engine is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(self._key(engine), None)
+
+
+# 프로세스 전역 캐시 인스턴스
+_schema_cache = SchemaCache()
+
+
+def get_schema_cache() -> SchemaCache:
+    """프로세스 전역 스키마 캐시 반환"""
+    return _schema_cache
+
+
+def invalidate_schema_cache(engine: Optional[Engine] = None):
+    """프로세스 전역 스키마 캐시 무효화"""
+    _schema_cache.invalidate(engine)
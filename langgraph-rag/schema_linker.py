@@ -0,0 +1,254 @@
+"""
+Schema Linker - 질문 관련 테이블/컬럼만 골라내는 스키마 링킹 단계
+사용자 질문과 스키마를 키워드/동의어로 매칭하여 토큰 예산 안의 축약 스키마를 생성
+
+sap_zsdr0340_sales_detail(68+ 컬럼), sap_zmmr0001_materials(~100 컬럼) 같은 넓은 SAP 테이블을
+전부 프롬프트에 넣으면 느리고 비용이 크므로, 질문과 관련 있는 테이블과 컬럼만 남깁니다.
+동의어 사전은 sap_field_mapping.FIELD_MAPPING과 LangChainSQLAgent 프롬프트의 테이블 선택 가이드를 기반으로 합니다.
+"""
+
+from typing import List, Dict, Any, Set
+from dataclasses import dataclass, field
+from sap_field_mapping import FIELD_MAPPING
+from schema_cache import render_table
+import os
+import re
+import time
+
+# ========================
+# Configuration
+# ========================
+
+# 축약 스키마 토큰 예산 (추정치 기준)
+SCHEMA_TOKEN_BUDGET = int(os.getenv("SCHEMA_TOKEN_BUDGET", 2000))
+
+# 테이블 선택 가이드 (LangChainSQLAgent prefix의 "테이블 선택 가이드"와 동일한 내용)
+TABLE_GUIDE: Dict[str, List[str]] = {
+    "sap_zsdr0340_sales_detail": ["매출", "청구", "판매", "판매처", "청구금액", "청구일"],
+    "sap_zmmr0016_inventory": ["재고", "재고구분", "총재고", "재고금액", "가용재고"],
+    "sap_zmmr0001_materials": ["자재", "제품", "자재그룹", "가격", "판가", "도매가", "소비자가", "제품군", "제품유형"],
+    "sap_zsdr0062_sales_orders": ["부족수량", "판매오더", "오더수량", "납품가능", "납품지시", "출고수량"],
+}
+
+# 업무 용어 → 실제 컬럼명 동의어 (프롬프트 가이드의 컬럼 설명)
+DOMAIN_SYNONYMS: Dict[str, List[str]] = {
+    "매출": ["청구금액", "매출액", "금액"],
+    "판매량": ["청구수량", "수량"],
+    "판매처": ["판매처", "판매처명", "고객명"],
+    "고객": ["판매처", "고객명", "고객번호"],
+    "제품군": ["자재그룹7명"],
+    "제품유형": ["자재그룹6명"],
+    "부족수량": ["오더수량", "납품가능수량"],
+    "가격": ["판가", "도매가", "소비자가"],
+    "재고금액": ["재고금액"],
+}
+
+# 시간 조건이 있는 질문에는 날짜 컬럼을 항상 포함
+TEMPORAL_TERMS = ["월별", "월", "년", "연도", "기간", "최근", "이번", "지난", "오늘", "어제", "분기", "일자", "날짜", "date", "month", "year"]
+
+# 한국어 조사/접미사 (질문 단어 정규화용)
+KOREAN_SUFFIXES = ["에서", "으로", "부터", "까지", "별로", "별", "은", "는", "이", "가", "을", "를", "의", "에", "로", "과", "와", "도", "만"]
+
+# 작은 테이블은 링킹 없이 전체 컬럼 포함
+SMALL_TABLE_COLUMNS = 12
+
+# 최고 점수 대비 이 비율 미만의 테이블은 제외 (우연한 컬럼명 매칭 방지)
+RELATIVE_TABLE_CUTOFF = 0.4
+
+# 선택된 테이블에 최소한으로 포함할 컬럼 수 (매칭 컬럼이 적으면 앞쪽 컬럼으로 채움)
+MIN_COLUMNS = 8
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    토큰 수 추정 (tokenizer 다운로드 없이 사용하는 근사치)
+
+    ASCII는 약 4자당 1토큰, 한글 등 비ASCII 문자는 1자당 약 1토큰으로 계산합니다.
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def normalize(text: str) -> str:
+    """비교용 정규화 (소문자, 공백/구두점 제거)"""
+    return re.sub(r"[\s_\-()\[\]\"'.,?!]+", "", text.lower())
+
+
+def build_synonyms() -> Dict[str, Set[str]]:
+    """FIELD_MAPPING과 DOMAIN_SYNONYMS로 양방향 동의어 사전 생성"""
+    synonyms: Dict[str, Set[str]] = {}
+
+    def add(a: str, b: str):
+        a, b = normalize(a), normalize(b)
+        if len(a) >= 2 and len(b) >= 2:
+            synonyms.setdefault(a, set()).add(b)
+            synonyms.setdefault(b, set()).add(a)
+
+    for code, label in FIELD_MAPPING.items():
+        add(code, label)
+    for term, columns in DOMAIN_SYNONYMS.items():
+        for col in columns:
+            add(term, col)
+
+    return synonyms
+
+
+@dataclass
+class LinkResult:
+    """스키마 링킹 결과"""
+    schema_text: str  # 프롬프트에 넣을 축약 스키마
+    tables: List[str] = field(default_factory=list)  # 선택된 테이블
+    tokens_full: int = 0  # 전체 스키마 토큰 수 (추정)
+    tokens_pruned: int = 0  # 축약 스키마 토큰 수 (추정)
+    elapsed_ms: float = 0.0  # 링킹 소요 시간
+    fallback: bool = False  # 매칭 실패로 전체 스키마(예산 내)를 사용했는지 여부
+
+
+class SchemaLinker:
+    """
+    질문-스키마 링킹
+
+    1. 질문 단어와 동의어를 확장
+    2. 테이블 가이드 키워드와 컬럼명 매칭으로 테이블/컬럼 점수 계산
+    3. 점수 순으로 토큰 예산 안에서 테이블과 컬럼을 채움
+    """
+
+    def __init__(self, token_budget: int = SCHEMA_TOKEN_BUDGET, max_tables: int = 4):
+        self.token_budget = token_budget
+        self.max_tables = max_tables
+        self.synonyms = build_synonyms()
+
+    def _query_terms(self, query: str) -> Set[str]:
+        """질문 단어 추출 + 조사 제거 + 동의어 확장"""
+        terms = set()
+        for word in re.findall(r"[\w가-힣]+", query.lower()):
+            for suffix in KOREAN_SUFFIXES:
+                if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+                    word = word[:-len(suffix)]
+                    break
+            if len(word) >= 2:
+                terms.add(word)
+
+        query_norm = normalize(query)
+        for key, values in self.synonyms.items():
+            if key in query_norm:
+                terms.add(key)
+                terms.update(values)
+
+        return terms
+
+    @staticmethod
+    def _column_score(col_norm: str, query_norm: str, terms: Set[str]) -> int:
+        score = 0
+        if len(col_norm) >= 2 and col_norm in query_norm:
+            score += 3
+        matches = sum(1 for term in terms if term in col_norm)
+        score += 2 * min(matches, 2)
+        return score
+
+    @staticmethod
+    def _is_date_column(col: Dict[str, Any]) -> bool:
+        col_type = col['type'].upper()
+        name = col['name'].lower()
+        return ("DATE" in col_type or "TIME" in col_type
+                or name.endswith(("일", "일자", "일시", "date")))
+
+    def _render(self, table: Dict[str, Any], columns: List[Dict[str, Any]]) -> str:
+        text = render_table(table, columns)
+        omitted = len(table['columns']) - len(columns)
+        if omitted > 0:
+            text += f"\n  (... {omitted} more columns omitted)"
+        return text
+
+    def link(self, query: str, tables: List[Dict[str, Any]]) -> LinkResult:
+        """
+        질문과 관련된 테이블/컬럼만 포함한 축약 스키마 생성
+
+        Args:
+            query: 사용자 질문
+            tables: schema_cache.extract_schema() 형식의 테이블 목록
+
+        Returns:
+            LinkResult
+        """
+        started = time.perf_counter()
+        query_norm = normalize(query)
+        terms = self._query_terms(query)
+        temporal = any(t in query_norm for t in TEMPORAL_TERMS)
+
+        full_text = "\n".join(render_table(t) for t in tables)
+
+        scored = []
+        for table in tables:
+            name = table['name']
+            table_score = 5 * sum(1 for kw in TABLE_GUIDE.get(name, []) if kw in query_norm)
+
+            col_scores = []
+            for col in table['columns']:
+                col_scores.append(self._column_score(normalize(col['name']), query_norm, terms))
+            table_score += sum(sorted(col_scores, reverse=True)[:3])
+
+            if table_score > 0:
+                scored.append((table_score, table, col_scores))
+
+        fallback = not scored
+        if fallback:
+            # 매칭되는 테이블이 없으면 원래 순서대로 전체 컬럼을 예산 안에서 포함
+            scored = [(0, t, [1] * len(t['columns'])) for t in tables]
+        else:
+            scored.sort(key=lambda item: item[0], reverse=True)
+            cutoff = scored[0][0] * RELATIVE_TABLE_CUTOFF
+            scored = [item for item in scored if item[0] >= cutoff][:self.max_tables]
+
+        parts = []
+        selected = []
+        used = 0
+        for _, table, col_scores in scored:
+            required = set(table['primary_key'])
+            if temporal:
+                required.update(c['name'] for c in table['columns'] if self._is_date_column(c))
+
+            if fallback or len(table['columns']) <= SMALL_TABLE_COLUMNS:
+                ranked = list(table['columns'])
+            else:
+                ranked = [c for c, s in sorted(zip(table['columns'], col_scores), key=lambda x: -x[1])
+                          if s > 0 or c['name'] in required]
+                for col in table['columns']:
+                    if len(ranked) >= MIN_COLUMNS:
+                        break
+                    if col not in ranked:
+                        ranked.append(col)
+
+            # 예산을 넘으면 점수가 낮은 선택 컬럼부터 제거 (원래 컬럼 순서는 유지)
+            while True:
+                keep = {c['name'] for c in ranked}
+                columns = [c for c in table['columns'] if c['name'] in keep]
+                text = self._render(table, columns)
+                tokens = estimate_tokens(text)
+                if used + tokens <= self.token_budget:
+                    break
+                optional = [c for c in ranked if c['name'] not in required]
+                if not optional:
+                    break
+                ranked.remove(optional[-1])
+
+            if used + tokens > self.token_budget and selected:
+                break
+
+            parts.append(text)
+            selected.append(table['name'])
+            used += tokens
+
+        others = [t['name'] for t in tables if t['name'] not in selected]
+        if others:
+            parts.append(f"\nOther tables (not shown): {', '.join(others)}")
+
+        schema_text = "\n".join(parts)
+        return LinkResult(
+            schema_text=schema_text,
+            tables=selected,
+            tokens_full=estimate_tokens(full_text),
+            tokens_pruned=estimate_tokens(schema_text),
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+            fallback=fallback,
+        )
@@ -0,0 +1,303 @@
+"""
+SQL Query Tool - 결과 행을 타입 그대로 보관하는 sql_db_query 도구
+ReAct 에이전트의 sql_db_query 도구를 대체하여 실행 결과를 실행(run) 단위 side channel에 저장
+
+기본 QuerySQLDataBaseTool은 결과를 문자열로만 돌려주므로 에이전트가 행 데이터를 얻으려면
+observation 텍스트를 다시 파싱하거나 같은 SQL을 한 번 더 실행해야 했습니다.
+이 도구는 SQLAlchemy가 반환한 행(Decimal, date 등 원래 타입)을 ResultCapture에 보관하고
+LLM에는 크기가 제한된 요약만 전달합니다.
+- 앞쪽 N행 (문자 예산 안에서)
+- 전체 행 수
+- 숫자 컬럼별 min/max/sum
+- 결과 핸들 (전체 결과는 서버에 남아 API 응답에 사용)
+결과가 5행이든 5,000행이든 다음 LLM 호출의 프롬프트 크기는 거의 같습니다.
+
+cost_guard가 설정되면 실행 전에 EXPLAIN으로 비용을 검사하고, 거부 사유를 "Error: ..."로 돌려주어
+에이전트가 더 싼 쿼리로 고쳐 쓰도록 합니다.
+실행은 query_budget의 시간 예산(statement_timeout)과 요청 취소 범위 안에서 이루어지며,
+SELECT는 서버 사이드 커서로 max_rows + 1행만 가져옵니다.
+에이전트가 비동기로 호출하면(_arun) async_db 경로로 실행되어 이벤트 루프를 막지 않습니다.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, field
+from contextvars import ContextVar
+from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
+from sqlalchemy import text
+from cost_guard import CostGuard
+from query_budget import BudgetedConnection, BudgetExceeded
+from async_db import AsyncDatabase
+from blocking_executor import run_blocking
+from decimal import Decimal
+import itertools
+import os
+import time
+
+# ========================
+# Configuration
+# ========================
+
+# LLM에 보여줄 미리보기 행 수
+QUERY_PREVIEW_ROWS = int(os.getenv("QUERY_PREVIEW_ROWS", 20))
+
+# ResultCapture 없이 도구가 호출된 경우의 최대 보관 행 수
+DEFAULT_CAPTURE_ROWS = int(os.getenv("DEFAULT_CAPTURE_ROWS", 1000))
+
+# 미리보기 최대 문자 수 (컬럼이 많은 테이블에서도 observation 크기를 제한)
+QUERY_PREVIEW_CHARS = int(os.getenv("QUERY_PREVIEW_CHARS", 4000))
+
+# 미리보기 값 최대 길이 (SQLDatabase.run의 truncate 기준과 동일)
+PREVIEW_VALUE_LENGTH = 100
+
+_handle_counter = itertools.count(1)
+
+
+def new_handle() -> str:
+    """프로세스 안에서 유일한 결과 핸들 (예: 'r42')"""
+    return f"r{next(_handle_counter)}"
+
+
+def is_numeric(value: Any) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def numeric_stats(columns: List[str], rows: List[Tuple[Any, ...]]) -> Dict[str, Dict[str, Any]]:
+    """숫자 컬럼별 min/max/sum (NULL 제외, 숫자가 아닌 값이 섞인 컬럼은 제외)"""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for i, name in enumerate(columns):
+        values = [row[i] for row in rows if row[i] is not None]
+        if values and all(is_numeric(v) for v in values):
+            stats[name] = {"min": min(values), "max": max(values), "sum": sum(values)}
+    return stats
+
+
+@dataclass
+class QueryResult:
+    """sql_db_query 한 번의 실행 결과 (타입 보존)"""
+    sql: str
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+    truncated: bool = False  # max_rows에서 잘렸는지 여부
+    elapsed_ms: float = 0.0
+    handle: str = field(default_factory=new_handle)
+    note: Optional[str] = None  # 비용 검사에서 재작성된 경우 사유
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """API 응답용 딕셔너리 리스트로 변환"""
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+
+@dataclass
+class QueryTiming:
+    """sql_db_query 한 번의 DB 실행 시간 (성공/실패 모두 기록, trace span에 사용)"""
+    sql: str
+    elapsed_ms: float
+    rows: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class ResultCapture:
+    """
+    실행(run) 단위 결과 보관소
+
+    LangChainSQLAgent.run()이 만들어 activate()로 현재 컨텍스트에 연결합니다.
+    도구는 스레드 풀에서 실행되지만 LangChain이 contextvars를 복사하므로 같은 객체에 기록됩니다.
+    """
+    max_rows: int = DEFAULT_CAPTURE_ROWS
+    results: List[QueryResult] = field(default_factory=list)
+    errors: List[Tuple[str, str]] = field(default_factory=list)  # (sql, 에러 메시지)
+    timings: List[QueryTiming] = field(default_factory=list)
+    budget_exceeded: List[Dict[str, Any]] = field(default_factory=list)  # BudgetExceeded.to_dict()
+
+    @property
+    def last(self) -> Optional[QueryResult]:
+        """마지막으로 성공한 쿼리 결과"""
+        return self.results[-1] if self.results else None
+
+    def get(self, handle: str) -> Optional[QueryResult]:
+        """결과 핸들로 보관된 결과 조회"""
+        for result in self.results:
+            if result.handle == handle:
+                return result
+        return None
+
+
+_current_capture: ContextVar[Optional[ResultCapture]] = ContextVar("sql_result_capture", default=None)
+
+
+def activate(capture: ResultCapture):
+    """현재 컨텍스트에 ResultCapture 연결 (반환된 토큰으로 deactivate)"""
+    return _current_capture.set(capture)
+
+
+def deactivate(token):
+    _current_capture.reset(token)
+
+
+def current_capture() -> Optional[ResultCapture]:
+    return _current_capture.get()
+
+
+def format_value(value: Any) -> str:
+    text_value = str(value)
+    if len(text_value) > PREVIEW_VALUE_LENGTH:
+        return text_value[:PREVIEW_VALUE_LENGTH] + "..."
+    return text_value
+
+
+def format_summary(result: QueryResult, preview_rows: int = QUERY_PREVIEW_ROWS,
+                   max_chars: int = QUERY_PREVIEW_CHARS) -> str:
+    """
+    LLM에 전달할 결과 요약
+
+    예:
+        Result r3: 1523 rows, 4 columns
+        자재 | 자재명 | 재고금액 | 청구일
+        ...앞쪽 행...
+        (showing first 20 of 1523 rows; full result kept server-side)
+        Numeric columns: 재고금액 min=0 max=91230000 sum=1203391000
+    """
+    total = f"{result.row_count}+" if result.truncated else str(result.row_count)
+    lines = [f"Result {result.handle}: {total} rows, {len(result.columns)} columns"]
+    if result.note:
+        lines.append(f"Note: {result.note}")
+    if not result.rows:
+        lines.append(f"Columns: {' | '.join(result.columns)}")
+        return "\n".join(lines)
+
+    header = " | ".join(result.columns)
+    lines.append(header)
+    used = len(lines[0]) + len(header)
+    shown = 0
+    for row in result.rows[:preview_rows]:
+        line = " | ".join(format_value(v) for v in row)
+        if shown and used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line)
+        shown += 1
+
+    if shown < result.row_count:
+        lines.append(f"(showing first {shown} of {total} rows; full result kept server-side)")
+
+    stats = numeric_stats(result.columns, result.rows)
+    if stats:
+        summary = "; ".join(
+            f"{name} min={s['min']} max={s['max']} sum={s['sum']}" for name, s in stats.items()
+        )
+        lines.append(f"Numeric columns: {summary}")
+
+    return "\n".join(lines)
+
+
+class CapturingQuerySQLDataBaseTool(QuerySQLDataBaseTool):
+    """
+    결과를 ResultCapture에 보관하고 LLM에는 요약만 반환하는 sql_db_query 도구
+
+    이름/설명/입력 스키마는 기본 도구와 같으므로 프롬프트 변경 없이 교체할 수 있습니다.
+    에러는 기본 도구처럼 "Error: ..." 문자열로 반환하여 에이전트가 쿼리를 수정하도록 합니다.
+    """
+
+    preview_rows: int = QUERY_PREVIEW_ROWS
+    cost_guard: Optional[CostGuard] = None
+    async_db: Optional[AsyncDatabase] = None  # 있으면 비동기 호출(_arun)은 이벤트 루프를 막지 않는 경로로 실행
+
+    @staticmethod
+    def _record_error(capture: Optional[ResultCapture], query: str, started: float, error: Exception):
+        if capture is None:
+            return
+        capture.errors.append((query, str(error)))
+        if isinstance(error, BudgetExceeded):
+            capture.budget_exceeded.append(error.to_dict())
+        capture.timings.append(QueryTiming(
+            sql=query, elapsed_ms=(time.perf_counter() - started) * 1000, error=str(error)
+        ))
+
+    @staticmethod
+    def _record_result(capture: Optional[ResultCapture], query: str, started: float, columns: List[str],
+                       rows: List[Tuple[Any, ...]], truncated: bool, note: Optional[str]) -> QueryResult:
+        result = QueryResult(
+            sql=query,
+            columns=columns,
+            rows=rows,
+            truncated=truncated,
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+            note=note,
+        )
+        if capture is not None:
+            capture.results.append(result)
+            capture.timings.append(QueryTiming(sql=query, elapsed_ms=result.elapsed_ms, rows=result.row_count))
+        return result
+
+    def execute(self, query: str, guarded: bool = False) -> QueryResult:
+        """
+        쿼리 실행 후 결과를 현재 ResultCapture에 기록 (에러는 그대로 전달)
+
+        guarded=True면 호출 측에서 이미 비용 검사를 마친 SQL로 보고 EXPLAIN을 생략합니다.
+        """
+        capture = current_capture()
+        max_rows = capture.max_rows if capture else DEFAULT_CAPTURE_ROWS
+
+        started = time.perf_counter()
+        note = None
+        try:
+            if self.cost_guard is not None and not guarded:
+                verdict = self.cost_guard.enforce(query)  # 거부 시 QueryRejected
+                if verdict.action == "rewrite":
+                    query, note = verdict.sql, verdict.feedback()
+            with BudgetedConnection(self.db._engine) as conn:
+                # SELECT는 서버 사이드 커서로 실행하여 max_rows + 1행 이후는 DB가 만들지 않도록 함
+                if query.lstrip().upper().startswith(("SELECT", "WITH")):
+                    conn = conn.execution_options(stream_results=True)
+                cursor = conn.execute(text(query))
+                if cursor.returns_rows:
+                    columns = list(cursor.keys())
+                    rows = [tuple(row) for row in cursor.fetchmany(max_rows + 1)]
+                else:
+                    columns, rows = [], []
+        except Exception as e:
+            self._record_error(capture, query, started, e)
+            raise
+
+        return self._record_result(capture, query, started, columns, rows[:max_rows], len(rows) > max_rows, note)
+
+    async def aexecute(self, query: str, guarded: bool = False) -> QueryResult:
+        """execute()의 비동기 버전 (async_db로 실행, 비용 검사 EXPLAIN만 스레드에서 실행)"""
+        if self.async_db is None:
+            return await run_blocking(self.execute, query, guarded)
+
+        capture = current_capture()
+        max_rows = capture.max_rows if capture else DEFAULT_CAPTURE_ROWS
+
+        started = time.perf_counter()
+        note = None
+        try:
+            if self.cost_guard is not None and not guarded:
+                verdict = await run_blocking(self.cost_guard.enforce, query)
+                if verdict.action == "rewrite":
+                    query, note = verdict.sql, verdict.feedback()
+            columns, rows, truncated = await self.async_db.fetch(query, max_rows)
+        except Exception as e:
+            self._record_error(capture, query, started, e)
+            raise
+
+        return self._record_result(capture, query, started, columns, rows, truncated, note)
+
+    def _run(self, query: str, run_manager=None) -> str:
+        try:
+            result = self.execute(query)
+        except Exception as e:
+            return f"Error: {e}"
+        return format_summary(result, self.preview_rows)
+
+    async def _arun(self, query: str, run_manager=None) -> str:
+        try:
+            result = await self.aexecute(query)
+        except Exception as e:
+            return f"Error: {e}"
+        return format_summary(result, self.preview_rows)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Trace 요약 스크립트
+AGENT_TRACE_FILE(JSONL)에 기록된 실행 trace를 읽어 구간별 소요 시간을 요약
+
+사용법:
+    AGENT_TRACE_FILE=traces.jsonl python main.py      # trace 기록
+    python summarize_traces.py traces.jsonl            # 요약
+    python summarize_traces.py traces.jsonl --top 10 --since 3600
+
+출력:
+1. 구간(span)별 호출 수, 총/평균/p50/p95 소요 시간, 전체 실행 시간 대비 비율
+2. 가장 느린 실행과 LLM/도구/DB/후처리 시간 분해
+3. DB 시간이 가장 긴 SQL
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Dict, Any
+
+
+def load_traces(path: str, since: float = 0) -> List[Dict[str, Any]]:
+    traces = []
+    cutoff = time.time() - since if since else 0
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                trace = json.loads(line)
+            except ValueError:
+                print(f"⚠️ {line_no}번째 줄 파싱 실패, 건너뜀", file=sys.stderr)
+                continue
+            if trace.get("timestamp", 0) >= cutoff:
+                traces.append(trace)
+    return traces
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * (len(values) - 1) + 0.5))]
+
+
+def breakdown(trace: Dict[str, Any]) -> Dict[str, float]:
+    """실행 하나의 LLM/도구/DB/stage 시간 (ms)"""
+    result = {"llm": 0.0, "tool": 0.0, "db": 0.0, "post_process": 0.0}
+    for span in trace.get("spans", []):
+        if span["kind"] in ("llm", "tool"):
+            result[span["kind"]] += span["duration_ms"]
+        if span["name"] == "post_process":
+            result["post_process"] += span["duration_ms"]
+        result["db"] += span.get("attributes", {}).get("db_ms", 0.0)
+    return result
+
+
+def summarize(traces: List[Dict[str, Any]], top: int):
+    total_ms = sum(t["duration_ms"] for t in traces)
+    durations = [t["duration_ms"] for t in traces]
+
+    print("=" * 80)
+    print(f"📊 실행 {len(traces)}건 | 성공 {sum(1 for t in traces if t.get('success'))}건 | "
+          f"캐시 적중 {sum(1 for t in traces if t.get('cache_hit'))}건")
+    print(f"⏱️ 실행 시간 p50 {percentile(durations, 0.5) / 1000:.2f}s | "
+          f"p95 {percentile(durations, 0.95) / 1000:.2f}s | max {max(durations) / 1000:.2f}s")
+    print("=" * 80)
+
+    # 1. 구간별 통계
+    by_name: Dict[str, List[float]] = {}
+    for trace in traces:
+        for span in trace.get("spans", []):
+            key = f"{span['kind']}:{span['name']}"
+            by_name.setdefault(key, []).append(span["duration_ms"])
+        for span in trace.get("spans", []):
+            db_ms = span.get("attributes", {}).get("db_ms")
+            if db_ms is not None:
+                by_name.setdefault("db:sql_execution", []).append(db_ms)
+
+    print(f"\n{'구간':<32}{'호출':>7}{'총(s)':>10}{'평균(ms)':>11}{'p50(ms)':>10}{'p95(ms)':>10}{'비율':>8}")
+    print("-" * 88)
+    for key, values in sorted(by_name.items(), key=lambda item: -sum(item[1])):
+        share = sum(values) / total_ms * 100 if total_ms else 0
+        print(f"{key:<32}{len(values):>7}{sum(values) / 1000:>10.2f}{sum(values) / len(values):>11.1f}"
+              f"{percentile(values, 0.5):>10.1f}{percentile(values, 0.95):>10.1f}{share:>7.1f}%")
+    print("  (llm/tool 구간은 서로 겹치지 않지만 stage:agent_loop는 이들을 포함합니다)")
+
+    # 2. 가장 느린 실행
+    print(f"\n🐢 가장 느린 실행 {top}건")
+    print("-" * 88)
+    for trace in sorted(traces, key=lambda t: -t["duration_ms"])[:top]:
+        parts = breakdown(trace)
+        print(f"{trace['duration_ms'] / 1000:>7.2f}s  LLM {parts['llm'] / 1000:.2f}s | "
+              f"도구 {parts['tool'] / 1000:.2f}s (DB {parts['db'] / 1000:.2f}s) | "
+              f"후처리 {parts['post_process']:.0f}ms | {trace['query'][:40]!r}")
+
+    # 3. DB 시간이 긴 SQL
+    sql_spans = [
+        span for trace in traces for span in trace.get("spans", [])
+        if span.get("attributes", {}).get("db_ms") is not None
+    ]
+    if sql_spans:
+        print(f"\n🐘 DB 시간이 가장 긴 SQL {top}건")
+        print("-" * 88)
+        for span in sorted(sql_spans, key=lambda s: -s["attributes"]["db_ms"])[:top]:
+            attrs = span["attributes"]
+            sql = " ".join(attrs.get("sql", "").split())
+            status = "❌" if span.get("error") else "✅"
+            print(f"{status} {attrs['db_ms']:>9.1f}ms  {attrs.get('rows', 0):>6} rows  {sql[:90]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="에이전트 실행 trace 요약")
+    parser.add_argument("path", nargs="?", default=os.getenv("AGENT_TRACE_FILE"), help="trace JSONL 파일")
+    parser.add_argument("--top", type=int, default=5, help="느린 실행/SQL 표시 개수")
+    parser.add_argument("--since", type=float, default=0, help="최근 N초 이내의 trace만 요약")
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error("trace 파일 경로를 지정하거나 AGENT_TRACE_FILE을 설정하세요")
+
+    traces = load_traces(args.path, args.since)
+    if not traces:
+        print("요약할 trace가 없습니다")
+        return
+
+    summarize(traces, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+비동기 DB 실행 부하 테스트 스크립트
+느린 SQL 하나가 실행되는 동안 다른 스트림(/api/chat 등)이 멈추지 않는지 확인
+
+기본 모드는 임시 SQLite DB에서 느린 재귀 CTE를 실행하면서, 같은 이벤트 루프에서
+일정 간격으로 청크를 내보내는 가짜 채팅 스트림 N개의 청크 간격을 측정합니다.
+1. 동기 엔진으로 루프 안에서 직접 실행 (기존 방식) → 쿼리 시간만큼 스트림이 멈춤
+2. AsyncDatabase.fetch로 실행 → 스트림 간격이 유지됨
+
+--live 옵션을 주면 실행 중인 서버(--url)에 느린 /api/text-to-sql/stream 요청을 보내는 동안
+/api/chat 스트림 N개의 청크 간격을 측정합니다.
+"""
+
+import asyncio
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from typing import List
+from sqlalchemy import create_engine, text
+
+from async_db import AsyncDatabase
+
+CHAT_CHUNK_INTERVAL = 0.02  # 가짜 채팅 스트림의 청크 간격 (초)
+MAX_ALLOWED_GAP = 0.25  # 허용하는 최대 청크 간격 (초)
+
+# 약 1~3초 걸리는 CPU 바운드 쿼리
+SLOW_QUERY = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 3000000) "
+    "SELECT count(*) AS n, sum(x) AS total FROM c"
+)
+
+
+def create_test_db() -> str:
+    path = os.path.join(tempfile.mkdtemp(), "async_load.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE numbers (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO numbers VALUES (?)", [(i,) for i in range(1000)])
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+async def fake_chat_stream(stop: asyncio.Event) -> float:
+    """CHAT_CHUNK_INTERVAL마다 청크를 내보내는 스트림, 최대 청크 간격 반환"""
+    max_gap = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(CHAT_CHUNK_INTERVAL)
+        now = time.perf_counter()
+        max_gap = max(max_gap, now - last)
+        last = now
+    return max_gap
+
+
+async def measure(label: str, run_query, streams: int) -> float:
+    """쿼리를 실행하는 동안 스트림 N개의 최대 청크 간격 측정"""
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(fake_chat_stream(stop)) for _ in range(streams)]
+    await asyncio.sleep(0.1)  # 스트림 시작
+
+    started = time.perf_counter()
+    await run_query()
+    query_time = time.perf_counter() - started
+
+    await asyncio.sleep(0.1)
+    stop.set()
+    max_gap = max(await asyncio.gather(*tasks))
+    print(f"  {label}: 쿼리 {query_time:.2f}초 / 스트림 최대 청크 간격 {max_gap * 1000:.0f}ms")
+    return max_gap
+
+
+async def run_simulated(streams: int) -> List[str]:
+    db_url = create_test_db()
+    sync_engine = create_engine(db_url)
+    async_db = AsyncDatabase(db_url)
+
+    async def blocking_query():
+        # 기존 방식: async 핸들러 안에서 동기 엔진 호출
+        with sync_engine.connect() as conn:
+            conn.execute(text(SLOW_QUERY)).fetchall()
+
+    async def async_query():
+        await async_db.fetch(SLOW_QUERY, max_rows=10)
+
+    blocking_gap = await measure("동기 엔진", blocking_query, streams)
+    async_gap = await measure("비동기 엔진", async_query, streams)
+    await async_db.dispose()
+
+    failures = []
+    if async_gap > MAX_ALLOWED_GAP:
+        failures.append(f"비동기 실행 중 스트림이 멈춤: {async_gap * 1000:.0f}ms > {MAX_ALLOWED_GAP * 1000:.0f}ms")
+    if blocking_gap <= MAX_ALLOWED_GAP:
+        print("  ℹ️ 동기 엔진에서도 스트림이 멈추지 않음 (쿼리가 너무 빠름)")
+    return failures
+
+
+async def run_live(url: str, streams: int, question: str) -> List[str]:
+    import httpx
+
+    async def slow_sql(client: httpx.AsyncClient):
+        payload = {"query": question, "max_rows": 100000, "use_cache": False}
+        async with client.stream("POST", f"{url}/api/text-to-sql/stream", json=payload) as response:
+            async for _ in response.aiter_lines():
+                pass
+
+    async def chat(client: httpx.AsyncClient) -> float:
+        payload = {"messages": [{"role": "user", "content": "제제 연구에서 용출 시험의 목적을 길게 설명해주세요"}]}
+        max_gap = 0.0
+        last = None
+        async with client.stream("POST", f"{url}/api/chat", json=payload) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                if "content" not in json.loads(line[6:]):
+                    continue
+                now = time.perf_counter()
+                if last is not None:
+                    max_gap = max(max_gap, now - last)
+                last = now
+        return max_gap
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        sql_task = asyncio.create_task(slow_sql(client))
+        await asyncio.sleep(1.0)  # SQL 생성 후 실행 단계에 들어갈 때까지 대기
+        gaps = await asyncio.gather(*(chat(client) for _ in range(streams)))
+        await sql_task
+
+    max_gap = max(gaps)
+    print(f"  /api/chat 스트림 {streams}개 최대 청크 간격 {max_gap * 1000:.0f}ms")
+    # 실제 LLM 토큰 간격이 섞이므로 기준을 넉넉하게 둠
+    if max_gap > MAX_ALLOWED_GAP * 8:
+        return [f"/api/chat 스트림이 멈춤: {max_gap * 1000:.0f}ms"]
+    return []
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="비동기 DB 실행 부하 테스트")
+    parser.add_argument("-n", type=int, default=4, help="동시 채팅 스트림 수")
+    parser.add_argument("--live", action="store_true", help="실행 중인 서버에 요청")
+    parser.add_argument("--url", default="http://localhost:8000", help="서버 주소 (--live)")
+    parser.add_argument("--question", default="전체 판매 실적을 고객, 자재, 일자별로 모두 보여주세요",
+                        help="느린 Text-to-SQL 질문 (--live)")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"🚀 비동기 DB 부하 테스트 (스트림 {args.n}개, {'live' if args.live else 'simulated'})")
+    print("=" * 80)
+
+    if args.live:
+        failures = await run_live(args.url, args.n, args.question)
+    else:
+        failures = await run_simulated(args.n)
+
+    if failures:
+        print("\n❌ 실패:")
+        for failure in failures:
+            print(f"  - {failure}")
+        raise SystemExit(1)
+
+    print("\n✅ 느린 쿼리 실행 중에도 스트림이 멈추지 않음")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
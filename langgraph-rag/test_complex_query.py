@@ -2,10 +2,15 @@
 """
 복잡한 쿼리 테스트 스크립트
 부족수량 분석 쿼리를 단계별로 테스트
+
+    python test_complex_query.py            # 간단한 쿼리 + 복잡한 쿼리 테스트
+    python test_complex_query.py --compare  # ReAct 전용 vs 단일 호출 우선(fast_first) 토큰/시간 비교
 """
 
 import asyncio
 import os
+import sys
+import time
 from dotenv import load_dotenv
 from langchain_sql_agent import LangChainSQLAgent
 
@@ -98,7 +103,65 @@ async def test_simple_queries():
         else:
             print(f"  ❌ 실패: {result.get('error', '')}")
 
+async def compare_modes():
+    """
+    같은 워크로드를 react / fast_first 모드로 실행하여 토큰과 실행 시간 비교
+    
+    답변 캐시는 끄고 실행합니다 (캐시 적중이 비교를 왜곡하지 않도록).
+    """
+    
+    db_url = "sqlite:///db.sqlite"
+    agent = LangChainSQLAgent(
+        db_url=db_url,
+        max_iterations=30,
+        verbose=False
+    )
+    
+    queries = [
+        "재고 테이블에 몇 개의 행이 있나요?",
+        "총 재고금액 합계를 알려주세요",
+        "자재 471422의 정보를 보여주세요",
+        "최근 1개월 판매 데이터 5개만 보여주세요",
+        "부족수량이 가장 많은 자재 1개의 자재코드와 총 부족수량을 보여주세요",
+    ]
+    
+    print("\n" + "="*80)
+    print("모드 비교: react vs fast_first")
+    print("="*80)
+    
+    totals = {mode: {"tokens": 0, "seconds": 0.0, "success": 0} for mode in ("react", "fast_first")}
+    
+    for q in queries:
+        print(f"\n📋 {q}")
+        for mode in ("react", "fast_first"):
+            started = time.perf_counter()
+            result = await agent.run(q, use_cache=False, mode=mode)
+            elapsed = time.perf_counter() - started
+            metrics = result.get('metrics', {})
+            
+            totals[mode]["tokens"] += metrics.get('total_tokens', 0)
+            totals[mode]["seconds"] += elapsed
+            totals[mode]["success"] += 1 if result.get('success') else 0
+            
+            status = "✅" if result.get('success') else "❌"
+            route = metrics.get('fast_path') or "react"
+            print(f"  {status} {mode:<11} {elapsed:6.2f}초 | 토큰 {metrics.get('total_tokens', 0):>6} | "
+                  f"도구 호출 {metrics.get('tool_calls', 0):>2} | 행 {metrics.get('result_count', 0):>5} | {route}")
+    
+    react, fast = totals["react"], totals["fast_first"]
+    print("\n" + "="*80)
+    print("📈 합계")
+    print("="*80)
+    for mode, total in totals.items():
+        print(f"  {mode:<11} {total['seconds']:7.2f}초 | 토큰 {total['tokens']:>7} | 성공 {total['success']}/{len(queries)}")
+    if fast["seconds"] and fast["tokens"]:
+        print(f"\n  ⚡ 시간 {react['seconds'] / fast['seconds']:.1f}배, 토큰 {react['tokens'] / fast['tokens']:.1f}배 감소")
+
 if __name__ == "__main__":
+    if "--compare" in sys.argv:
+        asyncio.run(compare_modes())
+        sys.exit(0)
+    
     print("🚀 SQL Agent 테스트 시작...\n")
     
     # 간단한 쿼리 먼저 테스트
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+동시 요청 테스트 스크립트
+공유 LangChainSQLAgent 하나에 N개의 요청을 동시에 보내 서로 간섭하거나 직렬화되지 않는지 확인
+
+기본 모드는 LLM 대신 지연 시간을 흉내 내는 실행기를 사용하고,
+실제 sql_db_query 도구(CapturingQuerySQLDataBaseTool)로 임시 SQLite DB를 조회합니다.
+--live 옵션을 주면 DB_URL과 실제 LLM으로 같은 검사를 수행합니다.
+
+확인 항목:
+1. 요청마다 지정한 max_rows가 그대로 적용되는지 (다른 요청의 설정에 덮어쓰이지 않는지)
+2. 각 요청의 결과에 다른 요청의 행이 섞이지 않는지
+3. 전체 소요 시간이 요청 하나의 소요 시간과 비슷한지 (직렬화되지 않는지)
+4. 요청별 메트릭이 분리되어 기록되는지
+"""
+
+import asyncio
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from dotenv import load_dotenv
+from langchain_core.agents import AgentAction
+
+load_dotenv()
+
+# 시뮬레이션 모드에서는 Azure 설정 없이 에이전트를 만들 수 있도록 LMStudio 설정 사용
+os.environ.setdefault("USE_LMSTUDIO", "true")
+
+from langchain_sql_agent import LangChainSQLAgent
+
+SIMULATED_LLM_LATENCY = 1.0  # 요청당 LLM 지연 (초)
+
+
+class SimulatedExecutor:
+    """LLM 호출 지연을 흉내 내고 실제 sql_db_query 도구를 호출하는 AgentExecutor 대체"""
+
+    def __init__(self, query_tool):
+        self.query_tool = query_tool
+
+    async def ainvoke(self, inputs, config=None):
+        question = inputs["input"]
+        request_id = int(question.split("#")[1].split()[0])
+
+        await asyncio.sleep(SIMULATED_LLM_LATENCY / 2)  # SQL 생성
+        sql = f"SELECT id, {request_id} AS request_id FROM numbers ORDER BY id"
+        observation = await self.query_tool.ainvoke({"query": sql}, config=config)
+        await asyncio.sleep(SIMULATED_LLM_LATENCY / 2)  # 응답 생성
+
+        action = AgentAction(tool="sql_db_query", tool_input={"query": sql}, log="")
+        return {"output": f"request #{request_id} done", "intermediate_steps": [(action, observation)]}
+
+
+def create_test_db(row_count: int = 5000) -> str:
+    path = os.path.join(tempfile.mkdtemp(), "concurrent.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE numbers (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO numbers VALUES (?)", [(i,) for i in range(row_count)])
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+async def run_concurrent(agent: LangChainSQLAgent, n: int, live: bool):
+    """요청 n개를 동시에 실행하고 결과를 검사"""
+    requests = [(i, 100 * (i + 1)) for i in range(n)]
+
+    if live:
+        question = "sap_zmmr0016_inventory 테이블의 자재와 재고금액을 조회해주세요 (요청 #{})"
+    else:
+        question = "요청 #{} 숫자 목록"
+
+    async def one(request_id: int, max_rows: int):
+        started = time.perf_counter()
+        result = await agent.run(question.format(request_id), max_rows=max_rows, use_cache=False)
+        return request_id, max_rows, result, time.perf_counter() - started
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(i, m) for i, m in requests))
+    wall_time = time.perf_counter() - started
+
+    failures = []
+    for request_id, max_rows, result, elapsed in outcomes:
+        rows = result.get("results") or []
+        status = "✅" if result.get("success") else "❌"
+        print(f"  {status} #{request_id}: max_rows={max_rows} rows={len(rows)} "
+              f"metrics.query={result['metrics']['query'][:20]!r} ({elapsed:.2f}s)")
+
+        if not result.get("success"):
+            failures.append(f"#{request_id} 실패: {result.get('error')}")
+        if len(rows) > max_rows:
+            failures.append(f"#{request_id} 행 수 {len(rows)} > max_rows {max_rows}")
+        if not live:
+            if len(rows) != max_rows:
+                failures.append(f"#{request_id} 행 수 {len(rows)} != max_rows {max_rows}")
+            if any(row["request_id"] != request_id for row in rows):
+                failures.append(f"#{request_id} 다른 요청의 결과가 섞임")
+        if f"#{request_id}" not in result["metrics"]["query"]:
+            failures.append(f"#{request_id} 메트릭이 다른 요청과 섞임")
+
+    slowest = max(elapsed for _, _, _, elapsed in outcomes)
+    print(f"\n⏱️ 전체 {wall_time:.2f}초 / 가장 느린 요청 {slowest:.2f}초 / 요청 {n}개")
+
+    if not live and wall_time > SIMULATED_LLM_LATENCY * 2:
+        failures.append(f"요청이 직렬화됨: {wall_time:.2f}초 > {SIMULATED_LLM_LATENCY * 2:.2f}초")
+
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="LangChainSQLAgent 동시 요청 테스트")
+    parser.add_argument("-n", type=int, default=8, help="동시 요청 수")
+    parser.add_argument("--live", action="store_true", help="실제 LLM과 DB_URL 사용")
+    args = parser.parse_args()
+
+    if args.live:
+        db_url = os.getenv("DB_URL", "sqlite:///db.sqlite")
+        agent = LangChainSQLAgent(db_url=db_url, verbose=False)
+    else:
+        # ReAct 루프만 시뮬레이션하므로 단일 호출 경로(실제 LLM 호출)는 끔
+        agent = LangChainSQLAgent(db_url=create_test_db(), verbose=False, mode="react")
+        query_tool = next(tool for tool in agent.tools if tool.name == "sql_db_query")
+        agent.agent = SimulatedExecutor(query_tool)
+
+    print("=" * 80)
+    print(f"🚀 동시 요청 테스트 ({args.n}개, {'live' if args.live else 'simulated'})")
+    print("=" * 80)
+
+    failures = await run_concurrent(agent, args.n, args.live)
+
+    if failures:
+        print("\n❌ 실패:")
+        for failure in failures:
+            print(f"  - {failure}")
+        raise SystemExit(1)
+
+    print("\n✅ 요청 간 간섭 없음, 직렬화 없음")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())